@@ -2,112 +2,257 @@
 """
 Aplicación principal Flask para Las-Lira
 Sistema de gestión de florería
+
+Desarrollo:  python3 app.py
+Producción:  gunicorn -c gunicorn.conf.py 'app:create_app()'  (ver start.sh)
 """
 
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
+from sqlalchemy.exc import DatabaseError
 import os
+import time
 from extensions import db
 
-# Cargar variables de entorno
+# Cargar variables de entorno (antes de leer la configuración de base de datos y servidor)
 load_dotenv()
 
-# Inicializar Flask
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
-
-# Deshabilitar redirecciones automáticas por trailing slash (evita problemas con CORS preflight)
-app.url_map.strict_slashes = False
-
-# Configurar ruta correcta de la base de datos
-basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f'sqlite:///{os.path.join(basedir, "instance", "laslira.db")}')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Inicializar extensiones
-# Configurar CORS para permitir requests desde el frontend
-CORS(app,
-     origins=[
-         "http://localhost:3001",
-         "http://localhost:3002",
-         "http://localhost:5173",
-         "http://127.0.0.1:3001",
-         "http://127.0.0.1:3002",
-         "http://127.0.0.1:5001"
-     ],
-     methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
-     allow_headers=["Content-Type", "Authorization"],
-     supports_credentials=True
-)
-db.init_app(app)
-
-# Importar rutas
-from routes import (
-    clientes_routes,
-    pedidos_routes, inventario_routes, productos_routes,
-    upload_routes, rutas_routes, producto_colores_routes,
-    pedido_insumos_routes, evento_routes, exportar_routes,
-    analisis_routes, reportes_routes, auth_routes, auditoria_routes
-)
-
-# Registrar blueprints
-app.register_blueprint(auth_routes.bp)  # Ya tiene su propio prefix definido (/api/auth)
-app.register_blueprint(clientes_routes.bp, url_prefix='/api/clientes')
-app.register_blueprint(pedidos_routes.bp, url_prefix='/api/pedidos')
-app.register_blueprint(pedido_insumos_routes.bp)  # Ya tiene su propio prefix definido
-app.register_blueprint(inventario_routes.bp, url_prefix='/api/inventario')
-app.register_blueprint(productos_routes.bp, url_prefix='/api/productos')
-app.register_blueprint(upload_routes.bp, url_prefix='/api/upload')
-app.register_blueprint(rutas_routes.bp, url_prefix='/api/rutas')
-app.register_blueprint(producto_colores_routes.bp, url_prefix='/api/productos-colores')
-app.register_blueprint(evento_routes.bp, url_prefix='/api/eventos')
-app.register_blueprint(exportar_routes.bp, url_prefix='/api/exportar')
-app.register_blueprint(analisis_routes.bp)  # Ya tiene su propio prefix definido (/api/analisis)
-app.register_blueprint(reportes_routes.bp, url_prefix='/api/reportes')
-app.register_blueprint(auditoria_routes.bp)  # Ya tiene su propio prefix definido (/api/auditoria)
-
-@app.route('/')
-def index():
-    return jsonify({'app': 'Las-Lira Backend', 'status': 'running', 'version': '1.0'})
-
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    """Endpoint para verificar que el servidor esté funcionando"""
-    return jsonify({
-        'status': 'ok',
-        'message': 'Las-Lira API funcionando correctamente 🌸'
-    })
-
-@app.route('/api', methods=['GET'])
-def api_info():
-    """Información general de la API"""
-    return jsonify({
-        'nombre': 'Las-Lira API',
-        'version': '1.0.0',
-        'descripcion': 'Sistema de gestión integral para florería',
-        'endpoints': {
-            'pedidos': '/api/pedidos',
-            'inventario': '/api/inventario',
-            'productos': '/api/productos',
-            'rutas': '/api/rutas',
-            'health': '/api/health'
-        }
-    })
+from config.database import configuracion_base_datos, catalogo_disponible, ESQUEMA_CATALOGO
+from config.instrumentacion import SQL_PROFILE
+from config.respuestas import COMPRESION_HTTP
+
+
+def create_app(config=None):
+    """
+    Crea y configura la aplicación Flask
+
+    Args:
+        config: dict opcional con valores de configuración que reemplazan a los por defecto
+
+    Returns:
+        Flask: aplicación lista para servir
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+
+    # Deshabilitar redirecciones automáticas por trailing slash (evita problemas con CORS preflight)
+    app.url_map.strict_slashes = False
+
+    # Base de datos: URI, pool y PRAGMAs de SQLite (WAL, busy_timeout...) en config/database.py
+    app.config.update(configuracion_base_datos())
+    # Conteo de consultas SQL por request y detector de N+1 (ver utils/instrumentacion_sql.py)
+    app.config['SQL_PROFILE'] = SQL_PROFILE
+    # gzip/brotli de las respuestas JSON (ver utils/respuestas_http.py)
+    app.config['COMPRESION_HTTP'] = COMPRESION_HTTP
+
+    if config:
+        app.config.update(config)
+
+    # Inicializar extensiones
+    # Configurar CORS para permitir requests desde el frontend
+    CORS(app,
+         origins=[
+             "http://localhost:3001",
+             "http://localhost:3002",
+             "http://localhost:5173",
+             "http://127.0.0.1:3001",
+             "http://127.0.0.1:3002",
+             "http://127.0.0.1:5001"
+         ],
+         methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
+         allow_headers=["Content-Type", "Authorization"],
+         supports_credentials=True
+    )
+    db.init_app(app)
+
+    # Importar rutas
+    from routes import (
+        clientes_routes,
+        pedidos_routes, inventario_routes, productos_routes,
+        upload_routes, rutas_routes, producto_colores_routes,
+        pedido_insumos_routes, evento_routes, exportar_routes,
+        analisis_routes, reportes_routes, auth_routes, auditoria_routes,
+        importacion_routes
+    )
+
+    # Registrar blueprints
+    app.register_blueprint(auth_routes.bp)  # Ya tiene su propio prefix definido (/api/auth)
+    app.register_blueprint(clientes_routes.bp, url_prefix='/api/clientes')
+    app.register_blueprint(pedidos_routes.bp, url_prefix='/api/pedidos')
+    app.register_blueprint(pedido_insumos_routes.bp)  # Ya tiene su propio prefix definido
+    app.register_blueprint(inventario_routes.bp, url_prefix='/api/inventario')
+    app.register_blueprint(productos_routes.bp, url_prefix='/api/productos')
+    app.register_blueprint(upload_routes.bp, url_prefix='/api/upload')
+    app.register_blueprint(rutas_routes.bp, url_prefix='/api/rutas')
+    app.register_blueprint(producto_colores_routes.bp, url_prefix='/api/productos-colores')
+    app.register_blueprint(evento_routes.bp, url_prefix='/api/eventos')
+    app.register_blueprint(exportar_routes.bp, url_prefix='/api/exportar')
+    app.register_blueprint(analisis_routes.bp)  # Ya tiene su propio prefix definido (/api/analisis)
+    app.register_blueprint(reportes_routes.bp, url_prefix='/api/reportes')
+    app.register_blueprint(auditoria_routes.bp)  # Ya tiene su propio prefix definido (/api/auditoria)
+    app.register_blueprint(importacion_routes.bp, url_prefix='/api/importacion')
+
+    # Con los modelos ya importados por las rutas: crear las tablas que falten
+    _crear_tablas(app)
+
+    _registrar_rutas_generales(app)
+
+    # Se registra antes que la instrumentación: los after_request corren en orden
+    # inverso, así la compresión es lo último que se aplica a la respuesta
+    if app.config['COMPRESION_HTTP']:
+        from utils.respuestas_http import instalar_compresion
+        instalar_compresion(app)
+
+    if app.config['SQL_PROFILE']:
+        from utils.instrumentacion_sql import instalar_instrumentacion
+        instalar_instrumentacion(app)
+
+    return app
+
+
+def _crear_tablas(app):
+    """
+    Crea las tablas de los modelos que la base de datos aún no tiene (las existentes
+    no se modifican). Corre en cada proceso al arrancar: con varios workers de Gunicorn
+    sobre una base nueva, otro proceso puede crear la misma tabla entre la verificación
+    y el CREATE; en ese caso basta con verificar de nuevo
+    """
+    with app.app_context():
+        tablas = None
+        if not catalogo_disponible(db.engine):
+            # Sin el archivo del catálogo no hay esquema donde crear sus tablas
+            tablas = [tabla for tabla in db.metadata.sorted_tables if tabla.schema != ESQUEMA_CATALOGO]
+        try:
+            db.metadata.create_all(db.engine, tables=tablas)
+        except DatabaseError:
+            db.session.rollback()
+            db.metadata.create_all(db.engine, tables=tablas)
+
+
+def _registrar_rutas_generales(app):
+    """Rutas de la aplicación que no pertenecen a ningún blueprint"""
+    iniciada = time.time()
+
+    @app.route('/')
+    def index():
+        return jsonify({'app': 'Las-Lira Backend', 'status': 'running', 'version': '1.0'})
+
+    @app.route('/api/health', methods=['GET'])
+    def health_check():
+        """Endpoint para verificar que el servidor esté funcionando"""
+        return jsonify({
+            'status': 'ok',
+            'message': 'Las-Lira API funcionando correctamente 🌸'
+        })
+
+    @app.route('/api/ready', methods=['GET'])
+    def readiness_check():
+        """
+        Verifica que el proceso pueda atender requests de verdad (para el balanceador
+        o un reinicio ordenado): base de datos, carpeta de uploads y caché
+        Responde 503 si alguna verificación falla
+        """
+        from config.servidor import calcular_workers
+        from services.imagenes_service import UPLOAD_FOLDER
+        from utils.cache_helpers import cache_referencia
+
+        verificaciones = {}
+
+        inicio = time.perf_counter()
+        try:
+            db.session.execute(db.text('SELECT 1'))
+            verificaciones['base_datos'] = {'ok': True, 'ms': round((time.perf_counter() - inicio) * 1000, 2)}
+        except Exception as e:
+            db.session.rollback()
+            verificaciones['base_datos'] = {'ok': False, 'error': str(e)}
+
+        uploads_ok = os.path.isdir(UPLOAD_FOLDER) and os.access(UPLOAD_FOLDER, os.W_OK)
+        verificaciones['uploads'] = {'ok': uploads_ok} if uploads_ok else {'ok': False, 'error': f'Sin permiso de escritura en {UPLOAD_FOLDER}'}
+
+        try:
+            cache_referencia.backend.obtener_versiones(['ready'])
+            verificaciones['cache'] = {'ok': True, 'backend': cache_referencia.backend.nombre}
+            if not cache_referencia.activa:
+                verificaciones['cache']['advertencia'] = (
+                    f'{calcular_workers()} procesos con caché en memoria: la caché está desactivada '
+                    '(usar CACHE_BACKEND=redis o WEB_WORKERS=1)'
+                )
+        except Exception as e:
+            verificaciones['cache'] = {'ok': False, 'error': str(e)}
+
+        listo = all(v['ok'] for v in verificaciones.values())
+        return jsonify({
+            'status': 'ready' if listo else 'not_ready',
+            'pid': os.getpid(),
+            'uptime_segundos': round(time.time() - iniciada),
+            'verificaciones': verificaciones
+        }), 200 if listo else 503
+
+    @app.route('/api/cache/metricas', methods=['GET'])
+    def metricas_cache():
+        """Aciertos, fallos y tiempo ahorrado por la caché de datos de referencia"""
+        from utils.cache_helpers import cache_referencia
+        return jsonify({'success': True, 'data': cache_referencia.obtener_metricas()})
+
+    @app.route('/api/debug/profile', methods=['GET', 'DELETE'])
+    def perfil_consultas():
+        """
+        Reporte de consultas SQL por endpoint y de los últimos requests (SQL_PROFILE=1)
+        Query params: limite (requests recientes, por defecto 50). DELETE reinicia el reporte
+        """
+        if not app.config['SQL_PROFILE']:
+            return jsonify({'success': False, 'error': 'Instrumentación desactivada: iniciar con SQL_PROFILE=1'}), 404
+
+        from utils.instrumentacion_sql import registro_perfiles
+        if request.method == 'DELETE':
+            registro_perfiles.limpiar()
+            return jsonify({'success': True, 'message': 'Reporte reiniciado'})
+
+        limite = request.args.get('limite', 50, type=int)
+        return jsonify({'success': True, 'data': registro_perfiles.reporte(limite=limite)})
+
+    @app.route('/api', methods=['GET'])
+    def api_info():
+        """Información general de la API"""
+        return jsonify({
+            'nombre': 'Las-Lira API',
+            'version': '1.0.0',
+            'descripcion': 'Sistema de gestión integral para florería',
+            'endpoints': {
+                'pedidos': '/api/pedidos',
+                'inventario': '/api/inventario',
+                'productos': '/api/productos',
+                'rutas': '/api/rutas',
+                'health': '/api/health',
+                'ready': '/api/ready'
+            }
+        })
+
+
+def __getattr__(nombre):
+    """
+    Instancia por defecto para los scripts (from app import app), creada recién
+    cuando se pide: Gunicorn importa este módulo solo para llamar a create_app()
+    """
+    if nombre == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
 
 if __name__ == '__main__':
+    app = create_app()
+
     print("=" * 80)
     print("🌸 LAS-LIRA BACKEND")
     print("=" * 80)
     print(f"\n📍 Servidor: http://127.0.0.1:5001")
     print(f"📍 API: http://127.0.0.1:5001/api")
-    print(f"\n⚠️  Presiona CTRL+C para detener\n")
+    print(f"\n⚠️  Servidor de desarrollo: para producción usa ./start.sh produccion")
+    print(f"⚠️  Presiona CTRL+C para detener\n")
     print("=" * 80)
-    
-    # Crear tablas si no existen
-    with app.app_context():
-        db.create_all()
-    
+
     # Ejecutar servidor
     app.run(
         host='0.0.0.0',
@@ -0,0 +1,10 @@
+"""
+Configuración de las alertas de stock bajo (services/alertas_stock_service.py)
+"""
+
+# Días hacia adelante cuyas reservas (libro de reservas) cuentan como demanda próxima:
+# si el stock físico no las cubre la alerta es crítica aunque haya disponible
+HORIZONTE_DEMANDA_DIAS = 7
+
+# Alertas máximas por respuesta del feed /api/inventario/alertas
+MAX_ALERTAS_POR_RESPUESTA = 500
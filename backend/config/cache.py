@@ -0,0 +1,62 @@
+"""
+Configuración de la caché de datos de referencia
+(catálogos de flores, contenedores, bodegas, productos de evento, recetas...)
+"""
+
+import os
+
+# Backend compartido entre procesos: 'memoria' (solo este proceso) o 'redis'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memoria')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+# Prefijo de claves en el backend compartido (permite varias instalaciones en un mismo Redis)
+CACHE_PREFIJO = os.getenv('CACHE_PREFIJO', 'laslira')
+
+# Entradas máximas de la caché en memoria de cada proceso (LRU)
+CACHE_MAX_ENTRADAS = 512
+
+# Tiempo de vida por espacio de nombres (segundos)
+# La invalidación por etiquetas es la que mantiene los datos al día;
+# el TTL solo acota cuánto puede durar un dato si algo se escribe fuera del ORM
+TTL_CACHE = {
+    'flores': 300,
+    'contenedores': 300,
+    'bodegas': 3600,
+    'productos_evento': 3600,
+    'etiquetas_cliente': 3600,
+    'productos': 600,
+    'recetas': 600,
+    'producto_colores': 600,
+    # Hojas de ruta, una entrada por fecha de entrega (scripts con SQL directo: ver el TTL)
+    'rutas': 60,
+    # Cola del taller: se invalida con cada cambio de estado o confirmación de insumos;
+    # el TTL corto acota lo que tarda en verse un cambio hecho con SQL directo
+    'taller': 30,
+}
+TTL_CACHE_DEFECTO = 300
+
+# Modelo (nombre de la clase) -> etiquetas de caché que invalida al modificarse
+ETIQUETAS_POR_MODELO = {
+    'Flor': ('flores',),
+    'Contenedor': ('contenedores',),
+    'Bodega': ('bodegas',),
+    # Los listados de flores y contenedores incluyen sus proveedores
+    'Proveedor': ('proveedores', 'flores', 'contenedores'),
+    'ProductoEvento': ('productos_evento',),
+    'Producto': ('productos',),
+    'ProductoCatalogo': ('productos',),
+    'ImagenProductoCatalogo': ('productos',),
+    'RecetaProducto': ('recetas',),
+    'ProductoColor': ('producto_colores',),
+    'ProductoColorFlor': ('producto_colores',),
+    # Datos operativos: no se cachean, pero sus versiones entran en los ETag de las
+    # respuestas (utils/respuestas_http.py). Los pedidos no llevan etiqueta: sus ETag
+    # usan el cursor del feed de cambios, que ya se escribe con cada cambio de pedido
+    'Cliente': ('clientes',),
+    'Evento': ('eventos',),
+    'EventoInsumo': ('eventos',),
+}
+
+# Etiquetas cuya versión se guarda en versiones_etiquetas (una escritura más en cada
+# commit que las marca): solo las que leen los ETag y no se deducen de datos ya escritos.
+# 'taller' y 'rutas:*' cambian con cada pedido y sus ETag usan el cursor de cambios_pedidos
+ETIQUETAS_VERSIONADAS = frozenset({'clientes', 'eventos', 'productos'})
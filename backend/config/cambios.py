@@ -0,0 +1,35 @@
+"""
+Configuración del feed de cambios de pedidos (/api/pedidos/cambios)
+"""
+
+import os
+from config.servidor import calcular_threads
+
+# Segundos máximos que un long-poll espera cambios antes de responder vacío
+ESPERA_MAXIMA_SEGUNDOS = 25
+
+# Cada cuánto se revisa la tabla mientras se espera. Los cambios de este mismo proceso
+# despiertan a los clientes al instante; los de otros workers, en a lo más este intervalo
+INTERVALO_SONDEO_SEGUNDOS = 2
+
+# Duración de una conexión SSE; el navegador (EventSource) se reconecta solo con Last-Event-ID
+DURACION_STREAM_SEGUNDOS = 55
+
+# Comentario de keep-alive en SSE (evita que proxies corten la conexión inactiva)
+INTERVALO_PING_SEGUNDOS = 15
+
+# Milisegundos que el cliente espera antes de reconectar (campo retry de SSE)
+REINTENTO_CLIENTE_MS = 3000
+
+# Cambios máximos por respuesta (si hay más, el cliente sigue desde el cursor devuelto)
+MAX_CAMBIOS_POR_RESPUESTA = 500
+
+# Esperas simultáneas por proceso: cada una ocupa un hilo del worker (gthread) mientras
+# espera, así que se deja siempre al menos la mitad de los hilos para el resto de la API
+MAX_ESPERAS_CONCURRENTES = int(os.getenv('CAMBIOS_MAX_ESPERAS', '0')) or max(1, calcular_threads() // 2)
+
+# Días de cambios que se conservan; un cursor más antiguo debe recargar el tablero
+RETENCION_CAMBIOS_DIAS = 7
+
+# Se purgan los cambios vencidos cada N cambios registrados
+PURGAR_CADA_CAMBIOS = 1000
@@ -0,0 +1,26 @@
+"""
+Configuración de la comparación aproximada de nombres de productos
+(utils/similitud_helpers.py y services/coincidencias_productos_service.py)
+"""
+
+import os
+
+# Similitud mínima (0-1) para considerar que dos nombres son el mismo producto
+UMBRAL_COINCIDENCIA = 0.8
+
+# Largo de los n-gramas de caracteres con que se indexan los nombres
+TAMANO_NGRAMA = 3
+
+# Bloqueo: solo se puntúan los candidatos que comparten al menos esta proporción
+# de n-gramas con la consulta (coeficiente de Dice), y a lo más MAX_CANDIDATOS
+DICE_MINIMO_CANDIDATO = 0.3
+MAX_CANDIDATOS_POR_CONSULTA = 25
+
+# Procesos para lotes grandes (scripts); COINCIDENCIAS_PROCESOS=1 desactiva el paralelismo
+PROCESOS_COINCIDENCIAS = int(os.getenv('COINCIDENCIAS_PROCESOS', '0')) or (os.cpu_count() or 1)
+
+# Bajo esta cantidad de consultas no compensa levantar procesos
+MIN_CONSULTAS_PARALELO = 2000
+
+# Nombres máximos por solicitud a /api/productos/coincidencias
+MAX_NOMBRES_POR_SOLICITUD = 500
@@ -78,6 +78,26 @@ COMUNAS_PRECIOS = {
     "Pirque": 35000,
 }
 
+# Formas alternativas de escribir una comuna en las direcciones -> comuna de COMUNAS_PRECIOS
+# Las tildes, la ñ, los signos de puntuación y las mayúsculas ya se ignoran al comparar:
+# aquí solo van abreviaturas (ej: "Ñunoa" o "Nunoa" encuentran "Ñuñoa" sin necesidad de alias)
+ALIAS_COMUNAS = {
+    "Stgo Centro": "Santiago Centro",
+    "Est Central": "Estación Central",
+    "PAC": "Pedro Aguirre Cerda",
+    "P.A.C.": "Pedro Aguirre Cerda",
+    "Quinta Nl": "Quinta Normal",
+}
+
+# Destinos con tarifa propia dentro de una comuna (clínicas, cementerios): en una
+# dirección ganan a la comuna en que están ("Clinica Alemana, Vitacura" -> "Clinica Alemana")
+DESTINOS_ESPECIALES = (
+    "Clinica Alemana",
+    "Clinica Las Condes",
+    "Clinica Los Andes",
+    "Parque del Recuerdo",
+)
+
 # Lista de comunas ordenadas por precio (para dropdown/select)
 COMUNAS_ORDENADAS = sorted(COMUNAS_PRECIOS.keys())
 
@@ -128,11 +148,11 @@ ZONAS = {
     "Clínicas": ["Clinica Alemana", "Clinica Las Condes", "Clinica Los Andes", "Parque del Recuerdo"]
 }
 
+# Índice inverso comuna -> zona (las comunas no se repiten entre zonas)
+_ZONA_POR_COMUNA = {comuna: zona for zona, comunas in ZONAS.items() for comuna in comunas}
+
 def obtener_zona_comuna(comuna):
     """
     Obtiene la zona geográfica de una comuna
     """
-    for zona, comunas in ZONAS.items():
-        if comuna in comunas:
-            return zona
-    return "Otra"
+    return _ZONA_POR_COMUNA.get(comuna, "Otra")
@@ -0,0 +1,22 @@
+"""
+Configuración del motor de costos de cotizaciones de eventos
+(services/costos_eventos_service.py)
+"""
+
+# Margen (%) que se usa cuando el evento no tiene uno
+MARGEN_POR_DEFECTO = 30
+
+# Líneas máximas (agregar + actualizar + eliminar) por edición en lote
+MAX_LINEAS_POR_EDICION = 1000
+
+# Escenarios máximos por solicitud a /api/eventos/<id>/simular
+MAX_ESCENARIOS_SIMULACION = 20
+
+# Referencias al inventario por tipo de línea:
+# tipo_insumo -> (campo de EventoInsumo, atributos de costo en orden de preferencia)
+REFERENCIAS_INSUMOS = {
+    'flor': ('flor_id', ('costo_unitario',)),
+    'contenedor': ('contenedor_id', ('costo',)),
+    'producto': ('producto_id', ('precio',)),
+    'producto_evento': ('producto_evento_id', ('costo_alquiler', 'costo_compra')),
+}
@@ -0,0 +1,28 @@
+"""
+Configuración de variantes de imágenes (miniaturas y WebP)
+"""
+
+# Tamaños de variantes: nombre -> lado mayor en píxeles
+# Se usan con ?size=<nombre> en /api/upload/imagen/<filename>
+TAMANOS_VARIANTES = {
+    'thumb': 160,    # Grilla de inventario, tarjetas del tablero
+    'small': 400,    # Hojas de ruta del repartidor, listados
+    'medium': 1024,  # Vista de detalle
+}
+
+# Formatos generados para cada tamaño: extensión -> (formato Pillow, mimetype)
+FORMATOS_VARIANTES = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),  # Respaldo para navegadores sin WebP
+}
+
+# Calidad de compresión
+CALIDAD_WEBP = 80
+CALIDAD_JPEG = 82
+
+# Tiempo de caché HTTP de las variantes (segundos)
+# Las variantes se identifican por el hash del contenido, su ETag nunca cambia
+MAX_AGE_VARIANTES = 30 * 24 * 60 * 60  # 30 días
+
+# Hilos del worker que genera variantes en segundo plano
+WORKERS_VARIANTES = 2
@@ -0,0 +1,43 @@
+"""
+Configuración de la importación masiva (/api/importacion y scripts/importar_lote.py)
+"""
+
+# Filas leídas, validadas y escritas por lote; cada lote se confirma en su propia transacción
+TAMANO_LOTE_IMPORTACION = 1000
+
+# Errores de validación detallados en el resumen (el resto solo se cuenta)
+MAX_ERRORES_REPORTADOS = 200
+
+# Tamaño máximo del archivo subido por la API (MB); archivos más grandes, con el script
+MAX_ARCHIVO_IMPORTACION_MB = 50
+
+FORMATOS_IMPORTACION = ('csv', 'jsonl')
+
+# ===== PEDIDOS (exportación de Trello: pedidos_trello_COMPLETO.csv) =====
+
+ESTADOS_PEDIDO_TRELLO = {
+    'ARCHIVADO': 'Archivado',
+    'ACTIVO': 'Pedidos Semana'
+}
+ESTADO_PEDIDO_DEFECTO = 'Archivado'
+
+ESTADOS_PAGO_TRELLO = {
+    'PAGADO': 'Pagado',
+    'PENDIENTE': 'No Pagado'
+}
+ESTADO_PAGO_DEFECTO = 'Pagado'
+
+# ===== PRODUCTOS (exportación de Shopify: products_export_1.csv) =====
+
+# Columna de metafield de Shopify -> clave en Producto.metafields (JSON)
+METAFIELDS_SHOPIFY = {
+    'Color (product.metafields.shopify.color-pattern)': 'color',
+    'Material de decoración (product.metafields.shopify.decoration-material)': 'material',
+    'Formato de papel (product.metafields.shopify.paper-format)': 'formato_papel',
+    'Tamaño de papel (product.metafields.shopify.paper-size)': 'tamaño_papel',
+    'Características de la planta (product.metafields.shopify.plant-characteristics)': 'caracteristicas_planta',
+    'Forma (product.metafields.shopify.shape)': 'forma',
+    'Espacio adecuado (product.metafields.shopify.suitable-space)': 'espacio_adecuado',
+    'Luz solar (product.metafields.shopify.sunlight)': 'luz_solar',
+    'Forma de jarrón (product.metafields.shopify.vase-shape)': 'forma_jarrón',
+}
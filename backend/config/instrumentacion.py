@@ -0,0 +1,23 @@
+"""
+Configuración de la instrumentación de consultas SQL por request
+(conteo de consultas, tiempo en base de datos y detector de N+1)
+
+Desactivada por defecto: SQL_PROFILE=1 la activa. Con ella activa cada respuesta
+lleva un header Server-Timing y /api/debug/profile muestra el reporte.
+"""
+
+import os
+
+SQL_PROFILE = os.getenv('SQL_PROFILE', '0') == '1'
+
+# Aviso de N+1: una misma forma de consulta repetida más de N veces en un request
+UMBRAL_CONSULTAS_REPETIDAS = int(os.getenv('SQL_PROFILE_UMBRAL_REPETIDAS', '10'))
+
+# Requests recientes que se guardan para el reporte (los más antiguos se descartan)
+MAX_PERFILES_RECIENTES = 200
+
+# Formas de consulta más repetidas que se muestran por request
+MAX_HUELLAS_POR_PERFIL = 5
+
+# Largo máximo del texto de una forma de consulta en el reporte
+MAX_LARGO_HUELLA = 300
@@ -26,6 +26,9 @@ MOTIVOS_ESTANDAR = [
     "Otro"
 ]
 
+# Motivos en minúsculas para comparaciones rápidas (se calcula una sola vez)
+MOTIVOS_ESTANDAR_MINUSCULAS = frozenset(m.lower() for m in MOTIVOS_ESTANDAR)
+
 def obtener_motivos():
     """Retorna la lista de motivos estándar"""
     return MOTIVOS_ESTANDAR
@@ -0,0 +1,32 @@
+"""
+Configuración del pronóstico de demanda de flores y las compras sugeridas
+(services/pronostico_service.py)
+"""
+
+# Días de historial de pedidos usados para ajustar el pronóstico
+DIAS_HISTORIA = 730
+
+# Vida media (días) del promedio exponencial del consumo diario: los días recientes pesan más
+VIDA_MEDIA_NIVEL_DIAS = 28
+
+# Días hacia adelante de la lista de compras, por defecto
+HORIZONTE_COMPRA_DIAS = 4
+
+# Máximo de días de pronóstico por cálculo
+MAX_HORIZONTE_COMPRA_DIAS = 31
+
+# Fechas especiales (Chile) con demanda propia:
+# ('fija', mes, día) o ('domingo', mes, n) para el n-ésimo domingo del mes
+FECHAS_ESPECIALES = {
+    'San Valentín': ('fija', 2, 14),
+    'Día de la Mujer': ('fija', 3, 8),
+    'Día de la Madre': ('domingo', 5, 2),
+    'Día del Padre': ('domingo', 6, 3),
+    'Día de Todos los Santos': ('fija', 11, 1),
+}
+
+# Días antes de la fecha especial que se entregan pedidos por ella (más el mismo día)
+DIAS_PREVIOS_FECHA_ESPECIAL = 3
+
+# Multiplicador de la demanda en una fecha especial sin historial suficiente
+FACTOR_FECHA_ESPECIAL_DEFECTO = 2.0
@@ -0,0 +1,25 @@
+"""
+Configuración del libro de reservas de insumos por fecha
+(services/reservas_service.py)
+"""
+
+# Días que una flor se mantiene vendible desde que llega al taller. Las reservas a
+# menos de esa distancia de la fecha consultada compiten por el mismo stock
+VIDA_UTIL_FLORES_DIAS = 5
+
+# Ventana de reservas que compite con una fecha, por tipo de insumo:
+# (días antes, días después); None = sin límite en ese sentido. Los contenedores no
+# se echan a perder: toda reserva pendiente compromete el mismo stock
+VENTANAS_DISPONIBILIDAD = {
+    'Flor': (VIDA_UTIL_FLORES_DIAS - 1, VIDA_UTIL_FLORES_DIAS - 1),
+    'Contenedor': (None, None),
+}
+
+# Estados de pedido cuyos insumos no quedan reservados
+ESTADOS_SIN_RESERVA = ('Cancelado',)
+
+# Orígenes por consulta al conciliar (límite de parámetros de SQLite en IN)
+TAMANO_LOTE_CONCILIACION = 500
+
+# Días máximos por consulta al calendario de reservas de un insumo
+MAX_DIAS_CALENDARIO = 366
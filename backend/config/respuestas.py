@@ -0,0 +1,19 @@
+"""
+Configuración de compresión HTTP y validadores (ETag) de las respuestas JSON
+"""
+
+import os
+
+# Comprimir respuestas (gzip, o brotli si el paquete está instalado y el cliente lo acepta)
+# COMPRESION_HTTP=0 la desactiva, p. ej. si un proxy (nginx) ya comprime
+COMPRESION_HTTP = os.getenv('COMPRESION_HTTP', '1') == '1'
+
+# Bajo este tamaño no vale la pena comprimir (bytes)
+COMPRESION_MIN_BYTES = int(os.getenv('COMPRESION_MIN_BYTES', '1024'))
+
+# Niveles: 6 en gzip y 5 en brotli comprimen casi como el máximo a una fracción del costo
+NIVEL_GZIP = 6
+NIVEL_BROTLI = 5
+
+# Tipos de contenido que se comprimen (las imágenes y PDF ya vienen comprimidos)
+TIPOS_COMPRIMIBLES = ('application/json', 'text/csv', 'text/plain', 'text/html')
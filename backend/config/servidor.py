@@ -0,0 +1,54 @@
+"""
+Configuración del servidor de producción (Gunicorn)
+
+SQLite admite un solo escritor a la vez: con SQLite se usan pocos procesos y
+algunos hilos por proceso (las esperas largas, como generar PDFs o llamar a la API
+de Google, liberan el GIL), en vez de muchos procesos compitiendo por el bloqueo
+de escritura. Con Postgres (DATABASE_URL=postgresql://...) se escala por CPU.
+
+Las cachés y sus invalidaciones viven en cada proceso salvo con CACHE_BACKEND=redis
+(config/cache.py): sin Redis se usa un solo proceso con más hilos, porque cada worker
+serviría su propia copia desactualizada de lo que otro modificó.
+"""
+
+import multiprocessing
+import os
+from config.cache import CACHE_BACKEND
+
+
+def _entero_env(nombre, defecto):
+    valor = os.getenv(nombre)
+    return int(valor) if valor and valor.isdigit() else defecto
+
+
+def usa_sqlite():
+    """Indica si la base de datos configurada es SQLite (la por defecto)"""
+    return os.getenv('DATABASE_URL', 'sqlite://').startswith('sqlite')
+
+
+def calcular_workers():
+    """Procesos de Gunicorn: WEB_WORKERS o un valor según la caché y la base de datos"""
+    if CACHE_BACKEND != 'redis':
+        defecto = 1
+    elif usa_sqlite():
+        defecto = 2
+    else:
+        defecto = multiprocessing.cpu_count() * 2 + 1
+    return max(1, _entero_env('WEB_WORKERS', defecto))
+
+
+def calcular_threads():
+    """Hilos por proceso: WEB_THREADS, o 8 con un solo proceso y 4 con varios"""
+    return max(1, _entero_env('WEB_THREADS', 8 if calcular_workers() == 1 else 4))
+
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PUERTO = _entero_env('PORT', 5001)
+
+# Segundos antes de matar un worker colgado (el PDF de rutas puede tardar)
+TIMEOUT_WORKER = _entero_env('WEB_TIMEOUT', 120)
+# Segundos que un worker tiene para terminar sus requests en un reinicio ordenado
+TIMEOUT_APAGADO = _entero_env('WEB_GRACEFUL_TIMEOUT', 30)
+# Reciclar workers cada N requests (con variación aleatoria para no reiniciar todos juntos)
+MAX_REQUESTS = _entero_env('WEB_MAX_REQUESTS', 1000)
+MAX_REQUESTS_VARIACION = 100
@@ -0,0 +1,50 @@
+"""
+Configuración de Gunicorn para producción
+
+Uso (desde backend/):
+    gunicorn -c gunicorn.conf.py 'app:create_app()'
+
+Reinicio ordenado (recarga código sin cortar requests en curso):
+    kill -HUP $(cat gunicorn.pid)
+"""
+
+import os
+from config.cache import CACHE_BACKEND
+from config.servidor import (
+    HOST, PUERTO, TIMEOUT_WORKER, TIMEOUT_APAGADO, MAX_REQUESTS, MAX_REQUESTS_VARIACION,
+    calcular_workers, calcular_threads
+)
+
+bind = f'{HOST}:{PUERTO}'
+workers = calcular_workers()
+threads = calcular_threads()
+worker_class = 'gthread'
+
+timeout = TIMEOUT_WORKER
+graceful_timeout = TIMEOUT_APAGADO
+keepalive = 5
+max_requests = MAX_REQUESTS
+max_requests_jitter = MAX_REQUESTS_VARIACION
+
+# Cada worker crea su propia app: las conexiones SQLite y los hilos de fondo
+# (variantes de imágenes) no deben compartirse a través de fork()
+preload_app = False
+
+pidfile = 'gunicorn.pid'
+accesslog = '-'
+errorlog = '-'
+loglevel = 'info'
+proc_name = 'laslira-backend'
+
+
+def when_ready(server):
+    server.log.info(f"🌸 Las-Lira en http://{bind} ({server.cfg.workers} workers x {server.cfg.threads} hilos)")
+    if server.cfg.workers > 1 and CACHE_BACKEND != 'redis':
+        server.log.warning("⚠️ Varios workers con la caché en memoria de cada proceso: "
+                           "usa CACHE_BACKEND=redis o WEB_WORKERS=1")
+
+
+def post_fork(server, worker):
+    # La app del worker lee WEB_WORKERS (config.servidor): que vea los procesos reales,
+    # también si se cambiaron con -w en la línea de comandos
+    os.environ['WEB_WORKERS'] = str(server.cfg.workers)
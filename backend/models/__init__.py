@@ -1,9 +1,15 @@
 from .cliente import Cliente
-from .pedido import Pedido, PedidoInsumo
+from .pedido import Pedido, PedidoInsumo, CambioPedido
 from .producto import Producto, RecetaProducto
-from .inventario import Flor, Contenedor, Bodega, Proveedor
+from .catalogo import ProductoCatalogo, ImagenProductoCatalogo
+from .inventario import (
+    Flor, Contenedor, Bodega, Proveedor, MovimientoReserva, ReservaDiaria, AlertaStock,
+    PronosticoDemanda, CompraSugerida
+)
 from .usuario import Usuario
 from .auditoria import Auditoria
+from .archivo import ArchivoSubido
+from .version_etiqueta import VersionEtiqueta
 from .producto_detallado import (
     ProductoColor, 
     ProductoColorFlor, 
@@ -13,10 +19,12 @@ from .producto_detallado import (
 
 __all__ = [
     'Cliente',
-    'Pedido', 'PedidoInsumo',
+    'Pedido', 'PedidoInsumo', 'CambioPedido',
     'Producto', 'RecetaProducto',
-    'Flor', 'Contenedor', 'Bodega', 'Proveedor',
-    'Usuario', 'Auditoria',
+    'ProductoCatalogo', 'ImagenProductoCatalogo',
+    'Flor', 'Contenedor', 'Bodega', 'Proveedor', 'MovimientoReserva', 'ReservaDiaria', 'AlertaStock',
+    'PronosticoDemanda', 'CompraSugerida',
+    'Usuario', 'Auditoria', 'ArchivoSubido', 'VersionEtiqueta',
     'ProductoColor', 'ProductoColorFlor',
     'PedidoFlorSeleccionada', 'PedidoContenedorSeleccionado'
 ]
@@ -0,0 +1,42 @@
+"""
+Modelo de Archivo Subido
+Almacenamiento direccionado por contenido: cada archivo se guarda una sola vez
+con su hash SHA-256 como nombre y lleva la cuenta de cuántos registros lo usan
+"""
+
+from datetime import datetime
+from extensions import db
+
+
+class ArchivoSubido(db.Model):
+    """Archivo único en uploads/ identificado por el hash de su contenido"""
+    __tablename__ = 'archivos_subidos'
+
+    hash = db.Column(db.String(64), primary_key=True)  # SHA-256 del contenido
+    extension = db.Column(db.String(10), nullable=False)  # png, jpg, webp...
+    tamano_bytes = db.Column(db.Integer, nullable=False, default=0)
+    referencias = db.Column(db.Integer, nullable=False, default=0)  # Columnas que apuntan a este archivo
+    veces_subido = db.Column(db.Integer, nullable=False, default=1)  # Subidas totales (incluye duplicadas)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    fecha_ultima_subida = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    @property
+    def filename(self):
+        """Nombre del archivo en uploads/ (<hash>.<extension>)"""
+        return f'{self.hash}.{self.extension}'
+
+    def to_dict(self):
+        return {
+            'hash': self.hash,
+            'filename': self.filename,
+            'url': f'/api/upload/imagen/{self.filename}',
+            'extension': self.extension,
+            'tamano_bytes': self.tamano_bytes,
+            'referencias': self.referencias,
+            'veces_subido': self.veces_subido,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_ultima_subida': self.fecha_ultima_subida.isoformat() if self.fecha_ultima_subida else None
+        }
+
+    def __repr__(self):
+        return f'<ArchivoSubido {self.filename} ({self.referencias} refs)>'
@@ -0,0 +1,90 @@
+"""
+Modelos del catálogo de Shopify (las_lira.db)
+
+Las tablas viven en el esquema 'catalogo': con SQLite es la base legacy adjuntada
+(ATTACH) a cada conexión del pool (ver config/database.py), así que se consultan
+con la misma sesión y se pueden unir con pedidos en una sola consulta.
+"""
+
+import json
+from datetime import datetime
+from extensions import db
+from config.database import ESQUEMA_CATALOGO
+
+
+class ProductoCatalogo(db.Model):
+    __tablename__ = 'productos'
+    __table_args__ = {'schema': ESQUEMA_CATALOGO}
+
+    id = db.Column(db.Integer, primary_key=True)
+    nombre = db.Column(db.Text, nullable=False)
+    descripcion = db.Column(db.Text)
+    precio = db.Column(db.Float)
+    categoria = db.Column(db.Text)
+    tipo = db.Column(db.Text)
+    imagen_url = db.Column(db.Text)
+    sku = db.Column(db.Text)
+    peso = db.Column(db.Float)
+    tags = db.Column(db.Text)
+    metafields = db.Column(db.Text)
+    activo = db.Column(db.Boolean, default=True)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Las imágenes se cargan en una sola consulta para todos los productos del listado
+    imagenes = db.relationship(
+        'ImagenProductoCatalogo', backref='producto', lazy='selectin',
+        order_by='ImagenProductoCatalogo.posicion', cascade='all, delete-orphan'
+    )
+
+    @property
+    def imagen_principal(self):
+        """URL de la imagen marcada como principal, o imagen_url del producto"""
+        for imagen in self.imagenes:
+            if imagen.es_principal:
+                return imagen.url
+        return self.imagen_url
+
+    def to_dict(self):
+        """Convierte el producto a diccionario (formato de /api/productos)"""
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'descripcion': self.descripcion,
+            'precio': self.precio,
+            'categoria': self.categoria,
+            'tipo': self.tipo,
+            'imagen_principal': self.imagen_principal,
+            'imagen_url': self.imagen_url,
+            'imagenes': [imagen.to_dict() for imagen in self.imagenes],
+            'sku': self.sku,
+            'peso': self.peso,
+            'tags': self.tags.split(',') if self.tags else [],
+            'metafields': json.loads(self.metafields) if self.metafields else {},
+            'activo': bool(self.activo)
+        }
+
+    def __repr__(self):
+        return f'<ProductoCatalogo {self.id} - {self.nombre}>'
+
+
+class ImagenProductoCatalogo(db.Model):
+    __tablename__ = 'imagenes_productos'
+    __table_args__ = {'schema': ESQUEMA_CATALOGO}
+
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey(f'{ESQUEMA_CATALOGO}.productos.id'), nullable=False, index=True)
+    url = db.Column(db.Text, nullable=False)
+    posicion = db.Column(db.Integer, default=0)
+    alt_text = db.Column(db.Text)
+    es_principal = db.Column(db.Boolean, default=False)
+
+    def to_dict(self):
+        return {
+            'url': self.url,
+            'posicion': self.posicion,
+            'alt_text': self.alt_text,
+            'es_principal': bool(self.es_principal)
+        }
+
+    def __repr__(self):
+        return f'<ImagenProductoCatalogo {self.producto_id} #{self.posicion}>'
@@ -201,3 +201,165 @@ class Proveedor(db.Model):
     def __repr__(self):
         return f'<Proveedor {self.nombre}>'
 
+
+
+class MovimientoReserva(db.Model):
+    """
+    Libro de reservas de insumos por fecha (services/reservas_service.py)
+
+    Solo se agregan filas: cada una reserva (cantidad positiva) o libera (negativa)
+    unidades de un insumo para una fecha, a nombre de un pedido o evento. Lo que un
+    origen tiene reservado es la suma de sus movimientos. Sin FK: el historial de
+    un pedido o evento eliminado se conserva.
+    """
+    __tablename__ = 'movimientos_reservas'
+    __table_args__ = (
+        db.Index('ix_movimientos_reservas_insumo_fecha', 'insumo_tipo', 'insumo_id', 'fecha'),
+        db.Index('ix_movimientos_reservas_origen', 'origen_tipo', 'origen_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    insumo_tipo = db.Column(db.String(20), nullable=False)  # Flor, Contenedor
+    insumo_id = db.Column(db.String(20), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)  # Fecha de entrega del pedido o del evento
+    cantidad = db.Column(db.Integer, nullable=False)
+    origen_tipo = db.Column(db.String(20), nullable=False)  # pedido, evento
+    origen_id = db.Column(db.String(20), nullable=False)
+    motivo = db.Column(db.String(20))  # creado, insumos, fecha, estado, eliminado, conciliacion
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'insumo_tipo': self.insumo_tipo,
+            'insumo_id': self.insumo_id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'cantidad': self.cantidad,
+            'origen_tipo': self.origen_tipo,
+            'origen_id': self.origen_id,
+            'motivo': self.motivo,
+            'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None
+        }
+
+
+class ReservaDiaria(db.Model):
+    """
+    Total reservado por insumo y día: la suma de movimientos_reservas, mantenida en la
+    misma transacción que registra cada movimiento
+    """
+    __tablename__ = 'reservas_diarias'
+
+    insumo_tipo = db.Column(db.String(20), primary_key=True)
+    insumo_id = db.Column(db.String(20), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    cantidad = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        return {
+            'insumo_tipo': self.insumo_tipo,
+            'insumo_id': self.insumo_id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'cantidad': self.cantidad
+        }
+
+
+class AlertaStock(db.Model):
+    """
+    Estado de alerta de stock de cada flor o contenedor (services/alertas_stock_service.py)
+
+    Se actualiza en la misma transacción que cambia el stock, las reservas o el umbral
+    del insumo. La secuencia crece con cada cambio de la alerta (aparece, cambia de
+    nivel o de cantidades, se resuelve) y sirve de cursor al feed de alertas. Las
+    alertas resueltas se conservan con nivel NULL para que el feed las informe.
+    """
+    __tablename__ = 'alertas_stock'
+
+    insumo_tipo = db.Column(db.String(20), primary_key=True)  # Flor, Contenedor
+    insumo_id = db.Column(db.String(20), primary_key=True)
+    nombre = db.Column(db.String(100))
+    nivel = db.Column(db.String(20))  # critico, bajo o NULL (sin alerta)
+    stock = db.Column(db.Integer, default=0, nullable=False)
+    disponible = db.Column(db.Integer, default=0, nullable=False)
+    stock_bajo = db.Column(db.Integer, default=0, nullable=False)
+    demanda_proxima = db.Column(db.Integer, default=0, nullable=False)  # Reservas de los próximos días
+    reponer = db.Column(db.Integer, default=0, nullable=False)  # Unidades sugeridas para salir de la alerta
+    secuencia = db.Column(db.Integer, nullable=False, unique=True)
+    fecha_actualizacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'secuencia': self.secuencia,
+            'insumo_tipo': self.insumo_tipo,
+            'insumo_id': self.insumo_id,
+            'nombre': self.nombre,
+            'nivel': self.nivel,
+            'stock': self.stock,
+            'disponible': self.disponible,
+            'stock_bajo': self.stock_bajo,
+            'demanda_proxima': self.demanda_proxima,
+            'reponer': self.reponer,
+            'fecha_actualizacion': self.fecha_actualizacion.isoformat() if self.fecha_actualizacion else None
+        }
+
+
+class PronosticoDemanda(db.Model):
+    """
+    Consumo diario pronosticado de cada flor (services/pronostico_service.py)
+
+    Lo escribe el cálculo nocturno (scripts/calcular_pronostico_compras.py), que
+    reemplaza todas las filas en una transacción; las requests solo lo leen.
+    """
+    __tablename__ = 'pronosticos_demanda'
+
+    flor_id = db.Column(db.String(10), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    cantidad = db.Column(db.Float, default=0, nullable=False)  # Tallos pronosticados por el historial
+    reservado = db.Column(db.Integer, default=0, nullable=False)  # Ya reservado en el libro de reservas
+    fecha_especial = db.Column(db.String(50))  # Fecha especial cuya demanda incluye el día
+    fecha_calculo = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'flor_id': self.flor_id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'cantidad': self.cantidad,
+            'reservado': self.reservado,
+            'demanda': max(self.cantidad, self.reservado),
+            'fecha_especial': self.fecha_especial,
+            'fecha_calculo': self.fecha_calculo.isoformat() if self.fecha_calculo else None
+        }
+
+
+class CompraSugerida(db.Model):
+    """
+    Tallos a comprar de cada flor para cubrir el horizonte del último cálculo
+    (services/pronostico_service.py); solo se guardan las flores que hay que comprar
+    """
+    __tablename__ = 'compras_sugeridas'
+
+    flor_id = db.Column(db.String(10), primary_key=True)
+    proveedor_id = db.Column(db.String(10), index=True)  # NULL si la flor no tiene proveedor activo
+    desde = db.Column(db.Date, nullable=False)
+    hasta = db.Column(db.Date, nullable=False)
+    demanda = db.Column(db.Float, default=0, nullable=False)  # Pronóstico (o reservado, si es mayor) del horizonte
+    reservado = db.Column(db.Integer, default=0, nullable=False)
+    stock = db.Column(db.Integer, default=0, nullable=False)  # Stock al momento del cálculo
+    stock_bajo = db.Column(db.Integer, default=0, nullable=False)  # Se mantiene como margen
+    cantidad = db.Column(db.Integer, nullable=False)
+    costo_estimado = db.Column(db.Numeric(12, 2), default=0)
+    fecha_calculo = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'flor_id': self.flor_id,
+            'proveedor_id': self.proveedor_id,
+            'desde': self.desde.isoformat() if self.desde else None,
+            'hasta': self.hasta.isoformat() if self.hasta else None,
+            'demanda': self.demanda,
+            'reservado': self.reservado,
+            'stock': self.stock,
+            'stock_bajo': self.stock_bajo,
+            'cantidad': self.cantidad,
+            'costo_estimado': float(self.costo_estimado) if self.costo_estimado else 0,
+            'fecha_calculo': self.fecha_calculo.isoformat() if self.fecha_calculo else None
+        }
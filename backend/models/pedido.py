@@ -2,9 +2,9 @@
 Modelo de Pedido
 """
 
-import os
 from datetime import datetime
 from extensions import db
+from config.database import catalogo_disponible
 
 class Pedido(db.Model):
     __tablename__ = 'pedidos'
@@ -76,6 +76,13 @@ class Pedido(db.Model):
     # Relaciones
     cliente = db.relationship('Cliente', back_populates='pedidos', lazy=True)
     producto = db.relationship('Producto', backref='pedidos', lazy=True)
+    # Imagen principal del producto en el catálogo de Shopify (esquema catalogo, misma conexión)
+    imagen_catalogo = db.relationship(
+        'ImagenProductoCatalogo',
+        primaryjoin='and_(foreign(Pedido.producto_id) == ImagenProductoCatalogo.producto_id, '
+                    'ImagenProductoCatalogo.es_principal == True)',
+        viewonly=True, uselist=False, lazy='select'
+    )
     insumos = db.relationship('PedidoInsumo', backref='pedido', lazy=True, cascade='all, delete-orphan')
     
     @property
@@ -96,57 +103,16 @@ class Pedido(db.Model):
         if self.producto.imagen_url:
             return self.producto.imagen_url
         
-        # 3. Intentar obtener de la tabla imagenes_productos
-        try:
-            import sqlite3
-            # Obtener la ruta del proyecto dinámicamente
-            backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            db_path = os.path.join(os.path.dirname(backend_dir), 'las_lira.db')
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                SELECT url FROM imagenes_productos 
-                WHERE producto_id = ? AND es_principal = 1
-                LIMIT 1
-            ''', (self.producto_id,))
-            
-            resultado = cursor.fetchone()
-            conn.close()
-            
-            if resultado:
-                return resultado[0]
-        except Exception:
-            pass  # Si hay error, continuar con None
+        # 3. Intentar obtener de la tabla imagenes_productos del catálogo (si está adjunto)
+        if catalogo_disponible(db.engine) and self.imagen_catalogo:
+            return self.imagen_catalogo.url
         
         return None
     
     def to_dict(self):
         """Convierte el pedido a diccionario"""
         # Construir lista de productos con sus insumos
-        productos_list = []
-        for pp in self.pedido_productos:
-            # Obtener insumos asociados a este producto
-            insumos_producto = [insumo.to_dict() for insumo in pp.insumos]
-
-            # Obtener imagen del producto
-            producto_imagen = None
-            if pp.producto:
-                if pp.producto.imagen_principal:
-                    producto_imagen = pp.producto.imagen_principal
-                elif pp.producto.imagen_url:
-                    producto_imagen = pp.producto.imagen_url
-
-            productos_list.append({
-                'id': pp.id,
-                'producto_id': pp.producto_id,
-                'producto_nombre': pp.producto_nombre,
-                'precio': float(pp.precio),
-                'cantidad': pp.cantidad,
-                'foto_respaldo': pp.foto_respaldo,
-                'producto_imagen': producto_imagen,
-                'insumos': insumos_producto
-            })
+        productos_list = [pp.to_dict_con_insumos() for pp in self.pedido_productos]
 
         return {
             'id': self.id,
@@ -230,6 +196,27 @@ class PedidoProducto(db.Model):
             'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None
         }
 
+    def to_dict_con_insumos(self):
+        """Formato de los productos dentro de un pedido (campo 'productos' de Pedido.to_dict)"""
+        # Obtener imagen del producto
+        producto_imagen = None
+        if self.producto:
+            if self.producto.imagen_principal:
+                producto_imagen = self.producto.imagen_principal
+            elif self.producto.imagen_url:
+                producto_imagen = self.producto.imagen_url
+
+        return {
+            'id': self.id,
+            'producto_id': self.producto_id,
+            'producto_nombre': self.producto_nombre,
+            'precio': float(self.precio),
+            'cantidad': self.cantidad,
+            'foto_respaldo': self.foto_respaldo,
+            'producto_imagen': producto_imagen,
+            'insumos': [insumo.to_dict() for insumo in self.insumos]
+        }
+
 
 class HistorialEstado(db.Model):
     """Tabla para registrar el historial de cambios de estado de pedidos"""
@@ -294,3 +281,31 @@ class PedidoInsumo(db.Model):
             'fecha_registro': self.fecha_registro.isoformat() if self.fecha_registro else None
         }
 
+
+
+class CambioPedido(db.Model):
+    """
+    Feed de cambios de pedidos (services/cambios_pedidos_service.py)
+
+    El id es la secuencia del feed: crece siempre, no se reutiliza y se asigna al
+    confirmar (en orden de commit), así un cliente puede retomar desde el último id
+    que vio. Sin FK a pedidos: el cambio de un
+    pedido eliminado se conserva.
+    """
+    __tablename__ = 'cambios_pedidos'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    pedido_id = db.Column(db.Integer, nullable=False)
+    tipo = db.Column(db.String(20), nullable=False)  # creado, actualizado, estado, cancelado, eliminado
+    estado = db.Column(db.String(50))  # Estado del pedido después del cambio
+    fecha = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'secuencia': self.id,
+            'pedido_id': self.pedido_id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'fecha': self.fecha.isoformat() if self.fecha else None
+        }
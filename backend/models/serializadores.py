@@ -0,0 +1,321 @@
+"""
+Serializadores de los modelos (ver utils/serializadores.py)
+
+Conjuntos de campos:
+- tarjeta: lo mínimo para una tarjeta o un autocompletado
+- lista: todos los campos propios del registro, sin datos anidados
+- detalle: el mismo formato que to_dict(), con los datos anidados cargados por lotes
+"""
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import selectinload
+from extensions import db
+from config.database import catalogo_disponible
+from models.cliente import Cliente
+from models.evento import Evento, EventoInsumo
+from models.inventario import Contenedor, Flor
+from models.pedido import Pedido, PedidoProducto
+from models.producto import Producto
+from utils.serializadores import (
+    Serializador, Campo, Calculado, Relacion, iso, decimal_o_cero
+)
+
+
+def _escalar(columna, condicion):
+    """Subconsulta escalar correlacionada: un dato de otra tabla en la misma fila"""
+    return select(columna).where(condicion).scalar_subquery()
+
+
+# ===== PEDIDOS =====
+
+def _cargar_imagen_producto(filas):
+    """Imagen del producto de cada pedido, con los fallbacks de Pedido._obtener_imagen_producto"""
+    ids = {fila['producto_id'] for fila in filas if fila['producto_id']}
+    if not ids:
+        return [None] * len(filas)
+
+    # pedidos.producto_id es texto y productos.id entero: se indexa por str
+    imagenes = {}
+    sin_imagen = []
+    for producto_id, imagen_principal, imagen_url in db.session.query(
+        Producto.id, Producto.imagen_principal, Producto.imagen_url
+    ).filter(Producto.id.in_(ids)):
+        imagenes[str(producto_id)] = imagen_principal or imagen_url
+        if not imagenes[str(producto_id)]:
+            sin_imagen.append(producto_id)
+
+    # Productos sin imagen propia: imagen principal del catálogo de Shopify (sin
+    # catálogo adjunto quedan sin imagen)
+    if sin_imagen and catalogo_disponible(db.engine):
+        from models.catalogo import ImagenProductoCatalogo
+        for producto_id, url in db.session.query(
+            ImagenProductoCatalogo.producto_id, ImagenProductoCatalogo.url
+        ).filter(
+            ImagenProductoCatalogo.producto_id.in_(sin_imagen),
+            ImagenProductoCatalogo.es_principal == True
+        ):
+            imagenes[str(producto_id)] = imagenes[str(producto_id)] or url
+
+    return [imagenes.get(str(fila['producto_id'])) if fila['producto_id'] else None for fila in filas]
+
+
+def _cargar_productos_pedido(filas):
+    """Productos (con insumos) de los pedidos del lote en tres consultas"""
+    por_pedido = {fila['id']: [] for fila in filas}
+    productos = PedidoProducto.query.options(
+        selectinload(PedidoProducto.insumos),
+        selectinload(PedidoProducto.producto)
+    ).filter(PedidoProducto.pedido_id.in_(list(por_pedido))).order_by(PedidoProducto.id)
+
+    for pp in productos:
+        por_pedido[pp.pedido_id].append(pp.to_dict_con_insumos())
+    return [por_pedido[fila['id']] for fila in filas]
+
+
+class PedidoSerializador(Serializador):
+    campos = {
+        'id': Campo(Pedido.id),
+        'fecha_pedido': Campo(Pedido.fecha_pedido, iso),
+        'fecha_entrega': Campo(Pedido.fecha_entrega, iso),
+        'canal': Campo(Pedido.canal),
+        'shopify_order_number': Campo(Pedido.shopify_order_number),
+        'cliente_id': Campo(Pedido.cliente_id),
+        'cliente_nombre': Campo(Pedido.cliente_nombre),
+        'cliente_telefono': Campo(Pedido.cliente_telefono),
+        'cliente_email': Campo(Pedido.cliente_email),
+        'cliente_tipo': Campo(_escalar(Cliente.tipo_cliente, Cliente.id == Pedido.cliente_id)),
+        'producto_id': Campo(Pedido.producto_id),
+        'producto_nombre': Campo(_escalar(Producto.nombre, Producto.id == Pedido.producto_id)),
+        'producto_imagen': Relacion(_cargar_imagen_producto, requiere=('producto_id',)),
+        'arreglo_pedido': Campo(Pedido.arreglo_pedido),
+        'detalles_adicionales': Campo(Pedido.detalles_adicionales),
+        'precio_ramo': Campo(Pedido.precio_ramo, decimal_o_cero),
+        'precio_envio': Campo(Pedido.precio_envio, decimal_o_cero),
+        'precio_total': Calculado(
+            lambda f: float((f['ramo'] or 0) + (f['envio'] or 0)),
+            ramo=Pedido.precio_ramo, envio=Pedido.precio_envio
+        ),
+        'destinatario': Campo(Pedido.destinatario),
+        'mensaje': Campo(Pedido.mensaje),
+        'firma': Campo(Pedido.firma),
+        'direccion_entrega': Campo(Pedido.direccion_entrega),
+        'comuna': Campo(Pedido.comuna),
+        'latitud': Campo(Pedido.latitud),
+        'longitud': Campo(Pedido.longitud),
+        'motivo': Campo(Pedido.motivo),
+        'estado': Campo(Pedido.estado),
+        'dia_entrega': Campo(Pedido.dia_entrega),
+        'estado_pago': Campo(Pedido.estado_pago),
+        'tipo_pedido': Campo(Pedido.tipo_pedido),
+        'cobranza': Campo(Pedido.cobranza),
+        'plazo_pago_dias': Campo(Pedido.plazo_pago_dias),
+        'fecha_maxima_pago': Campo(Pedido.fecha_maxima_pago, iso),
+        'metodo_pago': Campo(Pedido.metodo_pago),
+        'documento_tributario': Campo(Pedido.documento_tributario),
+        'numero_documento': Campo(Pedido.numero_documento),
+        'foto_enviado_url': Campo(Pedido.foto_enviado_url),
+        'es_evento': Campo(Pedido.es_evento),
+        'tipo_evento': Campo(Pedido.tipo_evento),
+        'es_urgente': Campo(Pedido.es_urgente),
+        'colores_solicitados': Campo(Pedido.colores_solicitados),
+        'tipo_personalizacion': Campo(Pedido.tipo_personalizacion),
+        'notas_personalizacion': Campo(Pedido.notas_personalizacion),
+        'fecha_actualizacion': Campo(Pedido.fecha_actualizacion, iso),
+        'productos': Relacion(_cargar_productos_pedido, requiere=('id',)),
+    }
+
+    conjuntos = {
+        'tarjeta': (
+            'id', 'fecha_entrega', 'cliente_nombre', 'producto_nombre', 'arreglo_pedido',
+            'precio_total', 'comuna', 'estado', 'dia_entrega', 'estado_pago', 'tipo_pedido', 'es_urgente'
+        ),
+        # Cola del taller (services/taller_service.py agrega el estado de los insumos)
+        'taller': (
+            'id', 'fecha_entrega', 'cliente_nombre', 'producto_nombre', 'producto_imagen',
+            'arreglo_pedido', 'precio_ramo', 'es_urgente'
+        ),
+        'lista': tuple(nombre for nombre in campos if nombre not in ('producto_imagen', 'productos')),
+        'detalle': tuple(campos),
+    }
+
+
+# ===== CLIENTES =====
+
+_SQL_ETIQUETAS_CLIENTES = db.text('''
+    SELECT ce.cliente_id, e.id, e.nombre, e.categoria, e.color, e.icono, e.descripcion
+    FROM etiquetas_cliente e
+    JOIN cliente_etiquetas ce ON ce.etiqueta_id = e.id
+    WHERE ce.cliente_id IN :cliente_ids AND e.activa = 1
+    ORDER BY e.orden
+''').bindparams(bindparam('cliente_ids', expanding=True))
+
+
+def _cargar_etiquetas_cliente(filas):
+    """Etiquetas de los clientes del lote en una consulta (Cliente.obtener_etiquetas por lotes)"""
+    por_cliente = {fila['id']: [] for fila in filas}
+    try:
+        resultado = db.session.execute(_SQL_ETIQUETAS_CLIENTES, {'cliente_ids': list(por_cliente)})
+        for row in resultado:
+            por_cliente[row[0]].append({
+                'id': row[1],
+                'nombre': row[2],
+                'categoria': row[3],
+                'color': row[4],
+                'icono': row[5],
+                'descripcion': row[6]
+            })
+    except Exception as e:
+        print(f"Error obteniendo etiquetas de clientes: {e}")
+    return [por_cliente[fila['id']] for fila in filas]
+
+
+class ClienteSerializador(Serializador):
+    campos = {
+        'id': Campo(Cliente.id),
+        'nombre': Campo(Cliente.nombre),
+        'telefono': Campo(Cliente.telefono),
+        'email': Campo(Cliente.email),
+        'tipo_cliente': Campo(Cliente.tipo_cliente),
+        'direccion_principal': Campo(Cliente.direccion_principal),
+        'notas': Campo(Cliente.notas),
+        'total_pedidos': Campo(Cliente.total_pedidos),
+        'total_gastado': Campo(Cliente.total_gastado, decimal_o_cero),
+        'fecha_registro': Campo(Cliente.fecha_registro, iso),
+        'ultima_compra': Campo(Cliente.ultima_compra, iso),
+        'etiquetas': Relacion(_cargar_etiquetas_cliente, requiere=('id',)),
+    }
+
+    conjuntos = {
+        'tarjeta': ('id', 'nombre', 'telefono', 'email', 'tipo_cliente', 'total_pedidos'),
+        'lista': tuple(nombre for nombre in campos if nombre != 'etiquetas'),
+        'detalle': tuple(campos),
+    }
+
+
+# ===== EVENTOS =====
+
+def _nombre_insumo_evento(f):
+    """Mismo criterio que EventoInsumo.to_dict según tipo_insumo"""
+    if f['tipo'] == 'flor':
+        return f['flor_nombre']
+    if f['tipo'] == 'contenedor' and f['contenedor_id'] is not None:
+        return f"{f['contenedor_tipo']} - {f['contenedor_nombre']}"
+    if f['tipo'] == 'producto':
+        return f['producto_nombre']
+    if f['tipo'] == 'otro':
+        return f['nombre_otro']
+    return None
+
+
+def _stock_insumo_evento(f):
+    if f['tipo'] == 'flor':
+        return f['flor_disponible']
+    if f['tipo'] == 'contenedor':
+        return f['contenedor_disponible']
+    return None
+
+
+class EventoInsumoSerializador(Serializador):
+    campos = {
+        'id': Campo(EventoInsumo.id),
+        'evento_id': Campo(EventoInsumo.evento_id),
+        'tipo_insumo': Campo(EventoInsumo.tipo_insumo),
+        'flor_id': Campo(EventoInsumo.flor_id),
+        'contenedor_id': Campo(EventoInsumo.contenedor_id),
+        'producto_id': Campo(EventoInsumo.producto_id),
+        'nombre_otro': Campo(EventoInsumo.nombre_otro),
+        'nombre': Calculado(
+            _nombre_insumo_evento,
+            tipo=EventoInsumo.tipo_insumo,
+            nombre_otro=EventoInsumo.nombre_otro,
+            flor_nombre=_escalar(Flor.nombre, Flor.id == EventoInsumo.flor_id),
+            contenedor_id=_escalar(Contenedor.id, Contenedor.id == EventoInsumo.contenedor_id),
+            contenedor_tipo=_escalar(Contenedor.tipo, Contenedor.id == EventoInsumo.contenedor_id),
+            contenedor_nombre=_escalar(Contenedor.nombre, Contenedor.id == EventoInsumo.contenedor_id),
+            producto_nombre=_escalar(Producto.nombre, Producto.id == EventoInsumo.producto_id),
+        ),
+        'cantidad': Campo(EventoInsumo.cantidad),
+        'costo_unitario': Campo(EventoInsumo.costo_unitario, decimal_o_cero),
+        'costo_total': Campo(EventoInsumo.costo_total, decimal_o_cero),
+        'reservado': Campo(EventoInsumo.reservado),
+        'descontado_stock': Campo(EventoInsumo.descontado_stock),
+        'devuelto': Campo(EventoInsumo.devuelto),
+        'cantidad_faltante': Campo(EventoInsumo.cantidad_faltante),
+        'stock_disponible': Calculado(
+            _stock_insumo_evento,
+            tipo=EventoInsumo.tipo_insumo,
+            flor_disponible=_escalar(
+                Flor.cantidad_stock - Flor.cantidad_en_uso - Flor.cantidad_en_evento,
+                Flor.id == EventoInsumo.flor_id
+            ),
+            contenedor_disponible=_escalar(
+                Contenedor.cantidad_stock - Contenedor.cantidad_en_uso - Contenedor.cantidad_en_evento,
+                Contenedor.id == EventoInsumo.contenedor_id
+            ),
+        ),
+        'notas': Campo(EventoInsumo.notas),
+    }
+
+    conjuntos = {
+        'tarjeta': ('id', 'tipo_insumo', 'nombre', 'cantidad', 'costo_total'),
+        'lista': tuple(campos),
+        'detalle': tuple(campos),
+    }
+
+
+def _cargar_insumos_evento(filas):
+    """Insumos de los eventos del lote en una consulta"""
+    por_evento = {fila['id']: [] for fila in filas}
+    query = EventoInsumo.query.filter(EventoInsumo.evento_id.in_(list(por_evento))).order_by(EventoInsumo.id)
+    for insumo in EventoInsumoSerializador.proyectar(query, 'lista'):
+        por_evento[insumo['evento_id']].append(insumo)
+    return [por_evento[fila['id']] for fila in filas]
+
+
+class EventoSerializador(Serializador):
+    campos = {
+        'id': Campo(Evento.id),
+        'cliente_nombre': Campo(Evento.cliente_nombre),
+        'cliente_telefono': Campo(Evento.cliente_telefono),
+        'cliente_email': Campo(Evento.cliente_email),
+        'nombre_evento': Campo(Evento.nombre_evento),
+        'tipo_evento': Campo(Evento.tipo_evento),
+        'fecha_evento': Campo(Evento.fecha_evento, iso),
+        'hora_evento': Campo(Evento.hora_evento),
+        'lugar_evento': Campo(Evento.lugar_evento),
+        'cantidad_personas': Campo(Evento.cantidad_personas),
+        'estado': Campo(Evento.estado),
+        'costo_insumos': Campo(Evento.costo_insumos, decimal_o_cero),
+        'costo_mano_obra': Campo(Evento.costo_mano_obra, decimal_o_cero),
+        'costo_transporte': Campo(Evento.costo_transporte, decimal_o_cero),
+        'costo_otros': Campo(Evento.costo_otros, decimal_o_cero),
+        'costo_total': Campo(Evento.costo_total, decimal_o_cero),
+        'margen_porcentaje': Campo(Evento.margen_porcentaje, decimal_o_cero),
+        'precio_propuesta': Campo(Evento.precio_propuesta, decimal_o_cero),
+        'precio_final': Campo(Evento.precio_final, decimal_o_cero),
+        'anticipo': Campo(Evento.anticipo, decimal_o_cero),
+        'saldo': Campo(Evento.saldo, decimal_o_cero),
+        'pagado': Campo(Evento.pagado),
+        'insumos_reservados': Campo(Evento.insumos_reservados),
+        'insumos_descontados': Campo(Evento.insumos_descontados),
+        'insumos_faltantes': Campo(Evento.insumos_faltantes),
+        'lista_faltantes': Campo(Evento.lista_faltantes),
+        'notas_cotizacion': Campo(Evento.notas_cotizacion),
+        'notas_internas': Campo(Evento.notas_internas),
+        'notas_faltantes': Campo(Evento.notas_faltantes),
+        'fecha_cotizacion': Campo(Evento.fecha_cotizacion, iso),
+        'fecha_propuesta': Campo(Evento.fecha_propuesta, iso),
+        'fecha_confirmacion': Campo(Evento.fecha_confirmacion, iso),
+        'fecha_finalizacion': Campo(Evento.fecha_finalizacion, iso),
+        'fecha_retiro': Campo(Evento.fecha_retiro, iso),
+        'insumos': Relacion(_cargar_insumos_evento, requiere=('id',)),
+    }
+
+    conjuntos = {
+        'tarjeta': (
+            'id', 'nombre_evento', 'cliente_nombre', 'tipo_evento', 'fecha_evento',
+            'estado', 'precio_final', 'saldo', 'pagado'
+        ),
+        'lista': tuple(nombre for nombre in campos if nombre != 'insumos'),
+        'detalle': tuple(campos),
+    }
@@ -0,0 +1,18 @@
+"""
+Modelo de Versión de Etiqueta
+Contador por etiqueta de caché que se incrementa en la misma transacción que
+modifica sus datos; con él se arman los ETag de la API (utils/respuestas_http.py)
+"""
+
+from extensions import db
+
+
+class VersionEtiqueta(db.Model):
+    """Versión confirmada de los datos de una etiqueta (pedidos, clientes, productos...)"""
+    __tablename__ = 'versiones_etiquetas'
+
+    etiqueta = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<VersionEtiqueta {self.etiqueta}={self.version}>'
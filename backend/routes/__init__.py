@@ -12,7 +12,8 @@ from . import (
     analisis_routes,
     reportes_routes,
     auth_routes,
-    auditoria_routes
+    auditoria_routes,
+    importacion_routes
 )
 
 __all__ = [
@@ -29,6 +30,7 @@ __all__ = [
     'analisis_routes',
     'reportes_routes',
     'auth_routes',
-    'auditoria_routes'
+    'auditoria_routes',
+    'importacion_routes'
 ]
 
@@ -5,9 +5,14 @@ Rutas API para gestión de clientes
 from flask import Blueprint, request, jsonify
 from extensions import db
 from models.cliente import Cliente
+from models.serializadores import ClienteSerializador
+from services.clientes_service import ClientesService
 from utils.telefono_helpers import normalizar_telefono
 from utils.auditoria_helper import registrar_accion
 from routes.auth_routes import require_auth
+from utils.cache_helpers import cache_referencia, marcar_etiquetas_modificadas
+from utils.serializadores import conjunto_solicitado, respuesta_json_streaming
+from utils.respuestas_http import con_etag
 from datetime import datetime
 from sqlalchemy import or_
 import unicodedata
@@ -15,8 +20,12 @@ import unicodedata
 bp = Blueprint('clientes', __name__)
 
 @bp.route('/', methods=['GET'])
+@con_etag(Cliente.ultima_compra)
 def listar_clientes():
-    """Listar clientes con paginación"""
+    """
+    Listar clientes con paginación
+    Query param campos: tarjeta, lista o detalle (por defecto, con etiquetas)
+    """
     try:
         tipo = request.args.get('tipo')
         buscar = request.args.get('buscar', '').strip()
@@ -25,6 +34,7 @@ def listar_clientes():
         # Parámetros de paginación
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 100))
+        conjunto = conjunto_solicitado('detalle', ClienteSerializador)
         
         query = Cliente.query
         
@@ -61,8 +71,8 @@ def listar_clientes():
         # Contar total antes de paginar
         total = query.count()
         
-        # Aplicar paginación
-        clientes = query.order_by(Cliente.nombre).limit(limit).offset((page - 1) * limit).all()
+        # Aplicar paginación (las etiquetas de la página se cargan en una sola consulta)
+        pagina = query.order_by(Cliente.nombre).limit(limit).offset((page - 1) * limit)
         
         # Calcular estadísticas globales de TODOS los clientes (sin filtros)
         total_global = Cliente.query.count()
@@ -94,15 +104,17 @@ def listar_clientes():
             'promedio_pedidos_ocasional': calcular_promedio_pedidos('Ocasional'),
         }
         
-        return jsonify({
-            'success': True,
-            'data': [c.to_dict() for c in clientes],
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'total_pages': (total + limit - 1) // limit,
-            'stats': stats  # Estadísticas globales
-        })
+        return respuesta_json_streaming(
+            ClienteSerializador.proyectar(pagina, conjunto),
+            success=True,
+            total=total,
+            page=page,
+            limit=limit,
+            total_pages=(total + limit - 1) // limit,
+            stats=stats  # Estadísticas globales
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -333,7 +345,10 @@ def buscar_por_nombre():
 
         # Buscar en TODOS los clientes, no solo los primeros 1000
         # Esto asegura que clientes con pocos pedidos también aparezcan
-        todos_clientes = Cliente.query.all()
+        # Solo se leen las columnas de búsqueda; el detalle se serializa para los resultados
+        todos_clientes = db.session.query(
+            Cliente.id, Cliente.nombre, Cliente.email, Cliente.telefono, Cliente.total_pedidos
+        ).all()
 
         resultados = []
 
@@ -367,9 +382,14 @@ def buscar_por_nombre():
 
         resultados = sorted(resultados, key=calcular_score, reverse=True)[:100]
 
+        ids = [c.id for c in resultados]
+        por_id = {
+            c['id']: c for c in ClienteSerializador.proyectar(Cliente.query.filter(Cliente.id.in_(ids)), 'detalle')
+        }
+
         return jsonify({
             'success': True,
-            'clientes': [c.to_dict() for c in resultados],
+            'clientes': [por_id[cliente_id] for cliente_id in ids],
             'total': len(resultados)
         })
 
@@ -381,32 +401,40 @@ def buscar_por_nombre():
 def obtener_etiquetas():
     """Obtener todas las etiquetas disponibles agrupadas por categoría"""
     try:
-        result = db.session.execute(db.text('''
-            SELECT id, nombre, categoria, descripcion, color, icono, orden
-            FROM etiquetas_cliente
-            WHERE activa = 1
-            ORDER BY orden
-        '''))
-        
-        etiquetas_por_categoria = {}
-        
-        for row in result:
-            etiqueta = {
-                'id': row[0],
-                'nombre': row[1],
-                'categoria': row[2],
-                'descripcion': row[3],
-                'color': row[4],
-                'icono': row[5],
-                'orden': row[6]
-            }
-            
-            categoria = etiqueta['categoria']
-            if categoria not in etiquetas_por_categoria:
-                etiquetas_por_categoria[categoria] = []
-            
-            etiquetas_por_categoria[categoria].append(etiqueta)
-        
+        def consultar_etiquetas():
+            result = db.session.execute(db.text('''
+                SELECT id, nombre, categoria, descripcion, color, icono, orden
+                FROM etiquetas_cliente
+                WHERE activa = 1
+                ORDER BY orden
+            '''))
+
+            etiquetas_por_categoria = {}
+
+            for row in result:
+                etiqueta = {
+                    'id': row[0],
+                    'nombre': row[1],
+                    'categoria': row[2],
+                    'descripcion': row[3],
+                    'color': row[4],
+                    'icono': row[5],
+                    'orden': row[6]
+                }
+
+                categoria = etiqueta['categoria']
+                if categoria not in etiquetas_por_categoria:
+                    etiquetas_por_categoria[categoria] = []
+
+                etiquetas_por_categoria[categoria].append(etiqueta)
+
+            return etiquetas_por_categoria
+
+        # El catálogo solo se modifica con scripts de mantenimiento: basta con el TTL
+        etiquetas_por_categoria = cache_referencia.obtener_o_calcular(
+            'etiquetas_cliente', 'por_categoria', consultar_etiquetas
+        )
+
         return jsonify({
             'success': True,
             'data': etiquetas_por_categoria
@@ -443,6 +471,23 @@ def estadisticas_clientes():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bp.route('/estadisticas/verificar', methods=['GET'])
+def verificar_estadisticas_clientes():
+    """
+    Reporta clientes cuyas estadísticas (total_pedidos, total_gastado, ultima_compra)
+    no coinciden con sus pedidos activos. Para corregirlas:
+    scripts/verificar_estadisticas_clientes.py --ejecutar
+    """
+    try:
+        success, resultado, mensaje = ClientesService.verificar_estadisticas()
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 500
+
+        return jsonify({'success': True, 'data': resultado, 'message': mensaje})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @bp.route('/<cliente_id>/pedidos', methods=['GET'])
 def obtener_historial_pedidos(cliente_id):
     """Obtener historial de pedidos de un cliente"""
@@ -515,6 +560,7 @@ def agregar_etiqueta_cliente(cliente_id):
             VALUES (:cliente_id, :etiqueta_id, datetime('now'))
         '''), {'cliente_id': cliente_id, 'etiqueta_id': etiqueta_id})
 
+        marcar_etiquetas_modificadas(db.session, 'clientes')  # SQL directo: el listado cambia (ETag)
         db.session.commit()
 
         return jsonify({
@@ -550,6 +596,7 @@ def eliminar_etiqueta_cliente(cliente_id, etiqueta_id):
             WHERE cliente_id = :cliente_id AND etiqueta_id = :etiqueta_id
         '''), {'cliente_id': cliente_id, 'etiqueta_id': etiqueta_id})
 
+        marcar_etiquetas_modificadas(db.session, 'clientes')
         db.session.commit()
 
         if result.rowcount == 0:
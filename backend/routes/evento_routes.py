@@ -4,20 +4,32 @@ Las rutas ahora delegan la lógica de negocio al EventosService
 """
 
 from flask import Blueprint, request, jsonify
+from datetime import datetime
+from models.evento import Evento
+from models.serializadores import EventoSerializador
 from services.eventos_service import EventosService
+from services.costos_eventos_service import CostosEventosService
+from services.reservas_service import ReservasService
+from utils.cache_helpers import cache_referencia
+from utils.serializadores import conjunto_solicitado, respuesta_json_streaming
+from utils.respuestas_http import con_etag
 
 bp = Blueprint('eventos', __name__)
 
 
 @bp.route('/', methods=['GET'])
+@con_etag(Evento.fecha_cotizacion)
 def obtener_eventos():
-    """Obtiene todos los eventos"""
+    """
+    Obtiene todos los eventos
+    Query param campos: tarjeta, lista (por defecto) o detalle (con insumos)
+    """
     try:
-        eventos = EventosService.listar_eventos()
-        return jsonify({
-            'success': True,
-            'data': [evento.to_dict() for evento in eventos]
-        })
+        conjunto = conjunto_solicitado('lista', EventoSerializador)
+        eventos = EventosService.listar_eventos(conjunto)
+        return respuesta_json_streaming(eventos, success=True)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -26,13 +38,10 @@ def obtener_eventos():
 def obtener_evento(evento_id):
     """Obtiene un evento específico con sus insumos"""
     try:
-        evento = EventosService.obtener_evento(evento_id)
-        if not evento:
+        evento_dict = EventosService.obtener_evento_detalle(evento_id)
+        if not evento_dict:
             return jsonify({'success': False, 'error': 'Evento no encontrado'}), 404
 
-        evento_dict = evento.to_dict()
-        evento_dict['insumos'] = [insumo.to_dict() for insumo in evento.insumos]
-
         return jsonify({
             'success': True,
             'data': evento_dict
@@ -185,6 +194,54 @@ def agregar_insumo(evento_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bp.route('/<evento_id>/insumos', methods=['PATCH'])
+def editar_insumos(evento_id):
+    """
+    Edita varias líneas del evento en una sola transacción
+    Body: {"agregar": [...], "actualizar": [{"id", "cantidad", "costo_unitario"}], "eliminar": [ids]}
+    Los totales del evento se ajustan por diferencia
+    """
+    try:
+        data = request.get_json() or {}
+        success, resultado, mensaje = CostosEventosService.editar_lineas(
+            evento_id, data.get('agregar'), data.get('actualizar'), data.get('eliminar')
+        )
+
+        if success:
+            return jsonify({
+                'success': True,
+                'data': resultado.to_dict(),
+                'message': mensaje
+            })
+        else:
+            return jsonify({'success': False, 'error': mensaje}), 404 if mensaje.startswith(('Evento no encontrado', 'Insumo no encontrado')) else 400
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/<evento_id>/simular', methods=['POST'])
+def simular_costos(evento_id):
+    """
+    Totales del evento bajo otros supuestos (margen, costos, cantidades), sin guardar
+    Body: {"escenarios": [{"nombre", "margen_porcentaje", "factor_cantidades", "cantidades", ...}]}
+    o un solo escenario como objeto
+    """
+    try:
+        data = request.get_json() or {}
+        escenarios = data['escenarios'] if 'escenarios' in data else [data]
+
+        success, resultado, mensaje = CostosEventosService.simular(evento_id, escenarios)
+
+        if success:
+            return jsonify({'success': True, 'data': resultado, 'message': mensaje})
+        else:
+            return jsonify({'success': False, 'error': mensaje}), 404 if mensaje == 'Evento no encontrado' else 400
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @bp.route('/<evento_id>/insumos/<int:insumo_id>', methods=['DELETE'])
 def eliminar_insumo(evento_id, insumo_id):
     """Elimina un insumo del evento"""
@@ -305,15 +362,41 @@ def marcar_devuelto(evento_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bp.route('/<evento_id>/disponibilidad', methods=['GET'])
+def disponibilidad_evento(evento_id):
+    """
+    Indica si hay stock para las flores y contenedores del evento en su fecha
+    (o en ?fecha=YYYY-MM-DD), descontando lo que otros pedidos y eventos reservaron
+    """
+    try:
+        fecha = request.args.get('fecha')
+        try:
+            fecha = datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Fecha inválida (formato YYYY-MM-DD)'}), 400
+
+        success, data, mensaje = ReservasService.verificar_evento(evento_id, fecha)
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 404 if mensaje == 'Evento no encontrado' else 400
+
+        return jsonify({'success': True, 'data': data, 'message': mensaje})
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @bp.route('/productos-evento', methods=['GET'])
 def obtener_productos_evento():
     """Obtiene todos los productos de eventos"""
     try:
-        productos = EventosService.obtener_productos_evento()
+        productos = cache_referencia.obtener_o_calcular(
+            'productos_evento', 'activos',
+            lambda: [p.to_dict() for p in EventosService.obtener_productos_evento()]
+        )
 
         return jsonify({
             'success': True,
-            'data': [p.to_dict() for p in productos]
+            'data': productos
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,74 @@
+"""
+Rutas API para importación masiva de clientes, productos y pedidos
+"""
+
+import os
+from flask import Blueprint, request, jsonify
+from services.importacion_service import ImportacionService, TIPOS_IMPORTACION
+from config.importacion import FORMATOS_IMPORTACION, MAX_ARCHIVO_IMPORTACION_MB, TAMANO_LOTE_IMPORTACION
+from utils.auditoria_helper import registrar_accion
+from routes.auth_routes import require_auth
+
+bp = Blueprint('importacion', __name__)
+
+
+@bp.route('/<tipo>', methods=['POST'])
+@require_auth
+def importar_archivo(tipo):
+    """
+    Importar un archivo por lotes (multipart/form-data)
+
+    tipo: clientes (customers_export.csv de Shopify), productos (products_export_1.csv
+    de Shopify) o pedidos (pedidos_trello_COMPLETO.csv)
+
+    Campos:
+        archivo: CSV con encabezado o JSONL (un objeto por línea con las mismas columnas)
+        formato: csv o jsonl (por defecto, según la extensión)
+        simular: 1 para validar y contar sin guardar
+        lote: filas por transacción
+
+    Reimportar el mismo archivo no duplica: las filas ya importadas se omiten
+    """
+    try:
+        if tipo not in TIPOS_IMPORTACION:
+            return jsonify({'success': False, 'error': f'Tipo no válido. Válidos: {", ".join(TIPOS_IMPORTACION)}'}), 404
+
+        archivo = request.files.get('archivo')
+        if archivo is None or archivo.filename == '':
+            return jsonify({'success': False, 'error': 'No se envió ningún archivo'}), 400
+
+        if request.content_length and request.content_length > MAX_ARCHIVO_IMPORTACION_MB * 1024 * 1024:
+            return jsonify({
+                'success': False,
+                'error': f'Archivo mayor a {MAX_ARCHIVO_IMPORTACION_MB} MB: usar scripts/importar_lote.py'
+            }), 413
+
+        extension = os.path.splitext(archivo.filename)[1].lstrip('.').lower()
+        formato = request.form.get('formato') or ('jsonl' if extension in ('jsonl', 'ndjson') else 'csv')
+        if formato not in FORMATOS_IMPORTACION:
+            return jsonify({'success': False, 'error': f'Formato no válido. Válidos: {", ".join(FORMATOS_IMPORTACION)}'}), 400
+
+        simular = request.form.get('simular', '0').lower() in ('1', 'true', 'si')
+        tamano_lote = int(request.form.get('lote', TAMANO_LOTE_IMPORTACION))
+
+        success, resumen, mensaje = ImportacionService.importar(
+            tipo, archivo.stream, formato=formato, simular=simular, tamano_lote=tamano_lote
+        )
+        if not success:
+            return jsonify({'success': False, 'data': resumen, 'error': mensaje}), 400
+
+        if not simular:
+            registrar_accion('importar', tipo, None, {
+                'archivo': archivo.filename,
+                'insertadas': resumen['insertadas'],
+                'actualizadas': resumen['actualizadas'],
+                'omitidas': resumen['omitidas'],
+                'con_errores': resumen['con_errores']
+            })
+
+        return jsonify({'success': True, 'data': resumen, 'message': mensaje})
+
+    except ValueError:
+        return jsonify({'success': False, 'error': 'lote debe ser un número'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -4,11 +4,20 @@ Rutas para gestión de inventario (flores y contenedores)
 
 from flask import Blueprint, request, jsonify
 from extensions import db
-from models.inventario import Flor, Contenedor, Bodega, Proveedor, proveedor_flor, proveedor_contenedor
+from models.inventario import (
+    Flor, Contenedor, Bodega, Proveedor, AlertaStock, CompraSugerida, proveedor_flor, proveedor_contenedor
+)
 from config.precios_sugeridos import obtener_precio_flor
 from config.stock_sugerido import obtener_stock_flor
 from routes.auth_routes import require_auth
-from datetime import date
+from utils.cache_helpers import cache_referencia
+from services.inventario_service import InventarioService
+from services.reservas_service import ReservasService
+from services.alertas_stock_service import AlertasStockService
+from services.pronostico_service import PronosticoService
+from utils.stock_helpers import mover_stock
+from utils.respuestas_http import con_etag
+from datetime import date, datetime, timedelta
 
 bp = Blueprint('inventario', __name__)
 
@@ -119,25 +128,30 @@ def listar_flores():
         color = request.args.get('color')
         stock_bajo = request.args.get('stock_bajo', type=bool)
 
-        query = Flor.query
-
-        if bodega_id:
-            query = query.filter_by(bodega_id=bodega_id)
-        if tipo:
-            query = query.filter_by(tipo=tipo)
-        if color:
-            query = query.filter_by(color=color)
-        if stock_bajo:
-            # Filtrar flores donde cantidad_disponible <= stock_bajo
-            query = query.filter(
-                (Flor.cantidad_stock - Flor.cantidad_en_uso - Flor.cantidad_en_evento) <= Flor.stock_bajo
-            )
-
-        flores = query.order_by(Flor.tipo, Flor.color).all()
+        def consultar_flores():
+            query = Flor.query
+
+            if bodega_id:
+                query = query.filter_by(bodega_id=bodega_id)
+            if tipo:
+                query = query.filter_by(tipo=tipo)
+            if color:
+                query = query.filter_by(color=color)
+            if stock_bajo:
+                # Filtrar flores donde cantidad_disponible <= stock_bajo
+                query = query.filter(
+                    (Flor.cantidad_stock - Flor.cantidad_en_uso - Flor.cantidad_en_evento) <= Flor.stock_bajo
+                )
+
+            return [f.to_dict() for f in query.order_by(Flor.tipo, Flor.color).all()]
+
+        flores = cache_referencia.obtener_o_calcular(
+            'flores', f'{bodega_id}|{tipo}|{color}|{stock_bajo}', consultar_flores
+        )
 
         return jsonify({
             'success': True,
-            'data': [f.to_dict() for f in flores],
+            'data': flores,
             'total': len(flores)
         })
     except Exception as e:
@@ -211,9 +225,8 @@ def reponer_flor(flor_id):
         if cantidad <= 0:
             return jsonify({'success': False, 'error': 'La cantidad debe ser mayor a 0'}), 400
         
-        # Actualizar stock
-        flor.cantidad_stock += cantidad
-        flor.fecha_actualizacion = date.today()
+        # Actualizar stock (UPDATE atómico)
+        mover_stock('Flor', flor.id, stock=cantidad)
         
         # Asociar con proveedor si se proporciona (asociación automática)
         if proveedor_id:
@@ -251,9 +264,8 @@ def reponer_contenedor(contenedor_id):
         if cantidad <= 0:
             return jsonify({'success': False, 'error': 'La cantidad debe ser mayor a 0'}), 400
         
-        # Actualizar stock
-        contenedor.cantidad_stock += cantidad
-        contenedor.fecha_actualizacion = date.today()
+        # Actualizar stock (UPDATE atómico)
+        mover_stock('Contenedor', contenedor.id, stock=cantidad)
         
         # Asociar con proveedor si se proporciona (asociación automática)
         if proveedor_id:
@@ -349,13 +361,10 @@ def actualizar_stock_flor(flor_id):
         
         if operacion == 'set':
             flor.cantidad_stock = cantidad
-        elif operacion == 'add':
-            flor.cantidad_stock += cantidad
-        elif operacion == 'subtract':
-            flor.cantidad_stock = max(0, flor.cantidad_stock - cantidad)
-        
-        from datetime import date
-        flor.fecha_actualizacion = date.today()
+            flor.fecha_actualizacion = date.today()
+        elif operacion in ('add', 'subtract'):
+            # Sumar o restar en un UPDATE atómico (sin perder cambios de otros workers)
+            mover_stock('Flor', flor.id, stock=cantidad if operacion == 'add' else -cantidad)
         
         db.session.commit()
         
@@ -404,18 +413,24 @@ def listar_contenedores():
         bodega_id = request.args.get('bodega_id', type=int)
         tipo = request.args.get('tipo')
 
-        query = Contenedor.query
+        def consultar_contenedores():
+            query = Contenedor.query
 
-        if bodega_id:
-            query = query.filter_by(bodega_id=bodega_id)
-        if tipo:
-            query = query.filter_by(tipo=tipo)
+            if bodega_id:
+                query = query.filter_by(bodega_id=bodega_id)
+            if tipo:
+                query = query.filter_by(tipo=tipo)
 
-        contenedores = query.order_by(Contenedor.tipo, Contenedor.tamano).all()
+            return [c.to_dict() for c in query.order_by(Contenedor.tipo, Contenedor.tamano).all()]
+
+        contenedores = cache_referencia.obtener_o_calcular(
+            'contenedores', f'{bodega_id}|{tipo}', consultar_contenedores,
+            etiquetas=('contenedores', 'bodegas')  # Incluye el nombre de la bodega
+        )
 
         return jsonify({
             'success': True,
-            'data': [c.to_dict() for c in contenedores],
+            'data': contenedores,
             'total': len(contenedores)
         })
     except Exception as e:
@@ -535,13 +550,10 @@ def actualizar_stock_contenedor(contenedor_id):
         
         if operacion == 'set':
             contenedor.cantidad_stock = cantidad
-        elif operacion == 'add':
-            contenedor.cantidad_stock += cantidad
-        elif operacion == 'subtract':
-            contenedor.cantidad_stock = max(0, contenedor.cantidad_stock - cantidad)
-        
-        from datetime import date
-        contenedor.fecha_actualizacion = date.today()
+            contenedor.fecha_actualizacion = date.today()
+        elif operacion in ('add', 'subtract'):
+            # Sumar o restar en un UPDATE atómico (sin perder cambios de otros workers)
+            mover_stock('Contenedor', contenedor.id, stock=cantidad if operacion == 'add' else -cantidad)
         
         db.session.commit()
         
@@ -587,11 +599,14 @@ def eliminar_contenedor(contenedor_id):
 def listar_bodegas():
     """Listar todas las bodegas"""
     try:
-        bodegas = Bodega.query.filter_by(activa=True).all()
-        
+        bodegas = cache_referencia.obtener_o_calcular(
+            'bodegas', 'activas',
+            lambda: [b.to_dict() for b in Bodega.query.filter_by(activa=True).all()]
+        )
+
         return jsonify({
             'success': True,
-            'data': [b.to_dict() for b in bodegas]
+            'data': bodegas
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -601,39 +616,182 @@ def listar_bodegas():
 
 @bp.route('/resumen', methods=['GET'])
 def resumen_inventario():
-    """Obtener resumen del inventario"""
+    """Obtener resumen del inventario (bajo stock = alertas activas de cada tipo)"""
     try:
-        total_flores = db.session.query(db.func.sum(Flor.cantidad_stock)).scalar() or 0
-        total_contenedores = db.session.query(db.func.sum(Contenedor.stock)).scalar() or 0
-        
-        flores_bajo_stock = Flor.query.filter(Flor.cantidad_stock < 20).count()
-        contenedores_bajo_stock = Contenedor.query.filter(Contenedor.stock < 5).count()
-        
-        # Valor total del inventario
-        valor_flores = db.session.query(
-            db.func.sum(Flor.cantidad_stock * Flor.costo_unitario)
-        ).scalar() or 0
-        
-        valor_contenedores = db.session.query(
-            db.func.sum(Contenedor.stock * Contenedor.costo)
-        ).scalar() or 0
-        
+        resumen = AlertasStockService.resumen()
+        resumen['valor_total_inventario'] = resumen['valor_flores'] + resumen['valor_contenedores']
+        return jsonify({
+            'success': True,
+            'data': resumen
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ===== ALERTAS DE STOCK =====
+
+@bp.route('/alertas', methods=['GET'])
+@con_etag(AlertaStock.secuencia, por_dia=True)  # La demanda próxima se corre cada día
+def listar_alertas_stock():
+    """
+    Alertas de stock bajo (críticas primero) o feed de cambios
+    Query params: desde (cursor de la respuesta anterior: solo los cambios posteriores,
+    las alertas resueltas vienen con nivel null), nivel (critico|bajo), tipo (Flor|Contenedor)
+    """
+    try:
+        desde = request.args.get('desde', type=int)
+        success, data, mensaje = AlertasStockService.listar(
+            desde=desde,
+            nivel=request.args.get('nivel') or None,
+            insumo_tipo=request.args.get('tipo') or None
+        )
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 400
+        return jsonify({'success': True, 'data': data, 'message': mensaje})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/alertas/recalcular', methods=['POST'])
+@require_auth
+def recalcular_alertas_stock():
+    """Reevalúa las alertas de todos los insumos (tras cambios con SQL directo)"""
+    success, cambios, mensaje = AlertasStockService.recalcular()
+    if not success:
+        return jsonify({'success': False, 'error': mensaje}), 500
+    return jsonify({'success': True, 'data': {'cambios': cambios}, 'message': mensaje})
+
+
+
+# ===== DISPONIBILIDAD DE PRODUCTOS (RECETAS) =====
+
+@bp.route('/disponibilidad-productos', methods=['GET'])
+def disponibilidad_productos():
+    """
+    Unidades que se pueden armar de cada producto según su receta y el stock disponible
+    Query params: ids (opcional, separados por coma). Sin ids: todo el catálogo con receta
+    """
+    try:
+        ids = request.args.get('ids', '').strip()
+        producto_ids = [i.strip() for i in ids.split(',') if i.strip()] if ids else None
+
+        disponibilidad = InventarioService.calcular_disponibilidad_productos(producto_ids)
+
+        return jsonify({
+            'success': True,
+            'data': list(disponibilidad.values()),
+            'total': len(disponibilidad)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/disponibilidad-carrito', methods=['POST'])
+def disponibilidad_carrito():
+    """
+    Verifica el stock para varios productos a la vez (insumos compartidos se suman)
+    Body: {"items": [{"producto_id": "PR001", "cantidad": 2}, ...]}
+    """
+    try:
+        items = (request.json or {}).get('items') or []
+        if not items or any(not item.get('producto_id') for item in items):
+            return jsonify({'success': False, 'error': 'Se requiere items con producto_id'}), 400
+
+        disponible, faltantes, insumos = InventarioService.verificar_disponibilidad_carrito(items)
+
         return jsonify({
             'success': True,
             'data': {
-                'total_flores': int(total_flores),
-                'total_contenedores': int(total_contenedores),
-                'flores_bajo_stock': flores_bajo_stock,
-                'contenedores_bajo_stock': contenedores_bajo_stock,
-                'valor_total_inventario': float(valor_flores + valor_contenedores),
-                'valor_flores': float(valor_flores),
-                'valor_contenedores': float(valor_contenedores)
+                'disponible': disponible,
+                'faltantes': faltantes,
+                'insumos': insumos
             }
         })
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Cantidad inválida'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+
+# ===== RESERVAS POR FECHA =====
+
+def _fecha_parametro(nombre, defecto=None):
+    """date de un query param YYYY-MM-DD (ValueError si el formato es inválido)"""
+    valor = request.args.get(nombre)
+    return datetime.strptime(valor, '%Y-%m-%d').date() if valor else defecto
+
+
+@bp.route('/disponibilidad', methods=['GET'])
+def disponibilidad_por_fecha():
+    """
+    Stock disponible de flores y contenedores para una fecha, descontando las
+    reservas de pedidos y eventos que compiten con ella (libro de reservas)
+    Query params: fecha (YYYY-MM-DD, por defecto hoy), tipo (Flor o Contenedor),
+    ids (opcional, separados por coma)
+    """
+    try:
+        try:
+            fecha = _fecha_parametro('fecha', date.today())
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Fecha inválida (formato YYYY-MM-DD)'}), 400
+        ids = request.args.get('ids', '').strip()
+        insumo_ids = [i.strip() for i in ids.split(',') if i.strip()] if ids else None
+
+        success, data, mensaje = ReservasService.disponibilidad(fecha, request.args.get('tipo') or None, insumo_ids)
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 400
+
+        return jsonify({'success': True, 'data': data, 'total': len(data), 'fecha': fecha.isoformat()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/reservas/<insumo_tipo>/<insumo_id>', methods=['GET'])
+def calendario_reservas(insumo_tipo, insumo_id):
+    """
+    Reservas de una flor o contenedor por día, con el pedido o evento de cada una
+    Query params: desde (por defecto hoy), hasta (por defecto 30 días después de desde)
+    """
+    try:
+        try:
+            desde = _fecha_parametro('desde', date.today())
+            hasta = _fecha_parametro('hasta', desde + timedelta(days=30))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Fecha inválida (formato YYYY-MM-DD)'}), 400
+
+        success, data, mensaje = ReservasService.calendario(insumo_tipo.capitalize(), insumo_id, desde, hasta)
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 400
+
+        return jsonify({'success': True, 'data': data, 'message': mensaje})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+# ===== COMPRAS SUGERIDAS (PRONÓSTICO DE DEMANDA) =====
+# Se calculan de noche con scripts/calcular_pronostico_compras.py; aquí solo se leen
+
+@bp.route('/compras-sugeridas', methods=['GET'])
+@con_etag(CompraSugerida.fecha_calculo)
+def listar_compras_sugeridas():
+    """
+    Flores a comprar para los próximos días, agrupadas por proveedor
+    Query params: proveedor_id (opcional; 'sin-proveedor' para las flores sin proveedor)
+    """
+    success, data, mensaje = PronosticoService.compras_sugeridas(request.args.get('proveedor_id') or None)
+    if not success:
+        return jsonify({'success': False, 'error': mensaje}), 500
+    return jsonify({'success': True, 'data': data, 'message': mensaje})
+
+
+@bp.route('/flores/<flor_id>/pronostico', methods=['GET'])
+def pronostico_flor(flor_id):
+    """Demanda pronosticada por día de una flor y su compra sugerida"""
+    success, data, mensaje = PronosticoService.pronostico_flor(flor_id)
+    if not success:
+        return jsonify({'success': False, 'error': mensaje}), 500
+    return jsonify({'success': True, 'data': data, 'message': mensaje})
 
 
 # ===== PROVEEDORES =====
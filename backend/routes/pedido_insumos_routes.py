@@ -6,6 +6,10 @@ from extensions import db
 from models.pedido import PedidoInsumo, Pedido
 from models.inventario import Flor, Contenedor
 from models.producto_detallado import PedidoFlorSeleccionada, PedidoContenedorSeleccionado
+from services.reservas_service import conciliar_reservas
+from services.taller_service import TallerService, ETIQUETAS_TALLER
+from utils.stock_helpers import mover_stock, mover_stock_lote, StockInsuficiente
+from utils.respuestas_http import con_etag
 
 bp = Blueprint('pedido_insumos', __name__, url_prefix='/api/pedidos')
 
@@ -69,16 +73,9 @@ def guardar_insumos_pedido(pedido_id):
         # Primero, liberar stock de insumos anteriores si existen
         insumos_anteriores = PedidoInsumo.query.filter_by(pedido_id=pedido_id).all()
         for insumo_anterior in insumos_anteriores:
-            if not insumo_anterior.descontado_stock:
+            if not insumo_anterior.descontado_stock and insumo_anterior.insumo_tipo in ('Flor', 'Contenedor'):
                 # Liberar de "en uso" solo si no se descontó
-                if insumo_anterior.insumo_tipo == 'Flor':
-                    flor = Flor.query.get(insumo_anterior.insumo_id)
-                    if flor:
-                        flor.cantidad_en_uso = max(0, flor.cantidad_en_uso - insumo_anterior.cantidad)
-                elif insumo_anterior.insumo_tipo == 'Contenedor':
-                    contenedor = Contenedor.query.get(insumo_anterior.insumo_id)
-                    if contenedor:
-                        contenedor.cantidad_en_uso = max(0, contenedor.cantidad_en_uso - insumo_anterior.cantidad)
+                mover_stock(insumo_anterior.insumo_tipo, insumo_anterior.insumo_id, en_uso=-insumo_anterior.cantidad)
         
         # Eliminar insumos anteriores
         PedidoInsumo.query.filter_by(pedido_id=pedido_id).delete()
@@ -97,22 +94,18 @@ def guardar_insumos_pedido(pedido_id):
             db.session.add(nuevo_insumo)
             
             # RESERVAR: Incrementar cantidad_en_uso
-            cantidad = int(insumo_data['cantidad'])
-            if insumo_data['insumo_tipo'] == 'Flor':
-                flor = Flor.query.get(insumo_data['insumo_id'])
-                if flor:
-                    flor.cantidad_en_uso += cantidad
-            elif insumo_data['insumo_tipo'] == 'Contenedor':
-                contenedor = Contenedor.query.get(insumo_data['insumo_id'])
-                if contenedor:
-                    contenedor.cantidad_en_uso += cantidad
+            if insumo_data['insumo_tipo'] in ('Flor', 'Contenedor'):
+                mover_stock(insumo_data['insumo_tipo'], insumo_data['insumo_id'], en_uso=int(insumo_data['cantidad']))
+        
+        # El borrado en bloque no pasa por la sesión: conciliar el libro de reservas
+        db.session.flush()
+        conciliar_reservas(pedidos=[pedido.id], motivo='insumos')
         
         db.session.commit()
         
         # Registrar en auditoría
         try:
             from utils.auditoria_helper import registrar_accion
-            from models.pedido import Pedido
             pedido = Pedido.query.get(pedido_id)
             if pedido:
                 registrar_accion('agregar_insumos', 'pedido', pedido_id, {
@@ -260,26 +253,30 @@ def confirmar_insumos_y_descontar(pedido_id):
             }), 400
         
         # CONFIRMAR USO: Descontar del stock total Y liberar de "en uso"
-        # Los insumos ya estaban reservados (en_uso), ahora los consumimos realmente
+        # Los insumos ya estaban reservados (en_uso), ahora los consumimos realmente.
+        # Un UPDATE atómico por insumo: si otro pedido consumió el stock después de la
+        # verificación de arriba, el descuento no se aplica y se revierte todo
+        movimientos = {}
         for insumo in insumos:
-            if insumo.insumo_tipo == 'Flor':
-                flor = Flor.query.get(insumo.insumo_id)
-                if flor:
-                    # Descontar del stock total
-                    flor.cantidad_stock -= insumo.cantidad
-                    # Liberar de "en uso" (ya se usó realmente)
-                    flor.cantidad_en_uso = max(0, flor.cantidad_en_uso - insumo.cantidad)
-
-            elif insumo.insumo_tipo == 'Contenedor':
-                contenedor = Contenedor.query.get(insumo.insumo_id)
-                if contenedor:
-                    # Descontar del stock total
-                    contenedor.stock -= insumo.cantidad
-                    # Liberar de "en uso" (ya se usó realmente)
-                    contenedor.cantidad_en_uso = max(0, contenedor.cantidad_en_uso - insumo.cantidad)
+            if insumo.insumo_tipo in ('Flor', 'Contenedor'):
+                movimiento = movimientos.setdefault((insumo.insumo_tipo, insumo.insumo_id), {'stock': 0, 'en_uso': 0})
+                movimiento['stock'] -= insumo.cantidad
+                movimiento['en_uso'] -= insumo.cantidad
 
             # Marcar como descontado
             insumo.descontado_stock = True
+
+        try:
+            mover_stock_lote(movimientos, exigir_stock=True)
+        except StockInsuficiente as e:
+            db.session.rollback()
+            return jsonify({
+                'error': 'Stock insuficiente',
+                'detalles': [
+                    f"{f['nombre'] or f['insumo_id']}: Stock insuficiente (Stock: {f['stock']}, Requerido: {f['requerido']})"
+                    for f in e.faltantes
+                ]
+            }), 400
         
         # Cambiar estado del pedido
         # Si es retiro en tienda, va a "Retiro en Tienda", sino a "Listo para Despacho"
@@ -318,25 +315,12 @@ def confirmar_insumos_y_descontar(pedido_id):
 
 
 @bp.route('/taller', methods=['GET'])
+@con_etag(Pedido.fecha_actualizacion, etiquetas=ETIQUETAS_TALLER)
 def obtener_pedidos_taller():
-    """Obtener pedidos en proceso para la sección de taller"""
+    """Obtener pedidos en proceso para la sección de taller (tarjetas compactas)"""
     try:
-        pedidos = Pedido.query.filter_by(estado='En Proceso').order_by(Pedido.fecha_entrega).all()
-        
-        pedidos_taller = []
-        for pedido in pedidos:
-            pedido_dict = pedido.to_dict()
-            
-            # Contar insumos
-            insumos = PedidoInsumo.query.filter_by(pedido_id=pedido.id).all()
-            pedido_dict['tiene_insumos'] = len(insumos) > 0
-            pedido_dict['total_insumos'] = len(insumos)
-            pedido_dict['insumos_confirmados'] = all(i.descontado_stock for i in insumos) if insumos else False
-            
-            pedidos_taller.append(pedido_dict)
-        
-        return jsonify(pedidos_taller)
-    
+        return jsonify(TallerService.obtener_cola())
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -425,8 +409,7 @@ def guardar_insumos_detallados(pedido_id):
                 db.session.add(flor_seleccionada)
                 
                 # RESERVAR: Incrementar cantidad_en_uso
-                flor = Flor.query.get(flor_data.get('flor_id'))
-                flor.cantidad_en_uso += flor_data.get('cantidad')
+                mover_stock('Flor', flor_data.get('flor_id'), en_uso=flor_data.get('cantidad'))
         
         # PASO 3: Guardar contenedor seleccionado Y RESERVAR STOCK
         if 'contenedor' in data and data['contenedor']:
@@ -444,15 +427,13 @@ def guardar_insumos_detallados(pedido_id):
             db.session.add(contenedor_seleccionado)
             
             # RESERVAR: Incrementar cantidad_en_uso
-            contenedor = Contenedor.query.get(cont_data.get('contenedor_id'))
-            contenedor.cantidad_en_uso += cont_data.get('cantidad', 1)
+            mover_stock('Contenedor', cont_data.get('contenedor_id'), en_uso=cont_data.get('cantidad', 1))
         
         db.session.commit()
         
         # Registrar en auditoría
         try:
             from utils.auditoria_helper import registrar_accion
-            from models.pedido import Pedido
             pedido = Pedido.query.get(pedido_id)
             if pedido:
                 cantidad_flores = len(data.get('flores', []))
@@ -615,12 +596,12 @@ def confirmar_insumos_detallados(pedido_id):
                 )
                 continue
             
-            # APLICAR CAMBIOS:
+            # APLICAR CAMBIOS (un UPDATE atómico; no se aplica si otro pedido ya consumió el stock):
             # 1. Descontar del stock total lo que se usó
-            flor.cantidad_stock -= cantidad_a_usar
-            
             # 2. Liberar del "En Uso" lo que estaba reservado
-            flor.cantidad_en_uso -= cantidad_reservada
+            if mover_stock('Flor', flor.id, stock=-cantidad_a_usar, en_uso=-cantidad_reservada, exigir_stock=True) is None:
+                errores.append(f"{flor.tipo} {flor.color}: Stock insuficiente (otro pedido lo usó recién)")
+                continue
             
             # 3. Lo no usado (cantidad_reservada - cantidad_a_usar) vuelve automáticamente a disponible
             
@@ -657,14 +638,17 @@ def confirmar_insumos_detallados(pedido_id):
                             f"Total disponible: {stock_real_disponible}, Solicitado: {cantidad_a_usar}"
                         )
                     else:
-                        # APLICAR CAMBIOS
-                        contenedor.stock -= cantidad_a_usar
-                        contenedor.cantidad_en_uso -= cantidad_reservada
-                        contenedor_seleccionado.descontado_stock = True
-                        contenedor_seleccionado.cantidad = cantidad_a_usar
-                        contenedor_seleccionado.costo_total = contenedor_seleccionado.costo_unitario * cantidad_a_usar
+                        # APLICAR CAMBIOS (UPDATE atómico, como las flores)
+                        if mover_stock('Contenedor', contenedor.id, stock=-cantidad_a_usar,
+                                       en_uso=-cantidad_reservada, exigir_stock=True) is None:
+                            errores.append(f"{contenedor.tipo}: Stock insuficiente (otro pedido lo usó recién)")
+                        else:
+                            contenedor_seleccionado.descontado_stock = True
+                            contenedor_seleccionado.cantidad = cantidad_a_usar
+                            contenedor_seleccionado.costo_total = contenedor_seleccionado.costo_unitario * cantidad_a_usar
         
         if errores:
+            db.session.rollback()
             return jsonify({'success': False, 'error': 'Errores de validación', 'detalles': errores}), 400
         
         # Cambiar estado del pedido
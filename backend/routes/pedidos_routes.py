@@ -3,25 +3,35 @@ Rutas para gestión de pedidos (Refactorizado)
 Las rutas ahora delegan la lógica de negocio al PedidosService
 """
 
-import os
-import time
 from datetime import datetime, timedelta
 from io import BytesIO
-from flask import Blueprint, request, jsonify, session, send_file
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, request, jsonify, session, send_file, stream_with_context
 from services.pedidos_service import PedidosService
+from services.cambios_pedidos_service import CambiosPedidosService
 from services.rutas_service import RutasService
+from services.imagenes_service import ImagenesService
+from services.almacenamiento_service import AlmacenamientoService
 from extensions import db
 from models.pedido import Pedido, PedidoProducto
+from models.serializadores import PedidoSerializador
 from utils.auditoria_helper import registrar_accion
+from utils.serializadores import a_json, conjunto_solicitado, respuesta_json, respuesta_json_streaming
+from utils.respuestas_http import con_etag
 from routes.auth_routes import require_auth
+from config.cambios import (
+    ESPERA_MAXIMA_SEGUNDOS, DURACION_STREAM_SEGUNDOS, INTERVALO_PING_SEGUNDOS, REINTENTO_CLIENTE_MS
+)
 
 bp = Blueprint('pedidos', __name__)
 
 
 @bp.route('/', methods=['GET'], strict_slashes=False)
+@con_etag(Pedido.fecha_actualizacion)
 def listar_pedidos():
-    """Listar pedidos con filtros opcionales y paginación"""
+    """
+    Listar pedidos con filtros opcionales y paginación
+    Query param campos: tarjeta, lista o detalle (por defecto, el formato completo)
+    """
     try:
         # Recoger parámetros
         filtros = {
@@ -33,41 +43,41 @@ def listar_pedidos():
         buscar = request.args.get('buscar', '').strip()
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 100))
+        conjunto = conjunto_solicitado('detalle', PedidoSerializador)
 
         # Delegar al servicio
-        pedidos, total, total_pages = PedidosService.listar_pedidos(filtros, buscar, page, limit)
+        pedidos, total, total_pages = PedidosService.listar_pedidos(filtros, buscar, page, limit, conjunto)
 
-        return jsonify({
-            'success': True,
-            'data': [p.to_dict() for p in pedidos],
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'total_pages': total_pages
-        })
+        return respuesta_json_streaming(
+            pedidos, success=True, total=total, page=page, limit=limit, total_pages=total_pages
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @bp.route('/pagados', methods=['GET'], strict_slashes=False)
+@con_etag(Pedido.fecha_actualizacion)
 def listar_pagados():
-    """Listar pedidos pagados con búsqueda y paginación"""
+    """
+    Listar pedidos pagados con búsqueda y paginación
+    Query param campos: tarjeta, lista o detalle (por defecto, el formato completo)
+    """
     try:
         buscar = request.args.get('buscar', '').strip()
         page = int(request.args.get('page', 1))
         limit = int(request.args.get('limit', 50))
+        conjunto = conjunto_solicitado('detalle', PedidoSerializador)
 
         # Delegar al servicio
-        pedidos, total, total_pages = PedidosService.listar_pagados(buscar, page, limit)
+        pedidos, total, total_pages = PedidosService.listar_pagados(buscar, page, limit, conjunto)
 
-        return jsonify({
-            'success': True,
-            'data': [p.to_dict() for p in pedidos],
-            'total': total,
-            'page': page,
-            'limit': limit,
-            'total_pages': total_pages
-        })
+        return respuesta_json_streaming(
+            pedidos, success=True, total=total, page=page, limit=limit, total_pages=total_pages
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -228,8 +238,12 @@ def actualizar_pedido(pedido_id):
 
 
 @bp.route('/tablero', methods=['GET'])
+@con_etag(Pedido.fecha_actualizacion, por_dia=True)  # Los despachados se filtran por fecha
 def obtener_tablero():
-    """Obtiene pedidos organizados para vista Kanban"""
+    """
+    Obtiene pedidos organizados para vista Kanban
+    Query param campos: tarjeta, lista o detalle (por defecto, el formato completo)
+    """
     try:
         # Forzar refresh de la sesión para evitar datos en caché
         db.session.expire_all()
@@ -249,17 +263,87 @@ def obtener_tablero():
             'semanas_despachados': semanas_despachados
         }
 
+        conjunto = conjunto_solicitado('detalle', PedidoSerializador)
+
+        # Cursor antes de leer el tablero: un cambio simultáneo se vuelve a recibir, no se pierde
+        cursor_cambios = CambiosPedidosService.obtener_cursor()
+
         # Delegar al servicio
-        tablero = PedidosService.obtener_pedidos_tablero(filtros)
+        tablero = PedidosService.obtener_pedidos_tablero(filtros, conjunto)
 
-        return jsonify({
+        return respuesta_json({
             'success': True,
-            'data': tablero
+            'data': tablero,
+            'cursor_cambios': cursor_cambios
         })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@bp.route('/cambios', methods=['GET'])
+def obtener_cambios():
+    """
+    Feed de cambios del tablero (long-poll)
+    Query params:
+        desde: último cursor aplicado (sin él solo se devuelve el cursor actual)
+        espera: segundos a esperar si no hay cambios (0 a 25, por defecto 25)
+        campos: conjunto de campos de los pedidos (por defecto tarjeta)
+    """
+    try:
+        conjunto = conjunto_solicitado('tarjeta', PedidoSerializador)
+
+        if request.args.get('desde') is None:
+            return respuesta_json({
+                'success': True,
+                'data': {'cursor': CambiosPedidosService.obtener_cursor()}
+            })
+
+        desde = int(request.args['desde'])
+        espera = int(request.args.get('espera', ESPERA_MAXIMA_SEGUNDOS))
+
+        resultado = CambiosPedidosService.esperar_cambios(desde, espera, conjunto)
+
+        respuesta = respuesta_json({'success': True, 'data': resultado})
+        respuesta.headers['Cache-Control'] = 'no-store'
+        return respuesta
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/cambios/stream', methods=['GET'])
+def transmitir_cambios():
+    """
+    Feed de cambios del tablero como server-sent events (EventSource)
+    Retoma desde el header Last-Event-ID (reconexión automática) o ?desde=.
+    Cada evento 'cambios' trae el mismo objeto que /cambios; la conexión se cierra
+    tras DURACION_STREAM_SEGUNDOS y el navegador se reconecta solo.
+    """
+    try:
+        conjunto = conjunto_solicitado('tarjeta', PedidoSerializador)
+        desde = request.headers.get('Last-Event-ID') or request.args.get('desde')
+        desde = int(desde) if desde is not None else CambiosPedidosService.obtener_cursor()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    def generar():
+        yield f'retry: {REINTENTO_CLIENTE_MS}\n\n'.encode('utf-8')
+        for resultado in CambiosPedidosService.seguir_cambios(
+                desde, DURACION_STREAM_SEGUNDOS, conjunto, INTERVALO_PING_SEGUNDOS):
+            if resultado is None:
+                yield b': ping\n\n'
+            else:
+                yield b'id: %d\nevent: cambios\ndata: %s\n\n' % (resultado['cursor'], a_json(resultado))
+
+    respuesta = Response(stream_with_context(generar()), mimetype='text/event-stream')
+    respuesta.headers['Cache-Control'] = 'no-store'
+    respuesta.headers['X-Accel-Buffering'] = 'no'  # nginx: no acumular los eventos
+    return respuesta
+
+
 @bp.route('/<pedido_id>/cobranza', methods=['PATCH'], strict_slashes=False)
 def actualizar_cobranza(pedido_id):
     """Actualiza información de cobranza de un pedido"""
@@ -344,15 +428,11 @@ def subir_foto_respaldo(pedido_id):
         if not ('.' in file.filename and file.filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS):
             return jsonify({'success': False, 'error': 'Tipo de archivo no permitido'}), 400
 
-        # Crear carpeta de uploads si no existe
-        UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-        # Guardar archivo con nombre seguro
-        timestamp = int(time.time())
-        filename = secure_filename(f"pedido_{pedido_id}_{timestamp}_{file.filename}")
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        # Guardar archivo por contenido (una subida idéntica reutiliza el archivo existente)
+        success, filename, mensaje = AlmacenamientoService.guardar_archivo(file)
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 500
+        ImagenesService.encolar_variantes(filename)
 
         # Si se especificó pedido_producto_id, actualizar ese producto
         # Si no, actualizar el primer producto del pedido
@@ -1,117 +1,81 @@
 from flask import Blueprint, jsonify, request
-from config.database_paths import get_legacy_db_path, get_main_db_path
-import sqlite3
+from extensions import db
+from models.catalogo import ProductoCatalogo
+from utils.cache_helpers import cache_referencia
+from utils.respuestas_http import con_etag
+from services.coincidencias_productos_service import CoincidenciasProductosService
+from config.coincidencias import UMBRAL_COINCIDENCIA, MAX_NOMBRES_POR_SOLICITUD
 import json
 
 bp = Blueprint('productos', __name__)
 
+# Campos del catálogo que se pueden modificar con PUT
+CAMPOS_EDITABLES = ('nombre', 'descripcion', 'precio', 'categoria', 'tipo', 'imagen_url', 'sku', 'peso')
+
+
+def _tags_a_texto(tags):
+    return ','.join(tags) if isinstance(tags, list) else (tags or '')
+
+
 @bp.route('/', methods=['GET'])
+@con_etag(ProductoCatalogo.fecha_creacion)
 def listar_productos():
-    """Lista todos los productos con sus imágenes (de ambas bases de datos)"""
+    """Lista todos los productos con sus imágenes (catálogo de Shopify + productos internos)"""
     try:
-        productos_con_imagenes = []
-
-        # 1. Obtener productos de Shopify (base legacy)
-        conn_shopify = sqlite3.connect(get_legacy_db_path())
-        cursor_shopify = conn_shopify.cursor()
-
-        cursor_shopify.execute('''
-            SELECT id, nombre, descripcion, precio, categoria, tipo,
-                   imagen_url, sku, peso, tags, metafields, activo
-            FROM productos
-            WHERE activo = 1
-            ORDER BY nombre
-        ''')
-
-        for producto in cursor_shopify.fetchall():
-            id_prod, nombre, descripcion, precio, categoria, tipo, imagen_url, sku, peso, tags, metafields, activo = producto
-
-            # Obtener todas las imágenes del producto
-            cursor_shopify.execute('''
-                SELECT url, posicion, alt_text, es_principal
-                FROM imagenes_productos
-                WHERE producto_id = ?
-                ORDER BY posicion
-            ''', (id_prod,))
-
-            imagenes = []
-            imagen_principal_found = None
-            for img_url, pos, alt, es_principal in cursor_shopify.fetchall():
-                imagenes.append({
-                    'url': img_url,
-                    'posicion': pos,
-                    'alt_text': alt,
-                    'es_principal': bool(es_principal)
+        def consultar_productos():
+            productos_con_imagenes = []
+
+            # 1. Productos de Shopify (esquema catalogo); las imágenes llegan en una sola consulta extra
+            productos_shopify = ProductoCatalogo.query.filter(
+                ProductoCatalogo.activo == True
+            ).order_by(ProductoCatalogo.nombre).all()
+
+            for producto in productos_shopify:
+                producto_dict = producto.to_dict()
+                producto_dict['costo_estimado'] = producto.precio  # Compatibilidad con eventos
+                producto_dict['origen'] = 'shopify'
+                productos_con_imagenes.append(producto_dict)
+
+            # 2. Productos internos (laslira.db) que tienen recetas
+            productos_internos = db.session.execute(db.text('''
+                SELECT id, nombre, descripcion, precio_venta, tipo_arreglo, tamano, activo, imagen_url
+                FROM productos
+                WHERE activo = 1 OR activo IS NULL
+                ORDER BY nombre
+            ''')).fetchall()
+
+            for producto in productos_internos:
+                id_prod, nombre, descripcion, precio_venta, tipo_arreglo, tamano, activo, imagen_url = producto
+
+                productos_con_imagenes.append({
+                    'id': id_prod,  # Este es un string tipo "PR001"
+                    'nombre': nombre + ' 🌸',  # Agregar emoji para distinguir productos internos
+                    'descripcion': descripcion or '',
+                    'precio': precio_venta,
+                    'precio_venta': precio_venta,
+                    'costo_estimado': precio_venta,  # Agregar costo_estimado para compatibilidad con eventos
+                    'categoria': 'Productos Las Lira',
+                    'tipo': tipo_arreglo or 'Arreglo Floral',
+                    'tamano': tamano or '',
+                    'imagen_principal': imagen_url or '',
+                    'imagen_url': imagen_url or '',
+                    'imagenes': [],
+                    'sku': id_prod,
+                    'peso': 0,
+                    'tags': ['Producto Interno', 'Con Receta'],
+                    'metafields': {},
+                    'activo': bool(activo),
+                    'origen': 'interno'
                 })
-                # Si hay una imagen principal en imagenes_productos, usarla
-                if es_principal:
-                    imagen_principal_found = img_url
-
-            metafields_dict = json.loads(metafields) if metafields else {}
-
-            # Usar imagen_principal de imagenes_productos si existe, sino usar imagen_url de productos
-            imagen_principal_final = imagen_principal_found if imagen_principal_found else imagen_url
-
-            productos_con_imagenes.append({
-                'id': id_prod,
-                'nombre': nombre,
-                'descripcion': descripcion,
-                'precio': precio,
-                'costo_estimado': precio,  # Agregar costo_estimado para compatibilidad con eventos
-                'categoria': categoria,
-                'tipo': tipo,
-                'imagen_principal': imagen_principal_final,
-                'imagen_url': imagen_url,  # También incluir imagen_url para compatibilidad
-                'imagenes': imagenes,
-                'sku': sku,
-                'peso': peso,
-                'tags': tags.split(',') if tags else [],
-                'metafields': metafields_dict,
-                'activo': bool(activo),
-                'origen': 'shopify'
-            })
-
-        conn_shopify.close()
-
-        # 2. Obtener productos internos (laslira.db) que tienen recetas
-        conn_internal = sqlite3.connect(get_main_db_path())
-        cursor_internal = conn_internal.cursor()
-
-        cursor_internal.execute('''
-            SELECT id, nombre, descripcion, precio_venta, tipo_arreglo, tamano, activo, imagen_url
-            FROM productos
-            WHERE activo = 1 OR activo IS NULL
-            ORDER BY nombre
-        ''')
-
-        for producto in cursor_internal.fetchall():
-            id_prod, nombre, descripcion, precio_venta, tipo_arreglo, tamano, activo, imagen_url = producto
-
-            productos_con_imagenes.append({
-                'id': id_prod,  # Este es un string tipo "PR001"
-                'nombre': nombre + ' 🌸',  # Agregar emoji para distinguir productos internos
-                'descripcion': descripcion or '',
-                'precio': precio_venta,
-                'precio_venta': precio_venta,
-                'costo_estimado': precio_venta,  # Agregar costo_estimado para compatibilidad con eventos
-                'categoria': 'Productos Las Lira',
-                'tipo': tipo_arreglo or 'Arreglo Floral',
-                'tamano': tamano or '',
-                'imagen_principal': imagen_url or '',
-                'imagen_url': imagen_url or '',
-                'imagenes': [],
-                'sku': id_prod,
-                'peso': 0,
-                'tags': ['Producto Interno', 'Con Receta'],
-                'metafields': {},
-                'activo': bool(activo),
-                'origen': 'interno'
-            })
-
-        conn_internal.close()
-
-        # Ordenar todos los productos por nombre
-        productos_con_imagenes.sort(key=lambda x: x['nombre'])
+
+            # Ordenar todos los productos por nombre
+            productos_con_imagenes.sort(key=lambda x: x['nombre'])
+
+            return productos_con_imagenes
+
+        productos_con_imagenes = cache_referencia.obtener_o_calcular(
+            'productos', 'activos', consultar_productos, etiquetas=('productos',)
+        )
 
         return jsonify({
             'success': True,
@@ -135,50 +99,92 @@ def crear_producto():
         if not data.get('nombre'):
             return jsonify({'success': False, 'error': 'Campo requerido: nombre'}), 400
 
-        conn = sqlite3.connect(get_legacy_db_path())
-        cursor = conn.cursor()
-
-        # Preparar campos
-        nombre = data['nombre']
-        descripcion = data.get('descripcion', '')
-        precio = data.get('precio', 0)
-        categoria = data.get('categoria', '')
-        tipo = data.get('tipo', '')
-        imagen_url = data.get('imagen_url')
-        sku = data.get('sku', '')
-        peso = data.get('peso', 0)
-        tags = ','.join(data.get('tags', [])) if isinstance(data.get('tags'), list) else data.get('tags', '')
-        metafields = json.dumps(data.get('metafields', {}))
-
-        # Insertar producto
-        cursor.execute('''
-            INSERT INTO productos
-            (nombre, descripcion, precio, categoria, tipo, imagen_url, sku, peso, tags, metafields, activo)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
-        ''', (nombre, descripcion, precio, categoria, tipo, imagen_url, sku, peso, tags, metafields))
-
-        producto_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        producto = ProductoCatalogo(
+            nombre=data['nombre'],
+            descripcion=data.get('descripcion', ''),
+            precio=data.get('precio', 0),
+            categoria=data.get('categoria', ''),
+            tipo=data.get('tipo', ''),
+            imagen_url=data.get('imagen_url'),
+            sku=data.get('sku', ''),
+            peso=data.get('peso', 0),
+            tags=_tags_a_texto(data.get('tags', [])),
+            metafields=json.dumps(data.get('metafields', {})),
+            activo=True
+        )
+        db.session.add(producto)
+        db.session.commit()
 
         return jsonify({
             'success': True,
             'data': {
-                'id': producto_id,
-                'nombre': nombre,
-                'descripcion': descripcion,
-                'precio': precio,
-                'categoria': categoria,
-                'tipo': tipo,
-                'imagen_principal': imagen_url,
-                'sku': sku,
-                'peso': peso,
-                'tags': tags.split(',') if tags else [],
+                'id': producto.id,
+                'nombre': producto.nombre,
+                'descripcion': producto.descripcion,
+                'precio': producto.precio,
+                'categoria': producto.categoria,
+                'tipo': producto.tipo,
+                'imagen_principal': producto.imagen_url,
+                'sku': producto.sku,
+                'peso': producto.peso,
+                'tags': producto.tags.split(',') if producto.tags else [],
                 'activo': True
             },
-            'message': f'Producto "{nombre}" creado exitosamente'
+            'message': f'Producto "{producto.nombre}" creado exitosamente'
         }), 201
 
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/coincidencias', methods=['POST'])
+def buscar_coincidencias_productos():
+    """
+    Productos del catálogo más parecidos a cada nombre (p. ej. productos nuevos de
+    Shopify o arreglos escritos a mano)
+
+    Body: {"nombres": [...], "umbral": 0.8, "limite": 1}
+    """
+    try:
+        data = request.get_json() or {}
+        nombres = data.get('nombres')
+        if not isinstance(nombres, list) or not nombres:
+            return jsonify({'success': False, 'error': 'nombres debe ser una lista no vacía'}), 400
+        if len(nombres) > MAX_NOMBRES_POR_SOLICITUD:
+            return jsonify({'success': False, 'error': f'Máximo {MAX_NOMBRES_POR_SOLICITUD} nombres por solicitud'}), 400
+
+        umbral = float(data.get('umbral', UMBRAL_COINCIDENCIA))
+        limite = int(data.get('limite', 1))
+        # En una solicitud web no se levantan procesos
+        success, resultados, mensaje = CoincidenciasProductosService.buscar_en_catalogo(
+            [str(nombre) for nombre in nombres], umbral=umbral, limite=limite, procesos=1
+        )
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 500
+
+        return jsonify({'success': True, 'data': resultados, 'message': mensaje})
+
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'umbral y limite deben ser números'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/duplicados', methods=['GET'])
+@con_etag(ProductoCatalogo.fecha_creacion)
+def listar_productos_duplicados():
+    """Pares de productos del catálogo con nombres casi iguales (query param umbral)"""
+    try:
+        umbral = float(request.args.get('umbral', UMBRAL_COINCIDENCIA))
+        success, pares, mensaje = CoincidenciasProductosService.buscar_duplicados(umbral=umbral)
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 500
+
+        return jsonify({'success': True, 'data': pares, 'message': mensaje})
+
+    except ValueError:
+        return jsonify({'success': False, 'error': 'umbral debe ser un número'}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -187,65 +193,22 @@ def crear_producto():
 def obtener_producto(producto_id):
     """Obtiene un producto específico con sus imágenes"""
     try:
-        conn = sqlite3.connect(get_legacy_db_path())
-        cursor = conn.cursor()
-        
-        # Obtener producto
-        cursor.execute('''
-            SELECT id, nombre, descripcion, precio, categoria, tipo, 
-                   imagen_url, sku, peso, tags, metafields, activo
-            FROM productos 
-            WHERE id = ? AND activo = 1
-        ''', (producto_id,))
-        
-        producto = cursor.fetchone()
-        
+        producto = ProductoCatalogo.query.filter_by(id=producto_id, activo=True).first()
+
         if not producto:
             return jsonify({
                 'success': False,
                 'error': 'Producto no encontrado'
             }), 404
-        
-        id_prod, nombre, descripcion, precio, categoria, tipo, imagen_url, sku, peso, tags, metafields, activo = producto
-        
-        # Obtener imágenes
-        cursor.execute('''
-            SELECT url, posicion, alt_text, es_principal
-            FROM imagenes_productos 
-            WHERE producto_id = ?
-            ORDER BY posicion
-        ''', (id_prod,))
-        
-        imagenes = []
-        for img_url, pos, alt, es_principal in cursor.fetchall():
-            imagenes.append({
-                'url': img_url,
-                'posicion': pos,
-                'alt_text': alt,
-                'es_principal': bool(es_principal)
-            })
-        
-        metafields_dict = json.loads(metafields) if metafields else {}
-        
-        conn.close()
-        
+
+        producto_dict = producto.to_dict()
+        # Este endpoint siempre devolvió imagen_url como imagen principal
+        producto_dict['imagen_principal'] = producto.imagen_url
+        del producto_dict['imagen_url']
+
         return jsonify({
             'success': True,
-            'producto': {
-                'id': id_prod,
-                'nombre': nombre,
-                'descripcion': descripcion,
-                'precio': precio,
-                'categoria': categoria,
-                'tipo': tipo,
-                'imagen_principal': imagen_url,
-                'imagenes': imagenes,
-                'sku': sku,
-                'peso': peso,
-                'tags': tags.split(',') if tags else [],
-                'metafields': metafields_dict,
-                'activo': bool(activo)
-            }
+            'producto': producto_dict
         })
 
     except Exception as e:
@@ -261,65 +224,25 @@ def actualizar_producto(producto_id):
     try:
         data = request.json
 
-        conn = sqlite3.connect(get_legacy_db_path())
-        cursor = conn.cursor()
-
-        # Verificar que el producto existe
-        cursor.execute('SELECT id, nombre FROM productos WHERE id = ?', (producto_id,))
-        producto = cursor.fetchone()
-
+        producto = db.session.get(ProductoCatalogo, producto_id)
         if not producto:
-            conn.close()
             return jsonify({'success': False, 'error': 'Producto no encontrado'}), 404
 
-        # Construir UPDATE dinámicamente según los campos enviados
-        campos_a_actualizar = []
-        valores = []
-
-        if 'nombre' in data:
-            campos_a_actualizar.append('nombre = ?')
-            valores.append(data['nombre'])
-        if 'descripcion' in data:
-            campos_a_actualizar.append('descripcion = ?')
-            valores.append(data['descripcion'])
-        if 'precio' in data:
-            campos_a_actualizar.append('precio = ?')
-            valores.append(data['precio'])
-        if 'categoria' in data:
-            campos_a_actualizar.append('categoria = ?')
-            valores.append(data['categoria'])
-        if 'tipo' in data:
-            campos_a_actualizar.append('tipo = ?')
-            valores.append(data['tipo'])
-        if 'imagen_url' in data:
-            campos_a_actualizar.append('imagen_url = ?')
-            valores.append(data['imagen_url'])
-        if 'sku' in data:
-            campos_a_actualizar.append('sku = ?')
-            valores.append(data['sku'])
-        if 'peso' in data:
-            campos_a_actualizar.append('peso = ?')
-            valores.append(data['peso'])
+        # Actualizar solo los campos enviados
+        campos = [campo for campo in CAMPOS_EDITABLES if campo in data]
+        for campo in campos:
+            setattr(producto, campo, data[campo])
         if 'tags' in data:
-            tags = ','.join(data['tags']) if isinstance(data['tags'], list) else data['tags']
-            campos_a_actualizar.append('tags = ?')
-            valores.append(tags)
+            producto.tags = _tags_a_texto(data['tags'])
+            campos.append('tags')
         if 'metafields' in data:
-            campos_a_actualizar.append('metafields = ?')
-            valores.append(json.dumps(data['metafields']))
+            producto.metafields = json.dumps(data['metafields'])
+            campos.append('metafields')
 
-        if not campos_a_actualizar:
-            conn.close()
+        if not campos:
             return jsonify({'success': False, 'error': 'No hay campos para actualizar'}), 400
 
-        # Agregar ID al final de valores
-        valores.append(producto_id)
-
-        # Ejecutar UPDATE
-        query = f"UPDATE productos SET {', '.join(campos_a_actualizar)} WHERE id = ?"
-        cursor.execute(query, valores)
-        conn.commit()
-        conn.close()
+        db.session.commit()
 
         return jsonify({
             'success': True,
@@ -327,6 +250,7 @@ def actualizar_producto(producto_id):
         })
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -334,28 +258,21 @@ def actualizar_producto(producto_id):
 def eliminar_producto(producto_id):
     """Elimina un producto (soft delete - marca como inactivo)"""
     try:
-        conn = sqlite3.connect(get_legacy_db_path())
-        cursor = conn.cursor()
-
-        # Verificar que el producto existe
-        cursor.execute('SELECT id, nombre FROM productos WHERE id = ? AND activo = 1', (producto_id,))
-        producto = cursor.fetchone()
-
+        producto = ProductoCatalogo.query.filter_by(id=producto_id, activo=True).first()
         if not producto:
-            conn.close()
             return jsonify({'success': False, 'error': 'Producto no encontrado'}), 404
 
         # Soft delete - marcar como inactivo
-        cursor.execute('UPDATE productos SET activo = 0 WHERE id = ?', (producto_id,))
-        conn.commit()
-        conn.close()
+        producto.activo = False
+        db.session.commit()
 
         return jsonify({
             'success': True,
-            'message': f'Producto "{producto[1]}" eliminado exitosamente'
+            'message': f'Producto "{producto.nombre}" eliminado exitosamente'
         })
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -363,60 +280,29 @@ def eliminar_producto(producto_id):
 def productos_por_categoria(categoria):
     """Obtiene productos filtrados por categoría"""
     try:
-        conn = sqlite3.connect(get_legacy_db_path())
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT id, nombre, descripcion, precio, categoria, tipo, 
-                   imagen_url, sku, peso, tags, metafields, activo
-            FROM productos 
-            WHERE activo = 1 AND categoria LIKE ?
-            ORDER BY nombre
-        ''', (f'%{categoria}%',))
-        
-        productos = cursor.fetchall()
+        productos = ProductoCatalogo.query.filter(
+            ProductoCatalogo.activo == True,
+            ProductoCatalogo.categoria.like(f'%{categoria}%')
+        ).order_by(ProductoCatalogo.nombre).all()
+
         productos_con_imagenes = []
-        
         for producto in productos:
-            id_prod, nombre, descripcion, precio, categoria, tipo, imagen_url, sku, peso, tags, metafields, activo = producto
-            
-            # Obtener imagen principal
-            cursor.execute('''
-                SELECT url FROM imagenes_productos 
-                WHERE producto_id = ? AND es_principal = 1
-                LIMIT 1
-            ''', (id_prod,))
-            
-            imagen_principal = cursor.fetchone()
-            if imagen_principal:
-                imagen_principal = imagen_principal[0]
-            
-            metafields_dict = json.loads(metafields) if metafields else {}
-            
-            productos_con_imagenes.append({
-                'id': id_prod,
-                'nombre': nombre,
-                'descripcion': descripcion,
-                'precio': precio,
-                'categoria': categoria,
-                'tipo': tipo,
-                'imagen_principal': imagen_principal,
-                'sku': sku,
-                'peso': peso,
-                'tags': tags.split(',') if tags else [],
-                'metafields': metafields_dict,
-                'activo': bool(activo)
-            })
-        
-        conn.close()
-        
+            producto_dict = producto.to_dict()
+            # Solo la imagen marcada como principal (sin respaldo en imagen_url)
+            producto_dict['imagen_principal'] = next(
+                (imagen.url for imagen in producto.imagenes if imagen.es_principal), None
+            )
+            del producto_dict['imagen_url']
+            del producto_dict['imagenes']
+            productos_con_imagenes.append(producto_dict)
+
         return jsonify({
             'success': True,
             'productos': productos_con_imagenes,
             'total': len(productos_con_imagenes),
             'categoria': categoria
         })
-        
+
     except Exception as e:
         return jsonify({
             'success': False,
@@ -424,6 +310,131 @@ def productos_por_categoria(categoria):
         }), 500
 
 
+SQL_INSERTAR_INSUMO_RECETA = db.text('''
+    INSERT INTO recetas_productos
+    (producto_id, insumo_tipo, insumo_id, cantidad, unidad, es_opcional, notas)
+    VALUES (:producto_id, :insumo_tipo, :insumo_id, :cantidad, :unidad, :es_opcional, :notas)
+''')
+
+
+def _parametros_insumo_receta(producto_id, insumo):
+    """Parámetros de SQL_INSERTAR_INSUMO_RECETA para un insumo del request"""
+    return {
+        'producto_id': producto_id,
+        'insumo_tipo': insumo['insumo_tipo'],
+        'insumo_id': insumo['insumo_id'],
+        'cantidad': insumo.get('cantidad', 1),
+        'unidad': insumo.get('unidad', 'Unidad' if insumo['insumo_tipo'] == 'Contenedor' else 'Tallos'),
+        'es_opcional': insumo.get('es_opcional', False),
+        'notas': insumo.get('notas')
+    }
+
+
+def _calcular_receta(producto_id):
+    """Calcula la receta de un producto con costos, stock y margen (sin caché)"""
+    resultados = db.session.execute(
+        db.text('''
+        SELECT insumo_tipo, insumo_id, cantidad, unidad, es_opcional
+        FROM recetas_productos
+        WHERE producto_id = :producto_id
+        ORDER BY insumo_tipo, insumo_id
+        '''),
+        {'producto_id': str(producto_id)}  # Convertir a string para soportar ambos tipos
+    ).fetchall()
+
+    receta = []
+    costo_total_insumos = 0.0
+    for insumo_tipo, insumo_id, cantidad, unidad, es_opcional in resultados:
+        item = {
+            'id': insumo_id,
+            'tipo': insumo_tipo,
+            'cantidad': int(cantidad or 0),
+            'unidad': unidad,
+            'es_opcional': bool(es_opcional),
+        }
+        if insumo_tipo == 'Flor':
+            row = db.session.execute(
+                db.text('SELECT id, tipo, color, nombre, costo_unitario, cantidad_stock, foto_url FROM flores WHERE id = :id'),
+                {'id': insumo_id}
+            ).fetchone()
+            if row:
+                fid, tipo, color, nombre, costo_unitario, stock, foto = row
+                # Usar nombre si existe, sino crear nombre descriptivo: "Tipo - Color"
+                nombre_descriptivo = nombre if nombre else (f"{tipo} {color}" if color else tipo)
+                item.update({
+                    'nombre': nombre_descriptivo,
+                    'insumo_nombre': nombre_descriptivo,
+                    'tipo_insumo': tipo,
+                    'color': color,
+                    'costo_unitario': float(costo_unitario or 0),
+                    'stock_disponible': int(stock or 0),
+                    'foto_url': foto,
+                    'unidad_stock': 'Tallos',
+                })
+        elif insumo_tipo == 'Contenedor':
+            row = db.session.execute(
+                db.text('SELECT id, tipo, material, forma, tamano, color, nombre, costo, cantidad_stock, foto_url FROM contenedores WHERE id = :id'),
+                {'id': insumo_id}
+            ).fetchone()
+            if row:
+                cid, tipo, material, forma, tamano, color, nombre, costo, stock, foto = row
+                # Usar nombre si existe, sino crear nombre descriptivo: "Tipo Material Tamaño"
+                nombre_descriptivo = nombre if nombre else f"{tipo or ''} {material or ''} {tamano or ''}".strip()
+                item.update({
+                    'nombre': nombre_descriptivo,
+                    'insumo_nombre': nombre_descriptivo,
+                    'tipo_insumo': tipo,
+                    'material': material,
+                    'forma': forma,
+                    'tamano': tamano,
+                    'color': color,
+                    'costo_unitario': float(costo or 0),
+                    'stock_disponible': int(stock or 0),
+                    'foto_url': foto,
+                    'unidad_stock': 'Unidad',
+                })
+        # Derivados
+        item['costo_total'] = round((item.get('costo_unitario') or 0) * (item['cantidad'] or 0), 2)
+        item['disponible'] = (item.get('stock_disponible', 0) or 0) >= (item['cantidad'] or 0)
+        costo_total_insumos += item['costo_total']
+        receta.append(item)
+
+    # Precio de venta de referencia (best-effort)
+    # Primero intentar en laslira.db (productos internos)
+    try:
+        rowp = db.session.execute(
+            db.text('SELECT precio_venta FROM productos WHERE id = :id'), {'id': str(producto_id)}
+        ).fetchone()
+        precio_venta = float(rowp[0]) if rowp and rowp[0] is not None else None
+    except Exception:
+        db.session.rollback()
+        precio_venta = None
+
+    # Si no se encontró en laslira.db, intentar en el catálogo de Shopify
+    if precio_venta is None:
+        try:
+            precio = db.session.query(ProductoCatalogo.precio).filter(
+                ProductoCatalogo.id == producto_id
+            ).scalar()
+            precio_venta = float(precio) if precio is not None else None
+        except Exception:
+            db.session.rollback()
+            precio_venta = None
+
+    ganancia = (precio_venta or 0) - costo_total_insumos
+    margen = (ganancia / precio_venta * 100) if precio_venta and precio_venta > 0 else 0
+
+    return {
+        'receta': receta,
+        'producto_id': producto_id,
+        'total': len(receta),
+        'costo_total_insumos': round(costo_total_insumos, 2),
+        'precio_venta': precio_venta,
+        'ganancia': round(ganancia, 2),
+        'margen_porcentaje': round(margen, 2)
+    }
+
+
 @bp.route('/<producto_id>/receta', methods=['GET'])
 def obtener_receta_producto(producto_id):
     """Obtiene la receta (insumos) de un producto.
@@ -432,110 +443,13 @@ def obtener_receta_producto(producto_id):
     Acepta tanto IDs numéricos como strings (PR001, etc.)
     """
     try:
-        # Preferir la base usada por la app
-        conn = sqlite3.connect(get_main_db_path())
-        cursor = conn.cursor()
-
-        cursor.execute(
-            '''
-            SELECT insumo_tipo, insumo_id, cantidad, unidad, es_opcional
-            FROM recetas_productos
-            WHERE producto_id = ?
-            ORDER BY insumo_tipo, insumo_id
-            ''',
-            (str(producto_id),)  # Convertir a string para soportar ambos tipos
+        # La receta incluye costos y stock de insumos: se invalida también cuando cambian
+        receta = cache_referencia.obtener_o_calcular(
+            'recetas', str(producto_id), lambda: _calcular_receta(producto_id),
+            etiquetas=('recetas', 'flores', 'contenedores', 'productos')
         )
 
-        receta = []
-        costo_total_insumos = 0.0
-        resultados = cursor.fetchall()
-        for insumo_tipo, insumo_id, cantidad, unidad, es_opcional in resultados:
-            item = {
-                'id': insumo_id,
-                'tipo': insumo_tipo,
-                'cantidad': int(cantidad or 0),
-                'unidad': unidad,
-                'es_opcional': bool(es_opcional),
-            }
-            if insumo_tipo == 'Flor':
-                cursor.execute('SELECT id, tipo, color, nombre, costo_unitario, cantidad_stock, foto_url FROM flores WHERE id = ?', (insumo_id,))
-                row = cursor.fetchone()
-                if row:
-                    fid, tipo, color, nombre, costo_unitario, stock, foto = row
-                    # Usar nombre si existe, sino crear nombre descriptivo: "Tipo - Color"
-                    nombre_descriptivo = nombre if nombre else (f"{tipo} {color}" if color else tipo)
-                    item.update({
-                        'nombre': nombre_descriptivo,
-                        'insumo_nombre': nombre_descriptivo,
-                        'tipo_insumo': tipo,
-                        'color': color,
-                        'costo_unitario': float(costo_unitario or 0),
-                        'stock_disponible': int(stock or 0),
-                        'foto_url': foto,
-                        'unidad_stock': 'Tallos',
-                    })
-            elif insumo_tipo == 'Contenedor':
-                cursor.execute('SELECT id, tipo, material, forma, tamano, color, nombre, costo, stock, foto_url FROM contenedores WHERE id = ?', (insumo_id,))
-                row = cursor.fetchone()
-                if row:
-                    cid, tipo, material, forma, tamano, color, nombre, costo, stock, foto = row
-                    # Usar nombre si existe, sino crear nombre descriptivo: "Tipo Material Tamaño"
-                    nombre_descriptivo = nombre if nombre else f"{tipo or ''} {material or ''} {tamano or ''}".strip()
-                    item.update({
-                        'nombre': nombre_descriptivo,
-                        'insumo_nombre': nombre_descriptivo,
-                        'tipo_insumo': tipo,
-                        'material': material,
-                        'forma': forma,
-                        'tamano': tamano,
-                        'color': color,
-                        'costo_unitario': float(costo or 0),
-                        'stock_disponible': int(stock or 0),
-                        'foto_url': foto,
-                        'unidad_stock': 'Unidad',
-                    })
-            # Derivados
-            item['costo_total'] = round((item.get('costo_unitario') or 0) * (item['cantidad'] or 0), 2)
-            item['disponible'] = (item.get('stock_disponible', 0) or 0) >= (item['cantidad'] or 0)
-            costo_total_insumos += item['costo_total']
-            receta.append(item)
-
-        # Precio de venta de referencia (best-effort)
-        # Primero intentar en laslira.db (productos internos)
-        try:
-            cursor.execute('SELECT precio_venta FROM productos WHERE id = ?', (str(producto_id),))
-            rowp = cursor.fetchone()
-            precio_venta = float(rowp[0]) if rowp and rowp[0] is not None else None
-        except Exception:
-            precio_venta = None
-
-        conn.close()
-
-        # Si no se encontró en laslira.db, intentar en productos_shopify.db
-        if precio_venta is None:
-            try:
-                conn2 = sqlite3.connect(get_legacy_db_path())
-                c2 = conn2.cursor()
-                c2.execute('SELECT precio FROM productos WHERE id = ?', (producto_id,))
-                rowp = c2.fetchone()
-                precio_venta = float(rowp[0]) if rowp and rowp[0] is not None else None
-                conn2.close()
-            except Exception:
-                precio_venta = None
-
-        ganancia = (precio_venta or 0) - costo_total_insumos
-        margen = (ganancia / precio_venta * 100) if precio_venta and precio_venta > 0 else 0
-
-        return jsonify({
-            'success': True,
-            'receta': receta,
-            'producto_id': producto_id,
-            'total': len(receta),
-            'costo_total_insumos': round(costo_total_insumos, 2),
-            'precio_venta': precio_venta,
-            'ganancia': round(ganancia, 2),
-            'margen_porcentaje': round(margen, 2)
-        })
+        return jsonify({'success': True, **receta})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -550,27 +464,12 @@ def agregar_insumo_receta(producto_id):
         if not data.get('insumo_tipo') or not data.get('insumo_id'):
             return jsonify({'success': False, 'error': 'Campos requeridos: insumo_tipo, insumo_id'}), 400
 
-        conn = sqlite3.connect(get_main_db_path())
-        cursor = conn.cursor()
-
         # Insertar insumo en receta
-        cursor.execute('''
-            INSERT INTO recetas_productos
-            (producto_id, insumo_tipo, insumo_id, cantidad, unidad, es_opcional, notas)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            producto_id,
-            data['insumo_tipo'],
-            data['insumo_id'],
-            data.get('cantidad', 1),
-            data.get('unidad', 'Unidad' if data['insumo_tipo'] == 'Contenedor' else 'Tallos'),
-            data.get('es_opcional', False),
-            data.get('notas')
-        ))
-
-        receta_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        resultado = db.session.execute(SQL_INSERTAR_INSUMO_RECETA, _parametros_insumo_receta(producto_id, data))
+
+        receta_id = resultado.lastrowid
+        db.session.commit()
+        cache_referencia.invalidar('recetas')
 
         return jsonify({
             'success': True,
@@ -579,6 +478,7 @@ def agregar_insumo_receta(producto_id):
         }), 201
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -589,30 +489,21 @@ def actualizar_receta_completa(producto_id):
         data = request.json
         insumos = data.get('insumos', [])
 
-        conn = sqlite3.connect(get_main_db_path())
-        cursor = conn.cursor()
-
         # Eliminar receta actual
-        cursor.execute('DELETE FROM recetas_productos WHERE producto_id = ?', (producto_id,))
-
-        # Insertar nueva receta
-        for insumo in insumos:
-            cursor.execute('''
-                INSERT INTO recetas_productos
-                (producto_id, insumo_tipo, insumo_id, cantidad, unidad, es_opcional, notas)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                producto_id,
-                insumo['insumo_tipo'],
-                insumo['insumo_id'],
-                insumo.get('cantidad', 1),
-                insumo.get('unidad', 'Unidad' if insumo['insumo_tipo'] == 'Contenedor' else 'Tallos'),
-                insumo.get('es_opcional', False),
-                insumo.get('notas')
-            ))
-
-        conn.commit()
-        conn.close()
+        db.session.execute(
+            db.text('DELETE FROM recetas_productos WHERE producto_id = :producto_id'),
+            {'producto_id': producto_id}
+        )
+
+        # Insertar nueva receta (un solo executemany)
+        if insumos:
+            db.session.execute(
+                SQL_INSERTAR_INSUMO_RECETA,
+                [_parametros_insumo_receta(producto_id, insumo) for insumo in insumos]
+            )
+
+        db.session.commit()
+        cache_referencia.invalidar('recetas')
 
         return jsonify({
             'success': True,
@@ -620,6 +511,7 @@ def actualizar_receta_completa(producto_id):
         })
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
@@ -627,23 +519,19 @@ def actualizar_receta_completa(producto_id):
 def eliminar_insumo_receta(producto_id, receta_id):
     """Elimina un insumo específico de la receta"""
     try:
-        conn = sqlite3.connect(get_main_db_path())
-        cursor = conn.cursor()
-
         # Verificar que el insumo pertenece al producto
-        cursor.execute('''
+        existe = db.session.execute(db.text('''
             SELECT id FROM recetas_productos
-            WHERE id = ? AND producto_id = ?
-        ''', (receta_id, producto_id))
+            WHERE id = :receta_id AND producto_id = :producto_id
+        '''), {'receta_id': receta_id, 'producto_id': producto_id}).fetchone()
 
-        if not cursor.fetchone():
-            conn.close()
+        if not existe:
             return jsonify({'success': False, 'error': 'Insumo no encontrado en esta receta'}), 404
 
         # Eliminar insumo
-        cursor.execute('DELETE FROM recetas_productos WHERE id = ?', (receta_id,))
-        conn.commit()
-        conn.close()
+        db.session.execute(db.text('DELETE FROM recetas_productos WHERE id = :id'), {'id': receta_id})
+        db.session.commit()
+        cache_referencia.invalidar('recetas')
 
         return jsonify({
             'success': True,
@@ -651,4 +539,5 @@ def eliminar_insumo_receta(producto_id, receta_id):
         })
 
     except Exception as e:
+        db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
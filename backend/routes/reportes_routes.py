@@ -4,12 +4,22 @@ Las rutas ahora delegan la lógica de negocio al ReportesService
 """
 
 from flask import Blueprint, request, jsonify
+from models.cliente import Cliente
+from models.evento import Evento
+from models.pedido import Pedido
 from services.reportes_service import ReportesService
+from utils.respuestas_http import con_etag
 
 bp = Blueprint('reportes', __name__)
 
+# Los reportes se calculan sobre pedidos, clientes y eventos, y varios dependen de "hoy"
+etag_reportes = con_etag(
+    Pedido.fecha_actualizacion, Cliente.ultima_compra, Evento.fecha_cotizacion, por_dia=True
+)
+
 
 @bp.route('/kpis', methods=['GET'])
+@etag_reportes
 def obtener_kpis():
     """Obtener KPIs principales del dashboard"""
     try:
@@ -23,6 +33,7 @@ def obtener_kpis():
 
 
 @bp.route('/ventas-mensuales', methods=['GET'])
+@etag_reportes
 def obtener_ventas_mensuales():
     """Obtiene ventas agrupadas por mes"""
     try:
@@ -38,6 +49,7 @@ def obtener_ventas_mensuales():
 
 
 @bp.route('/top-productos', methods=['GET'])
+@etag_reportes
 def obtener_top_productos():
     """Obtiene los productos más vendidos"""
     try:
@@ -56,6 +68,7 @@ def obtener_top_productos():
 
 
 @bp.route('/distribucion-tipos', methods=['GET'])
+@etag_reportes
 def obtener_distribucion_tipos():
     """Obtiene la distribución de pedidos por tipo"""
     try:
@@ -70,6 +83,7 @@ def obtener_distribucion_tipos():
 
 
 @bp.route('/top-clientes', methods=['GET'])
+@etag_reportes
 def obtener_top_clientes():
     """Obtiene los mejores clientes por gasto total"""
     try:
@@ -85,6 +99,7 @@ def obtener_top_clientes():
 
 
 @bp.route('/distribucion-clientes', methods=['GET'])
+@etag_reportes
 def obtener_distribucion_clientes():
     """Obtiene la distribución de clientes por tipo"""
     try:
@@ -100,6 +115,7 @@ def obtener_distribucion_clientes():
 
 
 @bp.route('/comunas-frecuentes', methods=['GET'])
+@etag_reportes
 def obtener_comunas_frecuentes():
     """Obtiene las comunas con más pedidos"""
     try:
@@ -115,6 +131,7 @@ def obtener_comunas_frecuentes():
 
 
 @bp.route('/analisis-eventos', methods=['GET'])
+@etag_reportes
 def analisis_eventos():
     """Analiza eventos y sus estados"""
     try:
@@ -129,6 +146,7 @@ def analisis_eventos():
 
 
 @bp.route('/analisis-cobranza', methods=['GET'])
+@etag_reportes
 def analisis_cobranza():
     """Analiza el estado de cobranza de pedidos"""
     try:
@@ -143,6 +161,7 @@ def analisis_cobranza():
 
 
 @bp.route('/personalizaciones', methods=['GET'])
+@etag_reportes
 def obtener_personalizaciones():
     """Obtiene resumen de personalizaciones de pedidos"""
     try:
@@ -157,6 +176,7 @@ def obtener_personalizaciones():
 
 
 @bp.route('/ventas-dia-semana', methods=['GET'])
+@etag_reportes
 def ventas_por_dia_semana():
     """Analiza ventas agrupadas por día de la semana"""
     try:
@@ -174,6 +194,7 @@ def ventas_por_dia_semana():
 
 
 @bp.route('/canales-venta', methods=['GET'])
+@etag_reportes
 def obtener_canales_venta():
     """Obtiene distribución de ventas por canal"""
     try:
@@ -188,6 +209,7 @@ def obtener_canales_venta():
 
 
 @bp.route('/arreglos-por-motivo', methods=['GET'])
+@etag_reportes
 def arreglos_por_motivo():
     """Obtiene los arreglos más solicitados por cada motivo"""
     try:
@@ -205,6 +227,7 @@ def arreglos_por_motivo():
 
 
 @bp.route('/anticipacion-pedidos', methods=['GET'])
+@etag_reportes
 def analisis_anticipacion_pedidos():
     """Analiza con cuánta anticipación se hacen los pedidos"""
     try:
@@ -222,6 +245,7 @@ def analisis_anticipacion_pedidos():
 
 
 @bp.route('/colores-frecuentes', methods=['GET'])
+@etag_reportes
 def obtener_colores_frecuentes():
     """Obtiene los colores más solicitados en pedidos personalizados"""
     try:
@@ -239,6 +263,7 @@ def obtener_colores_frecuentes():
 
 
 @bp.route('/analisis-personalizaciones', methods=['GET'])
+@etag_reportes
 def analisis_personalizaciones():
     """Análisis detallado de personalizaciones"""
     try:
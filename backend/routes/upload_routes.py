@@ -2,16 +2,17 @@
 Rutas para subida y gestión de imágenes
 """
 
-from flask import Blueprint, request, jsonify, send_from_directory, session
+from flask import Blueprint, request, jsonify, send_from_directory, send_file, session
 from werkzeug.utils import secure_filename
 from utils.file_helpers import allowed_file
+from services.imagenes_service import ImagenesService
+from services.almacenamiento_service import AlmacenamientoService
+from config.imagenes import TAMANOS_VARIANTES, MAX_AGE_VARIANTES
 import os
-import sqlite3
 from extensions import db
 from models.inventario import Flor, Contenedor
 from models.producto import Producto
 from routes.auth_routes import require_auth
-from config.database_paths import get_legacy_db_path, get_main_db_path
 
 bp = Blueprint('upload', __name__)
 
@@ -39,17 +40,11 @@ def subir_imagen():
         if not allowed_file(file.filename):
             return jsonify({'success': False, 'error': 'Tipo de archivo no permitido'}), 400
         
-        # Guardar archivo con nombre seguro
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        # Si ya existe, agregar timestamp
-        if os.path.exists(filepath):
-            name, ext = os.path.splitext(filename)
-            filename = f"{name}_{int(os.time())}{ext}"
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
-        
-        file.save(filepath)
+        # Guardar archivo por contenido (una subida idéntica reutiliza el archivo existente)
+        success, filename, mensaje = AlmacenamientoService.guardar_archivo(file)
+        if not success:
+            return jsonify({'success': False, 'error': mensaje}), 500
+        ImagenesService.encolar_variantes(filename)
         
         return jsonify({
             'success': True,
@@ -63,8 +58,35 @@ def subir_imagen():
 
 @bp.route('/imagen/<filename>', methods=['GET'])
 def obtener_imagen(filename):
-    """Servir una imagen subida"""
+    """
+    Servir una imagen subida
+
+    Query params:
+        size: variante reducida a servir (thumb, small, medium). Sin size se sirve el original.
+    """
     try:
+        tamano = request.args.get('size')
+        if tamano:
+            if tamano not in TAMANOS_VARIANTES:
+                return jsonify({
+                    'success': False,
+                    'error': f'Tamaño no válido. Opciones: {", ".join(TAMANOS_VARIANTES)}'
+                }), 400
+
+            if secure_filename(filename) == filename:
+                acepta_webp = 'image/webp' in request.accept_mimetypes
+                variante = ImagenesService.resolver_variante(filename, tamano, acepta_webp)
+                if variante:
+                    ruta, etag, mimetype = variante
+                    response = send_file(ruta, mimetype=mimetype, etag=etag,
+                                         max_age=MAX_AGE_VARIANTES, conditional=True)
+                    response.cache_control.public = True
+                    response.vary.add('Accept')
+                    return response
+
+                # La variante aún no existe (imagen antigua o worker pendiente): generarla y servir el original
+                ImagenesService.encolar_variantes(filename)
+
         return send_from_directory(UPLOAD_FOLDER, filename)
     except Exception as e:
         return jsonify({'success': False, 'error': 'Imagen no encontrada'}), 404
@@ -82,9 +104,10 @@ def actualizar_foto_flor(flor_id):
         if 'file' in request.files:
             file = request.files['file']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(f"flor_{flor_id}_{file.filename}")
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(filepath)
+                success, filename, mensaje = AlmacenamientoService.guardar_archivo(file)
+                if not success:
+                    return jsonify({'success': False, 'error': mensaje}), 500
+                ImagenesService.encolar_variantes(filename)
                 flor.foto_url = filename
             else:
                 return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
@@ -121,9 +144,10 @@ def actualizar_foto_contenedor(contenedor_id):
         if 'file' in request.files:
             file = request.files['file']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(f"contenedor_{contenedor_id}_{file.filename}")
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(filepath)
+                success, filename, mensaje = AlmacenamientoService.guardar_archivo(file)
+                if not success:
+                    return jsonify({'success': False, 'error': mensaje}), 500
+                ImagenesService.encolar_variantes(filename)
                 contenedor.foto_url = filename
             else:
                 return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
@@ -161,74 +185,31 @@ def actualizar_foto_producto(producto_id):
         if 'file' in request.files:
             file = request.files['file']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(f"producto_{producto_id}_{file.filename}")
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(filepath)
+                success, filename, mensaje = AlmacenamientoService.guardar_archivo(file)
+                if not success:
+                    return jsonify({'success': False, 'error': mensaje}), 500
+                ImagenesService.encolar_variantes(filename)
                 # Actualizar tanto imagen_url como imagen_principal para mantener consistencia
                 producto.imagen_url = filename
                 producto.imagen_principal = filename
                 
-                # También actualizar en la base de datos principal (SQLite) para que se refleje en el listado
-                try:
-                    conn_legacy = sqlite3.connect(get_main_db_path())
-                    cursor_legacy = conn_legacy.cursor()
-                    
-                    # Actualizar imagen_url en la tabla productos
-                    # Usar el filename completo para que se pueda construir la URL
-                    cursor_legacy.execute('''
-                        UPDATE productos 
-                        SET imagen_url = ? 
-                        WHERE id = ?
-                    ''', (filename, producto_id))
-                    
-                    print(f"✅ Actualizado imagen_url en base legacy: {filename} para producto {producto_id}")
-                    
-                    # Actualizar o insertar en imagenes_productos si la tabla existe
-                    try:
-                        # Verificar si existe una imagen principal
-                        cursor_legacy.execute('''
-                            SELECT id FROM imagenes_productos 
-                            WHERE producto_id = ? AND es_principal = 1
-                            LIMIT 1
-                        ''', (producto_id,))
-                        existe_principal = cursor_legacy.fetchone()
-                        
-                        # Guardar solo el filename, no la URL completa (el frontend construirá la URL)
-                        # Esto es más consistente con cómo se guarda en la tabla productos
-                        imagen_url_completa = filename
-                        
-                        if existe_principal:
-                            # Actualizar la imagen principal existente
-                            cursor_legacy.execute('''
-                                UPDATE imagenes_productos 
-                                SET url = ? 
-                                WHERE producto_id = ? AND es_principal = 1
-                            ''', (imagen_url_completa, producto_id))
-                            print(f"✅ Actualizada imagen principal en imagenes_productos: {filename} para producto {producto_id}")
-                        else:
-                            # Insertar nueva imagen principal
-                            # Primero verificar si hay otras imágenes para este producto
-                            cursor_legacy.execute('''
-                                SELECT MAX(posicion) FROM imagenes_productos 
-                                WHERE producto_id = ?
-                            ''', (producto_id,))
-                            max_pos = cursor_legacy.fetchone()[0] or -1
-                            nueva_posicion = max_pos + 1
-                            
-                            cursor_legacy.execute('''
-                                INSERT INTO imagenes_productos (producto_id, url, posicion, es_principal)
-                                VALUES (?, ?, ?, 1)
-                            ''', (producto_id, imagen_url_completa, nueva_posicion))
-                            print(f"✅ Insertada nueva imagen principal en imagenes_productos: {filename} para producto {producto_id}")
-                    except sqlite3.OperationalError as e:
-                        # Si la tabla no existe, solo continuar
-                        print(f"⚠️ Tabla imagenes_productos no existe o error: {str(e)}")
-                    
-                    conn_legacy.commit()
-                    conn_legacy.close()
-                except Exception as e:
-                    print(f"⚠️ Advertencia: No se pudo actualizar la base de datos legacy: {str(e)}")
-                    # Continuar de todas formas, ya que el modelo SQLAlchemy se actualizó
+                # Mantener la imagen principal de imagenes_productos (si la tabla existe) en la
+                # misma transacción que el producto: un solo commit y sin conexiones aparte
+                # Se guarda solo el filename, igual que en productos (el frontend construye la URL)
+                if db.inspect(db.engine).has_table('imagenes_productos'):
+                    actualizadas = db.session.execute(db.text('''
+                        UPDATE imagenes_productos
+                        SET url = :url
+                        WHERE producto_id = :producto_id AND es_principal = 1
+                    '''), {'url': filename, 'producto_id': producto_id}).rowcount
+
+                    if not actualizadas:
+                        # Insertar nueva imagen principal después de las existentes
+                        db.session.execute(db.text('''
+                            INSERT INTO imagenes_productos (producto_id, url, posicion, es_principal)
+                            SELECT :producto_id, :url, COALESCE(MAX(posicion), -1) + 1, 1
+                            FROM imagenes_productos WHERE producto_id = :producto_id
+                        '''), {'url': filename, 'producto_id': producto_id})
             else:
                 return jsonify({'success': False, 'error': 'Archivo no válido'}), 400
         
@@ -262,3 +243,42 @@ def actualizar_foto_producto(producto_id):
         db.session.rollback()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+@bp.route('/almacenamiento', methods=['GET'])
+def obtener_estadisticas_almacenamiento():
+    """Estadísticas del almacenamiento de archivos (deduplicación y archivos sin uso)"""
+    try:
+        return jsonify({
+            'success': True,
+            'data': AlmacenamientoService.obtener_estadisticas()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@bp.route('/almacenamiento/limpiar', methods=['POST'])
+@require_auth
+def limpiar_almacenamiento():
+    """
+    Elimina archivos sin referencias (garbage collection)
+
+    Body (opcional):
+        dry_run: bool - solo reportar qué se eliminaría (por defecto true)
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        dry_run = data.get('dry_run', True)
+
+        success, resumen, mensaje = AlmacenamientoService.recolectar_basura(dry_run=dry_run)
+
+        if success:
+            return jsonify({
+                'success': True,
+                'data': resumen,
+                'message': mensaje
+            })
+        else:
+            return jsonify({'success': False, 'error': mensaje}), 500
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -11,7 +11,10 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, current_dir)
 
 # Ahora importar y ejecutar la aplicación
-from app import app, db
+from app import create_app
+from extensions import db
+
+app = create_app()
 
 if __name__ == '__main__':
     print("🌸 Iniciando servidor Las-Lira...")
@@ -28,7 +31,7 @@ if __name__ == '__main__':
     app.run(
         host='0.0.0.0',
         port=puerto,
-        debug=True,
+        debug=os.getenv('FLASK_DEBUG', '1') == '1',  # Solo desarrollo: en producción usar start.sh produccion
         use_reloader=False  # Desactivar reloader para evitar problemas de imports
     )
 
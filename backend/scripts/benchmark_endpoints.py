@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de latencia de los endpoints más usados sobre un dataset sintético
+de tamaño producción
+
+Crea (o reutiliza) una base SQLite aparte con datos generados a partir de los CSV
+de la raíz del proyecto (nombres de clientes, comunas, motivos, insumos, eventos)
+y recorre los endpoints con el test client de Flask. Por cada endpoint reporta
+latencia p50/p95, consultas SQL por request y memoria máxima (tracemalloc).
+
+La base de producción no se toca: DATABASE_URL y CATALOGO_DATABASE_PATH apuntan a
+archivos del directorio temporal antes de importar la app.
+
+Uso:
+    python3 scripts/benchmark_endpoints.py                      # Escala por defecto (50k pedidos, 20k clientes...)
+    python3 scripts/benchmark_endpoints.py --pedidos 5000 --clientes 2000
+    python3 scripts/benchmark_endpoints.py --resembrar          # Regenerar la base aunque ya exista
+    python3 scripts/benchmark_endpoints.py --con-cache          # No limpiar cachés entre repeticiones
+    python3 scripts/benchmark_endpoints.py --guardar-baseline   # Guardar resultados como referencia
+    python3 scripts/benchmark_endpoints.py --comparar           # Comparar con la referencia (sale con 1 si hay regresiones)
+"""
+
+import sys
+import os
+import csv
+import json
+import random
+import re
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Agregar el directorio del backend al path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAIZ_PROYECTO = os.path.dirname(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+ARCHIVO_BASELINE = os.path.join(BACKEND_DIR, 'scripts', 'benchmark_baseline.json')
+
+ESCALA_DEFECTO = {
+    'pedidos': 50000,
+    'clientes': 20000,
+    'insumos': 500,
+    'eventos': 2000,
+}
+
+# (nombre, url, repeticiones). {nombre_cliente} y {fecha_*} se completan en cada repetición
+ENDPOINTS = [
+    ('tablero', '/api/pedidos/tablero', 5),
+    ('buscar_cliente', '/api/clientes/buscar-por-nombre?nombre={nombre_cliente}', 20),
+    ('kpis', '/api/reportes/kpis', 10),
+    ('exportar_pedidos', '/api/exportar/pedidos?fecha_inicio={fecha_inicio_export}', 3),
+    ('rutas', '/api/pedidos/rutas?fecha=hoy', 10),
+]
+
+ESTADOS_TABLERO = [
+    'Entregas de Hoy', 'Entregas para Mañana', 'Entregas Semana', 'Entregas Próx Semana',
+    'Entregas Este Mes', 'Entregas Próx Mes', 'En Proceso', 'Listo para Despacho'
+]
+DIAS = ['LUNES', 'MARTES', 'MIERCOLES', 'JUEVES', 'VIERNES', 'SABADO', 'DOMINGO']
+TIPOS_CLIENTE = ['Nuevo', 'Fiel', 'Cumplidor', 'No Cumplidor', 'VIP', 'Ocasional']
+TAMANO_LOTE = 5000
+
+# Diferencia mínima de p95 para considerar regresión (el ruido en endpoints de pocos ms supera la tolerancia)
+MARGEN_MINIMO_MS = 5
+
+
+def leer_argumentos():
+    escala = dict(ESCALA_DEFECTO)
+    for clave in escala:
+        bandera = f'--{clave}'
+        if bandera in sys.argv:
+            escala[clave] = int(sys.argv[sys.argv.index(bandera) + 1])
+    semilla = int(sys.argv[sys.argv.index('--semilla') + 1]) if '--semilla' in sys.argv else 42
+    tolerancia = float(sys.argv[sys.argv.index('--tolerancia') + 1]) if '--tolerancia' in sys.argv else 25.0
+    return escala, semilla, tolerancia
+
+
+def rutas_bases(escala):
+    """Archivos SQLite del benchmark (uno por escala, para reutilizarlos entre corridas)"""
+    sufijo = '_'.join(str(escala[k]) for k in ('pedidos', 'clientes', 'insumos', 'eventos'))
+    directorio = tempfile.gettempdir()
+    return (
+        os.path.join(directorio, f'laslira_benchmark_{sufijo}.db'),
+        os.path.join(directorio, f'laslira_benchmark_catalogo_{sufijo}.db'),
+    )
+
+
+# ===== MUESTRAS DESDE LOS CSV =====
+
+def _leer_csv(nombre):
+    ruta = os.path.join(RAIZ_PROYECTO, nombre)
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding='utf-8') as archivo:
+        return list(csv.DictReader(archivo))
+
+
+def _precio(texto):
+    digitos = re.sub(r'[^\d]', '', texto or '')
+    return int(digitos) if digitos else 0
+
+
+def cargar_muestras():
+    """Valores reales (con su frecuencia) para que el dataset tenga la forma del negocio"""
+    pedidos = _leer_csv('pedidos_trello_COMPLETO.csv')
+    clientes = _leer_csv('base_clientes_completa.csv')
+    insumos = _leer_csv('insumos_las_lira.csv')
+    eventos = _leer_csv('eventos_trello.csv')
+
+    precios = [p for p in (_precio(fila.get('precio')) for fila in pedidos) if 5000 <= p <= 2000000]
+    nombres = [fila['nombre'].strip() for fila in clientes if fila.get('nombre', '').strip()]
+
+    return {
+        'nombres': nombres or ['Cliente Demo'],
+        'palabras_nombre': sorted({palabra.title() for nombre in nombres for palabra in nombre.split() if len(palabra) > 2}) or ['Demo'],
+        'comunas': [fila['comuna'] for fila in pedidos if fila.get('comuna')] or ['Las Condes'],
+        'motivos': [fila['motivo_pedido'] for fila in pedidos if fila.get('motivo_pedido')] or ['Cumpleaños'],
+        'canales': [fila['canal'] for fila in pedidos if fila.get('canal')] or ['WhatsApp'],
+        'direcciones': [fila['direccion'] for fila in pedidos if fila.get('direccion')] or ['Av. Apoquindo 4000'],
+        'arreglos': [fila['producto_limpio'] for fila in pedidos if fila.get('producto_limpio')] or ['Ramo de rosas'],
+        'precios': precios or [35000],
+        'flores': [fila['nombre'] for fila in insumos if fila.get('tipo_insumo') == 'Flor'] or ['Rosas'],
+        'contenedores': [fila['nombre'] for fila in insumos if fila.get('tipo_insumo') != 'Flor'] or ['Florero'],
+        'eventos': [fila['producto'] for fila in eventos if fila.get('producto')] or ['Evento'],
+        'lugares': [fila['direccion'] for fila in eventos if fila.get('direccion')] or ['Club de Golf'],
+    }
+
+
+# ===== GENERACIÓN DEL DATASET =====
+
+def _insertar_por_lotes(db, modelo, filas):
+    from sqlalchemy import insert
+    for inicio in range(0, len(filas), TAMANO_LOTE):
+        db.session.execute(insert(modelo), filas[inicio:inicio + TAMANO_LOTE])
+    db.session.commit()
+
+
+def sembrar(db, escala, semilla):
+    from models.cliente import Cliente
+    from models.pedido import Pedido
+    from models.inventario import Flor, Contenedor
+    from models.evento import Evento
+
+    azar = random.Random(semilla)
+    muestras = cargar_muestras()
+    ahora = datetime.now().replace(microsecond=0)
+
+    print(f"\n🌱 Generando dataset (semilla {semilla})...")
+    inicio = time.perf_counter()
+
+    # Clientes: nombres reales y combinaciones de sus palabras
+    clientes = []
+    for i in range(escala['clientes']):
+        if i < len(muestras['nombres']):
+            nombre = muestras['nombres'][i]
+        else:
+            nombre = ' '.join(azar.sample(muestras['palabras_nombre'], 2 if azar.random() < 0.6 else 3))
+        clientes.append({
+            'id': f'CLI_{i + 1:05d}',
+            'nombre': nombre,
+            'telefono': f'+569{azar.randint(10000000, 99999999)}',
+            'tipo_cliente': azar.choice(TIPOS_CLIENTE),
+            'total_pedidos': 0,
+            'total_gastado': 0,
+            'fecha_registro': ahora - timedelta(days=azar.randint(0, 3 * 365)),
+        })
+    _insertar_por_lotes(db, Cliente, clientes)
+
+    # Etiquetas de cliente: tablas creadas con SQL (scripts/archive/crear_sistema_etiquetas.py)
+    db.session.execute(db.text('''
+        CREATE TABLE IF NOT EXISTS etiquetas_cliente (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre VARCHAR(50) NOT NULL UNIQUE,
+            categoria VARCHAR(50) NOT NULL,
+            descripcion TEXT,
+            color VARCHAR(20),
+            icono VARCHAR(20),
+            activa BOOLEAN DEFAULT 1,
+            orden INTEGER DEFAULT 0,
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    '''))
+    db.session.execute(db.text('''
+        CREATE TABLE IF NOT EXISTS cliente_etiquetas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cliente_id VARCHAR(10) NOT NULL,
+            etiqueta_id INTEGER NOT NULL,
+            fecha_asignacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            asignacion_automatica BOOLEAN DEFAULT 1,
+            UNIQUE(cliente_id, etiqueta_id)
+        )
+    '''))
+    etiquetas = ['VIP', 'Frecuente', 'Corporativo', 'Eventos', 'Condolencias', 'Mantenciones']
+    db.session.execute(
+        db.text('INSERT INTO etiquetas_cliente (nombre, categoria, orden) VALUES (:nombre, :categoria, :orden)'),
+        [{'nombre': nombre, 'categoria': 'Tipo', 'orden': orden} for orden, nombre in enumerate(etiquetas)]
+    )
+    asignaciones = {
+        (cliente['id'], azar.randint(1, len(etiquetas)))
+        for cliente in clientes for _ in range(azar.choice([0, 0, 1, 2]))
+    }
+    db.session.execute(
+        db.text('INSERT INTO cliente_etiquetas (cliente_id, etiqueta_id) VALUES (:cliente_id, :etiqueta_id)'),
+        [{'cliente_id': c, 'etiqueta_id': e} for c, e in sorted(asignaciones)]
+    )
+    db.session.commit()
+    print(f"  👥 {len(clientes)} clientes ({len(asignaciones)} etiquetas asignadas)")
+
+    # Pedidos: 3 años de historia y una ventana activa alrededor de hoy
+    pedidos = []
+    for i in range(escala['pedidos']):
+        cliente = azar.choice(clientes)
+        if azar.random() < 0.05:
+            fecha_pedido = ahora - timedelta(days=azar.randint(0, 20), minutes=azar.randint(0, 1440))
+            fecha_entrega = ahora.replace(hour=azar.choice([10, 13, 16])) + timedelta(days=azar.randint(-2, 45))
+            estado = azar.choice(ESTADOS_TABLERO + ['Despachados'])
+        else:
+            fecha_pedido = ahora - timedelta(days=azar.randint(21, 3 * 365), minutes=azar.randint(0, 1440))
+            fecha_entrega = fecha_pedido + timedelta(days=azar.randint(0, 5))
+            estado = 'Cancelado' if azar.random() < 0.03 else azar.choice(['Entregado', 'Despachados'])
+        pedidos.append({
+            'numero_pedido': f'PED-{i + 1:05d}',
+            'fecha_pedido': fecha_pedido,
+            'fecha_entrega': fecha_entrega,
+            'canal': azar.choice(muestras['canales']),
+            'cliente_id': cliente['id'],
+            'cliente_nombre': cliente['nombre'][:100],
+            'cliente_telefono': cliente['telefono'],
+            'arreglo_pedido': azar.choice(muestras['arreglos'])[:200],
+            'precio_ramo': azar.choice(muestras['precios']),
+            'precio_envio': azar.choice([0, 5000, 7000, 10000]),
+            'direccion_entrega': azar.choice(muestras['direcciones'])[:300],
+            'comuna': azar.choice(muestras['comunas']),
+            'motivo': azar.choice(muestras['motivos'])[:50],
+            'estado': estado,
+            'dia_entrega': DIAS[fecha_entrega.weekday()],
+            'estado_pago': 'Pagado' if azar.random() < 0.9 else 'No Pagado',
+            'es_urgente': azar.random() < 0.02,
+            'retiro_en_tienda': azar.random() < 0.05,
+            'fecha_actualizacion': fecha_pedido,
+        })
+    _insertar_por_lotes(db, Pedido, pedidos)
+    print(f"  📦 {len(pedidos)} pedidos")
+
+    # Insumos: 60% flores, 40% contenedores
+    cantidad_flores = int(escala['insumos'] * 0.6)
+    flores = [{
+        'id': f'FL{i + 1:04d}',
+        'tipo': azar.choice(muestras['flores'])[:50],
+        'color': azar.choice(['Rojo', 'Blanco', 'Rosado', 'Amarillo', 'Morado', 'Mix']),
+        'costo_unitario': azar.randint(300, 3000),
+        'cantidad_stock': azar.randint(0, 400),
+        'cantidad_en_uso': 0,
+        'cantidad_en_evento': 0,
+        'stock_bajo': 10,
+    } for i in range(cantidad_flores)]
+    contenedores = [{
+        'id': f'CT{i + 1:04d}',
+        'nombre': azar.choice(muestras['contenedores'])[:100],
+        'tipo': azar.choice(['Florero', 'Macetero', 'Canasto', 'Caja']),
+        'costo': azar.randint(1000, 20000),
+        'cantidad_stock': azar.randint(0, 80),
+        'cantidad_en_uso': 0,
+        'cantidad_en_evento': 0,
+        'stock_bajo': 5,
+    } for i in range(escala['insumos'] - cantidad_flores)]
+    _insertar_por_lotes(db, Flor, flores)
+    _insertar_por_lotes(db, Contenedor, contenedores)
+    print(f"  🌸 {len(flores)} flores y {len(contenedores)} contenedores")
+
+    eventos = []
+    for i in range(escala['eventos']):
+        cliente = azar.choice(clientes)
+        precio = azar.randint(300, 5000) * 1000
+        eventos.append({
+            'id': f'EVT-{i + 1:05d}',
+            'cliente_nombre': cliente['nombre'],
+            'cliente_telefono': cliente['telefono'],
+            'nombre_evento': azar.choice(muestras['eventos'])[:200],
+            'tipo_evento': azar.choice(['Matrimonio', 'Cumpleaños', 'Corporativo', 'Funeral']),
+            'fecha_evento': ahora + timedelta(days=azar.randint(-3 * 365, 120)),
+            'lugar_evento': azar.choice(muestras['lugares'])[:500],
+            'cantidad_personas': azar.randint(20, 400),
+            'estado': azar.choice(['Cotización', 'Confirmado', 'Finalizado', 'Retirado']),
+            'precio_propuesta': precio,
+            'precio_final': precio,
+        })
+    _insertar_por_lotes(db, Evento, eventos)
+    print(f"  🎉 {len(eventos)} eventos")
+
+    print(f"✅ Dataset generado en {time.perf_counter() - inicio:.1f} s")
+    return [cliente['nombre'] for cliente in azar.sample(clientes, min(len(clientes), 200))]
+
+
+# ===== MEDICIÓN =====
+
+def _percentil(valores, porcentaje):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(porcentaje / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def _consultas_de(response):
+    """Cantidad de consultas SQL según el header Server-Timing de la instrumentación"""
+    coincidencia = re.search(r'desc="(\d+) consultas"', response.headers.get('Server-Timing', ''))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+def medir_endpoints(app, nombres_cliente, usar_cache, semilla):
+    from utils.cache_helpers import cache_referencia
+    from services.pedidos_service import invalidar_cache_rutas
+
+    azar = random.Random(semilla)
+    cliente = app.test_client()
+    resultados = {}
+
+    def limpiar_caches():
+        if not usar_cache:
+            cache_referencia.limpiar()
+            invalidar_cache_rutas()
+
+    for nombre, plantilla, repeticiones in ENDPOINTS:
+        def url():
+            return plantilla.format(
+                # Búsquedas parciales como las que escribe la vendedora (primeras letras del nombre)
+                nombre_cliente=azar.choice(nombres_cliente).split()[0][:5],
+                fecha_inicio_export=(datetime.now() - timedelta(days=90)).date().isoformat(),
+            )
+
+        # Calentamiento: importaciones perezosas, compilación de consultas, caché del SO
+        limpiar_caches()
+        respuesta = cliente.get(url())
+        if respuesta.status_code != 200:
+            print(f"  ❌ {nombre}: HTTP {respuesta.status_code} {respuesta.get_data(as_text=True)[:200]}")
+            continue
+
+        latencias = []
+        consultas = []
+        for _ in range(repeticiones):
+            limpiar_caches()
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url())
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(_consultas_de(respuesta))
+
+        # Memoria en una corrida aparte: tracemalloc distorsiona la latencia
+        limpiar_caches()
+        tracemalloc.start()
+        cliente.get(url())
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        resultados[nombre] = {
+            'repeticiones': repeticiones,
+            'p50_ms': round(statistics.median(latencias), 2),
+            'p95_ms': round(_percentil(latencias, 95), 2),
+            'max_ms': round(max(latencias), 2),
+            'consultas': max(c for c in consultas if c is not None) if any(c is not None for c in consultas) else None,
+            'memoria_pico_kb': round(pico / 1024, 1),
+            'bytes_respuesta': len(respuesta.get_data()),
+        }
+        r = resultados[nombre]
+        print(f"  ⏱️  {nombre:<18} p50 {r['p50_ms']:>9.1f} ms   p95 {r['p95_ms']:>9.1f} ms   "
+              f"{r['consultas']!s:>5} consultas   {r['memoria_pico_kb']:>9.0f} KB pico")
+
+    return resultados
+
+
+def comparar_con_baseline(resultados, escala, tolerancia):
+    """Imprime las diferencias con la referencia y retorna la lista de regresiones"""
+    if not os.path.exists(ARCHIVO_BASELINE):
+        print(f"\n⚠️  No existe {ARCHIVO_BASELINE} (usa --guardar-baseline)")
+        return []
+
+    with open(ARCHIVO_BASELINE, encoding='utf-8') as archivo:
+        baseline = json.load(archivo)
+
+    if baseline.get('escala') != escala:
+        print(f"\n⚠️  La referencia se midió con otra escala: {baseline.get('escala')}")
+
+    print(f"\n📊 Comparación con la referencia ({baseline.get('fecha')}, tolerancia {tolerancia:.0f}%):")
+    regresiones = []
+    for nombre, actual in resultados.items():
+        anterior = baseline['resultados'].get(nombre)
+        if not anterior:
+            print(f"  🆕 {nombre}: sin referencia")
+            continue
+        cambio_p95 = (actual['p95_ms'] - anterior['p95_ms']) / anterior['p95_ms'] * 100 if anterior['p95_ms'] else 0
+        mas_consultas = (actual['consultas'] or 0) > (anterior['consultas'] or 0)
+        mas_lento = cambio_p95 > tolerancia and actual['p95_ms'] - anterior['p95_ms'] > MARGEN_MINIMO_MS
+        regresion = mas_lento or mas_consultas
+        print(f"  {'❌' if regresion else '✅'} {nombre:<18} p95 {anterior['p95_ms']:.1f} → {actual['p95_ms']:.1f} ms "
+              f"({cambio_p95:+.0f}%)   consultas {anterior['consultas']} → {actual['consultas']}")
+        if regresion:
+            regresiones.append(nombre)
+    return regresiones
+
+
+if __name__ == '__main__':
+    escala, semilla, tolerancia = leer_argumentos()
+    ruta_db, ruta_catalogo = rutas_bases(escala)
+
+    if '--resembrar' in sys.argv:
+        for ruta in (ruta_db, ruta_catalogo):
+            if os.path.exists(ruta):
+                os.remove(ruta)
+    base_nueva = not os.path.exists(ruta_db)
+
+    # Antes de importar la app: la configuración de base de datos se lee al crearla
+    os.environ['DATABASE_URL'] = f'sqlite:///{ruta_db}'
+    os.environ['CATALOGO_DATABASE_PATH'] = ruta_catalogo
+
+    from app import create_app
+    from extensions import db
+
+    print("=" * 80)
+    print("⏱️  BENCHMARK DE ENDPOINTS")
+    print("=" * 80)
+    print(f"\n📁 Base: {ruta_db}")
+    print(f"📏 Escala: {escala}")
+
+    app = create_app({'SQL_PROFILE': True})
+    app.logger.disabled = True  # Los avisos de N+1 se ven en la columna de consultas
+
+    with app.app_context():
+        if base_nueva:
+            db.create_all()
+            nombres_cliente = sembrar(db, escala, semilla)
+        else:
+            print("\n♻️  Reutilizando dataset existente (usa --resembrar para regenerarlo)")
+            from models.cliente import Cliente
+            nombres_cliente = [fila[0] for fila in db.session.query(Cliente.nombre).order_by(Cliente.id).limit(200)]
+
+    print(f"\n🚀 Midiendo ({'con' if '--con-cache' in sys.argv else 'sin'} caché)...")
+    resultados = medir_endpoints(app, nombres_cliente, '--con-cache' in sys.argv, semilla)
+
+    if '--guardar-baseline' in sys.argv:
+        with open(ARCHIVO_BASELINE, 'w', encoding='utf-8') as archivo:
+            json.dump({
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'escala': escala,
+                'con_cache': '--con-cache' in sys.argv,
+                'resultados': resultados,
+            }, archivo, indent=2, ensure_ascii=False)
+            archivo.write('\n')
+        print(f"\n💾 Referencia guardada en {ARCHIVO_BASELINE}")
+
+    regresiones = []
+    if '--comparar' in sys.argv:
+        regresiones = comparar_con_baseline(resultados, escala, tolerancia)
+
+    print("\n" + "=" * 80)
+    if regresiones:
+        print(f"❌ Regresiones: {', '.join(regresiones)}")
+        sys.exit(1)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de contención de stock: muchos hilos descuentan la misma flor a la vez
+
+Compara el descuento con un UPDATE atómico (utils/stock_helpers.py, el que usan los
+endpoints) con el patrón anterior de leer el objeto, restar en Python y guardar, y
+reporta las operaciones por segundo y las actualizaciones perdidas (stock final
+distinto del esperado). El modo consumo pide más unidades de las que hay con
+exigir_stock y verifica que el stock nunca quede negativo ni se entregue de más.
+
+La base de producción no se toca: DATABASE_URL y CATALOGO_DATABASE_PATH apuntan a
+archivos del directorio temporal antes de importar la app.
+
+Uso:
+    python3 scripts/benchmark_stock_concurrente.py                        # 16 hilos x 50 descuentos
+    python3 scripts/benchmark_stock_concurrente.py --hilos 32 --operaciones 100
+    python3 scripts/benchmark_stock_concurrente.py --modo atomico         # Solo un modo
+"""
+
+import sys
+import os
+import argparse
+import tempfile
+import threading
+import time
+
+# Agregar el directorio del backend al path
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+MODOS = ('atomico', 'lectura-escritura', 'consumo')
+FLOR_ID = 'FLBENCH'
+
+
+def leer_argumentos():
+    parser = argparse.ArgumentParser(description='Benchmark de contención de stock')
+    parser.add_argument('--hilos', type=int, default=16)
+    parser.add_argument('--operaciones', type=int, default=50, help='Descuentos por hilo')
+    parser.add_argument('--modo', choices=MODOS, help='Por defecto, todos')
+    return parser.parse_args()
+
+
+def preparar_entorno(hilos):
+    """Base temporal y pool con una conexión por hilo, antes de importar la app"""
+    directorio = tempfile.mkdtemp(prefix='bench_stock_')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(directorio, 'stock.db')}"
+    os.environ['CATALOGO_DATABASE_PATH'] = os.path.join(directorio, 'catalogo.db')
+    os.environ['DB_POOL_SIZE'] = str(hilos + 2)
+    return directorio
+
+
+def reiniciar_flor(app, stock):
+    from extensions import db
+    from models.inventario import Flor
+    with app.app_context():
+        flor = db.session.get(Flor, FLOR_ID)
+        if flor is None:
+            flor = Flor(id=FLOR_ID, nombre='Rosa Benchmark', tipo='Rosa', color='Roja',
+                        cantidad_en_uso=0, cantidad_en_evento=0, costo_unitario=0, stock_bajo=0)
+            db.session.add(flor)
+        flor.cantidad_stock = stock
+        db.session.commit()
+
+
+def leer_stock(app):
+    from extensions import db
+    from models.inventario import Flor
+    with app.app_context():
+        return db.session.get(Flor, FLOR_ID).cantidad_stock
+
+
+def descontar_atomico(app, cliente):
+    respuesta = cliente.patch(f'/api/inventario/flores/{FLOR_ID}/stock',
+                              json={'operacion': 'subtract', 'cantidad': 1})
+    return respuesta.status_code == 200
+
+
+def descontar_lectura_escritura(app, cliente):
+    """Patrón anterior: leer, restar en Python y guardar el resultado"""
+    from extensions import db
+    from models.inventario import Flor
+    with app.app_context():
+        flor = db.session.get(Flor, FLOR_ID)
+        flor.cantidad_stock = max(0, flor.cantidad_stock - 1)
+        db.session.commit()
+    return True
+
+
+def consumir_exigido(app, cliente):
+    from extensions import db
+    from utils.stock_helpers import mover_stock
+    with app.app_context():
+        ok = mover_stock('Flor', FLOR_ID, stock=-1, exigir_stock=True) is not None
+        db.session.commit()
+    return ok
+
+
+def ejecutar_modo(app, modo, hilos, operaciones):
+    total = hilos * operaciones
+    # En consumo se pide el doble de lo que hay: solo la mitad debe entregarse
+    stock_inicial = total // 2 if modo == 'consumo' else total * 2
+    reiniciar_flor(app, stock_inicial)
+    operacion = {
+        'atomico': descontar_atomico,
+        'lectura-escritura': descontar_lectura_escritura,
+        'consumo': consumir_exigido,
+    }[modo]
+
+    exitos = [0] * hilos
+    errores = []
+    barrera = threading.Barrier(hilos)
+
+    def trabajar(indice):
+        cliente = app.test_client()
+        barrera.wait()
+        for _ in range(operaciones):
+            try:
+                if operacion(app, cliente):
+                    exitos[indice] += 1
+            except Exception as e:
+                errores.append(str(e))
+
+    trabajadores = [threading.Thread(target=trabajar, args=(i,)) for i in range(hilos)]
+    inicio = time.perf_counter()
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    segundos = time.perf_counter() - inicio
+
+    entregados = sum(exitos)
+    final = leer_stock(app)
+    esperado = stock_inicial - entregados
+    return {
+        'modo': modo,
+        'operaciones': total,
+        'segundos': segundos,
+        'por_segundo': total / segundos if segundos else 0,
+        'entregados': entregados,
+        'stock_final': final,
+        'stock_esperado': esperado,
+        'perdidas': final - esperado,
+        'errores': len(errores),
+        'primer_error': errores[0] if errores else None,
+        # En consumo, nada más que el stock inicial se puede entregar
+        'sobreventa': max(0, entregados - stock_inicial) if modo == 'consumo' else 0,
+    }
+
+
+def main():
+    args = leer_argumentos()
+    directorio = preparar_entorno(args.hilos)
+
+    from app import app
+    from extensions import db
+    with app.app_context():
+        db.create_all()
+
+    print("=" * 80)
+    print(f"🏁 CONTENCIÓN DE STOCK: {args.hilos} hilos x {args.operaciones} descuentos sobre la misma flor")
+    print(f"   Base temporal: {directorio}")
+    print("=" * 80)
+
+    con_fallas = False
+    for modo in ([args.modo] if args.modo else MODOS):
+        r = ejecutar_modo(app, modo, args.hilos, args.operaciones)
+        correcto = r['perdidas'] == 0 and r['sobreventa'] == 0 and r['stock_final'] >= 0
+        icono = '✅' if correcto else '❌'
+        print(f"\n{icono} {modo}: {r['por_segundo']:.0f} ops/s ({r['segundos']:.2f}s)")
+        print(f"   Entregados: {r['entregados']}/{r['operaciones']} | Stock final: {r['stock_final']} "
+              f"(esperado {r['stock_esperado']}) | Actualizaciones perdidas: {r['perdidas']}")
+        if r['errores']:
+            print(f"   ⚠️  {r['errores']} errores (ej.: {r['primer_error']})")
+        # El patrón de lectura-escritura se mide como referencia: sus pérdidas son el problema a evitar
+        if not correcto and modo != 'lectura-escritura':
+            con_fallas = True
+
+    print("\n" + "=" * 80)
+    if con_fallas:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cálculo nocturno del pronóstico de demanda de flores y la lista de compras sugeridas
+por proveedor (services/pronostico_service.py)
+
+Reemplaza pronosticos_demanda y compras_sugeridas; /api/inventario/compras-sugeridas
+solo lee el último cálculo. Con --ejecutar también reevalúa las alertas de stock para
+el día siguiente (la ventana de demanda próxima avanza un día; ver
+services/alertas_stock_service.py). Pensado para cron, después del cierre del día:
+    30 23 * * * cd /ruta/backend && python3 scripts/calcular_pronostico_compras.py --ejecutar
+
+Uso:
+    python3 scripts/calcular_pronostico_compras.py                 # Solo mostrar el cálculo
+    python3 scripts/calcular_pronostico_compras.py --ejecutar
+    python3 scripts/calcular_pronostico_compras.py --dias 7 --ejecutar
+"""
+
+import sys
+import os
+import argparse
+from datetime import date, timedelta
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extensions import db
+from services.pronostico_service import PronosticoService
+from services.alertas_stock_service import AlertasStockService
+from config.pronostico import HORIZONTE_COMPRA_DIAS
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pronóstico de demanda de flores y compras sugeridas')
+    parser.add_argument('--dias', type=int, default=HORIZONTE_COMPRA_DIAS, help='Días a cubrir desde mañana')
+    parser.add_argument('--ejecutar', action='store_true', help='Guardar (por defecto solo muestra el cálculo)')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"🌷 PRONÓSTICO DE DEMANDA Y COMPRAS SUGERIDAS ({args.dias} días)")
+    print("=" * 80)
+    if not args.ejecutar:
+        print("\n⚠️  Modo simulación (usa --ejecutar para guardar)")
+
+    success, resumen, mensaje = PronosticoService.calcular(args.dias)
+    if not success:
+        db.session.rollback()
+        print(f"\n❌ {mensaje}")
+        sys.exit(1)
+
+    dias = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+    print(f"\n📅 Horizonte: {resumen['desde']} a {resumen['hasta']}")
+    print(f"📈 Flores con historial: {resumen['flores_con_historial']} ({resumen['dias_historia']} días de historial)")
+    print("📊 Factor por día de la semana: " + ', '.join(
+        f"{dia} {factor:.2f}" for dia, factor in zip(dias, resumen['factores_dia_semana'])
+    ))
+    for nombre, factor in resumen['factores_fechas_especiales'].items():
+        print(f"   🎉 {nombre}: x{factor:.2f}")
+    print(f"\n🛒 {mensaje}: {resumen['tallos']} tallos, costo estimado ${resumen['costo_estimado']:,.0f}")
+
+    if args.ejecutar:
+        db.session.commit()
+        print("\n✅ Pronóstico y compras sugeridas guardados")
+
+        success, _, mensaje = AlertasStockService.recalcular(date.today() + timedelta(days=1))
+        if not success:
+            print(f"❌ Alertas de stock: {mensaje}")
+            sys.exit(1)
+        print(f"🚨 Alertas de stock: {mensaje}")
+    else:
+        db.session.rollback()
+        print("\n💡 Nada guardado (modo simulación)")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        main()
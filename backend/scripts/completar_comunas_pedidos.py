@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para completar la comuna de pedidos históricos que la tienen vacía,
+extrayéndola de la dirección de entrega
+
+Solo se guardan comunas reconocidas (las de config.comunas, incluidos alias);
+las direcciones sin comuna identificable se listan para revisión manual.
+
+Uso:
+    python3 scripts/completar_comunas_pedidos.py             # Simulación: muestra qué se completaría
+    python3 scripts/completar_comunas_pedidos.py --ejecutar  # Guarda las comunas en la base de datos
+"""
+
+import sys
+import os
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from extensions import db
+from models.pedido import Pedido
+from config.comunas import COMUNAS_PRECIOS
+from utils.ubicacion_helpers import extraer_comuna
+from services.pedidos_service import invalidar_cache_rutas
+from sqlalchemy import or_, update
+
+TAMANO_LOTE = 500
+
+
+def completar_comunas(ejecutar=False):
+    pendientes = db.session.query(Pedido.id, Pedido.direccion_entrega).filter(
+        or_(Pedido.comuna.is_(None), Pedido.comuna == '')
+    ).all()
+
+    print(f"\n📦 Pedidos sin comuna: {len(pendientes)}")
+
+    actualizaciones = []
+    sin_identificar = []
+    por_comuna = {}
+    for pedido_id, direccion in pendientes:
+        comuna = extraer_comuna(direccion or '')
+        if comuna in COMUNAS_PRECIOS:
+            actualizaciones.append({'id': pedido_id, 'comuna': comuna})
+            por_comuna[comuna] = por_comuna.get(comuna, 0) + 1
+        else:
+            sin_identificar.append((pedido_id, direccion))
+
+    for comuna, cantidad in sorted(por_comuna.items(), key=lambda x: -x[1]):
+        print(f"  📍 {comuna}: {cantidad}")
+
+    if sin_identificar:
+        print(f"\n⚠️  Sin comuna identificable ({len(sin_identificar)}):")
+        for pedido_id, direccion in sin_identificar[:20]:
+            print(f"  - {pedido_id}: {direccion or '(sin dirección)'}")
+        if len(sin_identificar) > 20:
+            print(f"  ... y {len(sin_identificar) - 20} más")
+
+    if not ejecutar:
+        print(f"\n⚠️  Modo simulación: se completarían {len(actualizaciones)} pedidos (usa --ejecutar para guardar)")
+        return
+
+    # UPDATE por lotes usando la clave primaria
+    for inicio in range(0, len(actualizaciones), TAMANO_LOTE):
+        db.session.execute(update(Pedido), actualizaciones[inicio:inicio + TAMANO_LOTE])
+        db.session.commit()
+
+    # El UPDATE masivo no pasa por el flush: invalidar las hojas de ruta cacheadas
+    invalidar_cache_rutas()
+    print(f"\n✅ {len(actualizaciones)} pedidos actualizados")
+
+
+if __name__ == '__main__':
+    print("=" * 80)
+    print("📍 COMPLETAR COMUNAS DE PEDIDOS")
+    print("=" * 80)
+
+    with app.app_context():
+        completar_comunas(ejecutar='--ejecutar' in sys.argv)
+
+    print("\n" + "=" * 80)
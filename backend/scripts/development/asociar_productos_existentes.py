@@ -6,11 +6,13 @@ Mantiene la compatibilidad con pedidos existentes
 
 import sqlite3
 import json
-from difflib import SequenceMatcher
+import os
+import sys
 
-def similitud_texto(a, b):
-    """Calcula la similitud entre dos textos (0-1)"""
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.similitud_helpers import IndiceSimilitud
 
 def asociar_productos():
     """
@@ -67,6 +69,11 @@ def asociar_productos():
         asociaciones_realizadas = 0
         productos_actualizados = 0
         
+        # Índice de nombres de Shopify (posición en la lista -> nombre)
+        indice_shopify = IndiceSimilitud(
+            (posicion, producto_shopify[1]) for posicion, producto_shopify in enumerate(productos_shopify)
+        )
+        
         for producto_existente in productos_existentes:
             id_existente, nombre_existente, descripcion_existente, precio_existente, categoria_existente, tipo_existente, imagen_url_existente, sku_existente, peso_existente, tags_existente, metafields_existente, activo_existente = producto_existente
             
@@ -86,15 +93,12 @@ def asociar_productos():
             
             # Si no hay coincidencia exacta, buscar por similitud
             if not mejor_match:
-                for producto_shopify in productos_shopify:
-                    id_shopify, nombre_shopify, descripcion_shopify, precio_shopify, categoria_shopify, tipo_shopify, imagen_url_shopify, sku_shopify, peso_shopify, tags_shopify, metafields_shopify, activo_shopify = producto_shopify
-                    
-                    similitud = similitud_texto(nombre_existente, nombre_shopify)
-                    
-                    if similitud > mejor_similitud and similitud > 0.7:  # Umbral de similitud
-                        mejor_match = producto_shopify
-                        mejor_similitud = similitud
-                        metodo = "similitud_texto"
+                coincidencias = indice_shopify.buscar(nombre_existente, umbral=0.7)  # Umbral de similitud
+                
+                if coincidencias:
+                    mejor_match = productos_shopify[coincidencias[0]['id']]
+                    mejor_similitud = coincidencias[0]['similitud']
+                    metodo = "similitud_texto"
             
             # Si encontramos una asociación
             if mejor_match:
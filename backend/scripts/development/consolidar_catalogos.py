@@ -11,11 +11,12 @@ import sqlite3
 import pandas as pd
 import json
 import os
-from difflib import SequenceMatcher
+import sys
 
-def similitud_texto(a, b):
-    """Calcula la similitud entre dos textos (0-1)"""
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.similitud_helpers import IndiceSimilitud
 
 def consolidar_catalogos():
     """
@@ -72,6 +73,7 @@ def consolidar_catalogos():
         for producto in productos_existentes:
             id_prod, nombre, descripcion, precio, categoria, tipo, imagen_url, sku, peso, tags, metafields, activo = producto
             productos_por_nombre[nombre.lower()] = producto
+        indice_nombres = IndiceSimilitud((nombre, nombre) for nombre in productos_por_nombre)
         
         # 5. Procesar productos de Shopify
         productos_shopify_activos = productos_shopify[productos_shopify['Status'] == 'active']
@@ -101,20 +103,13 @@ def consolidar_catalogos():
                 metodo = "coincidencia_exacta"
                 similitud = 1.0
             else:
-                # Buscar por similitud
-                mejor_match = None
-                mejor_similitud = 0
-                
-                for nombre_existente, producto in productos_por_nombre.items():
-                    sim = similitud_texto(titulo, nombre_existente)
-                    if sim > mejor_similitud and sim > 0.8:  # Umbral alto para evitar falsos positivos
-                        mejor_match = producto
-                        mejor_similitud = sim
+                # Buscar por similitud (umbral alto para evitar falsos positivos)
+                coincidencias = indice_nombres.buscar(titulo, umbral=0.8)
                 
-                if mejor_match:
-                    producto_existente = mejor_match
+                if coincidencias:
+                    producto_existente = productos_por_nombre[coincidencias[0]['id']]
                     metodo = "similitud_texto"
-                    similitud = mejor_similitud
+                    similitud = coincidencias[0]['similitud']
             
             if producto_existente:
                 id_existente, nombre_existente, descripcion_existente, precio_existente, categoria_existente, tipo_existente, imagen_url_existente, sku_existente, peso_existente, tags_existente, metafields_existente, activo_existente = producto_existente
@@ -197,18 +192,11 @@ def consolidar_catalogos():
             if nombre.lower() in productos_por_nombre:
                 producto_existente = productos_por_nombre[nombre.lower()]
             else:
-                # Buscar por similitud
-                mejor_match = None
-                mejor_similitud = 0
-                
-                for nombre_existente, producto in productos_por_nombre.items():
-                    sim = similitud_texto(nombre, nombre_existente)
-                    if sim > mejor_similitud and sim > 0.9:  # Umbral muy alto para el catálogo
-                        mejor_match = producto
-                        mejor_similitud = sim
+                # Buscar por similitud (umbral muy alto para el catálogo)
+                coincidencias = indice_nombres.buscar(nombre, umbral=0.9)
                 
-                if mejor_match:
-                    producto_existente = mejor_match
+                if coincidencias:
+                    producto_existente = productos_por_nombre[coincidencias[0]['id']]
             
             if producto_existente:
                 # Actualizar producto existente
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para generar miniaturas y variantes WebP de las imágenes ya subidas
+(backfill de backend/uploads para fotos anteriores al pipeline de variantes)
+
+Uso:
+    python3 scripts/generar_variantes_imagenes.py            # Solo imágenes sin variantes
+    python3 scripts/generar_variantes_imagenes.py --forzar   # Regenerar todas
+"""
+
+import sys
+import os
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.imagenes_service import ImagenesService, UPLOAD_FOLDER
+from utils.file_helpers import allowed_file
+
+
+def generar_variantes_existentes(forzar=False):
+    """Genera las variantes de todas las imágenes de la carpeta uploads"""
+
+    print("=" * 80)
+    print("🖼️  GENERANDO VARIANTES DE IMÁGENES")
+    print("=" * 80)
+
+    archivos = sorted(
+        f for f in os.listdir(UPLOAD_FOLDER)
+        if os.path.isfile(os.path.join(UPLOAD_FOLDER, f)) and allowed_file(f)
+    )
+    print(f"\n📁 Carpeta: {UPLOAD_FOLDER}")
+    print(f"📊 Imágenes encontradas: {len(archivos)}\n")
+
+    generadas = 0
+    omitidas = 0
+    errores = 0
+
+    for filename in archivos:
+        if not forzar and ImagenesService.obtener_hash(filename):
+            omitidas += 1
+            continue
+
+        success, _, mensaje = ImagenesService.generar_variantes(filename, forzar=forzar)
+        if success:
+            generadas += 1
+            print(f"  ✅ {mensaje}")
+        else:
+            errores += 1
+            print(f"  ❌ {mensaje}")
+
+    print(f"\n✅ Imágenes procesadas: {generadas}")
+    print(f"⏭️  Omitidas (ya tenían variantes): {omitidas}")
+    print(f"❌ Errores: {errores}")
+    print("\n" + "=" * 80)
+
+
+if __name__ == '__main__':
+    generar_variantes_existentes(forzar='--forzar' in sys.argv)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importa por lotes clientes o productos (exportaciones de Shopify) y pedidos
+(exportación de Trello) desde CSV o JSONL. Cada lote se confirma en su propia
+transacción y reimportar el mismo archivo no duplica filas.
+
+Uso:
+    python3 scripts/importar_lote.py pedidos ../pedidos_trello_COMPLETO.csv             # Solo validar
+    python3 scripts/importar_lote.py pedidos ../pedidos_trello_COMPLETO.csv --ejecutar
+    python3 scripts/importar_lote.py clientes ../customers_export.csv --ejecutar --lote 500
+    python3 scripts/importar_lote.py productos ../products_export_1.csv --ejecutar
+"""
+
+import sys
+import os
+import argparse
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.importacion_service import ImportacionService, TIPOS_IMPORTACION
+from config.importacion import FORMATOS_IMPORTACION, TAMANO_LOTE_IMPORTACION
+
+
+def mostrar_progreso(resumen):
+    print(f"   Lote {resumen['lotes']}: {resumen['procesadas']} filas "
+          f"({resumen['insertadas']} nuevas, {resumen['actualizadas']} actualizadas, "
+          f"{resumen['omitidas']} omitidas, {resumen['con_errores']} con errores) "
+          f"- {resumen['segundos']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importación masiva desde CSV o JSONL')
+    parser.add_argument('tipo', choices=TIPOS_IMPORTACION)
+    parser.add_argument('archivo')
+    parser.add_argument('--ejecutar', action='store_true', help='Guardar (por defecto solo se valida)')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE_IMPORTACION, help='Filas por transacción')
+    parser.add_argument('--formato', choices=FORMATOS_IMPORTACION,
+                        help='Por defecto según la extensión (.jsonl/.ndjson o csv)')
+    args = parser.parse_args()
+
+    formato = args.formato or ('jsonl' if args.archivo.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+
+    print("=" * 80)
+    print(f"📥 IMPORTACIÓN DE {args.tipo.upper()}: {args.archivo}")
+    print("=" * 80)
+    if not args.ejecutar:
+        print("\n⚠️  Modo simulación (usa --ejecutar para guardar)")
+    print()
+
+    success, resumen, mensaje = ImportacionService.importar(
+        args.tipo, args.archivo, formato=formato, simular=not args.ejecutar,
+        tamano_lote=args.lote, progreso=mostrar_progreso
+    )
+
+    errores = resumen.get('errores', [])
+    if errores:
+        print(f"\n❌ Filas con errores (primeras {min(len(errores), 20)}):")
+        for error in errores[:20]:
+            clave = f" [{error['clave']}]" if error.get('clave') else ''
+            print(f"   Fila {error['fila']}{clave}: {error['error']}")
+    duplicados = resumen.get('posibles_duplicados', [])
+    if duplicados:
+        print(f"\n🔍 Productos nuevos parecidos a otros del catálogo ({len(duplicados)}):")
+        for duplicado in duplicados[:20]:
+            similar = duplicado['similar_a']
+            print(f"   Fila {duplicado['fila']}: {duplicado['nombre']} ≈ {similar['nombre']} "
+                  f"(ID {similar['id']}, {similar['similitud']:.2f})")
+    if resumen.get('clientes_creados'):
+        print(f"\n👥 Clientes nuevos: {resumen['clientes_creados']}")
+
+    print(f"\n{'✅' if success else '❌'} {mensaje}")
+    print("\n" + "=" * 80)
+    if not success:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        main()
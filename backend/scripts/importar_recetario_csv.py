@@ -1,20 +1,31 @@
 """
 Script para importar productos desde recetario_flores.csv
 Crea/actualiza flores, contenedores y productos con sus recetas
+
+Las flores, contenedores y productos se buscan por nombre en memoria (se cargan una
+vez al inicio) y cada lote se guarda en una sola transacción; las filas con error
+quedan en <archivo>.errores.csv.
+
+Uso:
+    python3 scripts/importar_recetario_csv.py ../recetario_flores.csv              # Solo mostrar diferencias
+    python3 scripts/importar_recetario_csv.py ../recetario_flores.csv --ejecutar
 """
 
 import sys
 import os
-import csv
+import argparse
 from datetime import datetime
+from sqlalchemy import table, column, delete, insert
 
 # Añadir el directorio backend al path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from extensions import db
-from models.inventario import Flor, Contenedor
-from models.producto import Producto, RecetaProducto
-from app import app
+from models.producto import RecetaProducto
+from config.cache import ETIQUETAS_POR_MODELO
+from config.importacion import TAMANO_LOTE_IMPORTACION
+from utils.cache_helpers import marcar_etiquetas_modificadas
+from utils.ingesta_helpers import Columna, TablaIngesta, Ingesta
 
 # Mapeo de nombres de columnas CSV a nombres de insumos
 COLUMNAS_FLORES = {
@@ -54,6 +65,16 @@ COLUMNAS_FLORES = {
     'ACUARANTUS': 'Acuarantus'
 }
 
+# Columnas que escribe el script en la base heredada (las_lira.db)
+TABLA_FLORES = table('flores', column('id'), column('tipo'), column('nombre'),
+                     column('cantidad_stock'), column('cantidad_en_uso'))
+TABLA_CONTENEDORES = table('contenedores', column('id'), column('nombre'), column('cantidad_stock'),
+                           column('cantidad_en_uso'), column('cantidad_en_evento'), column('stock'))
+TABLA_PRODUCTOS = table('productos', column('id'), column('nombre'), column('descripcion'),
+                        column('tipo_arreglo'), column('precio_venta'), column('activo'),
+                        column('fecha_creacion'), column('categoria'), column('precio'))
+
+
 def limpiar_valor(valor):
     """Limpia y convierte valores del CSV"""
     if not valor or valor.strip() == '':
@@ -76,229 +97,127 @@ def limpiar_valor(valor):
         # Si no es número, devolver como texto
         return valor
 
-def obtener_o_crear_flor(nombre, flores_existentes):
-    """Obtiene una flor existente o crea una nueva"""
-    # Buscar en flores existentes
-    flor = next((f for f in flores_existentes if f.nombre and f.nombre.lower() == nombre.lower()), None)
 
-    if not flor:
-        # Generar ID
-        max_id = db.session.query(db.func.max(Flor.id)).scalar()
-        if max_id:
-            try:
-                numero = int(max_id.split('_')[1]) + 1
-            except:
-                numero = 1
-        else:
-            numero = 1
-        flor_id = f"FLO_{numero:03d}"
+MAPEO_RECETARIO = {
+    'nombre': Columna('NOMBRE', requerida=True),
+    'altura': Columna('ALTURA', convertir=limpiar_valor),
+    'ancho': Columna('ANCHO', convertir=limpiar_valor),
+    'precio_venta': Columna('PRECIO_VENTA', convertir=limpiar_valor),
+    'base': Columna('BASE'),
+    'oasis': Columna('OASIS', convertir=limpiar_valor),
+    'tipo_oasis': Columna('TIPO_OASIS', defecto=''),
+    **{col_csv: Columna(col_csv, convertir=limpiar_valor) for col_csv in COLUMNAS_FLORES},
+}
 
-        # Crear nueva flor con INSERT directo
-        from sqlalchemy import text
-        db.session.execute(
-            text("INSERT INTO flores (id, tipo, nombre, cantidad_stock, cantidad_en_uso) VALUES (:id, :tipo, :nombre, 0, 0)"),
-            {'id': flor_id, 'tipo': nombre, 'nombre': nombre}
-        )
-        db.session.flush()
-        flor = Flor.query.get(flor_id)
-        print(f"  ✅ Flor creada: {nombre} (ID: {flor.id})")
-        flores_existentes.append(flor)
 
-    return flor
+def main():
+    parser = argparse.ArgumentParser(description='Importar productos y recetas desde el recetario')
+    parser.add_argument('archivo', help='recetario_flores.csv')
+    parser.add_argument('--ejecutar', action='store_true', help='Guardar (por defecto solo muestra diferencias)')
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE_IMPORTACION, help='Filas por transacción')
+    args = parser.parse_args()
 
-def obtener_o_crear_contenedor(nombre, contenedores_existentes):
-    """Obtiene un contenedor existente o crea uno nuevo"""
-    # Buscar en contenedores existentes
-    contenedor = next((c for c in contenedores_existentes if c.nombre and c.nombre.lower() == nombre.lower()), None)
+    if not os.path.exists(args.archivo):
+        print(f"❌ Error: No se encuentra el archivo {args.archivo}")
+        sys.exit(1)
 
-    if not contenedor:
-        # Generar ID
-        max_id = db.session.query(db.func.max(Contenedor.id)).scalar()
-        if max_id:
-            try:
-                numero = int(max_id.split('_')[1]) + 1
-            except:
-                numero = 1
-        else:
-            numero = 1
-        cont_id = f"CON_{numero:03d}"
+    print("="*80)
+    print("🌸 IMPORTACIÓN DE RECETARIO DE PRODUCTOS")
+    print("="*80)
+    if not args.ejecutar:
+        print("\n⚠️  Modo simulación (usa --ejecutar para guardar)")
+    print()
+
+    flores = TablaIngesta(TABLA_FLORES, prefijo_id='FLO_', etiquetas=ETIQUETAS_POR_MODELO['Flor'])
+    contenedores = TablaIngesta(TABLA_CONTENEDORES, prefijo_id='CON_', etiquetas=ETIQUETAS_POR_MODELO['Contenedor'])
+    productos = TablaIngesta(TABLA_PRODUCTOS, prefijo_id='PROD_', etiquetas=ETIQUETAS_POR_MODELO['Producto'])
+    recetas_del_lote = {}  # producto_id -> filas de receta (reemplazan a las existentes)
+    recetas = {'total': 0}
+
+    def contenedor(nombre):
+        return contenedores.upsert(
+            {'nombre': nombre},
+            al_crear={'cantidad_stock': 0, 'cantidad_en_uso': 0, 'cantidad_en_evento': 0, 'stock': 0}
+        )
 
-        # Crear nuevo contenedor con INSERT directo
-        from sqlalchemy import text
+    def procesar_fila(valores):
+        nombre = valores['nombre']
+        altura, ancho = valores['altura'], valores['ancho']
+        descripcion_extra = f"Altura: {altura}cm, Ancho: {ancho}cm" if altura and ancho else ""
+        precio_venta = valores['precio_venta'] or 0
+
+        producto = productos.upsert({'nombre': nombre}, al_crear={
+            'descripcion': f'Producto importado desde recetario. {descripcion_extra}',
+            'tipo_arreglo': 'Arreglo Floral',
+            'precio_venta': precio_venta,
+            'activo': True,
+            'fecha_creacion': datetime.now(),
+            'categoria': 'Arreglos Florales',
+            'precio': precio_venta
+        })
+
+        receta = []
+        # Contenedor/base
+        if valores['base']:
+            receta.append(('Contenedor', contenedor(valores['base']), 1, 'unidades'))
+
+        # Oasis si existe
+        oasis, tipo_oasis = valores['oasis'], valores['tipo_oasis']
+        if oasis and tipo_oasis and tipo_oasis.upper() != 'NO':
+            cantidad_oasis = oasis if isinstance(oasis, (int, float)) else 1
+            receta.append(('Contenedor', contenedor(f"Oasis {tipo_oasis}"), cantidad_oasis, 'unidades'))
+
+        # Flores
+        for col_csv, nombre_flor in COLUMNAS_FLORES.items():
+            cantidad = valores[col_csv]
+            if cantidad and isinstance(cantidad, (int, float)) and cantidad > 0:
+                flor = flores.upsert({'nombre': nombre_flor}, al_crear={
+                    'tipo': nombre_flor, 'cantidad_stock': 0, 'cantidad_en_uso': 0
+                })
+                receta.append(('Flor', flor, cantidad, 'tallos'))
+
+        recetas['total'] += len(receta)
+        if args.ejecutar:
+            recetas_del_lote[producto['id']] = receta
+
+    def guardar_recetas():
+        """Reemplaza las recetas de los productos del lote (un DELETE y un INSERT)"""
+        if not recetas_del_lote:
+            return
         db.session.execute(
-            text("INSERT INTO contenedores (id, nombre, cantidad_stock, cantidad_en_uso, cantidad_en_evento, stock) VALUES (:id, :nombre, 0, 0, 0, 0)"),
-            {'id': cont_id, 'nombre': nombre}
+            delete(RecetaProducto).where(RecetaProducto.producto_id.in_(list(recetas_del_lote)))
         )
-        db.session.flush()
-        contenedor = Contenedor.query.get(cont_id)
-        print(f"  ✅ Contenedor creado: {nombre} (ID: {contenedor.id})")
-        contenedores_existentes.append(contenedor)
-
-    return contenedor
-
-def generar_id_producto():
-    """Genera un ID único para producto"""
-    max_producto = db.session.query(db.func.max(Producto.id)).scalar()
-    if max_producto:
-        # Extraer número del ID (ej: "PROD_001" -> 1)
-        try:
-            numero = int(max_producto.split('_')[1]) + 1
-        except:
-            numero = 1
-    else:
-        numero = 1
-    return f"PROD_{numero:03d}"
-
-def importar_recetario(csv_path):
-    """Importa productos desde el CSV del recetario"""
-
-    with app.app_context():
-        print("="*80)
-        print("🌸 IMPORTACIÓN DE RECETARIO DE PRODUCTOS")
-        print("="*80)
-
-        # Cargar flores y contenedores existentes
-        flores_existentes = Flor.query.all()
-        contenedores_existentes = Contenedor.query.all()
-
-        print(f"\n📊 Estado actual:")
-        print(f"   Flores en BD: {len(flores_existentes)}")
-        print(f"   Contenedores en BD: {len(contenedores_existentes)}")
-
-        # Leer CSV
-        with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            productos_creados = 0
-            productos_actualizados = 0
-
-            for row in reader:
-                nombre = row.get('NOMBRE', '').strip()
-                if not nombre:
-                    continue
-
-                print(f"\n🌸 Procesando: {nombre}")
-
-                # Verificar si el producto ya existe
-                producto = Producto.query.filter_by(nombre=nombre).first()
-
-                if producto:
-                    print(f"   ⚠️  Producto existe, actualizando...")
-                    # Limpiar recetas existentes
-                    RecetaProducto.query.filter_by(producto_id=producto.id).delete()
-                    productos_actualizados += 1
-                else:
-                    # Crear nuevo producto
-                    altura = limpiar_valor(row.get('ALTURA'))
-                    ancho = limpiar_valor(row.get('ANCHO'))
-                    descripcion_extra = f"Altura: {altura}cm, Ancho: {ancho}cm" if altura and ancho else ""
-
-                    producto_id = generar_id_producto()
-                    precio_venta = limpiar_valor(row.get('PRECIO_VENTA', 0)) or 0
-
-                    # Crear producto con INSERT directo para incluir todos los campos
-                    from sqlalchemy import text
-                    db.session.execute(
-                        text("""
-                            INSERT INTO productos
-                            (id, nombre, descripcion, tipo_arreglo, precio_venta, activo, fecha_creacion, categoria, precio)
-                            VALUES
-                            (:id, :nombre, :descripcion, :tipo_arreglo, :precio_venta, :activo, :fecha_creacion, :categoria, :precio)
-                        """),
-                        {
-                            'id': producto_id,
-                            'nombre': nombre,
-                            'descripcion': f'Producto importado desde recetario. {descripcion_extra}',
-                            'tipo_arreglo': 'Arreglo Floral',
-                            'precio_venta': precio_venta,
-                            'activo': True,
-                            'fecha_creacion': datetime.now(),
-                            'categoria': 'Arreglos Florales',
-                            'precio': precio_venta
-                        }
-                    )
-                    db.session.flush()
-                    # Obtener el producto recién creado
-                    producto = Producto.query.get(producto_id)
-                    db.session.add(producto)
-                    db.session.flush()
-                    print(f"   ✅ Producto creado (ID: {producto.id})")
-                    productos_creados += 1
-
-                # Procesar contenedor/base
-                base = row.get('BASE', '').strip()
-                tipo_base = row.get('TIPO_BASE', '').strip()
-
-                if base:
-                    contenedor = obtener_o_crear_contenedor(base, contenedores_existentes)
-                    # Agregar a receta
-                    receta = RecetaProducto(
-                        producto_id=producto.id,
-                        insumo_tipo='Contenedor',
-                        insumo_id=contenedor.id,
-                        cantidad=1,
-                        unidad='unidades'
-                    )
-                    db.session.add(receta)
-                    print(f"     → Base: {base}")
-
-                # Procesar oasis si existe
-                oasis = limpiar_valor(row.get('OASIS'))
-                tipo_oasis = row.get('TIPO_OASIS', '').strip()
-
-                if oasis and tipo_oasis and tipo_oasis.upper() != 'NO':
-                    nombre_oasis = f"Oasis {tipo_oasis}"
-                    contenedor_oasis = obtener_o_crear_contenedor(nombre_oasis, contenedores_existentes)
-                    cantidad_oasis = oasis if isinstance(oasis, (int, float)) else 1
-
-                    receta = RecetaProducto(
-                        producto_id=producto.id,
-                        insumo_tipo='Contenedor',
-                        insumo_id=contenedor_oasis.id,
-                        cantidad=cantidad_oasis,
-                        unidad='unidades'
-                    )
-                    db.session.add(receta)
-                    print(f"     → Oasis: {nombre_oasis} x{cantidad_oasis}")
-
-                # Procesar flores
-                flores_en_receta = 0
-                for col_csv, nombre_flor in COLUMNAS_FLORES.items():
-                    cantidad = limpiar_valor(row.get(col_csv))
-
-                    if cantidad and isinstance(cantidad, (int, float)) and cantidad > 0:
-                        flor = obtener_o_crear_flor(nombre_flor, flores_existentes)
-
-                        receta = RecetaProducto(
-                            producto_id=producto.id,
-                            insumo_tipo='Flor',
-                            insumo_id=flor.id,
-                            cantidad=cantidad,
-                            unidad='tallos'
-                        )
-                        db.session.add(receta)
-                        flores_en_receta += 1
-                        print(f"     → {nombre_flor}: {cantidad} tallos")
-
-                print(f"   ✅ Receta: {flores_en_receta} tipos de flores")
-
-        # Commit final
-        db.session.commit()
+        filas = [
+            {'producto_id': producto_id, 'insumo_tipo': insumo_tipo, 'insumo_id': insumo['id'],
+             'cantidad': cantidad, 'unidad': unidad}
+            for producto_id, receta in recetas_del_lote.items()
+            for insumo_tipo, insumo, cantidad, unidad in receta
+        ]
+        if filas:
+            db.session.execute(insert(RecetaProducto.__table__), filas)
+        marcar_etiquetas_modificadas(db.session, *ETIQUETAS_POR_MODELO['RecetaProducto'])
+        recetas_del_lote.clear()
+
+    ingesta = Ingesta(MAPEO_RECETARIO, procesar_fila, [flores, contenedores, productos],
+                      simular=not args.ejecutar, tamano_lote=args.lote,
+                      al_guardar=guardar_recetas)
+    success, resumen, mensaje = ingesta.ejecutar(args.archivo)
+
+    print("\n" + "="*80)
+    print(f"{'✅' if success else '❌'} {mensaje}")
+    print("="*80)
+    for tabla, conteo in resumen['tablas'].items():
+        print(f"   {tabla.capitalize()} creados: {conteo['nuevos']}")
+    print(f"   Productos existentes (receta reemplazada): {resumen['tablas']['productos']['sin_cambios']}")
+    print(f"   Insumos en recetas: {recetas['total']}")
+    if resumen['archivo_errores']:
+        print(f"   Filas con error: {resumen['con_errores']} (ver {resumen['archivo_errores']})")
+    print("="*80)
+    if not success:
+        sys.exit(1)
 
-        print("\n" + "="*80)
-        print("✅ IMPORTACIÓN COMPLETADA")
-        print("="*80)
-        print(f"   Productos creados: {productos_creados}")
-        print(f"   Productos actualizados: {productos_actualizados}")
-        print(f"   Total flores en BD: {Flor.query.count()}")
-        print(f"   Total contenedores en BD: {Contenedor.query.count()}")
-        print(f"   Total productos en BD: {Producto.query.count()}")
-        print("="*80)
 
 if __name__ == '__main__':
-    csv_path = '/Users/juliettegramatges/Las-Lira/recetario_flores.csv'
-
-    if not os.path.exists(csv_path):
-        print(f"❌ Error: No se encuentra el archivo {csv_path}")
-        sys.exit(1)
-
-    importar_recetario(csv_path)
+    from app import app
+    with app.app_context():
+        main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de mantenimiento del almacenamiento de archivos subidos (backend/uploads)
+
+Uso:
+    python3 scripts/mantenimiento_uploads.py recontar             # Recalcular conteos de referencias
+    python3 scripts/mantenimiento_uploads.py limpiar              # Ver qué archivos sin uso se eliminarían
+    python3 scripts/mantenimiento_uploads.py limpiar --ejecutar   # Eliminar archivos sin uso
+    python3 scripts/mantenimiento_uploads.py migrar               # Pasar archivos antiguos al almacenamiento por contenido
+    python3 scripts/mantenimiento_uploads.py migrar --eliminar-originales
+"""
+
+import sys
+import os
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.almacenamiento_service import AlmacenamientoService
+
+
+def mostrar_estadisticas():
+    estadisticas = AlmacenamientoService.obtener_estadisticas()
+    print(f"\n📊 Archivos únicos: {estadisticas['total_archivos']}")
+    print(f"📦 Tamaño total: {estadisticas['total_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"♻️  Ahorrado por deduplicación: {estadisticas['bytes_ahorrados_deduplicacion'] / 1024 / 1024:.1f} MB")
+    print(f"🗑️  Sin referencias: {estadisticas['archivos_sin_referencias']}")
+
+
+def main():
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'limpiar'
+
+    print("=" * 80)
+    print(f"🗂️  MANTENIMIENTO DE UPLOADS: {comando.upper()}")
+    print("=" * 80)
+
+    if comando == 'recontar':
+        success, _, mensaje = AlmacenamientoService.recontar_referencias()
+    elif comando == 'limpiar':
+        ejecutar = '--ejecutar' in sys.argv
+        if not ejecutar:
+            print("\n⚠️  Modo simulación (usa --ejecutar para eliminar)")
+        success, resumen, mensaje = AlmacenamientoService.recolectar_basura(dry_run=not ejecutar)
+        for filename in resumen.get('archivos_eliminados', []):
+            print(f"  🗑️  {filename}")
+    elif comando == 'migrar':
+        success, resumen, mensaje = AlmacenamientoService.migrar_archivos_antiguos(
+            eliminar_originales='--eliminar-originales' in sys.argv
+        )
+        if success:
+            print(f"\n📝 Filas actualizadas: {resumen['filas_actualizadas']}")
+    else:
+        print(f"\n❌ Comando desconocido: {comando}")
+        print(__doc__)
+        return
+
+    print(f"\n{'✅' if success else '❌'} {mensaje}")
+    mostrar_estadisticas()
+    print("\n" + "=" * 80)
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carga o repara el libro de reservas de insumos por fecha (services/reservas_service.py)
+
+Concilia todos los pedidos y eventos con insumos, y los que ya tienen movimientos en
+el libro: agrega solo las diferencias, así que se puede ejecutar varias veces. Luego
+rehace reservas_diarias sumando movimientos_reservas.
+
+Uso:
+    python3 scripts/reconstruir_reservas.py             # Solo mostrar diferencias
+    python3 scripts/reconstruir_reservas.py --ejecutar
+"""
+
+import sys
+import os
+import argparse
+from collections import Counter
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, insert, select
+from extensions import db
+from models.pedido import PedidoInsumo
+from models.evento import EventoInsumo
+from models.inventario import MovimientoReserva, ReservaDiaria
+from services.reservas_service import conciliar_reservas
+
+
+def origenes_con_insumos():
+    """(pedidos, eventos) con insumos o con movimientos en el libro"""
+    pedidos = {pedido_id for (pedido_id,) in db.session.execute(select(PedidoInsumo.pedido_id).distinct())}
+    eventos = {evento_id for (evento_id,) in db.session.execute(select(EventoInsumo.evento_id).distinct())}
+    for origen_tipo, origen_id in db.session.execute(
+        select(MovimientoReserva.origen_tipo, MovimientoReserva.origen_id).distinct()
+    ):
+        if origen_tipo == 'pedido':
+            pedidos.add(int(origen_id))
+        else:
+            eventos.add(origen_id)
+    return sorted(pedidos), sorted(eventos)
+
+
+def rehacer_diarias():
+    """Reemplaza reservas_diarias por la suma de movimientos_reservas; devuelve los días con reservas"""
+    total = func.sum(MovimientoReserva.cantidad)
+    db.session.execute(delete(ReservaDiaria))
+    db.session.execute(
+        insert(ReservaDiaria).from_select(
+            ['insumo_tipo', 'insumo_id', 'fecha', 'cantidad'],
+            select(MovimientoReserva.insumo_tipo, MovimientoReserva.insumo_id, MovimientoReserva.fecha, total)
+            .group_by(MovimientoReserva.insumo_tipo, MovimientoReserva.insumo_id, MovimientoReserva.fecha)
+            .having(total != 0)
+        )
+    )
+    return db.session.query(func.count()).select_from(ReservaDiaria).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cargar o reparar el libro de reservas de insumos')
+    parser.add_argument('--ejecutar', action='store_true', help='Guardar (por defecto solo muestra diferencias)')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("📒 RECONSTRUYENDO LIBRO DE RESERVAS DE INSUMOS")
+    print("=" * 80)
+    if not args.ejecutar:
+        print("\n⚠️  Modo simulación (usa --ejecutar para guardar)")
+
+    pedidos, eventos = origenes_con_insumos()
+    print(f"\n🔍 Conciliando {len(pedidos)} pedidos y {len(eventos)} eventos...")
+
+    antes = db.session.query(func.max(MovimientoReserva.id)).scalar() or 0
+    registrados = conciliar_reservas(pedidos=pedidos, eventos=eventos)
+    por_origen = Counter(
+        origen_tipo for (origen_tipo,) in db.session.execute(
+            select(MovimientoReserva.origen_tipo).where(MovimientoReserva.id > antes)
+        )
+    )
+    dias = rehacer_diarias()
+
+    print(f"\n📊 Movimientos nuevos: {registrados} "
+          f"({por_origen.get('pedido', 0)} de pedidos, {por_origen.get('evento', 0)} de eventos)")
+    print(f"📅 Días con reservas por insumo: {dias}")
+
+    if args.ejecutar:
+        db.session.commit()
+        print("\n✅ Libro de reservas actualizado")
+    else:
+        db.session.rollback()
+        print("\n💡 Nada guardado (modo simulación)")
+    print("=" * 80)
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        main()
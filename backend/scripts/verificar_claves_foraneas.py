@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Busca filas huérfanas (claves foráneas que apuntan a registros que no existen)
+antes de activar SQLITE_FOREIGN_KEYS=1 (config/database.py)
+
+Con filas huérfanas, activar la validación hace fallar cualquier escritura que toque
+esas tablas. El script solo informa: las filas se deben revisar y limpiar a mano.
+
+Uso:
+    python3 scripts/verificar_claves_foraneas.py
+    python3 scripts/verificar_claves_foraneas.py --detalle    # Muestra hasta 20 filas por tabla
+"""
+
+import sys
+import os
+import argparse
+from collections import defaultdict
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extensions import db
+
+MAX_FILAS_DETALLE = 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Buscar filas huérfanas antes de activar SQLITE_FOREIGN_KEYS')
+    parser.add_argument('--detalle', action='store_true', help='Mostrar las filas huérfanas de cada tabla')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("🔗 VERIFICANDO CLAVES FORÁNEAS")
+    print("=" * 80)
+
+    if db.engine.dialect.name != 'sqlite':
+        print("\n💡 Solo aplica a SQLite: otros motores validan las claves foráneas siempre")
+        return
+
+    # PRAGMA foreign_key_check: (tabla, rowid, tabla referida, índice de la FK)
+    huerfanas = defaultdict(list)
+    for tabla, rowid, referida, _ in db.session.execute(db.text('PRAGMA main.foreign_key_check')):
+        huerfanas[(tabla, referida)].append(rowid)
+
+    if not huerfanas:
+        print("\n✅ Sin filas huérfanas: se puede activar SQLITE_FOREIGN_KEYS=1")
+        print("=" * 80)
+        return
+
+    print()
+    for (tabla, referida), rowids in sorted(huerfanas.items()):
+        print(f"❌ {tabla} -> {referida}: {len(rowids)} filas huérfanas")
+        if args.detalle:
+            muestra = ', '.join(str(rowid) for rowid in rowids[:MAX_FILAS_DETALLE])
+            print(f"   rowid: {muestra}{' ...' if len(rowids) > MAX_FILAS_DETALLE else ''}")
+
+    print(f"\n⚠️  {sum(len(r) for r in huerfanas.values())} filas huérfanas: "
+          "límpialas antes de activar SQLITE_FOREIGN_KEYS=1")
+    print("=" * 80)
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verifica que total_pedidos, total_gastado y ultima_compra de los clientes coincidan
+con sus pedidos activos (se mantienen por deltas al guardar pedidos; las diferencias
+vienen de cambios hechos con SQL directo o de datos importados)
+
+Uso:
+    python3 scripts/verificar_estadisticas_clientes.py             # Reportar diferencias
+    python3 scripts/verificar_estadisticas_clientes.py --ejecutar  # Corregirlas
+"""
+
+import sys
+import os
+
+# Agregar el directorio del backend al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.clientes_service import ClientesService
+
+
+def main():
+    ejecutar = '--ejecutar' in sys.argv
+
+    print("=" * 80)
+    print("🔍 VERIFICACIÓN DE ESTADÍSTICAS DE CLIENTES")
+    print("=" * 80)
+    if not ejecutar:
+        print("\n⚠️  Modo simulación (usa --ejecutar para corregir)")
+
+    success, resultado, mensaje = ClientesService.verificar_estadisticas(corregir=ejecutar)
+
+    for diferencia in resultado.get('diferencias', [])[:20]:
+        print(f"\n  - {diferencia['nombre']} (ID: {diferencia['cliente_id']}):")
+        print(f"    Pedidos: {diferencia['total_pedidos']} → {diferencia['total_pedidos_real']}")
+        print(f"    Gastado: ${diferencia['total_gastado']:,.0f} → ${diferencia['total_gastado_real']:,.0f}")
+        print(f"    Última compra: {diferencia['ultima_compra']} → {diferencia['ultima_compra_real']}")
+    if resultado.get('con_diferencias', 0) > 20:
+        print(f"\n  ... y {resultado['con_diferencias'] - 20} más")
+
+    print(f"\n{'✅' if success else '❌'} {mensaje}")
+    print("\n" + "=" * 80)
+
+
+if __name__ == '__main__':
+    from app import app
+    with app.app_context():
+        main()
@@ -0,0 +1,320 @@
+"""
+Alertas de stock bajo de flores y contenedores
+
+Cada insumo se evalúa contra su propio umbral (stock_bajo) y contra su demanda
+próxima: lo reservado en el libro de reservas (services/reservas_service.py) para los
+próximos HORIZONTE_DEMANDA_DIAS días.
+- critico: el stock físico no cubre la demanda próxima, o no queda nada disponible
+- bajo: el disponible (stock - en uso - en evento) está bajo el umbral
+
+El estado se guarda en alertas_stock y se mantiene por insumo: los cambios de stock
+(utils/stock_helpers.py), de reservas o del propio insumo lo marcan en la sesión, y
+antes del commit se reevalúan solo los insumos marcados, con una consulta y en la
+misma transacción. Las escrituras con SQL directo deben llamar a
+marcar_insumos_modificados() o recalcular todo con AlertasStockService.recalcular().
+
+Como la demanda próxima depende de la fecha, el cálculo nocturno
+(scripts/calcular_pronostico_compras.py) reevalúa todos los insumos para el día
+siguiente; las consultas solo leen alertas_stock.
+
+La secuencia (cursor del feed) se asigna bajo bloquear_hasta_commit()
+(utils/sql_helpers.py): se confirma en orden y un cliente no salta alertas.
+"""
+
+from datetime import date, datetime, timedelta
+from itertools import chain
+from sqlalchemy import event, func, literal, select, tuple_, union_all, update, insert
+from sqlalchemy.orm import Session
+from extensions import db
+from utils.sql_helpers import bloquear_hasta_commit
+from models.inventario import Flor, Contenedor, ReservaDiaria, AlertaStock
+from config.alertas_stock import HORIZONTE_DEMANDA_DIAS, MAX_ALERTAS_POR_RESPUESTA
+from config.reservas import TAMANO_LOTE_CONCILIACION
+
+NIVELES_ALERTA = ('critico', 'bajo')
+
+_MODELOS_INSUMO = {'Flor': Flor, 'Contenedor': Contenedor}
+
+# Campos que, si cambian, generan una nueva entrada en el feed
+_CAMPOS_ESTADO = ('nombre', 'nivel', 'stock', 'disponible', 'stock_bajo', 'demanda_proxima', 'reponer')
+
+# Clave en session.info: insumos (tipo, id) a reevaluar antes del commit
+_INSUMOS_MODIFICADOS = 'alertas_stock_insumos'
+
+
+def marcar_insumos_modificados(session, claves):
+    """Reevalúa las alertas de los insumos [(insumo_tipo, insumo_id)] antes del commit de la sesión"""
+    session.info.setdefault(_INSUMOS_MODIFICADOS, set()).update(
+        (insumo_tipo.capitalize(), insumo_id) for insumo_tipo, insumo_id in claves
+    )
+
+
+def clasificar(stock, disponible, stock_bajo, demanda_proxima):
+    """
+    Nivel de alerta y unidades a reponer para salir de ella
+
+    Returns:
+        tuple: (nivel o None, reponer)
+    """
+    faltante_demanda = demanda_proxima - stock
+    if faltante_demanda > 0 or disponible < 0 or (disponible <= 0 and stock_bajo > 0):
+        nivel = 'critico'
+    elif disponible < stock_bajo:
+        nivel = 'bajo'
+    else:
+        return None, 0
+    return nivel, max(0, faltante_demanda, stock_bajo - disponible)
+
+
+def _consulta_estado(hoy, ids_por_tipo=None):
+    """
+    Stock, disponible, umbral y demanda próxima de flores y contenedores en una sola
+    consulta (la demanda es una subconsulta sobre la clave primaria de reservas_diarias)
+
+    Args:
+        ids_por_tipo: {insumo_tipo: [ids]} o None para todos los insumos
+    """
+    hasta = hoy + timedelta(days=HORIZONTE_DEMANDA_DIAS)
+    consultas = []
+    for insumo_tipo, modelo in _MODELOS_INSUMO.items():
+        if ids_por_tipo is not None and not ids_por_tipo.get(insumo_tipo):
+            continue
+        demanda = select(func.coalesce(func.sum(ReservaDiaria.cantidad), 0)).where(
+            ReservaDiaria.insumo_tipo == insumo_tipo,
+            ReservaDiaria.insumo_id == modelo.id,
+            ReservaDiaria.fecha.between(hoy, hasta),
+        ).scalar_subquery()
+        consulta = select(
+            literal(insumo_tipo).label('insumo_tipo'),
+            modelo.id.label('insumo_id'),
+            func.coalesce(modelo.nombre, modelo.tipo).label('nombre'),
+            func.coalesce(modelo.cantidad_stock, 0).label('stock'),
+            (func.coalesce(modelo.cantidad_stock, 0) - func.coalesce(modelo.cantidad_en_uso, 0)
+             - func.coalesce(modelo.cantidad_en_evento, 0)).label('disponible'),
+            func.coalesce(modelo.stock_bajo, 0).label('stock_bajo'),
+            demanda.label('demanda_proxima'),
+        )
+        if ids_por_tipo is not None:
+            consulta = consulta.where(modelo.id.in_(ids_por_tipo[insumo_tipo]))
+        consultas.append(consulta)
+    if not consultas:
+        return None
+    return consultas[0] if len(consultas) == 1 else union_all(*consultas)
+
+
+def _evaluar(conexion, claves=None, hoy=None):
+    """
+    Reevalúa las alertas de los insumos indicados (None = todos) y guarda las que cambiaron
+
+    Args:
+        hoy: día desde el que se cuenta la demanda próxima (por defecto, hoy)
+
+    Returns:
+        int: alertas que cambiaron
+    """
+    hoy = hoy or date.today()
+    tabla = AlertaStock.__table__
+    # Hasta el commit: la secuencia se lee y se asigna sin que otra transacción la tome
+    bloquear_hasta_commit(conexion, tabla)
+
+    lotes = [None]
+    if claves is not None:
+        claves = sorted(claves)
+        lotes = [claves[i:i + TAMANO_LOTE_CONCILIACION] for i in range(0, len(claves), TAMANO_LOTE_CONCILIACION)]
+
+    cambios = 0
+    for lote in lotes:
+        ids_por_tipo = None
+        if lote is not None:
+            ids_por_tipo = {}
+            for insumo_tipo, insumo_id in lote:
+                ids_por_tipo.setdefault(insumo_tipo, []).append(insumo_id)
+
+        consulta = _consulta_estado(hoy, ids_por_tipo)
+        nuevos = {}
+        for fila in (conexion.execute(consulta).mappings() if consulta is not None else ()):
+            nivel, reponer = clasificar(fila['stock'], fila['disponible'], fila['stock_bajo'], fila['demanda_proxima'])
+            nuevos[(fila['insumo_tipo'], fila['insumo_id'])] = dict(fila, nivel=nivel, reponer=reponer)
+
+        anteriores_consulta = select(tabla)
+        if lote is not None:
+            anteriores_consulta = anteriores_consulta.where(tuple_(tabla.c.insumo_tipo, tabla.c.insumo_id).in_(lote))
+        anteriores = {
+            (fila['insumo_tipo'], fila['insumo_id']): fila
+            for fila in conexion.execute(anteriores_consulta).mappings()
+        }
+
+        # Insumos eliminados: su alerta se resuelve
+        for clave, anterior in anteriores.items():
+            if clave not in nuevos and anterior['nivel'] is not None:
+                nuevos[clave] = dict(anterior, nivel=None, reponer=0)
+
+        ahora = datetime.utcnow()
+        siguiente = conexion.execute(select(func.coalesce(func.max(tabla.c.secuencia), 0))).scalar()
+        actualizar, insertar = [], []
+        for clave in sorted(nuevos):
+            nuevo = nuevos[clave]
+            anterior = anteriores.get(clave)
+            if anterior is None and nuevo['nivel'] is None:
+                continue  # Sin alerta ahora ni antes: no se guarda
+            if anterior is not None and all(anterior[campo] == nuevo[campo] for campo in _CAMPOS_ESTADO):
+                continue
+            siguiente += 1
+            valores = {campo: nuevo[campo] for campo in _CAMPOS_ESTADO}
+            valores.update(secuencia=siguiente, fecha_actualizacion=ahora)
+            if anterior is None:
+                insertar.append(dict(valores, insumo_tipo=clave[0], insumo_id=clave[1]))
+            else:
+                actualizar.append(dict(
+                    {f'b_{campo}': valor for campo, valor in valores.items()}, b_tipo=clave[0], b_id=clave[1]
+                ))
+
+        if actualizar:
+            campos = list(_CAMPOS_ESTADO) + ['secuencia', 'fecha_actualizacion']
+            conexion.execute(
+                update(tabla)
+                .where(tabla.c.insumo_tipo == db.bindparam('b_tipo'), tabla.c.insumo_id == db.bindparam('b_id'))
+                .values({campo: db.bindparam(f'b_{campo}') for campo in campos}),
+                actualizar
+            )
+        if insertar:
+            conexion.execute(insert(tabla), insertar)
+        cambios += len(actualizar) + len(insertar)
+    return cambios
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_insumos_modificados(session, flush_context):
+    """Marca las flores y contenedores creados, modificados o eliminados en el flush"""
+    claves = [
+        (type(obj).__name__, obj.id)
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, (Flor, Contenedor))
+    ]
+    if claves:
+        marcar_insumos_modificados(session, claves)
+
+
+@event.listens_for(Session, 'before_commit')
+def _actualizar_alertas_antes_commit(session):
+    """Reevalúa las alertas de los insumos marcados, dentro de la transacción que se confirma"""
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    claves = session.info.pop(_INSUMOS_MODIFICADOS, None)
+    if claves:
+        _evaluar(session.connection(), claves)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_insumos_modificados(session):
+    session.info.pop(_INSUMOS_MODIFICADOS, None)
+
+
+class AlertasStockService:
+    """Servicio de alertas de stock bajo"""
+
+    @staticmethod
+    def recalcular(hoy=None):
+        """
+        Reevalúa las alertas de todos los insumos (una consulta) y confirma
+
+        Args:
+            hoy: día desde el que se cuenta la demanda próxima (el cálculo nocturno
+                 pasa el día siguiente)
+
+        Returns:
+            tuple: (success, cambios, mensaje)
+        """
+        try:
+            cambios = _evaluar(db.session.connection(), hoy=hoy)
+            db.session.commit()
+            return True, cambios, f'{cambios} alertas actualizadas'
+        except Exception as e:
+            db.session.rollback()
+            return False, None, str(e)
+
+    @staticmethod
+    def listar(desde=None, nivel=None, insumo_tipo=None, limite=MAX_ALERTAS_POR_RESPUESTA):
+        """
+        Alertas activas o, con desde, el feed de cambios posteriores a ese cursor
+
+        Args:
+            desde: secuencia ya aplicada por el cliente (None = alertas activas)
+            nivel: 'critico' o 'bajo' (solo alertas activas)
+            insumo_tipo: 'Flor' o 'Contenedor'
+            limite: máximo de alertas a devolver
+
+        Returns:
+            tuple: (success, data, mensaje); data incluye cursor, alertas (en el feed, las
+                   resueltas vienen con nivel None) y hay_mas
+        """
+        if nivel is not None and nivel not in NIVELES_ALERTA:
+            return False, None, f"Nivel inválido: {nivel} (critico o bajo)"
+        if insumo_tipo is not None and insumo_tipo not in _MODELOS_INSUMO:
+            return False, None, f"Tipo de insumo inválido: {insumo_tipo} (Flor o Contenedor)"
+        try:
+            consulta = AlertaStock.query
+            if insumo_tipo:
+                consulta = consulta.filter(AlertaStock.insumo_tipo == insumo_tipo)
+            if desde is not None:
+                consulta = consulta.filter(AlertaStock.secuencia > desde)
+            else:
+                consulta = consulta.filter(AlertaStock.nivel.isnot(None))
+            if nivel:
+                consulta = consulta.filter(AlertaStock.nivel == nivel)
+
+            alertas = consulta.order_by(AlertaStock.secuencia).limit(limite + 1).all()
+            hay_mas = len(alertas) > limite
+            alertas = alertas[:limite]
+            if desde is not None and hay_mas:
+                cursor = alertas[-1].secuencia
+            else:
+                cursor = db.session.query(func.coalesce(func.max(AlertaStock.secuencia), 0)).scalar()
+            if desde is None:
+                # Las críticas primero y, dentro de cada nivel, las que más faltan
+                alertas.sort(key=lambda a: (NIVELES_ALERTA.index(a.nivel), -a.reponer))
+
+            return True, {
+                'cursor': cursor,
+                'alertas': [alerta.to_dict() for alerta in alertas],
+                'hay_mas': hay_mas
+            }, f'{len(alertas)} alertas'
+        except Exception as e:
+            db.session.rollback()
+            return False, None, str(e)
+
+    @staticmethod
+    def resumen():
+        """
+        Totales de stock, valor del inventario y alertas activas por tipo, en una consulta
+
+        Returns:
+            dict: total_flores, total_contenedores, flores_bajo_stock,
+                  contenedores_bajo_stock, alertas_criticas, valor_flores, valor_contenedores
+        """
+        def alertas(insumo_tipo=None, nivel=None):
+            consulta = select(func.count()).select_from(AlertaStock).where(AlertaStock.nivel.isnot(None))
+            if insumo_tipo:
+                consulta = consulta.where(AlertaStock.insumo_tipo == insumo_tipo)
+            if nivel:
+                consulta = consulta.where(AlertaStock.nivel == nivel)
+            return consulta.scalar_subquery()
+
+        fila = db.session.execute(select(
+            select(func.coalesce(func.sum(Flor.cantidad_stock), 0)).scalar_subquery(),
+            select(func.coalesce(func.sum(Contenedor.cantidad_stock), 0)).scalar_subquery(),
+            alertas('Flor'),
+            alertas('Contenedor'),
+            alertas(nivel='critico'),
+            select(func.coalesce(func.sum(Flor.cantidad_stock * Flor.costo_unitario), 0)).scalar_subquery(),
+            select(func.coalesce(func.sum(Contenedor.cantidad_stock * Contenedor.costo), 0)).scalar_subquery(),
+        )).one()
+        return {
+            'total_flores': int(fila[0]),
+            'total_contenedores': int(fila[1]),
+            'flores_bajo_stock': fila[2],
+            'contenedores_bajo_stock': fila[3],
+            'alertas_criticas': fila[4],
+            'valor_flores': float(fila[5]),
+            'valor_contenedores': float(fila[6]),
+        }
@@ -0,0 +1,432 @@
+"""
+Servicio de almacenamiento de archivos subidos
+Guarda los archivos direccionados por contenido (SHA-256): una subida idéntica
+reutiliza el archivo existente, cada archivo lleva la cuenta de los registros
+que lo referencian y los archivos sin referencias se eliminan (garbage collection)
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+from sqlalchemy import and_, case, delete, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from extensions import db
+from models.archivo import ArchivoSubido
+from models.catalogo import ImagenProductoCatalogo
+from models.evento import ProductoEvento
+from models.inventario import Flor, Contenedor
+from models.producto import Producto
+from models.pedido import Pedido, PedidoProducto
+from services.imagenes_service import ImagenesService
+from utils.file_helpers import get_file_extension
+from utils.sql_helpers import bloquear_hasta_commit, sentencia_insert
+
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+
+# Nombre de archivo direccionado por contenido: <sha256>.<extension>
+PATRON_ARCHIVO_CAS = re.compile(r'^([0-9a-f]{64})\.([a-z0-9]+)$')
+
+# Prefijo de archivos temporales mientras se recibe una subida
+PREFIJO_TEMPORAL = '.subida-'
+
+# Columnas que guardan nombres de archivos de uploads/ (fuente de las referencias)
+COLUMNAS_CON_ARCHIVOS = [
+    (Flor, 'foto_url'),
+    (Contenedor, 'foto_url'),
+    (Producto, 'imagen_url'),
+    (Producto, 'imagen_principal'),
+    (ProductoEvento, 'imagen_url'),
+    (Pedido, 'foto_enviado_url'),
+    (PedidoProducto, 'foto_respaldo'),
+    (ImagenProductoCatalogo, 'url'),  # Esquema del catálogo (ver models/catalogo.py)
+]
+_ATRIBUTOS_POR_MODELO = defaultdict(list)
+for _modelo, _atributo in COLUMNAS_CON_ARCHIVOS:
+    _ATRIBUTOS_POR_MODELO[_modelo].append(_atributo)
+
+# Horas que se conserva un archivo sin referencias (ej: subido pero el formulario aún no se guarda)
+HORAS_GRACIA_GC = 24
+
+# Tamaño de bloque al recibir y hashear subidas
+TAMANO_BLOQUE = 64 * 1024
+
+# Hashes por consulta al revisar qué archivos borrados volvieron a subirse
+TAMANO_LOTE_GC = 500
+
+
+def hash_de_archivo(valor):
+    """
+    Obtiene el hash de un valor de columna que apunta a un archivo direccionado por contenido
+
+    Acepta el nombre ('<hash>.jpg') o la URL ('/api/upload/imagen/<hash>.jpg').
+    Retorna None para URLs externas o nombres de archivos antiguos.
+    """
+    if not valor or not isinstance(valor, str):
+        return None
+    match = PATRON_ARCHIVO_CAS.match(valor.rsplit('/', 1)[-1])
+    return match.group(1) if match else None
+
+
+def _columnas_disponibles():
+    """Columnas de COLUMNAS_CON_ARCHIVOS cuya tabla existe en la base (el catálogo puede no estar adjunto)"""
+    inspector = db.inspect(db.engine)
+    for modelo, atributo in COLUMNAS_CON_ARCHIVOS:
+        tabla = modelo.__table__
+        if inspector.has_table(tabla.name, schema=tabla.schema):
+            yield modelo, atributo
+
+
+def _normalizar_extension(filename):
+    extension = get_file_extension(filename)
+    return 'jpg' if extension == 'jpeg' else extension
+
+
+@event.listens_for(Session, 'after_flush')
+def _actualizar_referencias_archivos(session, flush_context):
+    """
+    Ajusta ArchivoSubido.referencias según los cambios de las columnas con archivos,
+    dentro de la misma transacción del flush
+    """
+    deltas = defaultdict(int)
+    for obj in chain(session.new, session.dirty, session.deleted):
+        atributos = _ATRIBUTOS_POR_MODELO.get(type(obj))
+        if not atributos:
+            continue
+        estado = inspect(obj)
+        eliminado = obj in session.deleted
+        for atributo in atributos:
+            historial = estado.attrs[atributo].history
+            if eliminado:
+                # Lo que había en la base de datos deja de estar referenciado
+                quitados, agregados = list(historial.deleted or ()) + list(historial.unchanged or ()), ()
+            else:
+                quitados, agregados = historial.deleted or (), historial.added or ()
+            for valor in agregados:
+                hash_contenido = hash_de_archivo(valor)
+                if hash_contenido:
+                    deltas[hash_contenido] += 1
+            for valor in quitados:
+                hash_contenido = hash_de_archivo(valor)
+                if hash_contenido:
+                    deltas[hash_contenido] -= 1
+
+    tabla = ArchivoSubido.__table__
+    conexion = session.connection()
+    for hash_contenido, delta in deltas.items():
+        if delta == 0:
+            continue
+        nuevo_valor = tabla.c.referencias + delta
+        conexion.execute(
+            update(tabla)
+            .where(tabla.c.hash == hash_contenido)
+            .values(referencias=case((nuevo_valor < 0, 0), else_=nuevo_valor))
+        )
+
+
+class AlmacenamientoService:
+    """Servicio para guardar, deduplicar y limpiar archivos subidos"""
+
+    @staticmethod
+    def guardar_archivo(file):
+        """
+        Guarda un archivo subido hasheándolo mientras se escribe a disco
+
+        Si ya existe un archivo con el mismo contenido, se reutiliza (no se duplica).
+        El registro del archivo se guarda en una transacción propia, en otra conexión:
+        no confirma nada pendiente de la sesión del request y queda aunque la entidad
+        que lo usa no se guarde (la recolección de basura lo elimina después). Las
+        referencias se cuentan cuando la entidad guarda el nombre.
+
+        El registro y el archivo en disco se crean bajo el mismo bloqueo con que la
+        recolección de basura decide qué archivos borrar (ver recolectar_basura).
+
+        Args:
+            file: FileStorage de request.files
+
+        Returns:
+            tuple: (success, filename/None, mensaje)
+        """
+        extension = _normalizar_extension(file.filename or '')
+        if not extension:
+            return False, None, 'Archivo sin extensión'
+
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+        temporal = os.path.join(UPLOAD_FOLDER, f'{PREFIJO_TEMPORAL}{uuid.uuid4().hex}')
+
+        try:
+            sha = hashlib.sha256()
+            tamano = 0
+            with open(temporal, 'wb') as destino:
+                for bloque in iter(lambda: file.stream.read(TAMANO_BLOQUE), b''):
+                    sha.update(bloque)
+                    destino.write(bloque)
+                    tamano += len(bloque)
+            hash_contenido = sha.hexdigest()
+
+            # Un solo INSERT ... ON CONFLICT: dos subidas concurrentes del mismo contenido
+            # no chocan. Si el contenido ya estaba, se mantiene su extensión original
+            tabla = ArchivoSubido.__table__
+            ahora = datetime.utcnow()
+            with db.engine.begin() as conexion:
+                bloquear_hasta_commit(conexion, tabla)
+                consulta = sentencia_insert(conexion, tabla)
+                consulta = consulta.on_conflict_do_update(
+                    index_elements=['hash'],
+                    set_={'veces_subido': tabla.c.veces_subido + 1, 'fecha_ultima_subida': ahora}
+                ).returning(tabla.c.extension)
+                extension = conexion.execute(consulta, {
+                    'hash': hash_contenido, 'extension': extension, 'tamano_bytes': tamano,
+                    'referencias': 0, 'veces_subido': 1, 'fecha_creacion': ahora, 'fecha_ultima_subida': ahora
+                }).scalar_one()
+                filename = f'{hash_contenido}.{extension}'
+
+                ruta_final = os.path.join(UPLOAD_FOLDER, filename)
+                if os.path.exists(ruta_final):
+                    duplicado = True
+                else:
+                    os.replace(temporal, ruta_final)
+                    duplicado = False
+
+            mensaje = 'Archivo ya existente reutilizado' if duplicado else 'Archivo guardado'
+            return True, filename, mensaje
+
+        except Exception as e:
+            return False, None, f'Error al guardar archivo: {str(e)}'
+
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+    @staticmethod
+    def contar_referencias():
+        """
+        Cuenta las referencias reales de cada archivo recorriendo las columnas con archivos
+
+        Returns:
+            dict: hash -> cantidad de referencias
+
+        Raises:
+            RuntimeError: si falta la tabla de alguna columna; contar sin ella dejaría
+                          sus archivos sin referencias y la recolección los borraría
+        """
+        disponibles = list(_columnas_disponibles())
+        if len(disponibles) < len(COLUMNAS_CON_ARCHIVOS):
+            faltantes = sorted({modelo.__table__.fullname for modelo, _ in COLUMNAS_CON_ARCHIVOS}
+                               - {modelo.__table__.fullname for modelo, _ in disponibles})
+            raise RuntimeError(f'No se pueden contar las referencias: faltan las tablas {", ".join(faltantes)}')
+
+        conteo = defaultdict(int)
+        for modelo, atributo in disponibles:
+            columna = getattr(modelo, atributo)
+            filas = db.session.query(columna, func.count()).filter(
+                columna.isnot(None), columna != ''
+            ).group_by(columna).all()
+            for valor, cantidad in filas:
+                hash_contenido = hash_de_archivo(valor)
+                if hash_contenido:
+                    conteo[hash_contenido] += cantidad
+        return dict(conteo)
+
+    @staticmethod
+    def recontar_referencias():
+        """
+        Recalcula ArchivoSubido.referencias desde las columnas (corrige desvíos por
+        updates/deletes masivos que no pasan por el ORM)
+
+        Returns:
+            tuple: (success, corregidos, mensaje)
+        """
+        try:
+            conteo = AlmacenamientoService.contar_referencias()
+            corregidos = 0
+            for archivo in ArchivoSubido.query.all():
+                real = conteo.get(archivo.hash, 0)
+                if archivo.referencias != real:
+                    archivo.referencias = real
+                    corregidos += 1
+            db.session.commit()
+            return True, corregidos, f'{corregidos} conteos de referencias corregidos'
+        except Exception as e:
+            db.session.rollback()
+            return False, 0, str(e)
+
+    @staticmethod
+    def recolectar_basura(dry_run=False, horas_gracia=HORAS_GRACIA_GC):
+        """
+        Elimina archivos sin referencias (y sus variantes) subidos hace más de horas_gracia
+
+        Antes de eliminar recuenta las referencias, así la limpieza no depende de
+        que los conteos incrementales estén al día. Primero se borran y confirman las
+        filas (el DELETE vuelve a revisar las condiciones); después, bajo el bloqueo de
+        guardar_archivo, se borran solo los archivos cuyo hash sigue sin registro: una
+        subida del mismo contenido entre medio vuelve a crear la fila y conserva el archivo.
+
+        Args:
+            dry_run: solo reportar qué se eliminaría
+            horas_gracia: antigüedad mínima de la última subida
+
+        Returns:
+            tuple: (success, resumen_dict, mensaje)
+        """
+        try:
+            success, corregidos, mensaje = AlmacenamientoService.recontar_referencias()
+            if not success:
+                return False, {}, mensaje
+
+            limite = datetime.utcnow() - timedelta(hours=horas_gracia)
+            tabla = ArchivoSubido.__table__
+            sin_referencias = and_(tabla.c.referencias <= 0, tabla.c.fecha_ultima_subida < limite)
+            columnas = (tabla.c.hash, tabla.c.extension, tabla.c.tamano_bytes)
+            if dry_run:
+                candidatos = db.session.execute(select(*columnas).where(sin_referencias)).all()
+            else:
+                candidatos = db.session.execute(delete(tabla).where(sin_referencias).returning(*columnas)).all()
+                db.session.commit()
+
+            eliminados = [f'{hash_contenido}.{extension}' for hash_contenido, extension, _ in candidatos]
+            bytes_liberados = sum(tamano or 0 for _, _, tamano in candidatos)
+
+            if not dry_run and candidatos:
+                hashes = [hash_contenido for hash_contenido, _, _ in candidatos]
+                with db.engine.begin() as conexion:
+                    bloquear_hasta_commit(conexion, tabla)
+                    vigentes = set()
+                    for inicio in range(0, len(hashes), TAMANO_LOTE_GC):
+                        vigentes.update(conexion.execute(
+                            select(tabla.c.hash).where(tabla.c.hash.in_(hashes[inicio:inicio + TAMANO_LOTE_GC]))
+                        ).scalars())
+                    for filename in eliminados:
+                        hash_contenido = filename.split('.', 1)[0]
+                        if hash_contenido in vigentes:
+                            continue
+                        ruta = os.path.join(UPLOAD_FOLDER, filename)
+                        if os.path.exists(ruta):
+                            os.remove(ruta)
+                        ImagenesService.eliminar_variantes(hash_contenido, filename)
+
+            # Temporales de subidas interrumpidas
+            temporales = 0
+            for nombre in os.listdir(UPLOAD_FOLDER):
+                ruta = os.path.join(UPLOAD_FOLDER, nombre)
+                if nombre.startswith(PREFIJO_TEMPORAL) and \
+                        datetime.utcfromtimestamp(os.path.getmtime(ruta)) < limite:
+                    temporales += 1
+                    if not dry_run:
+                        os.remove(ruta)
+
+            if dry_run:
+                db.session.rollback()
+
+            resumen = {
+                'dry_run': dry_run,
+                'referencias_corregidas': corregidos,
+                'archivos_eliminados': eliminados,
+                'bytes_liberados': bytes_liberados,
+                'temporales_eliminados': temporales
+            }
+            accion = 'se eliminarían' if dry_run else 'eliminados'
+            return True, resumen, f'{len(eliminados)} archivos sin referencias {accion}'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, {}, str(e)
+
+    @staticmethod
+    def migrar_archivos_antiguos(eliminar_originales=False):
+        """
+        Migra los archivos guardados con el nombre antiguo (ej: flor_F001_foto.jpg) al
+        almacenamiento por contenido y actualiza las columnas que los referencian
+
+        Las copias idénticas de una misma foto quedan como un solo archivo.
+
+        Args:
+            eliminar_originales: borrar los archivos antiguos una vez migrados
+
+        Returns:
+            tuple: (success, resumen_dict, mensaje)
+        """
+        try:
+            # Nombre antiguo -> nombre por contenido
+            columnas = list(_columnas_disponibles())
+            migrados = {}
+            for modelo, atributo in columnas:
+                columna = getattr(modelo, atributo)
+                valores = db.session.query(columna).filter(columna.isnot(None), columna != '').distinct()
+                for (valor,) in valores:
+                    nombre = valor.rsplit('/', 1)[-1]
+                    if valor in migrados or valor.startswith('http') or hash_de_archivo(valor):
+                        continue
+                    ruta = os.path.join(UPLOAD_FOLDER, nombre)
+                    if not os.path.isfile(ruta) or not _normalizar_extension(nombre):
+                        continue
+
+                    hash_contenido = ImagenesService.calcular_hash(ruta)
+                    archivo = db.session.get(ArchivoSubido, hash_contenido)
+                    if not archivo:
+                        archivo = ArchivoSubido(
+                            hash=hash_contenido,
+                            extension=_normalizar_extension(nombre),
+                            tamano_bytes=os.path.getsize(ruta),
+                            veces_subido=0
+                        )
+                        db.session.add(archivo)
+                    archivo.veces_subido += 1
+
+                    destino = os.path.join(UPLOAD_FOLDER, archivo.filename)
+                    if not os.path.exists(destino):
+                        shutil.copy2(ruta, destino)
+                    migrados[valor] = archivo.filename
+
+            # Actualizar referencias (update masivo: los conteos se recalculan al final)
+            filas_actualizadas = 0
+            for modelo, atributo in columnas:
+                columna = getattr(modelo, atributo)
+                for anterior, nuevo in migrados.items():
+                    filas_actualizadas += modelo.query.filter(columna == anterior).update(
+                        {atributo: nuevo}, synchronize_session=False
+                    )
+
+            db.session.commit()
+            AlmacenamientoService.recontar_referencias()
+
+            eliminados = 0
+            if eliminar_originales:
+                for anterior in migrados:
+                    ruta = os.path.join(UPLOAD_FOLDER, anterior.rsplit('/', 1)[-1])
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+                        eliminados += 1
+
+            resumen = {
+                'archivos_migrados': len(migrados),
+                'archivos_unicos': len(set(migrados.values())),
+                'filas_actualizadas': filas_actualizadas,
+                'originales_eliminados': eliminados
+            }
+            return True, resumen, f'{len(migrados)} archivos migrados a {len(set(migrados.values()))} archivos únicos'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, {}, str(e)
+
+    @staticmethod
+    def obtener_estadisticas():
+        """Estadísticas del almacenamiento: archivos, bytes y ahorro por deduplicación"""
+        total_archivos, total_bytes, bytes_ahorrados, sin_referencias = db.session.query(
+            func.count(ArchivoSubido.hash),
+            func.coalesce(func.sum(ArchivoSubido.tamano_bytes), 0),
+            func.coalesce(func.sum((ArchivoSubido.veces_subido - 1) * ArchivoSubido.tamano_bytes), 0),
+            func.coalesce(func.sum(case((ArchivoSubido.referencias <= 0, 1), else_=0)), 0)
+        ).one()
+
+        return {
+            'total_archivos': total_archivos,
+            'total_bytes': int(total_bytes),
+            'bytes_ahorrados_deduplicacion': int(bytes_ahorrados),
+            'archivos_sin_referencias': int(sin_referencias)
+        }
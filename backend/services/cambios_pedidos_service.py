@@ -0,0 +1,346 @@
+"""
+Feed de cambios de pedidos para el tablero
+
+En vez de recargar el tablero completo cada pocos segundos, el cliente pide los
+cambios posteriores a su cursor (GET /api/pedidos/cambios?desde=N, long-poll, o
+/api/pedidos/cambios/stream con server-sent events) y aplica solo esos pedidos.
+
+Los cambios se anotan desde un after_flush de la sesión y se insertan en la tabla
+cambios_pedidos justo antes del commit, en la misma transacción que modifica el
+pedido: si la transacción se revierte, el cambio desaparece con ella. El id de la
+fila es la secuencia del feed y se asigna bajo bloquear_hasta_commit()
+(utils/sql_helpers.py), así los ids se confirman en orden también en Postgres y un
+cliente que ya vio el N no puede perder un cambio menor que N.
+
+Al confirmar, se despierta a las esperas de este proceso; las de otros workers lo
+ven al revisar la tabla cada INTERVALO_SONDEO_SEGUNDOS (una consulta por la clave
+primaria). Las escrituras con SQL directo sobre pedidos no pasan por la sesión y
+deben llamar a registrar_cambio().
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import chain
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.orm import Session
+from extensions import db
+from utils.sql_helpers import bloquear_hasta_commit
+from models.pedido import Pedido, PedidoInsumo, PedidoProducto, CambioPedido
+from models.serializadores import PedidoSerializador
+from config.cambios import (
+    ESPERA_MAXIMA_SEGUNDOS, INTERVALO_SONDEO_SEGUNDOS, MAX_CAMBIOS_POR_RESPUESTA,
+    MAX_ESPERAS_CONCURRENTES, RETENCION_CAMBIOS_DIAS, PURGAR_CADA_CAMBIOS
+)
+
+
+# Claves en session.info: filas anotadas que se insertan antes del commit, y filas ya
+# insertadas (con el bloqueo tomado) que se publican después del commit
+_CAMBIOS_PENDIENTES = 'cambios_pedidos_pendientes'
+_CAMBIOS_INSERTADOS = 'cambios_pedidos_insertados'
+
+# Si un pedido tiene varios cambios en un mismo flush se registra el más importante
+_PRIORIDAD_TIPOS = {'actualizado': 0, 'estado': 1, 'cancelado': 2, 'creado': 3, 'eliminado': 4}
+
+# Despierta a las esperas de este proceso cuando se confirman cambios
+_condicion = threading.Condition()
+_version_local = 0
+
+# Limita los hilos del worker ocupados esperando cambios
+_esperas = threading.BoundedSemaphore(MAX_ESPERAS_CONCURRENTES)
+
+_registrados_desde_purga = 0
+
+
+def _anotar(cambios, pedido_id, tipo, estado=None):
+    if pedido_id is None:
+        return
+    anterior = cambios.get(pedido_id)
+    if anterior is None or _PRIORIDAD_TIPOS[tipo] > _PRIORIDAD_TIPOS[anterior[0]]:
+        cambios[pedido_id] = (tipo, estado if estado is not None else (anterior[1] if anterior else None))
+    elif estado is not None and anterior[1] is None:
+        cambios[pedido_id] = (anterior[0], estado)
+
+
+def _anotar_filas(session, filas):
+    """Deja las filas para insertar antes del commit (o de inmediato si ya se insertaron las del commit)"""
+    if session.info.get(_CAMBIOS_INSERTADOS):
+        # Un flush posterior al before_commit: el bloqueo sigue tomado hasta el commit
+        session.connection().execute(CambioPedido.__table__.insert(), filas)
+        session.info[_CAMBIOS_INSERTADOS] += len(filas)
+    else:
+        session.info.setdefault(_CAMBIOS_PENDIENTES, []).extend(filas)
+
+
+def _tipo_cambio_pedido(session, pedido):
+    """'estado', 'cancelado', 'actualizado' o None (sin cambios reales) para un pedido modificado"""
+    if not session.is_modified(pedido, include_collections=False):
+        return None
+    if inspect(pedido).attrs.estado.history.added:
+        return 'cancelado' if pedido.estado == 'Cancelado' else 'estado'
+    return 'actualizado'
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_cambios_pedidos(session, flush_context):
+    """Registra en cambios_pedidos los pedidos creados, modificados o eliminados en el flush"""
+    cambios = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Pedido):
+            if obj in session.deleted:
+                _anotar(cambios, obj.id, 'eliminado', obj.estado)
+            elif obj in session.new:
+                _anotar(cambios, obj.id, 'creado', obj.estado)
+            else:
+                tipo = _tipo_cambio_pedido(session, obj)
+                if tipo:
+                    _anotar(cambios, obj.id, tipo, obj.estado)
+        elif isinstance(obj, (PedidoProducto, PedidoInsumo)):
+            _anotar(cambios, obj.pedido_id, 'actualizado')
+
+    if not cambios:
+        return
+
+    # Estado de los pedidos que solo cambiaron en sus productos o insumos
+    for pedido_id, (tipo, estado) in cambios.items():
+        if estado is None:
+            pedido = session.identity_map.get(inspect(Pedido).identity_key_from_primary_key([pedido_id]))
+            if pedido is not None:
+                cambios[pedido_id] = (tipo, pedido.estado)
+
+    ahora = datetime.utcnow()
+    _anotar_filas(session, [
+        {'pedido_id': pedido_id, 'tipo': tipo, 'estado': estado, 'fecha': ahora}
+        for pedido_id, (tipo, estado) in cambios.items()
+    ])
+
+
+@event.listens_for(Session, 'before_commit')
+def _insertar_cambios_pedidos(session):
+    """Inserta los cambios anotados con el bloqueo del feed tomado hasta el commit"""
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    filas = session.info.pop(_CAMBIOS_PENDIENTES, None)
+    if not filas:
+        return
+    conexion = session.connection()
+    bloquear_hasta_commit(conexion, CambioPedido.__table__)
+    conexion.execute(CambioPedido.__table__.insert(), filas)
+    session.info[_CAMBIOS_INSERTADOS] = len(filas)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notificar_cambios_pedidos(session):
+    """Despierta a las esperas solo cuando los cambios quedan confirmados"""
+    global _version_local, _registrados_desde_purga
+    registrados = session.info.pop(_CAMBIOS_INSERTADOS, 0)
+    if not registrados:
+        return
+    with _condicion:
+        _version_local += 1
+        _registrados_desde_purga += registrados
+        purgar = _registrados_desde_purga >= PURGAR_CADA_CAMBIOS
+        if purgar:
+            _registrados_desde_purga = 0
+        _condicion.notify_all()
+
+    if purgar:
+        CambiosPedidosService.purgar_antiguos()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_cambios_pedidos(session):
+    session.info.pop(_CAMBIOS_PENDIENTES, None)
+    session.info.pop(_CAMBIOS_INSERTADOS, None)
+
+
+def registrar_cambio(pedido_id, tipo='actualizado', estado=None):
+    """
+    Registra un cambio hecho con SQL directo (sin pasar por el ORM), en la transacción
+    actual de db.session; se inserta y publica al hacer commit
+    """
+    registrar_cambios([(pedido_id, tipo, estado)])
+
+
+def registrar_cambios(cambios):
+    """Como registrar_cambio() para varios pedidos: iterable de (pedido_id, tipo, estado)"""
+    ahora = datetime.utcnow()
+    filas = [
+        {'pedido_id': pedido_id, 'tipo': tipo, 'estado': estado, 'fecha': ahora}
+        for pedido_id, tipo, estado in cambios
+    ]
+    if filas:
+        _anotar_filas(db.session, filas)
+
+
+class CambiosPedidosService:
+    """Servicio del feed de cambios de pedidos"""
+
+    @staticmethod
+    def obtener_cursor():
+        """
+        Secuencia del último cambio registrado (0 si no hay ninguno)
+
+        Returns:
+            int: cursor desde el cual pedir cambios
+        """
+        return db.session.query(func.max(CambioPedido.id)).scalar() or 0
+
+    @staticmethod
+    def listar_cambios(desde, limite=MAX_CAMBIOS_POR_RESPUESTA, conjunto='tarjeta'):
+        """
+        Cambios posteriores al cursor con el estado actual de cada pedido afectado
+
+        Args:
+            desde: último cursor que el cliente aplicó
+            limite: máximo de cambios a devolver
+            conjunto: conjunto de campos de PedidoSerializador para los pedidos
+
+        Returns:
+            dict: cursor (nuevo), cambios (lista), pedidos (id -> pedido o None si ya no
+                  existe), hay_mas, reiniciar (el cursor es más antiguo que los cambios
+                  conservados o no corresponde a esta base: recargar el tablero)
+        """
+        minimo, maximo = db.session.query(func.min(CambioPedido.id), func.max(CambioPedido.id)).one()
+        maximo = maximo or 0
+
+        if desde > maximo or (minimo is not None and desde < minimo - 1):
+            return {'cursor': maximo, 'cambios': [], 'pedidos': {}, 'hay_mas': False, 'reiniciar': True}
+
+        cambios = (CambioPedido.query
+                   .filter(CambioPedido.id > desde)
+                   .order_by(CambioPedido.id.asc())
+                   .limit(limite + 1)
+                   .all())
+        hay_mas = len(cambios) > limite
+        cambios = [cambio.to_dict() for cambio in cambios[:limite]]
+
+        # Un pedido cambiado varias veces se envía una sola vez, con su estado actual
+        pedido_ids = list(dict.fromkeys(cambio['pedido_id'] for cambio in cambios))
+        pedidos = dict.fromkeys(pedido_ids)
+        if pedido_ids:
+            query = Pedido.query.filter(Pedido.id.in_(pedido_ids))
+            for pedido in PedidoSerializador.proyectar(query, conjunto, incluir=('id', 'estado')):
+                pedidos[pedido['id']] = pedido
+
+        return {
+            'cursor': cambios[-1]['secuencia'] if cambios else desde,
+            'cambios': cambios,
+            'pedidos': pedidos,
+            'hay_mas': hay_mas,
+            'reiniciar': False
+        }
+
+    @staticmethod
+    def _esperar(desde, segundos):
+        """
+        Espera hasta `segundos` a que el cursor avance más allá de `desde`
+
+        Returns:
+            bool: True si hay cambios nuevos (o el cursor ya no es válido)
+        """
+        limite_espera = time.monotonic() + segundos
+        while True:
+            with _condicion:
+                version = _version_local
+
+            if CambiosPedidosService.obtener_cursor() != desde:
+                return True
+
+            restante = limite_espera - time.monotonic()
+            if restante <= 0:
+                return False
+
+            # No retener la conexión ni la transacción mientras se espera
+            db.session.rollback()
+            with _condicion:
+                if _version_local == version:
+                    _condicion.wait(min(INTERVALO_SONDEO_SEGUNDOS, restante))
+
+    @staticmethod
+    def esperar_cambios(desde, espera=ESPERA_MAXIMA_SEGUNDOS, conjunto='tarjeta'):
+        """
+        Long-poll: responde apenas hay cambios posteriores al cursor, o vacío al
+        cumplirse la espera
+
+        Si ya hay MAX_ESPERAS_CONCURRENTES esperas en este proceso responde de
+        inmediato con esperado=False, para no copar los hilos del worker; el cliente
+        debe dejar pasar unos segundos antes de volver a preguntar.
+
+        Returns:
+            dict: igual que listar_cambios(), más esperado (bool)
+        """
+        espera = max(0, min(espera, ESPERA_MAXIMA_SEGUNDOS))
+        esperado = espera > 0 and _esperas.acquire(blocking=False)
+        if esperado:
+            try:
+                CambiosPedidosService._esperar(desde, espera)
+            finally:
+                _esperas.release()
+
+        resultado = CambiosPedidosService.listar_cambios(desde, conjunto=conjunto)
+        resultado['esperado'] = esperado
+        return resultado
+
+    @staticmethod
+    def seguir_cambios(desde, duracion, conjunto='tarjeta', intervalo_vacio=None):
+        """
+        Generador para server-sent events: entrega los cambios a medida que ocurren
+        durante `duracion` segundos
+
+        Yields:
+            dict como listar_cambios() cuando hay cambios, o None cada `intervalo_vacio`
+            segundos sin cambios (para mantener viva la conexión). Si se alcanzó el
+            máximo de esperas del proceso entrega solo los cambios pendientes y termina.
+        """
+        if not _esperas.acquire(blocking=False):
+            yield CambiosPedidosService.listar_cambios(desde, conjunto=conjunto)
+            return
+
+        try:
+            limite = time.monotonic() + duracion
+            intervalo_vacio = intervalo_vacio or duracion
+            while True:
+                resultado = CambiosPedidosService.listar_cambios(desde, conjunto=conjunto)
+                if resultado['cambios'] or resultado['reiniciar']:
+                    yield resultado
+                    if resultado['reiniciar']:
+                        return
+                    desde = resultado['cursor']
+                    if resultado['hay_mas']:
+                        continue
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    return
+                if not CambiosPedidosService._esperar(desde, min(intervalo_vacio, restante)):
+                    db.session.rollback()
+                    yield None
+        finally:
+            db.session.rollback()
+            _esperas.release()
+
+    @staticmethod
+    def purgar_antiguos(dias=RETENCION_CAMBIOS_DIAS):
+        """
+        Elimina los cambios de más de `dias` días (se llama sola cada PURGAR_CADA_CAMBIOS)
+
+        Usa su propia conexión: se invoca desde after_commit, cuando la sesión ya no
+        tiene transacción activa.
+
+        Returns:
+            int: cambios eliminados
+        """
+        tabla = CambioPedido.__table__
+        try:
+            limite = datetime.utcnow() - timedelta(days=dias)
+            with db.engine.begin() as conexion:
+                # Nunca se borra el último cambio: el cursor debe seguir siendo válido
+                ultimo = conexion.execute(select(func.max(tabla.c.id))).scalar() or 0
+                resultado = conexion.execute(
+                    delete(tabla).where(tabla.c.fecha < limite, tabla.c.id < ultimo)
+                )
+            return resultado.rowcount
+        except Exception as e:
+            print(f"⚠️ No se pudieron purgar cambios de pedidos antiguos: {e}")
+            return 0
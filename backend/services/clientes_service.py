@@ -1,289 +1,542 @@
-"""
-Servicio de gestión de clientes
-Contiene la lógica de negocio relacionada con clientes
-"""
-
-from extensions import db
-from models.cliente import Cliente
-from sqlalchemy import func, or_
-from datetime import datetime
-
-
-class ClientesService:
-    """Servicio para operaciones de negocio de clientes"""
-
-    @staticmethod
-    def listar_clientes(filtros=None, buscar=None, page=1, limit=100):
-        """
-        Lista clientes con filtros, búsqueda y paginación
-
-        Args:
-            filtros: dict con tipo, etiquetas
-            buscar: término de búsqueda
-            page: número de página
-            limit: registros por página
-
-        Returns:
-            tuple: (clientes, total, total_pages, stats)
-        """
-        query = Cliente.query
-
-        # Filtrar por etiquetas
-        if filtros and filtros.get('etiquetas'):
-            etiqueta_ids = filtros['etiquetas']
-            if etiqueta_ids:
-                etiquetas_sql = ','.join(map(str, etiqueta_ids))
-                sql_query = f'''
-                    SELECT DISTINCT cliente_id
-                    FROM cliente_etiquetas
-                    WHERE etiqueta_id IN ({etiquetas_sql})
-                '''
-                subquery = db.session.execute(db.text(sql_query))
-                cliente_ids = [row[0] for row in subquery]
-                if cliente_ids:
-                    query = query.filter(Cliente.id.in_(cliente_ids))
-                else:
-                    query = query.filter(Cliente.id.in_([]))
-
-        # Filtrar por tipo
-        if filtros and filtros.get('tipo'):
-            query = query.filter_by(tipo_cliente=filtros['tipo'])
-
-        # Buscar
-        if buscar:
-            query = query.filter(
-                or_(
-                    Cliente.nombre.ilike(f'%{buscar}%'),
-                    Cliente.telefono.ilike(f'%{buscar}%'),
-                    Cliente.email.ilike(f'%{buscar}%')
-                )
-            )
-
-        # Contar total
-        total = query.count()
-        total_pages = (total + limit - 1) // limit
-
-        # Paginar
-        clientes = query.order_by(Cliente.nombre).limit(limit).offset((page - 1) * limit).all()
-
-        # Calcular estadísticas
-        stats = ClientesService.obtener_estadisticas()
-
-        return clientes, total, total_pages, stats
-
-    @staticmethod
-    def obtener_estadisticas():
-        """Obtiene estadísticas globales de clientes"""
-        total_global = Cliente.query.count()
-
-        def calcular_promedio_gasto(tipo):
-            resultado = db.session.query(func.avg(Cliente.total_gastado)).filter_by(tipo_cliente=tipo).scalar()
-            return float(resultado) if resultado else 0
-
-        def calcular_promedio_pedidos(tipo):
-            resultado = db.session.query(func.avg(Cliente.total_pedidos)).filter_by(tipo_cliente=tipo).scalar()
-            return float(resultado) if resultado else 0
-
-        stats = {
-            'total': total_global,
-            'vip': Cliente.query.filter_by(tipo_cliente='VIP').count(),
-            'fiel': Cliente.query.filter_by(tipo_cliente='Fiel').count(),
-            'nuevo': Cliente.query.filter_by(tipo_cliente='Nuevo').count(),
-            'ocasional': Cliente.query.filter_by(tipo_cliente='Ocasional').count(),
-            'cumplidor': Cliente.query.filter_by(tipo_cliente='Cumplidor').count(),
-            'no_cumplidor': Cliente.query.filter_by(tipo_cliente='No Cumplidor').count(),
-            'promedios': {
-                'VIP': {
-                    'gasto': calcular_promedio_gasto('VIP'),
-                    'pedidos': calcular_promedio_pedidos('VIP')
-                },
-                'Fiel': {
-                    'gasto': calcular_promedio_gasto('Fiel'),
-                    'pedidos': calcular_promedio_pedidos('Fiel')
-                },
-                'Nuevo': {
-                    'gasto': calcular_promedio_gasto('Nuevo'),
-                    'pedidos': calcular_promedio_pedidos('Nuevo')
-                }
-            }
-        }
-
-        return stats
-
-    @staticmethod
-    def obtener_cliente(cliente_id):
-        """Obtiene un cliente por ID con sus pedidos"""
-        return Cliente.query.get(cliente_id)
-
-    @staticmethod
-    def crear_cliente(data):
-        """
-        Crea un nuevo cliente
-
-        Args:
-            data: dict con datos del cliente
-
-        Returns:
-            tuple: (success, cliente/error, mensaje)
-        """
-        try:
-            cliente = Cliente(
-                nombre=data['nombre'],
-                telefono=data.get('telefono'),
-                email=data.get('email'),
-                tipo_cliente=data.get('tipo_cliente', 'Nuevo'),
-                direccion=data.get('direccion'),
-                comuna=data.get('comuna'),
-                notas=data.get('notas')
-            )
-
-            db.session.add(cliente)
-            db.session.commit()
-
-            return True, cliente, 'Cliente creado exitosamente'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, None, str(e)
-
-    @staticmethod
-    def actualizar_cliente(cliente_id, data):
-        """
-        Actualiza un cliente existente
-
-        Args:
-            cliente_id: ID del cliente
-            data: dict con campos a actualizar
-
-        Returns:
-            tuple: (success, cliente/error, mensaje)
-        """
-        try:
-            cliente = Cliente.query.get(cliente_id)
-            if not cliente:
-                return False, None, 'Cliente no encontrado'
-
-            # Actualizar campos
-            campos_actualizables = ['nombre', 'telefono', 'email', 'tipo_cliente',
-                                   'direccion', 'comuna', 'notas']
-
-            for campo in campos_actualizables:
-                if campo in data:
-                    setattr(cliente, campo, data[campo])
-
-            db.session.commit()
-
-            return True, cliente, 'Cliente actualizado exitosamente'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, None, str(e)
-
-    @staticmethod
-    def eliminar_cliente(cliente_id):
-        """
-        Elimina un cliente
-
-        Args:
-            cliente_id: ID del cliente
-
-        Returns:
-            tuple: (success, mensaje)
-        """
-        try:
-            cliente = Cliente.query.get(cliente_id)
-            if not cliente:
-                return False, 'Cliente no encontrado'
-
-            db.session.delete(cliente)
-            db.session.commit()
-
-            return True, f'Cliente {cliente_id} eliminado'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, str(e)
-
-    @staticmethod
-    def reclasificar_clientes():
-        """
-        Reclasifica clientes según su comportamiento de compra
-
-        Lógica:
-        - VIP: > $500,000 gastado o > 10 pedidos
-        - Fiel: > $200,000 gastado o > 5 pedidos
-        - Ocasional: 2-4 pedidos
-        - Nuevo: 1 pedido
-
-        Returns:
-            tuple: (success, cantidad_reclasificados, mensaje)
-        """
-        try:
-            clientes = Cliente.query.all()
-            reclasificados = 0
-
-            for cliente in clientes:
-                tipo_anterior = cliente.tipo_cliente
-
-                # Lógica de clasificación
-                if cliente.total_gastado > 500000 or cliente.total_pedidos > 10:
-                    nuevo_tipo = 'VIP'
-                elif cliente.total_gastado > 200000 or cliente.total_pedidos > 5:
-                    nuevo_tipo = 'Fiel'
-                elif cliente.total_pedidos >= 2:
-                    nuevo_tipo = 'Ocasional'
-                else:
-                    nuevo_tipo = 'Nuevo'
-
-                if tipo_anterior != nuevo_tipo:
-                    cliente.tipo_cliente = nuevo_tipo
-                    reclasificados += 1
-
-            db.session.commit()
-
-            return True, reclasificados, f'{reclasificados} clientes reclasificados'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, 0, str(e)
-
-    @staticmethod
-    def actualizar_estadisticas_cliente(cliente_id):
-        """
-        Actualiza las estadísticas de un cliente basándose en sus pedidos
-
-        Args:
-            cliente_id: ID del cliente
-
-        Returns:
-            tuple: (success, mensaje)
-        """
-        try:
-            from models.pedido import Pedido
-
-            cliente = Cliente.query.get(cliente_id)
-            if not cliente:
-                return False, 'Cliente no encontrado'
-
-            # Contar pedidos (solo activos, no cancelados)
-            pedidos = Pedido.query.filter_by(cliente_id=cliente_id).filter(
-                Pedido.estado != 'Cancelado'
-            ).all()
-            cliente.total_pedidos = len(pedidos)
-
-            # Calcular total gastado (solo de pedidos activos)
-            total_gastado = sum((p.precio_ramo or 0) + (p.precio_envio or 0) for p in pedidos)
-            cliente.total_gastado = total_gastado
-
-            # Última compra
-            if pedidos:
-                ultima_compra = max(p.fecha_pedido for p in pedidos)
-                cliente.ultima_compra = ultima_compra
-
-            db.session.commit()
-
-            return True, 'Estadísticas actualizadas'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, str(e)
+"""
+Servicio de gestión de clientes
+Contiene la lógica de negocio relacionada con clientes
+"""
+
+from extensions import db
+from models.cliente import Cliente
+from models.pedido import Pedido
+from sqlalchemy import bindparam, case, event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+from utils.cache_helpers import marcar_etiquetas_modificadas
+from datetime import datetime
+from decimal import Decimal
+from itertools import chain
+
+
+# ============================================
+# ESTADÍSTICAS DE CLIENTES POR DELTAS
+# ============================================
+#
+# total_pedidos, total_gastado y ultima_compra de un cliente corresponden a sus
+# pedidos activos (no cancelados): cantidad, suma de precio_ramo + precio_envio y
+# máxima fecha_pedido. Cada flush que crea, modifica o elimina pedidos aplica la
+# diferencia con un UPDATE atómico (total = total + delta) en la misma transacción.
+# Las escrituras con SQL directo sobre pedidos no pasan por aquí: verificar_estadisticas()
+# detecta y corrige las diferencias.
+
+_ATRIBUTOS_ESTADISTICAS = ('cliente_id', 'estado', 'precio_ramo', 'precio_envio', 'fecha_pedido')
+
+def _aporte(valores):
+    """(cliente_id, monto, fecha_pedido) con que un pedido suma a su cliente, o None si no suma"""
+    if valores is None or valores['cliente_id'] is None or valores['estado'] == 'Cancelado':
+        return None
+    monto = Decimal(str(valores['precio_ramo'] or 0)) + Decimal(str(valores['precio_envio'] or 0))
+    return valores['cliente_id'], monto, valores['fecha_pedido']
+
+
+def _valores_pedido(estado_obj, anteriores):
+    """
+    Valores de los atributos de estadísticas antes (anteriores=True) o después del
+    flush; None si alguno no está cargado
+    """
+    valores = {}
+    for atributo in _ATRIBUTOS_ESTADISTICAS:
+        historial = estado_obj.attrs[atributo].history
+        if historial.unchanged:
+            valores[atributo] = historial.unchanged[0]
+        elif anteriores and historial.has_changes():
+            # Sin valor borrado el anterior era None (active_history lo carga al asignar)
+            valores[atributo] = historial.deleted[0] if historial.deleted else None
+        elif not anteriores and historial.added:
+            valores[atributo] = historial.added[0]
+        elif atributo in estado_obj.dict:
+            valores[atributo] = estado_obj.dict[atributo]
+        else:
+            return None
+    return valores
+
+
+def _valores_recalculados(tabla=Cliente.__table__):
+    """Columnas de estadísticas calculadas desde los pedidos (para UPDATE ... SET)"""
+    activos = (Pedido.cliente_id == tabla.c.id, Pedido.estado != 'Cancelado')
+    return {
+        'total_pedidos': select(func.count(Pedido.id)).where(*activos).scalar_subquery(),
+        'total_gastado': select(
+            func.coalesce(func.sum(func.coalesce(Pedido.precio_ramo, 0) + func.coalesce(Pedido.precio_envio, 0)), 0)
+        ).where(*activos).scalar_subquery(),
+        'ultima_compra': select(func.max(Pedido.fecha_pedido)).where(*activos).scalar_subquery(),
+    }
+
+
+def sumar_pedidos_nuevos(aportes):
+    """
+    Suma a sus clientes pedidos activos insertados con SQL directo, en la transacción
+    actual de db.session y en un solo UPDATE (executemany)
+
+    Args:
+        aportes: iterable de (cliente_id, cantidad_pedidos, monto, fecha_pedido_mas_reciente)
+    """
+    filas = [
+        {'b_id': cliente_id, 'b_pedidos': int(cantidad), 'b_monto': float(monto), 'b_fecha': fecha}
+        for cliente_id, cantidad, monto, fecha in aportes
+    ]
+    if not filas:
+        return
+    tabla = Cliente.__table__
+    fecha = bindparam('b_fecha', type_=tabla.c.ultima_compra.type)
+    db.session.execute(
+        update(tabla).where(tabla.c.id == bindparam('b_id')).values(
+            total_pedidos=func.coalesce(tabla.c.total_pedidos, 0) + bindparam('b_pedidos'),
+            total_gastado=func.coalesce(tabla.c.total_gastado, 0) + bindparam('b_monto'),
+            ultima_compra=case(
+                (or_(tabla.c.ultima_compra.is_(None), tabla.c.ultima_compra < fecha), fecha),
+                else_=tabla.c.ultima_compra
+            )
+        ),
+        filas
+    )
+    marcar_etiquetas_modificadas(db.session, 'clientes')
+
+
+@event.listens_for(Session, 'before_flush')
+def _cargar_pedidos_modificados(session, flush_context, instances):
+    """
+    Carga los atributos de estadísticas de los pedidos modificados o eliminados que no
+    estén cargados (p. ej. tras un commit): después del flush ya no se pueden leer
+    """
+    for obj in chain(session.dirty, session.deleted):
+        if isinstance(obj, Pedido) and not inspect(obj).transient:
+            for atributo in _ATRIBUTOS_ESTADISTICAS:
+                getattr(obj, atributo)
+
+
+@event.listens_for(Session, 'after_flush')
+def _aplicar_deltas_estadisticas_clientes(session, flush_context):
+    """Suma o resta a cada cliente el aporte de sus pedidos creados, modificados o eliminados"""
+    deltas = {}  # cliente_id -> [delta_pedidos, delta_gastado, fecha_mayor_agregada, recalcular_fecha]
+    recalcular = set()
+
+    def delta(cliente_id):
+        return deltas.setdefault(cliente_id, [0, Decimal(0), None, False])
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Pedido):
+            continue
+        estado_obj = inspect(obj)
+        if obj in session.new:
+            anterior, nuevo = None, _valores_pedido(estado_obj, anteriores=False)
+        elif obj in session.deleted:
+            anterior, nuevo = _valores_pedido(estado_obj, anteriores=True), None
+        else:
+            if not any(estado_obj.attrs[a].history.has_changes() for a in _ATRIBUTOS_ESTADISTICAS):
+                continue
+            anterior, nuevo = _valores_pedido(estado_obj, anteriores=True), _valores_pedido(estado_obj, anteriores=False)
+
+        if (anterior is None and obj not in session.new) or (nuevo is None and obj not in session.deleted):
+            # Valores incompletos: recalcular desde los pedidos al cliente actual del objeto
+            if estado_obj.dict.get('cliente_id') is not None:
+                recalcular.add(estado_obj.dict['cliente_id'])
+            continue
+
+        aporte_anterior, aporte_nuevo = _aporte(anterior), _aporte(nuevo)
+        if aporte_anterior == aporte_nuevo:
+            continue
+        if aporte_anterior:
+            cliente_id, monto, fecha = aporte_anterior
+            d = delta(cliente_id)
+            d[0] -= 1
+            d[1] -= monto
+            # Si era la compra más reciente, la fecha hay que buscarla de nuevo
+            if not (aporte_nuevo and aporte_nuevo[0] == cliente_id and fecha is not None
+                    and aporte_nuevo[2] is not None and aporte_nuevo[2] >= fecha):
+                d[3] = True
+        if aporte_nuevo:
+            cliente_id, monto, fecha = aporte_nuevo
+            d = delta(cliente_id)
+            d[0] += 1
+            d[1] += monto
+            if fecha is not None and (d[2] is None or fecha > d[2]):
+                d[2] = fecha
+
+    if not deltas and not recalcular:
+        return
+
+    tabla = Cliente.__table__
+    conexion = session.connection()
+    for cliente_id, (delta_pedidos, delta_gastado, fecha, recalcular_fecha) in deltas.items():
+        if cliente_id in recalcular:
+            continue
+        valores = {
+            'total_pedidos': func.coalesce(tabla.c.total_pedidos, 0) + delta_pedidos,
+            'total_gastado': func.coalesce(tabla.c.total_gastado, 0) + float(delta_gastado),
+        }
+        if recalcular_fecha:
+            valores['ultima_compra'] = _valores_recalculados(tabla)['ultima_compra']
+        elif fecha is not None:
+            valores['ultima_compra'] = case(
+                (or_(tabla.c.ultima_compra.is_(None), tabla.c.ultima_compra < fecha), fecha),
+                else_=tabla.c.ultima_compra
+            )
+        conexion.execute(update(tabla).where(tabla.c.id == cliente_id).values(**valores))
+
+    if recalcular:
+        conexion.execute(update(tabla).where(tabla.c.id.in_(recalcular)).values(**_valores_recalculados(tabla)))
+
+    # Los clientes cargados en la sesión deben releer las columnas actualizadas
+    for cliente_id in set(deltas) | recalcular:
+        cliente = session.identity_map.get(inspect(Cliente).identity_key_from_primary_key([cliente_id]))
+        if cliente is not None:
+            session.expire(cliente, ['total_pedidos', 'total_gastado', 'ultima_compra'])
+    # Sin marcar 'clientes': el cambio de pedido ya mueve el sello de los ETag de clientes
+    # (cursor de cambios_pedidos, ver utils/respuestas_http.py)
+
+
+# Sin esto, asignar un atributo no cargado (p. ej. tras un commit) no guarda el valor
+# anterior y el delta no se podría calcular
+for _atributo in _ATRIBUTOS_ESTADISTICAS:
+    event.listen(getattr(Pedido, _atributo), 'set', lambda target, valor, anterior, iniciador: valor,
+                 active_history=True, retval=True)
+
+
+class ClientesService:
+    """Servicio para operaciones de negocio de clientes"""
+
+    @staticmethod
+    def listar_clientes(filtros=None, buscar=None, page=1, limit=100):
+        """
+        Lista clientes con filtros, búsqueda y paginación
+
+        Args:
+            filtros: dict con tipo, etiquetas
+            buscar: término de búsqueda
+            page: número de página
+            limit: registros por página
+
+        Returns:
+            tuple: (clientes, total, total_pages, stats)
+        """
+        query = Cliente.query
+
+        # Filtrar por etiquetas
+        if filtros and filtros.get('etiquetas'):
+            etiqueta_ids = filtros['etiquetas']
+            if etiqueta_ids:
+                etiquetas_sql = ','.join(map(str, etiqueta_ids))
+                sql_query = f'''
+                    SELECT DISTINCT cliente_id
+                    FROM cliente_etiquetas
+                    WHERE etiqueta_id IN ({etiquetas_sql})
+                '''
+                subquery = db.session.execute(db.text(sql_query))
+                cliente_ids = [row[0] for row in subquery]
+                if cliente_ids:
+                    query = query.filter(Cliente.id.in_(cliente_ids))
+                else:
+                    query = query.filter(Cliente.id.in_([]))
+
+        # Filtrar por tipo
+        if filtros and filtros.get('tipo'):
+            query = query.filter_by(tipo_cliente=filtros['tipo'])
+
+        # Buscar
+        if buscar:
+            query = query.filter(
+                or_(
+                    Cliente.nombre.ilike(f'%{buscar}%'),
+                    Cliente.telefono.ilike(f'%{buscar}%'),
+                    Cliente.email.ilike(f'%{buscar}%')
+                )
+            )
+
+        # Contar total
+        total = query.count()
+        total_pages = (total + limit - 1) // limit
+
+        # Paginar
+        clientes = query.order_by(Cliente.nombre).limit(limit).offset((page - 1) * limit).all()
+
+        # Calcular estadísticas
+        stats = ClientesService.obtener_estadisticas()
+
+        return clientes, total, total_pages, stats
+
+    @staticmethod
+    def obtener_estadisticas():
+        """Obtiene estadísticas globales de clientes"""
+        total_global = Cliente.query.count()
+
+        def calcular_promedio_gasto(tipo):
+            resultado = db.session.query(func.avg(Cliente.total_gastado)).filter_by(tipo_cliente=tipo).scalar()
+            return float(resultado) if resultado else 0
+
+        def calcular_promedio_pedidos(tipo):
+            resultado = db.session.query(func.avg(Cliente.total_pedidos)).filter_by(tipo_cliente=tipo).scalar()
+            return float(resultado) if resultado else 0
+
+        stats = {
+            'total': total_global,
+            'vip': Cliente.query.filter_by(tipo_cliente='VIP').count(),
+            'fiel': Cliente.query.filter_by(tipo_cliente='Fiel').count(),
+            'nuevo': Cliente.query.filter_by(tipo_cliente='Nuevo').count(),
+            'ocasional': Cliente.query.filter_by(tipo_cliente='Ocasional').count(),
+            'cumplidor': Cliente.query.filter_by(tipo_cliente='Cumplidor').count(),
+            'no_cumplidor': Cliente.query.filter_by(tipo_cliente='No Cumplidor').count(),
+            'promedios': {
+                'VIP': {
+                    'gasto': calcular_promedio_gasto('VIP'),
+                    'pedidos': calcular_promedio_pedidos('VIP')
+                },
+                'Fiel': {
+                    'gasto': calcular_promedio_gasto('Fiel'),
+                    'pedidos': calcular_promedio_pedidos('Fiel')
+                },
+                'Nuevo': {
+                    'gasto': calcular_promedio_gasto('Nuevo'),
+                    'pedidos': calcular_promedio_pedidos('Nuevo')
+                }
+            }
+        }
+
+        return stats
+
+    @staticmethod
+    def obtener_cliente(cliente_id):
+        """Obtiene un cliente por ID con sus pedidos"""
+        return Cliente.query.get(cliente_id)
+
+    @staticmethod
+    def crear_cliente(data):
+        """
+        Crea un nuevo cliente
+
+        Args:
+            data: dict con datos del cliente
+
+        Returns:
+            tuple: (success, cliente/error, mensaje)
+        """
+        try:
+            cliente = Cliente(
+                nombre=data['nombre'],
+                telefono=data.get('telefono'),
+                email=data.get('email'),
+                tipo_cliente=data.get('tipo_cliente', 'Nuevo'),
+                direccion=data.get('direccion'),
+                comuna=data.get('comuna'),
+                notas=data.get('notas')
+            )
+
+            db.session.add(cliente)
+            db.session.commit()
+
+            return True, cliente, 'Cliente creado exitosamente'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, None, str(e)
+
+    @staticmethod
+    def actualizar_cliente(cliente_id, data):
+        """
+        Actualiza un cliente existente
+
+        Args:
+            cliente_id: ID del cliente
+            data: dict con campos a actualizar
+
+        Returns:
+            tuple: (success, cliente/error, mensaje)
+        """
+        try:
+            cliente = Cliente.query.get(cliente_id)
+            if not cliente:
+                return False, None, 'Cliente no encontrado'
+
+            # Actualizar campos
+            campos_actualizables = ['nombre', 'telefono', 'email', 'tipo_cliente',
+                                   'direccion', 'comuna', 'notas']
+
+            for campo in campos_actualizables:
+                if campo in data:
+                    setattr(cliente, campo, data[campo])
+
+            db.session.commit()
+
+            return True, cliente, 'Cliente actualizado exitosamente'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, None, str(e)
+
+    @staticmethod
+    def eliminar_cliente(cliente_id):
+        """
+        Elimina un cliente
+
+        Args:
+            cliente_id: ID del cliente
+
+        Returns:
+            tuple: (success, mensaje)
+        """
+        try:
+            cliente = Cliente.query.get(cliente_id)
+            if not cliente:
+                return False, 'Cliente no encontrado'
+
+            db.session.delete(cliente)
+            db.session.commit()
+
+            return True, f'Cliente {cliente_id} eliminado'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, str(e)
+
+    @staticmethod
+    def reclasificar_clientes():
+        """
+        Reclasifica clientes según su comportamiento de compra
+
+        Lógica:
+        - VIP: > $500,000 gastado o > 10 pedidos
+        - Fiel: > $200,000 gastado o > 5 pedidos
+        - Ocasional: 2-4 pedidos
+        - Nuevo: 1 pedido
+
+        Returns:
+            tuple: (success, cantidad_reclasificados, mensaje)
+        """
+        try:
+            clientes = Cliente.query.all()
+            reclasificados = 0
+
+            for cliente in clientes:
+                tipo_anterior = cliente.tipo_cliente
+
+                # Lógica de clasificación
+                if cliente.total_gastado > 500000 or cliente.total_pedidos > 10:
+                    nuevo_tipo = 'VIP'
+                elif cliente.total_gastado > 200000 or cliente.total_pedidos > 5:
+                    nuevo_tipo = 'Fiel'
+                elif cliente.total_pedidos >= 2:
+                    nuevo_tipo = 'Ocasional'
+                else:
+                    nuevo_tipo = 'Nuevo'
+
+                if tipo_anterior != nuevo_tipo:
+                    cliente.tipo_cliente = nuevo_tipo
+                    reclasificados += 1
+
+            db.session.commit()
+
+            return True, reclasificados, f'{reclasificados} clientes reclasificados'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, 0, str(e)
+
+    @staticmethod
+    def actualizar_estadisticas_cliente(cliente_id):
+        """
+        Recalcula las estadísticas de un cliente desde sus pedidos activos
+
+        Los pedidos ya las mantienen al día; esto es para corregir diferencias
+        (ver verificar_estadisticas)
+
+        Args:
+            cliente_id: ID del cliente
+
+        Returns:
+            tuple: (success, mensaje)
+        """
+        try:
+            tabla = Cliente.__table__
+            resultado = db.session.execute(
+                update(tabla).where(tabla.c.id == cliente_id).values(**_valores_recalculados(tabla))
+            )
+            if resultado.rowcount == 0:
+                return False, 'Cliente no encontrado'
+
+            marcar_etiquetas_modificadas(db.session, 'clientes')
+            db.session.commit()
+
+            return True, 'Estadísticas actualizadas'
+
+        except Exception as e:
+            db.session.rollback()
+            return False, str(e)
+
+    @staticmethod
+    def verificar_estadisticas(corregir=False, tolerancia=0.01):
+        """
+        Compara total_pedidos, total_gastado y ultima_compra de cada cliente con lo que
+        dicen sus pedidos activos (una sola consulta agrupada)
+
+        Args:
+            corregir: recalcular los clientes con diferencias
+            tolerancia: diferencia de monto que se ignora (redondeos)
+
+        Returns:
+            tuple: (success, resultado_dict, mensaje)
+        """
+        try:
+            reales = db.session.query(
+                Pedido.cliente_id.label('cliente_id'),
+                func.count(Pedido.id).label('pedidos'),
+                func.sum(func.coalesce(Pedido.precio_ramo, 0) + func.coalesce(Pedido.precio_envio, 0)).label('gastado'),
+                func.max(Pedido.fecha_pedido).label('ultima')
+            ).filter(
+                Pedido.cliente_id.isnot(None),
+                Pedido.estado != 'Cancelado'
+            ).group_by(Pedido.cliente_id).subquery()
+
+            filas = db.session.query(
+                Cliente.id, Cliente.nombre, Cliente.total_pedidos, Cliente.total_gastado, Cliente.ultima_compra,
+                reales.c.pedidos, reales.c.gastado, reales.c.ultima
+            ).outerjoin(reales, reales.c.cliente_id == Cliente.id).all()
+
+            diferencias = []
+            for cliente_id, nombre, total_pedidos, total_gastado, ultima_compra, pedidos, gastado, ultima in filas:
+                pedidos, gastado = pedidos or 0, float(gastado or 0)
+                if ((total_pedidos or 0) != pedidos
+                        or abs(float(total_gastado or 0) - gastado) > tolerancia
+                        or ultima_compra != ultima):
+                    diferencias.append({
+                        'cliente_id': cliente_id,
+                        'nombre': nombre,
+                        'total_pedidos': total_pedidos or 0,
+                        'total_pedidos_real': pedidos,
+                        'total_gastado': float(total_gastado or 0),
+                        'total_gastado_real': gastado,
+                        'ultima_compra': ultima_compra.isoformat() if ultima_compra else None,
+                        'ultima_compra_real': ultima.isoformat() if ultima else None
+                    })
+
+            corregidos = 0
+            if corregir and diferencias:
+                tabla = Cliente.__table__
+                ids = [d['cliente_id'] for d in diferencias]
+                for i in range(0, len(ids), 500):
+                    db.session.execute(
+                        update(tabla).where(tabla.c.id.in_(ids[i:i + 500])).values(**_valores_recalculados(tabla))
+                    )
+                marcar_etiquetas_modificadas(db.session, 'clientes')
+                db.session.commit()
+                corregidos = len(ids)
+
+            resultado = {
+                'revisados': len(filas),
+                'con_diferencias': len(diferencias),
+                'corregidos': corregidos,
+                'diferencias': diferencias
+            }
+            mensaje = f'{len(diferencias)} de {len(filas)} clientes con estadísticas desactualizadas'
+            if corregidos:
+                mensaje += f', {corregidos} corregidos'
+            return True, resultado, mensaje
+
+        except Exception as e:
+            db.session.rollback()
+            return False, {}, str(e)
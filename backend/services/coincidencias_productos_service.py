@@ -0,0 +1,77 @@
+"""
+Servicio de coincidencias de productos del catálogo
+
+Busca, para nombres que llegan de afuera (productos nuevos de Shopify, arreglos
+escritos a mano en pedidos), el producto del catálogo que probablemente es el
+mismo, y detecta productos duplicados dentro del catálogo. La comparación está en
+utils/similitud_helpers.py.
+"""
+
+from extensions import db
+from sqlalchemy import select
+from models.catalogo import ProductoCatalogo
+from config.coincidencias import UMBRAL_COINCIDENCIA
+from utils.similitud_helpers import IndiceSimilitud, buscar_coincidencias
+
+
+def _productos_catalogo(solo_activos=True):
+    consulta = select(ProductoCatalogo.id, ProductoCatalogo.nombre).order_by(ProductoCatalogo.id)
+    if solo_activos:
+        consulta = consulta.where(ProductoCatalogo.activo == True)
+    return db.session.execute(consulta).all()
+
+
+class CoincidenciasProductosService:
+    """Servicio de búsqueda aproximada de productos del catálogo"""
+
+    @staticmethod
+    def buscar_en_catalogo(nombres, umbral=UMBRAL_COINCIDENCIA, limite=1, procesos=None):
+        """
+        Productos del catálogo más parecidos a cada nombre
+
+        Args:
+            nombres: lista de nombres a buscar
+            umbral: similitud mínima (0-1)
+            limite: coincidencias máximas por nombre
+            procesos: procesos para lotes grandes (por defecto según config/coincidencias.py)
+
+        Returns:
+            tuple: (success, [{'nombre', 'coincidencias': [{'id', 'nombre', 'similitud'}]}], mensaje)
+        """
+        try:
+            resultados = buscar_coincidencias(nombres, _productos_catalogo(), umbral, limite, procesos)
+            encontrados = sum(1 for coincidencias in resultados if coincidencias)
+            return True, [
+                {'nombre': nombre, 'coincidencias': coincidencias}
+                for nombre, coincidencias in zip(nombres, resultados)
+            ], f'{encontrados} de {len(nombres)} nombres con coincidencias'
+
+        except Exception as e:
+            return False, [], str(e)
+
+    @staticmethod
+    def buscar_duplicados(umbral=UMBRAL_COINCIDENCIA, solo_activos=True):
+        """
+        Pares de productos del catálogo con nombres casi iguales (para consolidarlos)
+
+        Returns:
+            tuple: (success, [{'producto', 'duplicado', 'similitud'}], mensaje)
+        """
+        try:
+            productos = _productos_catalogo(solo_activos)
+            indice = IndiceSimilitud(productos)
+            pares = []
+            for producto_id, nombre in productos:
+                for coincidencia in indice.buscar(nombre, umbral, limite=5, excluir=producto_id):
+                    # Cada par una sola vez: el producto de menor id primero
+                    if coincidencia['id'] > producto_id:
+                        pares.append({
+                            'producto': {'id': producto_id, 'nombre': nombre},
+                            'duplicado': {'id': coincidencia['id'], 'nombre': coincidencia['nombre']},
+                            'similitud': coincidencia['similitud']
+                        })
+            pares.sort(key=lambda par: -par['similitud'])
+            return True, pares, f'{len(pares)} posibles duplicados en {len(productos)} productos'
+
+        except Exception as e:
+            return False, [], str(e)
@@ -0,0 +1,336 @@
+"""
+Motor de costos de cotizaciones de eventos
+
+Las líneas de un evento (EventoInsumo) se editan por lotes y los totales del evento
+se mantienen por diferencia: una edición solo lee las líneas que toca y suma al
+costo de insumos la variación de sus totales, en vez de recorrer todas las líneas
+del evento en cada cambio.
+
+Las referencias al inventario (flores, contenedores, productos y productos de
+evento) se cargan con una consulta por tipo, tanto para poner precio a las líneas
+nuevas como para describirlas en la cotización.
+
+Los escenarios "qué pasa si" (otro margen, otras cantidades, líneas agregadas o
+quitadas) se calculan sobre los datos cargados, sin modificar la sesión.
+"""
+
+import math
+from collections import defaultdict
+from extensions import db
+from sqlalchemy import select, func, update
+from models.evento import Evento, EventoInsumo, ProductoEvento
+from models.inventario import Flor, Contenedor
+from models.producto import Producto
+from config.cotizaciones import (
+    MARGEN_POR_DEFECTO, MAX_LINEAS_POR_EDICION, MAX_ESCENARIOS_SIMULACION, REFERENCIAS_INSUMOS
+)
+
+_MODELOS_REFERENCIA = {
+    'flor': (Flor, str),
+    'contenedor': (Contenedor, str),
+    'producto': (Producto, int),
+    'producto_evento': (ProductoEvento, int),
+}
+
+_NOMBRES_TIPO = {'flor': 'Flor', 'contenedor': 'Contenedor', 'producto': 'Producto',
+                 'producto_evento': 'Producto de evento'}
+
+
+def calcular_totales(costo_insumos, costo_mano_obra=0, costo_transporte=0, costo_otros=0,
+                     margen_porcentaje=None, precio_final=0, anticipo=0):
+    """
+    Costo total, precio propuesto (con margen), precio final y saldo de un evento
+
+    Returns:
+        dict: costo_insumos, costo_total, precio_propuesta, precio_final, saldo
+    """
+    costo_total = (
+        float(costo_insumos or 0) + float(costo_mano_obra or 0) +
+        float(costo_transporte or 0) + float(costo_otros or 0)
+    )
+    margen_decimal = float(margen_porcentaje or MARGEN_POR_DEFECTO) / 100
+    precio_propuesta = costo_total / (1 - margen_decimal) if margen_decimal < 1 else costo_total
+    # Si no hay precio final, usar propuesta
+    precio_final = float(precio_final) if precio_final else precio_propuesta
+    return {
+        'costo_insumos': float(costo_insumos or 0),
+        'costo_total': costo_total,
+        'precio_propuesta': precio_propuesta,
+        'precio_final': precio_final,
+        'saldo': precio_final - float(anticipo or 0),
+    }
+
+
+def aplicar_totales(evento):
+    """Recalcula los totales del evento a partir de su costo_insumos (in-place, sin leer líneas)"""
+    totales = calcular_totales(
+        evento.costo_insumos, evento.costo_mano_obra, evento.costo_transporte, evento.costo_otros,
+        evento.margen_porcentaje, evento.precio_final, evento.anticipo
+    )
+    for campo, valor in totales.items():
+        setattr(evento, campo, valor)
+
+
+def sumar_costo_insumos(evento_id):
+    """Costo de insumos del evento sumado en SQL (para recalcular desde cero)"""
+    return float(db.session.execute(
+        select(func.coalesce(func.sum(EventoInsumo.costo_total), 0)).where(EventoInsumo.evento_id == evento_id)
+    ).scalar())
+
+
+def _referencia(linea):
+    """(tipo, id) de la referencia al inventario de una línea (EventoInsumo o dict), o None"""
+    if isinstance(linea, dict):
+        tipo = linea.get('tipo_insumo') or linea.get('insumo_tipo')
+        valor = linea.get(REFERENCIAS_INSUMOS[tipo][0]) if tipo in REFERENCIAS_INSUMOS else None
+    else:
+        tipo = linea.tipo_insumo
+        valor = getattr(linea, REFERENCIAS_INSUMOS[tipo][0]) if tipo in REFERENCIAS_INSUMOS else None
+    if valor in (None, ''):
+        return None
+    return tipo, _MODELOS_REFERENCIA[tipo][1](valor)
+
+
+def cargar_referencias(lineas):
+    """
+    Flores, contenedores, productos y productos de evento referenciados por las líneas
+
+    Returns:
+        dict: {tipo: {id: objeto}}, con una consulta por tipo
+    """
+    ids_por_tipo = defaultdict(set)
+    for linea in lineas:
+        referencia = _referencia(linea)
+        if referencia:
+            ids_por_tipo[referencia[0]].add(referencia[1])
+
+    referencias = {}
+    for tipo, ids in ids_por_tipo.items():
+        modelo = _MODELOS_REFERENCIA[tipo][0]
+        referencias[tipo] = {objeto.id: objeto for objeto in modelo.query.filter(modelo.id.in_(ids))}
+    return referencias
+
+
+def costo_referencia(tipo, objeto):
+    """Costo unitario de inventario de una flor, contenedor o producto"""
+    for atributo in REFERENCIAS_INSUMOS[tipo][1]:
+        valor = getattr(objeto, atributo, None)
+        if valor:
+            return float(valor)
+    return 0.0
+
+
+def describir_linea(linea, referencias):
+    """Descripción de una línea para la cotización, con las referencias ya cargadas"""
+    tipo = linea.tipo_insumo or 'otro'
+    descripcion = linea.nombre_otro or f'Insumo {tipo}'
+    referencia = _referencia(linea)
+    objeto = referencias.get(referencia[0], {}).get(referencia[1]) if referencia else None
+
+    if objeto is None:
+        return descripcion
+    if tipo == 'flor':
+        return f"{objeto.tipo} - {objeto.color}"
+    if tipo == 'contenedor':
+        return f"{objeto.tipo} - {objeto.material}"
+    if tipo == 'producto':
+        return objeto.nombre or f'Producto {linea.producto_id}'
+    return objeto.nombre or descripcion
+
+
+def _validar_linea_nueva(data, referencias):
+    """
+    Valores de una línea nueva; sin costo_unitario se usa el costo del inventario
+
+    Raises:
+        ValueError: si falta el tipo, la cantidad no es válida o la referencia no existe
+    """
+    tipo_insumo = data.get('tipo_insumo') or data.get('insumo_tipo')
+    if not tipo_insumo:
+        raise ValueError('Campo requerido: tipo_insumo')
+    cantidad = int(data.get('cantidad', 1))
+    if cantidad < 0:
+        raise ValueError('La cantidad no puede ser negativa')
+
+    valores = {'evento_id': None, 'tipo_insumo': tipo_insumo, 'cantidad': cantidad, 'notas': data.get('notas', '')}
+    costo_unitario = data.get('costo_unitario')
+
+    referencia = _referencia(data)
+    if referencia:
+        campo = REFERENCIAS_INSUMOS[tipo_insumo][0]
+        objeto = referencias.get(referencia[0], {}).get(referencia[1])
+        if objeto is None:
+            raise ValueError(f'{_NOMBRES_TIPO[tipo_insumo]} {referencia[1]} no encontrado')
+        valores[campo] = referencia[1]
+        if costo_unitario is None:
+            costo_unitario = costo_referencia(tipo_insumo, objeto)
+    elif tipo_insumo in ['mano_obra', 'transporte', 'otro'] and data.get('nombre_otro'):
+        valores['nombre_otro'] = data['nombre_otro']
+
+    valores['costo_unitario'] = float(costo_unitario or 0)
+    valores['costo_total'] = valores['costo_unitario'] * cantidad
+    return valores
+
+
+def _aplicar_cambio_linea(valores, data):
+    """Aplica cantidad/costo_unitario/notas de data sobre valores (dict), recalculando el total"""
+    if 'cantidad' in data:
+        cantidad = int(data['cantidad'])
+        if cantidad < 0:
+            raise ValueError('La cantidad no puede ser negativa')
+        valores['cantidad'] = cantidad
+    if data.get('costo_unitario') is not None:
+        valores['costo_unitario'] = float(data['costo_unitario'])
+    if 'notas' in data:
+        valores['notas'] = data['notas']
+    valores['costo_total'] = float(valores['costo_unitario'] or 0) * (valores['cantidad'] or 0)
+
+
+class CostosEventosService:
+    """Edición en lote de líneas de cotización y simulación de escenarios"""
+
+    @staticmethod
+    def editar_lineas(evento_id, agregar=(), actualizar=(), eliminar=()):
+        """
+        Agrega, actualiza y elimina líneas del evento en una sola transacción
+
+        Args:
+            evento_id: ID del evento
+            agregar: lista de dicts como en EventosService.agregar_insumo
+            actualizar: lista de dicts con id y cantidad, costo_unitario y/o notas
+            eliminar: lista de IDs de línea
+
+        Returns:
+            tuple: (success, evento/None, mensaje)
+        """
+        try:
+            agregar, actualizar, eliminar = list(agregar or ()), list(actualizar or ()), list(eliminar or ())
+            if len(agregar) + len(actualizar) + len(eliminar) > MAX_LINEAS_POR_EDICION:
+                return False, None, f'Máximo {MAX_LINEAS_POR_EDICION} líneas por edición'
+
+            evento = Evento.query.get(evento_id)
+            if not evento:
+                return False, None, 'Evento no encontrado'
+
+            # Solo las líneas que se tocan
+            ids_actualizar = [int(cambio['id']) for cambio in actualizar]
+            ids_eliminar = [int(linea_id) for linea_id in eliminar]
+            ids = set(ids_actualizar) | set(ids_eliminar)
+            lineas = {
+                linea.id: linea for linea in EventoInsumo.query.filter(
+                    EventoInsumo.evento_id == evento_id, EventoInsumo.id.in_(ids)
+                )
+            } if ids else {}
+            faltantes = sorted(ids - set(lineas))
+            if faltantes:
+                return False, None, f'Insumo no encontrado: {", ".join(map(str, faltantes))}'
+
+            diferencia = 0.0
+
+            for cambio, linea_id in zip(actualizar, ids_actualizar):
+                linea = lineas[linea_id]
+                valores = {'cantidad': linea.cantidad, 'costo_unitario': linea.costo_unitario, 'notas': linea.notas}
+                _aplicar_cambio_linea(valores, cambio)
+                diferencia += valores['costo_total'] - float(linea.costo_total or 0)
+                for campo, valor in valores.items():
+                    setattr(linea, campo, valor)
+
+            for linea_id in set(ids_eliminar):
+                diferencia -= float(lineas[linea_id].costo_total or 0)
+                db.session.delete(lineas[linea_id])
+
+            referencias = cargar_referencias(agregar)
+            nuevas = [_validar_linea_nueva(data, referencias) for data in agregar]
+            for valores in nuevas:
+                valores['evento_id'] = evento_id
+                diferencia += valores['costo_total']
+            db.session.add_all(EventoInsumo(**valores) for valores in nuevas)
+
+            # Suma atómica en la base: dos ediciones simultáneas no pisan la diferencia de la otra
+            db.session.execute(
+                update(Evento).where(Evento.id == evento_id)
+                .values(costo_insumos=func.coalesce(Evento.costo_insumos, 0) + diferencia)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.refresh(evento)
+            aplicar_totales(evento)
+            db.session.commit()
+
+            return True, evento, (f'{len(nuevas)} agregados, {len(actualizar)} actualizados, '
+                                  f'{len(set(ids_eliminar))} eliminados')
+
+        except (ValueError, TypeError, KeyError) as e:
+            db.session.rollback()
+            return False, None, f'Línea no válida: {e}'
+        except Exception as e:
+            db.session.rollback()
+            return False, None, str(e)
+
+    @staticmethod
+    def simular(evento_id, escenarios):
+        """
+        Totales del evento bajo otros supuestos, sin guardar nada
+
+        Cada escenario puede traer margen_porcentaje, costo_mano_obra, costo_transporte,
+        costo_otros, precio_final, factor_cantidades (multiplica todas las cantidades,
+        redondeando hacia arriba), cantidades ({id de línea: cantidad}), costos_unitarios
+        ({id de línea: costo}), agregar (líneas nuevas) y eliminar (IDs de línea).
+
+        Returns:
+            tuple: (success, {'actual': totales, 'escenarios': [totales + diferencia_propuesta]}, mensaje)
+        """
+        try:
+            if not escenarios:
+                return False, None, 'Se requiere al menos un escenario'
+            if len(escenarios) > MAX_ESCENARIOS_SIMULACION:
+                return False, None, f'Máximo {MAX_ESCENARIOS_SIMULACION} escenarios por solicitud'
+
+            evento = Evento.query.get(evento_id)
+            if not evento:
+                return False, None, 'Evento no encontrado'
+
+            lineas = db.session.execute(
+                select(EventoInsumo.id, EventoInsumo.cantidad, EventoInsumo.costo_unitario)
+                .where(EventoInsumo.evento_id == evento_id)
+            ).all()
+            referencias = cargar_referencias(
+                linea for escenario in escenarios for linea in escenario.get('agregar') or ()
+            )
+
+            base = {
+                'costo_mano_obra': evento.costo_mano_obra, 'costo_transporte': evento.costo_transporte,
+                'costo_otros': evento.costo_otros, 'margen_porcentaje': evento.margen_porcentaje,
+                'precio_final': evento.precio_final, 'anticipo': evento.anticipo
+            }
+            actual = calcular_totales(
+                sum((cantidad or 0) * float(costo_unitario or 0) for _, cantidad, costo_unitario in lineas), **base
+            )
+
+            resultados = []
+            for escenario in escenarios:
+                factor = float(escenario.get('factor_cantidades', 1))
+                cantidades = {int(k): int(v) for k, v in (escenario.get('cantidades') or {}).items()}
+                costos = {int(k): float(v) for k, v in (escenario.get('costos_unitarios') or {}).items()}
+                eliminar = {int(linea_id) for linea_id in escenario.get('eliminar') or ()}
+
+                costo_insumos = 0.0
+                for linea_id, cantidad, costo_unitario in lineas:
+                    if linea_id in eliminar:
+                        continue
+                    cantidad = cantidades.get(linea_id, math.ceil((cantidad or 0) * factor))
+                    costo_insumos += cantidad * costos.get(linea_id, float(costo_unitario or 0))
+                for data in escenario.get('agregar') or ():
+                    costo_insumos += _validar_linea_nueva(data, referencias)['costo_total']
+
+                supuestos = {campo: escenario.get(campo, valor) for campo, valor in base.items()}
+                totales = calcular_totales(costo_insumos, **supuestos)
+                totales['margen_porcentaje'] = float(supuestos['margen_porcentaje'] or MARGEN_POR_DEFECTO)
+                totales['diferencia_propuesta'] = totales['precio_propuesta'] - actual['precio_propuesta']
+                resultados.append({'nombre': escenario.get('nombre'), **totales})
+
+            return True, {'actual': actual, 'escenarios': resultados}, f'{len(resultados)} escenarios calculados'
+
+        except (ValueError, TypeError) as e:
+            return False, None, f'Escenario no válido: {e}'
+        except Exception as e:
+            return False, None, str(e)
@@ -5,24 +5,40 @@ Contiene toda la lógica de negocio relacionada con eventos y cotizaciones
 
 from extensions import db
 from models.evento import Evento, EventoInsumo, ProductoEvento
-from models.inventario import Flor, Contenedor
-from models.producto import Producto
+from models.serializadores import EventoSerializador
+from services.costos_eventos_service import (
+    CostosEventosService, aplicar_totales, sumar_costo_insumos, cargar_referencias, describir_linea
+)
+from services.reservas_service import ReservasService
+from utils.stock_helpers import mover_stock
+from collections import defaultdict
 from datetime import datetime
 
 
+def _lineas_inventario(evento):
+    """Líneas del evento que mueven stock (flores y contenedores)"""
+    return [linea for linea in evento.insumos if linea.tipo_insumo in ('flor', 'contenedor')]
+
+
+def _id_inventario(linea):
+    return linea.flor_id if linea.tipo_insumo == 'flor' else linea.contenedor_id
+
+
 class EventosService:
     """Servicio para operaciones de negocio de eventos"""
 
     @staticmethod
-    def listar_eventos():
+    def listar_eventos(conjunto='lista'):
         """
         Lista todos los eventos ordenados por fecha
 
+        Args:
+            conjunto: conjunto de campos de EventoSerializador
+
         Returns:
-            list: eventos ordenados por fecha descendente
+            generador de dicts: eventos serializados por fecha descendente
         """
-        eventos = Evento.query.order_by(Evento.fecha_evento.desc()).all()
-        return eventos
+        return EventoSerializador.proyectar(Evento.query.order_by(Evento.fecha_evento.desc()), conjunto)
 
     @staticmethod
     def obtener_evento(evento_id):
@@ -37,6 +53,18 @@ class EventosService:
         """
         return Evento.query.get(evento_id)
 
+    @staticmethod
+    def obtener_evento_detalle(evento_id):
+        """
+        Evento serializado con sus insumos (nombre y stock disponible de cada uno),
+        en dos consultas
+
+        Returns:
+            dict: formato de Evento.to_dict() más 'insumos', o None si no existe
+        """
+        query = Evento.query.filter(Evento.id == evento_id)
+        return next(EventoSerializador.proyectar(query, 'detalle'), None)
+
     @staticmethod
     def generar_id_evento():
         """
@@ -119,7 +147,9 @@ class EventosService:
     @staticmethod
     def recalcular_costos_evento(evento):
         """
-        Recalcula los costos totales y precios del evento
+        Recalcula desde cero los costos totales y precios del evento (el costo de
+        insumos se suma en SQL). Las ediciones de líneas no lo usan: ajustan
+        costo_insumos por diferencia (CostosEventosService.editar_lineas)
 
         Args:
             evento: instancia del Evento
@@ -127,28 +157,8 @@ class EventosService:
         Returns:
             None (modifica el evento in-place)
         """
-        # Calcular costo de insumos
-        costo_insumos = sum(insumo.costo_total for insumo in evento.insumos)
-        evento.costo_insumos = costo_insumos
-
-        # Calcular costo total
-        evento.costo_total = (
-            float(evento.costo_insumos or 0) +
-            float(evento.costo_mano_obra or 0) +
-            float(evento.costo_transporte or 0) +
-            float(evento.costo_otros or 0)
-        )
-
-        # Calcular precio propuesta con margen
-        margen_decimal = float(evento.margen_porcentaje or 30) / 100
-        evento.precio_propuesta = evento.costo_total / (1 - margen_decimal) if margen_decimal < 1 else evento.costo_total
-
-        # Si no hay precio final, usar propuesta
-        if not evento.precio_final or evento.precio_final == 0:
-            evento.precio_final = evento.precio_propuesta
-
-        # Calcular saldo
-        evento.saldo = float(evento.precio_final or 0) - float(evento.anticipo or 0)
+        evento.costo_insumos = sumar_costo_insumos(evento.id)
+        aplicar_totales(evento)
 
     @staticmethod
     def actualizar_evento(evento_id, data):
@@ -183,8 +193,8 @@ class EventosService:
             if 'fecha_evento' in data:
                 evento.fecha_evento = datetime.fromisoformat(data['fecha_evento']) if data['fecha_evento'] else None
 
-            # Recalcular costos
-            EventosService.recalcular_costos_evento(evento)
+            # Recalcular totales (las líneas no cambian: basta el costo de insumos guardado)
+            aplicar_totales(evento)
 
             db.session.commit()
 
@@ -201,61 +211,14 @@ class EventosService:
 
         Args:
             evento_id: ID del evento
-            data: dict con tipo_insumo (o insumo_tipo), cantidad, costo_unitario, y referencias específicas
+            data: dict con tipo_insumo (o insumo_tipo), cantidad, costo_unitario (por defecto
+                  el costo del inventario) y referencias específicas
 
         Returns:
             tuple: (success, evento/error, mensaje)
         """
-        try:
-            evento = Evento.query.get(evento_id)
-            if not evento:
-                return False, None, 'Evento no encontrado'
-
-            # Obtener tipo de insumo (acepta ambos nombres para compatibilidad)
-            tipo_insumo = data.get('tipo_insumo') or data.get('insumo_tipo')
-            if not tipo_insumo:
-                return False, None, 'Campo requerido: tipo_insumo'
-
-            cantidad = data.get('cantidad', 1)
-            costo_unitario = data.get('costo_unitario', 0)
-            notas = data.get('notas', '')
-
-            # Crear insumo de evento
-            insumo_evento = EventoInsumo(
-                evento_id=evento_id,
-                tipo_insumo=tipo_insumo,
-                cantidad=cantidad,
-                costo_unitario=costo_unitario,
-                costo_total=costo_unitario * cantidad,
-                notas=notas
-            )
-
-            # Asignar referencias según tipo
-            if tipo_insumo == 'flor' and data.get('flor_id'):
-                insumo_evento.flor_id = str(data['flor_id'])
-            elif tipo_insumo == 'contenedor' and data.get('contenedor_id'):
-                insumo_evento.contenedor_id = str(data['contenedor_id'])
-            elif tipo_insumo == 'producto' and data.get('producto_id'):
-                # Los productos tienen ID numérico
-                insumo_evento.producto_id = int(data['producto_id'])
-            elif tipo_insumo == 'producto_evento' and data.get('producto_evento_id'):
-                insumo_evento.producto_evento_id = int(data['producto_evento_id'])
-            elif tipo_insumo in ['mano_obra', 'transporte', 'otro'] and data.get('nombre_otro'):
-                insumo_evento.nombre_otro = data['nombre_otro']
-
-            db.session.add(insumo_evento)
-
-            # Recalcular costos del evento
-            db.session.flush()  # Para que el insumo esté disponible
-            EventosService.recalcular_costos_evento(evento)
-
-            db.session.commit()
-
-            return True, evento, 'Insumo agregado exitosamente'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, None, str(e)
+        success, evento, mensaje = CostosEventosService.editar_lineas(evento_id, agregar=[data])
+        return success, evento, 'Insumo agregado exitosamente' if success else mensaje
 
     @staticmethod
     def eliminar_evento(evento_id):
@@ -313,28 +276,8 @@ class EventosService:
         Returns:
             tuple: (success, evento/error, mensaje)
         """
-        try:
-            evento = Evento.query.get(evento_id)
-            if not evento:
-                return False, None, 'Evento no encontrado'
-
-            insumo = EventoInsumo.query.get(insumo_id)
-            if not insumo or insumo.evento_id != evento_id:
-                return False, None, 'Insumo no encontrado'
-
-            db.session.delete(insumo)
-            db.session.flush()
-
-            # Recalcular costos
-            EventosService.recalcular_costos_evento(evento)
-
-            db.session.commit()
-
-            return True, evento, 'Insumo eliminado exitosamente'
-
-        except Exception as e:
-            db.session.rollback()
-            return False, None, str(e)
+        success, evento, mensaje = CostosEventosService.editar_lineas(evento_id, eliminar=[insumo_id])
+        return success, evento, 'Insumo eliminado exitosamente' if success else mensaje
 
     @staticmethod
     def cambiar_estado(evento_id, nuevo_estado):
@@ -365,7 +308,10 @@ class EventosService:
     @staticmethod
     def reservar_insumos(evento_id):
         """
-        Reserva los insumos del evento (marca como 'en_evento')
+        Reserva las flores y contenedores del evento (marca como 'en_evento')
+
+        Si el evento tiene fecha, el stock se verifica para esa fecha con el libro de
+        reservas (ReservasService.verificar_evento); si no, contra el disponible de hoy.
 
         Args:
             evento_id: ID del evento
@@ -378,31 +324,48 @@ class EventosService:
             if not evento:
                 return False, None, 'Evento no encontrado'
 
-            reservados = []
-            faltantes = []
-
-            for insumo in evento.insumos:
-                if insumo.insumo_tipo == 'Flor':
-                    flor = Flor.query.get(insumo.insumo_id)
-                    if flor:
-                        if flor.cantidad_disponible >= insumo.cantidad:
-                            flor.cantidad_en_evento += insumo.cantidad
-                            reservados.append(f"Flor {flor.tipo} {flor.color}: {insumo.cantidad}")
-                        else:
-                            faltantes.append(f"Flor {flor.tipo} {flor.color}: necesita {insumo.cantidad}, disponible {flor.cantidad_disponible}")
-                else:  # Contenedor
-                    contenedor = Contenedor.query.get(insumo.insumo_id)
-                    if contenedor:
-                        if contenedor.cantidad_disponible >= insumo.cantidad:
-                            contenedor.cantidad_en_evento += insumo.cantidad
-                            reservados.append(f"Contenedor {contenedor.tipo}: {insumo.cantidad}")
-                        else:
-                            faltantes.append(f"Contenedor {contenedor.tipo}: necesita {insumo.cantidad}, disponible {contenedor.cantidad_disponible}")
-
+            lineas = [
+                linea for linea in _lineas_inventario(evento)
+                if not linea.reservado and not linea.descontado_stock
+            ]
+            referencias = cargar_referencias(lineas)
+
+            if evento.fecha_evento:
+                success, verificacion, mensaje = ReservasService.verificar_evento(evento_id)
+                if not success:
+                    return False, None, mensaje
+                faltantes = [
+                    f"{insumo['insumo_tipo']} {insumo['nombre'] or insumo['insumo_id']}: "
+                    f"necesita {insumo['requerido']}, disponible {insumo['disponible']}"
+                    for insumo in verificacion['insumos'] if insumo['faltante']
+                ]
+            else:
+                requeridos = defaultdict(int)
+                primera_linea = {}
+                for linea in lineas:
+                    clave = (linea.tipo_insumo, _id_inventario(linea))
+                    requeridos[clave] += linea.cantidad or 0
+                    primera_linea.setdefault(clave, linea)
+
+                faltantes = []
+                for (tipo, insumo_id), requerido in requeridos.items():
+                    objeto = referencias.get(tipo, {}).get(insumo_id)
+                    if objeto is not None and objeto.cantidad_disponible < requerido:
+                        faltantes.append(f"{describir_linea(primera_linea[(tipo, insumo_id)], referencias)}: "
+                                         f"necesita {requerido}, disponible {objeto.cantidad_disponible}")
             if faltantes:
-                db.session.rollback()
                 return False, faltantes, 'Stock insuficiente para algunos insumos'
 
+            reservados = []
+            for linea in lineas:
+                objeto = referencias.get(linea.tipo_insumo, {}).get(_id_inventario(linea))
+                if objeto is None:
+                    continue
+                mover_stock(linea.tipo_insumo, objeto.id, en_evento=linea.cantidad or 0)
+                linea.reservado = True
+                reservados.append(f"{describir_linea(linea, referencias)}: {linea.cantidad}")
+            evento.insumos_reservados = True
+
             db.session.commit()
             return True, reservados, 'Insumos reservados exitosamente'
 
@@ -426,22 +389,21 @@ class EventosService:
             if not evento:
                 return False, None, 'Evento no encontrado'
 
+            lineas = [linea for linea in _lineas_inventario(evento) if not linea.descontado_stock]
+            referencias = cargar_referencias(lineas)
             descontados = []
 
-            for insumo in evento.insumos:
-                if insumo.insumo_tipo == 'Flor':
-                    flor = Flor.query.get(insumo.insumo_id)
-                    if flor:
-                        # Reducir de en_evento y de stock
-                        flor.cantidad_en_evento = max(0, flor.cantidad_en_evento - insumo.cantidad)
-                        flor.cantidad_stock = max(0, flor.cantidad_stock - insumo.cantidad)
-                        descontados.append(f"Flor {flor.tipo} {flor.color}: -{insumo.cantidad}")
-                else:  # Contenedor
-                    contenedor = Contenedor.query.get(insumo.insumo_id)
-                    if contenedor:
-                        contenedor.cantidad_en_evento = max(0, contenedor.cantidad_en_evento - insumo.cantidad)
-                        contenedor.stock = max(0, contenedor.stock - insumo.cantidad)
-                        descontados.append(f"Contenedor {contenedor.tipo}: -{insumo.cantidad}")
+            for linea in lineas:
+                objeto = referencias.get(linea.tipo_insumo, {}).get(_id_inventario(linea))
+                if objeto is None:
+                    continue
+                cantidad = linea.cantidad or 0
+                # Reducir de en_evento (si estaba reservado) y de stock, en un UPDATE atómico
+                mover_stock(linea.tipo_insumo, objeto.id, stock=-cantidad,
+                            en_evento=-cantidad if linea.reservado else 0)
+                linea.descontado_stock = True
+                descontados.append(f"{describir_linea(linea, referencias)}: -{cantidad}")
+            evento.insumos_descontados = True
 
             db.session.commit()
             return True, descontados, 'Stock descontado exitosamente'
@@ -466,21 +428,20 @@ class EventosService:
             if not evento:
                 return False, None, 'Evento no encontrado'
 
+            lineas = [
+                linea for linea in _lineas_inventario(evento)
+                if linea.descontado_stock and not linea.devuelto
+            ]
+            referencias = cargar_referencias(lineas)
             devueltos = []
 
-            for insumo in evento.insumos:
-                if insumo.insumo_tipo == 'Flor':
-                    flor = Flor.query.get(insumo.insumo_id)
-                    if flor:
-                        flor.cantidad_en_evento = max(0, flor.cantidad_en_evento - insumo.cantidad)
-                        flor.cantidad_stock += insumo.cantidad
-                        devueltos.append(f"Flor {flor.tipo} {flor.color}: +{insumo.cantidad}")
-                else:  # Contenedor
-                    contenedor = Contenedor.query.get(insumo.insumo_id)
-                    if contenedor:
-                        contenedor.cantidad_en_evento = max(0, contenedor.cantidad_en_evento - insumo.cantidad)
-                        contenedor.stock += insumo.cantidad
-                        devueltos.append(f"Contenedor {contenedor.tipo}: +{insumo.cantidad}")
+            for linea in lineas:
+                objeto = referencias.get(linea.tipo_insumo, {}).get(_id_inventario(linea))
+                if objeto is None:
+                    continue
+                mover_stock(linea.tipo_insumo, objeto.id, stock=linea.cantidad or 0)
+                linea.devuelto = True
+                devueltos.append(f"{describir_linea(linea, referencias)}: +{linea.cantidad}")
 
             db.session.commit()
             return True, devueltos, 'Insumos devueltos al stock'
@@ -742,23 +703,11 @@ class EventosService:
             </thead>
             <tbody>
 """
+            # Flores, contenedores y productos de todas las líneas: una consulta por tipo
+            referencias = cargar_referencias(evento.insumos)
             for insumo in evento.insumos:
                 tipo = insumo.tipo_insumo or 'otro'
-                descripcion = insumo.nombre_otro or f'Insumo {tipo}'
-                
-                # Intentar obtener descripción del insumo
-                if tipo == 'flor' and insumo.flor_id:
-                    flor = Flor.query.get(insumo.flor_id)
-                    if flor:
-                        descripcion = f"{flor.tipo} - {flor.color}"
-                elif tipo == 'contenedor' and insumo.contenedor_id:
-                    contenedor = Contenedor.query.get(insumo.contenedor_id)
-                    if contenedor:
-                        descripcion = f"{contenedor.tipo} - {contenedor.material}"
-                elif tipo == 'producto' and insumo.producto_id:
-                    producto = Producto.query.get(insumo.producto_id)
-                    if producto:
-                        descripcion = producto.nombre or producto.arreglo_pedido or f'Producto {insumo.producto_id}'
+                descripcion = describir_linea(insumo, referencias)
                 
                 cantidad = insumo.cantidad or 0
                 costo_unit = float(insumo.costo_unitario or 0)
@@ -0,0 +1,189 @@
+"""
+Servicio para variantes de imágenes subidas
+Genera miniaturas y versiones WebP de las fotos en segundo plano,
+almacenadas por hash de contenido
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config.imagenes import (
+    TAMANOS_VARIANTES, FORMATOS_VARIANTES, CALIDAD_WEBP, CALIDAD_JPEG, WORKERS_VARIANTES
+)
+
+# Carpetas de almacenamiento
+UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'uploads')
+VARIANTES_FOLDER = os.path.join(UPLOAD_FOLDER, 'variantes')
+# Índice nombre de archivo original -> hash de su contenido (un archivo .sha256 por imagen)
+INDICE_FOLDER = os.path.join(VARIANTES_FOLDER, 'indice')
+
+# Worker en segundo plano para no bloquear la respuesta de la subida
+_executor = ThreadPoolExecutor(max_workers=WORKERS_VARIANTES, thread_name_prefix='variantes-imagen')
+# Imágenes ya encoladas (evita encolar la misma imagen varias veces si muchos clientes la piden)
+_pendientes = set()
+_pendientes_lock = threading.Lock()
+
+
+class ImagenesService:
+    """Servicio para generar y resolver variantes de imágenes"""
+
+    @staticmethod
+    def calcular_hash(filepath):
+        """Calcula el SHA-256 de un archivo leyéndolo por bloques"""
+        sha = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for bloque in iter(lambda: f.read(64 * 1024), b''):
+                sha.update(bloque)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _ruta_indice(filename):
+        return os.path.join(INDICE_FOLDER, f'{filename}.sha256')
+
+    @staticmethod
+    def ruta_variante(hash_contenido, tamano, extension):
+        """Ruta de una variante: variantes/<2 primeros del hash>/<hash>_<tamano>.<ext>"""
+        return os.path.join(VARIANTES_FOLDER, hash_contenido[:2], f'{hash_contenido}_{tamano}.{extension}')
+
+    @staticmethod
+    def obtener_hash(filename):
+        """Obtiene el hash registrado para una imagen original, o None si aún no tiene variantes"""
+        try:
+            with open(ImagenesService._ruta_indice(filename)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    @staticmethod
+    def _escribir_atomico(destino, escribir):
+        """Escribe un archivo vía temporal + os.replace para no servir archivos a medio escribir"""
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        temporal = f'{destino}.{uuid.uuid4().hex}.tmp'
+        try:
+            escribir(temporal)
+            os.replace(temporal, destino)
+        finally:
+            if os.path.exists(temporal):
+                os.remove(temporal)
+
+    @staticmethod
+    def generar_variantes(filename, forzar=False):
+        """
+        Genera las variantes (tamaños x formatos) de una imagen subida
+
+        Args:
+            filename: nombre del archivo original en uploads/
+            forzar: regenerar aunque las variantes ya existan
+
+        Returns:
+            tuple: (success, hash/None, mensaje)
+        """
+        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        if not os.path.isfile(filepath):
+            return False, None, f'Imagen no encontrada: {filename}'
+
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            return False, None, 'Pillow no está instalado, no se generan variantes'
+
+        try:
+            hash_contenido = ImagenesService.calcular_hash(filepath)
+            generadas = 0
+
+            with Image.open(filepath) as original:
+                # Respetar la orientación EXIF de las fotos tomadas con el teléfono
+                imagen = ImageOps.exif_transpose(original)
+
+                for tamano, lado in TAMANOS_VARIANTES.items():
+                    for extension, (formato, _) in FORMATOS_VARIANTES.items():
+                        destino = ImagenesService.ruta_variante(hash_contenido, tamano, extension)
+                        if os.path.exists(destino) and not forzar:
+                            continue
+
+                        variante = imagen.copy()
+                        variante.thumbnail((lado, lado), Image.LANCZOS)
+
+                        if formato == 'JPEG':
+                            variante = variante.convert('RGB')
+                            opciones = {'quality': CALIDAD_JPEG, 'optimize': True, 'progressive': True}
+                        else:
+                            if variante.mode not in ('RGB', 'RGBA'):
+                                variante = variante.convert('RGBA')
+                            opciones = {'quality': CALIDAD_WEBP, 'method': 4}
+
+                        ImagenesService._escribir_atomico(
+                            destino, lambda ruta: variante.save(ruta, formato, **opciones)
+                        )
+                        generadas += 1
+
+            # Registrar el hash al final: solo se resuelven variantes completas
+            def escribir_indice(ruta):
+                with open(ruta, 'w') as f:
+                    f.write(hash_contenido)
+            ImagenesService._escribir_atomico(ImagenesService._ruta_indice(filename), escribir_indice)
+
+            return True, hash_contenido, f'{generadas} variantes generadas para {filename}'
+
+        except Exception as e:
+            return False, None, f'Error al generar variantes de {filename}: {str(e)}'
+
+    @staticmethod
+    def _generar_en_segundo_plano(filename):
+        try:
+            success, _, mensaje = ImagenesService.generar_variantes(filename)
+            if not success:
+                print(f"⚠️ {mensaje}")
+        finally:
+            with _pendientes_lock:
+                _pendientes.discard(filename)
+
+    @staticmethod
+    def encolar_variantes(filename):
+        """Encola la generación de variantes de una imagen en el worker de segundo plano"""
+        if not filename or not os.path.isfile(os.path.join(UPLOAD_FOLDER, filename)):
+            return
+        with _pendientes_lock:
+            if filename in _pendientes:
+                return
+            _pendientes.add(filename)
+        _executor.submit(ImagenesService._generar_en_segundo_plano, filename)
+
+    @staticmethod
+    def eliminar_variantes(hash_contenido, filename=None):
+        """Elimina las variantes de un contenido (y la entrada de índice del archivo, si se indica)"""
+        for tamano in TAMANOS_VARIANTES:
+            for extension in FORMATOS_VARIANTES:
+                ruta = ImagenesService.ruta_variante(hash_contenido, tamano, extension)
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        if filename and os.path.exists(ImagenesService._ruta_indice(filename)):
+            os.remove(ImagenesService._ruta_indice(filename))
+
+    @staticmethod
+    def resolver_variante(filename, tamano, acepta_webp=True):
+        """
+        Busca la variante ya generada de una imagen
+
+        Args:
+            filename: nombre del archivo original
+            tamano: clave de TAMANOS_VARIANTES
+            acepta_webp: si el cliente acepta image/webp
+
+        Returns:
+            tuple: (ruta, etag, mimetype) o None si la variante no existe todavía
+        """
+        hash_contenido = ImagenesService.obtener_hash(filename)
+        if not hash_contenido:
+            return None
+
+        extensiones = ['webp', 'jpg'] if acepta_webp else ['jpg']
+        for extension in extensiones:
+            ruta = ImagenesService.ruta_variante(hash_contenido, tamano, extension)
+            if os.path.isfile(ruta):
+                mimetype = FORMATOS_VARIANTES[extension][1]
+                return ruta, f'{hash_contenido}-{tamano}-{extension}', mimetype
+
+        return None
@@ -0,0 +1,651 @@
+"""
+Importación masiva de clientes, productos y pedidos (exportaciones de Shopify y Trello)
+
+El archivo (CSV con encabezado o JSONL, un objeto por línea) se lee con pandas de
+a TAMANO_LOTE_IMPORTACION filas. Cada lote se valida y transforma por columnas
+completas, sin recorrer fila a fila, y se escribe con un INSERT/UPDATE de Core por
+tabla (executemany). Cada lote se confirma en su propia transacción: si algo falla
+a mitad de archivo, los lotes anteriores quedan guardados y al volver a importar
+el mismo archivo se omiten.
+
+Claves con que se reconocen las filas ya importadas:
+- clientes: teléfono normalizado; sin teléfono, email; sin ninguno, nombre
+- productos (catálogo de Shopify): nombre sin distinguir mayúsculas; los existentes
+  se actualizan y se les agregan las imágenes que no tenían. Los nuevos con un
+  nombre casi igual a otro del catálogo se listan en posibles_duplicados
+- pedidos: shopify_order_number; sin él, numero_pedido + fecha de entrega +
+  cliente + arreglo + precio (numero_pedido de Trello se repite entre pedidos),
+  más la posición de la fila entre las del archivo con esa misma clave. Un pedido
+  con varias líneas (arreglos distintos bajo un mismo n_pedido) repite la clave:
+  la fila k-ésima se omite solo si la base ya tiene k pedidos con esa clave
+
+Las escrituras con Core no pasan por los hooks de la sesión: después de cada lote
+de pedidos se suma su aporte a las estadísticas de los clientes, se registran
+los pedidos en el feed del tablero y se invalidan las cachés afectadas.
+"""
+
+import json
+import time
+from collections import Counter
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from extensions import db
+from models.cliente import Cliente
+from models.pedido import Pedido
+from models.catalogo import ProductoCatalogo, ImagenProductoCatalogo
+from config.importacion import (
+    TAMANO_LOTE_IMPORTACION, MAX_ERRORES_REPORTADOS, FORMATOS_IMPORTACION,
+    ESTADOS_PEDIDO_TRELLO, ESTADO_PEDIDO_DEFECTO, ESTADOS_PAGO_TRELLO, ESTADO_PAGO_DEFECTO,
+    METAFIELDS_SHOPIFY
+)
+from services.cambios_pedidos_service import registrar_cambios
+from services.clientes_service import sumar_pedidos_nuevos
+from services.pedidos_service import invalidar_cache_rutas
+from utils.cache_helpers import marcar_etiquetas_modificadas
+from utils.fecha_helpers import obtener_dia_semana
+from utils.similitud_helpers import IndiceSimilitud
+
+try:
+    import pandas as pd  # Dependencia opcional: sin ella la importación masiva no está disponible
+except ImportError:
+    pd = None
+
+
+TIPOS_IMPORTACION = ('clientes', 'productos', 'pedidos')
+
+# Valores que las exportaciones usan para celdas vacías
+_VACIOS = ('nan', 'NaN', 'None', 'null')
+
+
+# ===== LECTURA Y LIMPIEZA POR COLUMNAS =====
+
+def _leer_lotes(archivo, formato, tamano_lote):
+    """
+    DataFrames de texto (celdas vacías como '') de a tamano_lote filas; el índice
+    es el número de fila del archivo sin contar el encabezado (desde 1)
+    """
+    if formato == 'jsonl':
+        lector = pd.read_json(archivo, lines=True, chunksize=tamano_lote, dtype=False,
+                              convert_dates=False, keep_default_dates=False)
+    else:
+        lector = pd.read_csv(archivo, dtype=str, keep_default_na=False, chunksize=tamano_lote,
+                             encoding='utf-8-sig')
+    fila = 1
+    with lector:
+        for lote in lector:
+            lote = lote.fillna('').astype(str)
+            lote.columns = lote.columns.str.strip()
+            lote.index = pd.RangeIndex(fila, fila + len(lote))
+            fila += len(lote)
+            yield lote
+
+
+def _texto(lote, columna):
+    """Columna sin espacios en los extremos ('' si el archivo no la trae)"""
+    if columna not in lote.columns:
+        return pd.Series('', index=lote.index, dtype=object)
+    serie = lote[columna].str.strip()
+    return serie.mask(serie.isin(_VACIOS), '')
+
+
+def _montos(serie):
+    """
+    Montos numéricos ('$9.500', '9500', '9500.0', '12,5'); NaN si no se entienden.
+    El punto solo se toma como separador de miles en el formato 9.500 / 1.250.000
+    """
+    texto = serie.str.replace(r'[$\s]', '', regex=True)
+    miles = texto.str.fullmatch(r'\d{1,3}(\.\d{3})+(,\d+)?')
+    texto = texto.mask(miles, texto.str.replace('.', '', regex=False))
+    return pd.to_numeric(texto.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def _fechas(serie):
+    """Fechas en AAAA-MM-DD, DD/MM/AAAA o ISO 8601 (con hora); NaT si no se entienden"""
+    fechas = pd.to_datetime(serie, format='%Y-%m-%d', errors='coerce')
+    for formato in ('%d/%m/%Y', 'ISO8601'):
+        faltan = fechas.isna() & (serie != '')
+        if not faltan.any():
+            break
+        convertidas = pd.to_datetime(serie[faltan], format=formato, errors='coerce', utc=True)
+        fechas[faltan] = convertidas.dt.tz_localize(None)
+    return fechas
+
+
+def _telefonos(serie):
+    """Primer contacto normalizado como normalizar_telefono() (solo dígitos y +)"""
+    return serie.str.split(',').str[0].str.replace(r'[^\d+]', '', regex=True)
+
+
+def _marcar(errores, mascara, mensaje):
+    """Anota el mensaje en las filas de la máscara que aún no tienen error"""
+    errores[mascara & (errores == '')] = mensaje
+
+
+def _registros(datos):
+    """Filas del DataFrame como dicts para executemany ('' y NaN/NaT como NULL)"""
+    datos = datos.astype(object)
+    return datos.where(datos.notna() & (datos != ''), None).to_dict('records')
+
+
+def _anotar_errores(resumen, errores, claves=None):
+    con_error = errores[errores != '']
+    resumen['con_errores'] += len(con_error)
+    for fila, mensaje in con_error.items():
+        if len(resumen['errores']) >= MAX_ERRORES_REPORTADOS:
+            break
+        error = {'fila': int(fila), 'error': mensaje}
+        if claves is not None and claves[fila]:
+            error['clave'] = claves[fila]
+        resumen['errores'].append(error)
+
+
+# ===== CLIENTES =====
+
+def _cargar_mapa_clientes():
+    """
+    Clientes existentes por teléfono normalizado, email y nombre (una consulta de
+    columnas); ante duplicados queda el de menor id, como en buscar_o_crear_cliente
+    """
+    filas = db.session.execute(
+        select(Cliente.id, Cliente.telefono, Cliente.email, Cliente.nombre).order_by(Cliente.id)
+    ).all()
+    clientes = pd.DataFrame(filas, columns=['id', 'telefono', 'email', 'nombre'], dtype=object).fillna('')
+
+    mapa = {}
+    claves = {
+        'telefono': _telefonos(clientes['telefono'].astype(str)),
+        'email': clientes['email'].astype(str).str.strip().str.lower(),
+        'nombre': clientes['nombre'].astype(str).str.strip().str.upper(),
+    }
+    for nombre_mapa, serie in claves.items():
+        validos = serie != ''
+        # Invertido: en el dict queda la última aparición, o sea el menor id
+        mapa[nombre_mapa] = dict(zip(serie[validos][::-1], clientes['id'][validos][::-1]))
+
+    ids = clientes['id'].astype(str)
+    numeros = ids[ids.str.startswith('CLI')].str[3:].str.extract(r'(\d+)', expand=False).dropna().astype(int)
+    mapa['siguiente'] = int(numeros.max()) + 1 if len(numeros) else 1
+    return mapa
+
+
+def _resolver_clientes(mapa, telefono, email, nombre):
+    """Id de cliente existente por teléfono; sin teléfono, por email o nombre (NaN si no hay)"""
+    ids = telefono.map(mapa['telefono'])
+    sin_telefono = telefono == ''
+    ids = ids.mask(sin_telefono & (email != ''), email.map(mapa['email']))
+    ids = ids.mask(sin_telefono & ids.isna() & (nombre != ''), nombre.map(mapa['nombre']))
+    return ids
+
+
+def _crear_clientes(mapa, nuevos, simular):
+    """Inserta los clientes nuevos (DataFrame sin duplicados) con ids CLI correlativos"""
+    inicio = mapa['siguiente']
+    mapa['siguiente'] += len(nuevos)
+    nuevos = nuevos.assign(id=[f'CLI{numero:03d}' for numero in range(inicio, mapa['siguiente'])])
+    if not simular and len(nuevos):
+        db.session.execute(insert(Cliente.__table__), _registros(nuevos))
+
+    for nombre_mapa, columna, normalizar in (
+        ('telefono', 'telefono', lambda s: s),
+        ('email', 'email', lambda s: s.str.lower()),
+        ('nombre', 'nombre', lambda s: s.str.upper()),
+    ):
+        if columna in nuevos.columns:
+            claves = normalizar(nuevos[columna].fillna(''))
+            validos = claves != ''
+            for clave, cliente_id in zip(claves[validos], nuevos['id'][validos]):
+                mapa[nombre_mapa].setdefault(clave, cliente_id)
+    return nuevos
+
+
+def _importar_lote_clientes(lote, contexto, resumen, simular):
+    """Clientes de la exportación de Shopify (customers_export.csv)"""
+    if 'clientes' not in contexto:
+        contexto['clientes'] = _cargar_mapa_clientes()
+    mapa = contexto['clientes']
+
+    nombre = (_texto(lote, 'First Name') + ' ' + _texto(lote, 'Last Name')).str.strip()
+    email = _texto(lote, 'Email').str.lower()
+    telefono = _telefonos(_texto(lote, 'Phone').str.lstrip("'"))
+    telefono = telefono.mask(telefono == '', _telefonos(_texto(lote, 'Default Address Phone').str.lstrip("'")))
+    direccion = (_texto(lote, 'Default Address Address1') + ', ' + _texto(lote, 'Default Address City')).str.strip(', ')
+
+    errores = pd.Series('', index=lote.index, dtype=object)
+    _marcar(errores, (nombre == '') & (email == '') & (telefono == ''), 'Cliente sin nombre, email ni teléfono')
+    _marcar(errores, (email != '') & ~email.str.contains('@', regex=False), 'Email no válido')
+    _anotar_errores(resumen, errores, email.where(email != '', telefono))
+
+    clientes = pd.DataFrame({
+        'nombre': nombre.mask(nombre == '', email).replace('', 'Sin nombre').str.slice(0, 200),
+        'telefono': telefono,
+        'email': email,
+        'direccion_principal': direccion,
+        'notas': _texto(lote, 'Note'),
+        'tipo_cliente': 'Nuevo',
+    })[errores == '']
+
+    # Clave del cliente en el lote: el mismo cliente puede venir repetido
+    nombre_clave = clientes['nombre'].str.upper().where(clientes['email'] == '', '')
+    clave = clientes['telefono'].mask(clientes['telefono'] == '', 'E:' + clientes['email'])
+    clave = clave.mask(clave == 'E:', 'N:' + nombre_clave)
+    repetidos = clave.duplicated()
+    existentes = _resolver_clientes(mapa, clientes['telefono'], clientes['email'], nombre_clave)
+    resumen['omitidas'] += int(repetidos.sum())
+
+    # Existentes: solo se completan email y dirección si estaban vacíos
+    actualizar = clientes.assign(b_id=existentes)[existentes.notna() & ~repetidos]
+    if len(actualizar):
+        if not simular:
+            tabla = Cliente.__table__
+            db.session.execute(
+                update(tabla).where(tabla.c.id == bindparam('b_id')).values(
+                    email=func.coalesce(func.nullif(tabla.c.email, ''), bindparam('b_email')),
+                    direccion_principal=func.coalesce(
+                        func.nullif(tabla.c.direccion_principal, ''), bindparam('b_direccion')
+                    ),
+                ),
+                _registros(actualizar.rename(columns={'email': 'b_email', 'direccion_principal': 'b_direccion'})
+                           [['b_id', 'b_email', 'b_direccion']])
+            )
+        resumen['actualizadas'] += len(actualizar)
+
+    nuevos = clientes[existentes.isna() & ~repetidos]
+    _crear_clientes(mapa, nuevos, simular)
+    resumen['insertadas'] += len(nuevos)
+    if not simular:
+        marcar_etiquetas_modificadas(db.session, 'clientes')
+
+
+# ===== PRODUCTOS =====
+
+def _agrupar_por_handle(lotes):
+    """
+    Reordena los lotes para que las filas de un mismo producto (Handle) no queden
+    repartidas entre dos lotes: Shopify las exporta contiguas
+    """
+    pendiente = None
+    for lote in lotes:
+        if pendiente is not None:
+            lote = pd.concat([pendiente, lote])
+        handles = _texto(lote, 'Handle')
+        ultimo = handles.iloc[-1]
+        pendiente = lote[handles == ultimo]
+        completo = lote[handles != ultimo]
+        if len(completo):
+            yield completo
+    if pendiente is not None and len(pendiente):
+        yield pendiente
+
+
+def _importar_lote_productos(lote, contexto, resumen, simular):
+    """
+    Productos de la exportación de Shopify (products_export_1.csv: una fila por
+    variante o imagen) al catálogo: productos e imágenes del esquema catalogo
+    """
+    if 'productos' not in contexto:
+        filas = db.session.execute(
+            select(ProductoCatalogo.id, ProductoCatalogo.nombre).order_by(ProductoCatalogo.id)
+        ).all()
+        contexto['productos'] = {}
+        for producto_id, nombre in filas:
+            contexto['productos'].setdefault((nombre or '').strip().lower(), producto_id)
+        contexto['indice_productos'] = IndiceSimilitud(filas)
+    existentes = contexto['productos']
+    indice = contexto['indice_productos']
+
+    handle = _texto(lote, 'Handle')
+    imagenes = pd.DataFrame({
+        'handle': handle,
+        'url': _texto(lote, 'Image Src'),
+        'posicion': pd.to_numeric(_texto(lote, 'Image Position'), errors='coerce').fillna(999).astype(int),
+        'alt_text': _texto(lote, 'Image Alt Text'),
+    })
+    imagenes = imagenes[imagenes['url'] != ''].sort_values('posicion', kind='stable').drop_duplicates(['handle', 'url'])
+
+    # La fila base de cada producto es la que trae el título
+    base = lote[(_texto(lote, 'Title') != '') & (handle != '')]
+    base = base[~_texto(base, 'Handle').duplicated()]
+    precio_txt = _texto(base, 'Variant Price')
+    precio = _montos(precio_txt)
+    errores = pd.Series('', index=base.index, dtype=object)
+    _marcar(errores, (precio_txt != '') & precio.isna(), 'Variant Price no válido')
+    _marcar(errores, precio < 0, 'Precio negativo')
+    _anotar_errores(resumen, errores, _texto(base, 'Handle'))
+
+    metafields = pd.DataFrame({clave: _texto(base, columna) for columna, clave in METAFIELDS_SHOPIFY.items()})
+    productos = pd.DataFrame({
+        'handle': _texto(base, 'Handle'),
+        'nombre': _texto(base, 'Title'),
+        'descripcion': _texto(base, 'Body (HTML)'),
+        'precio': precio,
+        'categoria': _texto(base, 'Product Category'),
+        'tipo': _texto(base, 'Type'),
+        'imagen_url': _texto(base, 'Handle').map(imagenes.drop_duplicates('handle').set_index('handle')['url']),
+        'sku': _texto(base, 'Variant SKU'),
+        'peso': pd.to_numeric(_texto(base, 'Variant Grams'), errors='coerce'),
+        'tags': _texto(base, 'Tags'),
+        'metafields': [
+            json.dumps({k: v for k, v in fila.items() if v}, ensure_ascii=False) if any(fila.values()) else ''
+            for fila in metafields.to_dict('records')
+        ],
+        'activo': _texto(base, 'Status').str.lower().isin(['active', '']),
+    }, index=base.index)[errores == '']
+
+    claves = productos['nombre'].str.lower()
+    repetidos = claves.duplicated()
+    ids = claves.map(existentes)
+    resumen['omitidas'] += int(repetidos.sum())
+
+    actualizar = productos.assign(b_id=ids)[ids.notna() & ~repetidos]
+    nuevos = productos[ids.isna() & ~repetidos]
+    resumen['actualizadas'] += len(actualizar)
+    resumen['insertadas'] += len(nuevos)
+
+    # Productos nuevos con un nombre casi igual a otro del catálogo: para revisar a mano
+    for fila, nombre in nuevos['nombre'].items():
+        similares = indice.buscar(nombre)
+        if similares and len(resumen['posibles_duplicados']) < MAX_ERRORES_REPORTADOS:
+            resumen['posibles_duplicados'].append({
+                'fila': int(fila), 'nombre': nombre, 'similar_a': similares[0]
+            })
+
+    if simular:
+        for nombre in nuevos['nombre']:
+            existentes.setdefault(nombre.lower(), 0)
+            indice.agregar(0, nombre)
+        return
+
+    tabla = ProductoCatalogo.__table__
+    columnas = [c for c in productos.columns if c not in ('handle', 'nombre')]
+    if len(actualizar):
+        # Las celdas vacías del archivo no borran lo que ya tiene el producto
+        db.session.execute(
+            update(tabla).where(tabla.c.id == bindparam('b_id')).values(
+                {columna: func.coalesce(bindparam(f'b_{columna}'), tabla.c[columna]) for columna in columnas}
+            ),
+            _registros(actualizar.rename(columns={c: f'b_{c}' for c in columnas})[['b_id'] + [f'b_{c}' for c in columnas]])
+        )
+    producto_por_handle = dict(zip(actualizar['handle'], actualizar['b_id'].astype(int)))
+    if len(nuevos):
+        insertados = db.session.execute(
+            insert(tabla).returning(tabla.c.id), _registros(nuevos.drop(columns='handle'))
+        ).scalars().all()
+        producto_por_handle.update(zip(nuevos['handle'], insertados))
+        existentes.update(zip(nuevos['nombre'].str.lower(), insertados))
+        for producto_id, nombre in zip(insertados, nuevos['nombre']):
+            indice.agregar(producto_id, nombre)
+
+    # Imágenes: solo las que el producto aún no tiene; la principal, si no tenía ninguna
+    imagenes = imagenes.assign(producto_id=imagenes['handle'].map(producto_por_handle)).dropna(subset=['producto_id'])
+    if len(imagenes):
+        tabla_imagenes = ImagenProductoCatalogo.__table__
+        guardadas = pd.DataFrame(db.session.execute(
+            select(tabla_imagenes.c.producto_id, tabla_imagenes.c.url)
+            .where(tabla_imagenes.c.producto_id.in_(set(producto_por_handle.values())))
+        ).all(), columns=['producto_id', 'url'])
+        imagenes = imagenes.astype({'producto_id': int})
+        nuevas = imagenes.merge(guardadas, on=['producto_id', 'url'], how='left', indicator=True)
+        nuevas = nuevas[nuevas['_merge'] == 'left_only']
+        nuevas['es_principal'] = ~nuevas['producto_id'].isin(guardadas['producto_id']) & ~nuevas['producto_id'].duplicated()
+        if len(nuevas):
+            db.session.execute(
+                insert(tabla_imagenes),
+                _registros(nuevas[['producto_id', 'url', 'posicion', 'alt_text', 'es_principal']])
+            )
+    marcar_etiquetas_modificadas(db.session, 'productos')
+
+
+# ===== PEDIDOS =====
+
+def _claves_pedidos(pedidos):
+    """Clave de idempotencia de cada pedido, sin la posición (ver docstring del módulo)"""
+    natural = (
+        'T:' + pedidos['numero_pedido'] + '|' + pedidos['fecha_entrega'].dt.strftime('%Y-%m-%d').fillna('')
+        + '|' + pedidos['cliente_nombre'].str.upper() + '|' + pedidos['arreglo_pedido'].str.upper()
+        + '|' + pedidos['precio_ramo'].round(2).astype(float).astype(str)
+    )
+    return natural.mask(pedidos['shopify_order_number'] != '', 'S:' + pedidos['shopify_order_number'])
+
+
+def _contar_existentes(pedidos):
+    """Cuántos pedidos hay en la base de datos con cada clave del lote (dos consultas)"""
+    existentes = Counter()
+    shopify = set(pedidos['shopify_order_number']) - {''}
+    if shopify:
+        existentes.update({
+            f'S:{numero}': cantidad for numero, cantidad in db.session.execute(
+                select(Pedido.shopify_order_number, func.count())
+                .where(Pedido.shopify_order_number.in_(shopify))
+                .group_by(Pedido.shopify_order_number)
+            )
+        })
+
+    numeros = set(pedidos.loc[pedidos['shopify_order_number'] == '', 'numero_pedido'])
+    if numeros:
+        filtro_numero = Pedido.numero_pedido.in_(numeros - {''})
+        if '' in numeros:
+            filtro_numero = or_(filtro_numero, func.coalesce(Pedido.numero_pedido, '') == '')
+        filas = db.session.execute(
+            select(Pedido.numero_pedido, Pedido.fecha_entrega, Pedido.cliente_nombre,
+                   Pedido.arreglo_pedido, Pedido.precio_ramo)
+            .where(filtro_numero, func.coalesce(Pedido.shopify_order_number, '') == '')
+        ).all()
+        existentes.update(
+            f"T:{numero or ''}|{fecha_entrega.strftime('%Y-%m-%d') if fecha_entrega else ''}"
+            f"|{(cliente_nombre or '').upper()}|{(arreglo or '').upper()}|{round(float(precio or 0), 2)}"
+            for numero, fecha_entrega, cliente_nombre, arreglo, precio in filas
+        )
+    return existentes
+
+
+def _importar_lote_pedidos(lote, contexto, resumen, simular):
+    """Pedidos de la exportación de Trello (pedidos_trello_COMPLETO.csv)"""
+    if 'clientes' not in contexto:
+        contexto['clientes'] = _cargar_mapa_clientes()
+        contexto['existentes'] = {}
+        contexto['ocurrencias'] = Counter()
+        contexto['clientes_creados'] = 0
+    mapa = contexto['clientes']
+
+    fecha_creacion_txt, fecha_entrega_txt = _texto(lote, 'fecha_creacion'), _texto(lote, 'fecha_entrega')
+    fecha_creacion, fecha_entrega = _fechas(fecha_creacion_txt), _fechas(fecha_entrega_txt)
+    precio_txt, envio_txt = _texto(lote, 'precio'), _texto(lote, 'envio')
+    precio, envio = _montos(precio_txt), _montos(envio_txt)
+
+    errores = pd.Series('', index=lote.index, dtype=object)
+    _marcar(errores, (fecha_entrega_txt != '') & fecha_entrega.isna(), 'fecha_entrega no válida')
+    _marcar(errores, (fecha_creacion_txt != '') & fecha_creacion.isna(), 'fecha_creacion no válida')
+    _marcar(errores, fecha_entrega.isna() & fecha_creacion.isna(), 'Sin fecha de entrega ni de creación')
+    _marcar(errores, (precio_txt != '') & precio.isna(), 'precio no válido')
+    _marcar(errores, (envio_txt != '') & envio.isna(), 'envio no válido')
+    _marcar(errores, (precio < 0) | (envio < 0), 'Montos negativos')
+    _anotar_errores(resumen, errores, _texto(lote, 'n_pedido').mask(lambda s: s == '', _texto(lote, 'id_pedido')))
+
+    nombre = _texto(lote, 'cliente')
+    telefono = _telefonos(_texto(lote, 'contacto'))
+    email = _texto(lote, 'correo_cliente').str.split(',').str[0].str.strip().str.lower()
+    direccion = _texto(lote, 'direccion')
+    retiro = (_texto(lote, 'tipo_entrega').str.upper() == 'RETIRO') | direccion.str.upper().str.contains('RETIRO', regex=False)
+    direccion = direccion.mask(retiro, 'RETIRO EN TIENDA').replace('', 'Sin dirección')
+    producto = _texto(lote, 'producto_catalogo')
+    fecha_entrega = fecha_entrega.fillna(fecha_creacion)
+    canal = _texto(lote, 'canal').str.lower().str.contains('shopify', regex=False)
+
+    pedidos = pd.DataFrame({
+        'numero_pedido': _texto(lote, 'id_pedido'),
+        'shopify_order_number': _texto(lote, 'n_pedido'),
+        'fecha_pedido': fecha_creacion.fillna(fecha_entrega),
+        'fecha_entrega': fecha_entrega,
+        'dia_entrega': fecha_entrega.map(lambda fecha: obtener_dia_semana(fecha) if pd.notna(fecha) else None),
+        'canal': canal.map({True: 'Shopify', False: 'WhatsApp'}),
+        'cliente_nombre': nombre.replace('', 'Cliente sin nombre'),
+        'cliente_telefono': telefono.replace('', 'Sin teléfono'),
+        'cliente_email': email,
+        'arreglo_pedido': producto.mask(producto == '', _texto(lote, 'producto')),
+        'detalles_adicionales': _texto(lote, 'detalles_cliente'),
+        'precio_ramo': precio.fillna(0),
+        'precio_envio': envio.fillna(0),
+        'destinatario': _texto(lote, 'para'),
+        'mensaje': _texto(lote, 'mensaje'),
+        'firma': _texto(lote, 'firma'),
+        'direccion_entrega': direccion,
+        'comuna': _texto(lote, 'comuna'),
+        'motivo': _texto(lote, 'motivo_pedido'),
+        'estado': _texto(lote, 'estado_pedido').str.upper().map(ESTADOS_PEDIDO_TRELLO).fillna(ESTADO_PEDIDO_DEFECTO),
+        'estado_pago': _texto(lote, 'estado_pago').str.upper().map(ESTADOS_PAGO_TRELLO).fillna(ESTADO_PAGO_DEFECTO),
+        'tipo_pedido': _texto(lote, 'tipo_producto'),
+        'cobranza': _texto(lote, 'notas_cobranza'),
+        'metodo_pago': _texto(lote, 'metodo_pago').replace('', 'Pendiente'),
+        'documento_tributario': _texto(lote, 'tipo_documento').replace('', 'No requiere'),
+    })
+    validos = errores == ''
+    pedidos, nombre, telefono, email = pedidos[validos], nombre[validos], telefono[validos], email[validos]
+
+    # Idempotencia: la fila k-ésima con una clave ya está importada si la base tenía al
+    # menos k pedidos con esa clave antes de esta importación. Las cantidades se leen la
+    # primera vez que aparece cada clave, antes de insertar ninguna fila con ella
+    claves = _claves_pedidos(pedidos)
+    existentes, ocurrencias = contexto['existentes'], contexto['ocurrencias']
+    sin_contar = ~claves.isin(existentes.keys())
+    if sin_contar.any():
+        contadas = _contar_existentes(pedidos[sin_contar])
+        existentes.update((clave, contadas[clave]) for clave in claves[sin_contar])
+    posicion = claves.map(ocurrencias).fillna(0).astype(int) + claves.groupby(claves).cumcount()
+    ya_importados = posicion < claves.map(existentes)
+    ocurrencias.update(claves)
+    resumen['omitidas'] += int(ya_importados.sum())
+    pedidos, nombre, telefono, email = (
+        pedidos[~ya_importados], nombre[~ya_importados], telefono[~ya_importados], email[~ya_importados]
+    )
+    if pedidos.empty:
+        return
+
+    # Clientes: existentes en una pasada por los mapas; los que faltan se crean en bloque
+    nombre_clave = nombre.str.upper()
+    cliente_id = _resolver_clientes(mapa, telefono, pd.Series('', index=pedidos.index), nombre_clave)
+    faltan = cliente_id.isna() & ((telefono != '') | (nombre != ''))
+    if faltan.any():
+        clave_cliente = telefono.mask(telefono == '', 'N:' + nombre_clave)[faltan]
+        nuevos = pd.DataFrame({
+            'clave': clave_cliente,
+            'nombre': pedidos['cliente_nombre'][faltan].str.slice(0, 200),
+            'telefono': telefono[faltan],
+            'email': email[faltan],
+            'fecha_registro': pedidos['fecha_pedido'][faltan],
+            'tipo_cliente': 'Nuevo',
+        }).sort_values('fecha_registro', kind='stable').drop_duplicates('clave')
+        creados = _crear_clientes(mapa, nuevos.drop(columns='clave'), simular)
+        contexto['clientes_creados'] += len(creados)
+        cliente_id = cliente_id.fillna(clave_cliente.map(dict(zip(nuevos['clave'], creados['id']))))
+    pedidos = pedidos.assign(cliente_id=cliente_id)
+
+    resumen['insertadas'] += len(pedidos)
+    resumen['clientes_creados'] = contexto['clientes_creados']
+    if simular:
+        return
+
+    tabla = Pedido.__table__
+    insertados = db.session.execute(
+        insert(tabla).returning(tabla.c.id, tabla.c.estado, tabla.c.fecha_entrega), _registros(pedidos)
+    ).all()
+
+    # Los pedidos solo se agregan: a cada cliente se le suma su aporte (ver clientes_service)
+    activos_cliente = pedidos[pedidos['cliente_id'].notna() & (pedidos['estado'] != 'Cancelado')]
+    aportes = activos_cliente.assign(
+        monto=activos_cliente['precio_ramo'] + activos_cliente['precio_envio']
+    ).groupby('cliente_id').agg(
+        cantidad=('monto', 'size'), monto=('monto', 'sum'), fecha=('fecha_pedido', 'max')
+    )
+    sumar_pedidos_nuevos(
+        (cliente_id, fila.cantidad, fila.monto, fila.fecha.to_pydatetime())
+        for cliente_id, fila in aportes.iterrows()
+    )
+    # El tablero y las rutas no muestran pedidos archivados
+    activos = [(pedido_id, estado, fecha) for pedido_id, estado, fecha in insertados if estado != 'Archivado']
+    registrar_cambios((pedido_id, 'creado', estado) for pedido_id, estado, _ in activos)
+    contexto.setdefault('fechas_rutas', set()).update(fecha.date() for _, _, fecha in activos if fecha)
+
+
+_IMPORTADORES = {
+    'clientes': _importar_lote_clientes,
+    'productos': _importar_lote_productos,
+    'pedidos': _importar_lote_pedidos,
+}
+
+
+class ImportacionService:
+    """Servicio de importación masiva desde archivos CSV o JSONL"""
+
+    @staticmethod
+    def importar(tipo, archivo, formato='csv', simular=False, tamano_lote=TAMANO_LOTE_IMPORTACION, progreso=None):
+        """
+        Importa un archivo por lotes, una transacción por lote
+
+        Args:
+            tipo: 'clientes' (Shopify), 'productos' (Shopify) o 'pedidos' (Trello)
+            archivo: ruta o archivo abierto en modo binario
+            formato: 'csv' (con encabezado) o 'jsonl' (un objeto por línea, mismas columnas)
+            simular: validar y contar sin escribir nada
+            tamano_lote: filas por lote
+            progreso: función opcional que recibe el resumen parcial después de cada lote
+
+        Returns:
+            tuple: (success, resumen_dict, mensaje)
+        """
+        if pd is None:
+            return False, {}, 'La importación masiva requiere pandas (ver requirements.txt)'
+        if tipo not in _IMPORTADORES:
+            return False, {}, f'Tipo de importación no válido: {tipo}. Válidos: {", ".join(TIPOS_IMPORTACION)}'
+        if formato not in FORMATOS_IMPORTACION:
+            return False, {}, f'Formato no válido: {formato}. Válidos: {", ".join(FORMATOS_IMPORTACION)}'
+
+        resumen = {
+            'tipo': tipo,
+            'simulacion': simular,
+            'lotes': 0,
+            'procesadas': 0,
+            'insertadas': 0,
+            'actualizadas': 0,
+            'omitidas': 0,
+            'con_errores': 0,
+            'errores': [],
+        }
+        if tipo == 'pedidos':
+            resumen['clientes_creados'] = 0
+        elif tipo == 'productos':
+            resumen['posibles_duplicados'] = []
+
+        importar_lote = _IMPORTADORES[tipo]
+        contexto = {}
+        inicio = time.monotonic()
+        lotes = _leer_lotes(archivo, formato, max(1, int(tamano_lote)))
+        if tipo == 'productos':
+            lotes = _agrupar_por_handle(lotes)
+
+        try:
+            for lote in lotes:
+                importar_lote(lote, contexto, resumen, simular)
+                if simular:
+                    db.session.rollback()
+                else:
+                    db.session.commit()
+                    for fecha in contexto.pop('fechas_rutas', ()):
+                        invalidar_cache_rutas(fecha)
+                resumen['lotes'] += 1
+                resumen['procesadas'] = max(resumen['procesadas'], int(lote.index.max()))
+                resumen['segundos'] = round(time.monotonic() - inicio, 2)
+                if progreso:
+                    progreso(resumen)
+
+        except (ValueError, pd.errors.ParserError) as e:
+            db.session.rollback()
+            return False, resumen, f'Archivo no válido (después de la fila {resumen["procesadas"]}): {e}'
+        except Exception as e:
+            db.session.rollback()
+            return False, resumen, f'Error en el lote {resumen["lotes"] + 1} (los anteriores quedaron guardados): {e}'
+
+        resumen['segundos'] = round(time.monotonic() - inicio, 2)
+        accion = 'validadas' if simular else 'importadas'
+        mensaje = (f'{resumen["procesadas"]} filas {accion}: {resumen["insertadas"]} nuevas, '
+                   f'{resumen["actualizadas"]} actualizadas, {resumen["omitidas"]} omitidas, '
+                   f'{resumen["con_errores"]} con errores')
+        return True, resumen, mensaje
@@ -6,49 +6,201 @@ from extensions import db
 from models.inventario import Flor, Contenedor
 from models.pedido import PedidoInsumo, Pedido
 from models.producto import RecetaProducto
-from datetime import date
+from sqlalchemy import literal, or_
+from utils.stock_helpers import mover_stock
+from services.alertas_stock_service import AlertasStockService
 
 class InventarioService:
     
     @staticmethod
-    def verificar_disponibilidad_producto(producto_id):
+    def _cargar_recetas(producto_ids=None):
         """
-        Verifica si hay stock suficiente para preparar un producto
+        Carga las líneas obligatorias de receta agrupadas por producto (una sola consulta)
+
+        Returns:
+            dict: producto_id -> [(insumo_tipo, insumo_id, cantidad), ...]
         """
-        recetas = RecetaProducto.query.filter_by(producto_id=producto_id).all()
-        
-        faltantes = []
-        disponible = True
-        
-        for receta in recetas:
-            if receta.es_opcional:
+        query = db.session.query(
+            RecetaProducto.producto_id, RecetaProducto.insumo_tipo,
+            RecetaProducto.insumo_id, RecetaProducto.cantidad
+        ).filter(or_(RecetaProducto.es_opcional.is_(None), RecetaProducto.es_opcional == False))
+        if producto_ids is not None:
+            query = query.filter(RecetaProducto.producto_id.in_(producto_ids))
+
+        recetas = {}
+        for producto_id, insumo_tipo, insumo_id, cantidad in query:
+            if not cantidad or cantidad <= 0:
                 continue
-                
-            if receta.insumo_tipo == 'Flor':
-                flor = Flor.query.get(receta.insumo_id)
-                stock_actual = flor.cantidad_stock if flor else 0
-                
-                if stock_actual < receta.cantidad:
-                    disponible = False
-                    faltantes.append({
-                        'insumo_tipo': 'Flor',
-                        'insumo_id': receta.insumo_id,
-                        'necesario': receta.cantidad,
-                        'disponible': stock_actual
-                    })
-            else:  # Contenedor
-                contenedor = Contenedor.query.get(receta.insumo_id)
-                stock_actual = contenedor.stock if contenedor else 0
-                
-                if stock_actual < receta.cantidad:
-                    disponible = False
+            # Todo lo que no es flor se trata como contenedor (igual que el resto del servicio)
+            tipo = 'Flor' if insumo_tipo == 'Flor' else 'Contenedor'
+            recetas.setdefault(producto_id, []).append((tipo, insumo_id, cantidad))
+        return recetas
+
+    @staticmethod
+    def _cargar_disponibles(insumos=None):
+        """
+        Carga el stock disponible (stock - en uso - en evento) de flores y contenedores
+        en una sola consulta (UNION ALL)
+
+        Args:
+            insumos: conjunto de (tipo, id) a cargar; None para todo el inventario
+
+        Returns:
+            dict: (tipo, id) -> cantidad disponible
+        """
+        query_flores = db.session.query(
+            literal('Flor').label('tipo'), Flor.id,
+            (Flor.cantidad_stock - Flor.cantidad_en_uso - Flor.cantidad_en_evento).label('disponible')
+        )
+        query_contenedores = db.session.query(
+            literal('Contenedor').label('tipo'), Contenedor.id,
+            (Contenedor.cantidad_stock - Contenedor.cantidad_en_uso - Contenedor.cantidad_en_evento).label('disponible')
+        )
+        if insumos is not None:
+            flor_ids = {insumo_id for tipo, insumo_id in insumos if tipo == 'Flor'}
+            contenedor_ids = {insumo_id for tipo, insumo_id in insumos if tipo == 'Contenedor'}
+            if not flor_ids and not contenedor_ids:
+                return {}
+            query_flores = query_flores.filter(Flor.id.in_(flor_ids))
+            query_contenedores = query_contenedores.filter(Contenedor.id.in_(contenedor_ids))
+
+        return {
+            (tipo, insumo_id): max(disponible or 0, 0)
+            for tipo, insumo_id, disponible in query_flores.union_all(query_contenedores)
+        }
+
+    @staticmethod
+    def calcular_disponibilidad_productos(producto_ids=None):
+        """
+        Calcula cuántas unidades de cada producto se pueden armar con el stock disponible
+
+        Carga todas las recetas y todo el stock necesario en dos consultas, en vez de
+        consultar cada insumo por separado. Los insumos opcionales no limitan.
+
+        Args:
+            producto_ids: lista de IDs de producto; None para todo el catálogo con receta
+
+        Returns:
+            dict: producto_id -> {
+                'cantidad_posible': unidades armables (None si el producto no tiene receta),
+                'disponible': bool,
+                'limitante': insumo que limita la cantidad posible,
+                'faltantes': insumos sin stock para armar una unidad
+            }
+        """
+        recetas = InventarioService._cargar_recetas(producto_ids)
+        insumos = {(tipo, insumo_id) for lineas in recetas.values() for tipo, insumo_id, _ in lineas}
+        disponibles = InventarioService._cargar_disponibles(insumos)
+
+        resultado = {}
+        for producto_id in (producto_ids if producto_ids is not None else recetas.keys()):
+            lineas = recetas.get(producto_id)
+            if not lineas:
+                resultado[producto_id] = {
+                    'producto_id': producto_id,
+                    'cantidad_posible': None,
+                    'disponible': True,
+                    'limitante': None,
+                    'faltantes': []
+                }
+                continue
+
+            cantidad_posible = None
+            limitante = None
+            faltantes = []
+            for tipo, insumo_id, cantidad in lineas:
+                stock_disponible = disponibles.get((tipo, insumo_id), 0)
+                alcanza_para = stock_disponible // cantidad
+                if cantidad_posible is None or alcanza_para < cantidad_posible:
+                    cantidad_posible = alcanza_para
+                    limitante = {'insumo_tipo': tipo, 'insumo_id': insumo_id}
+                if stock_disponible < cantidad:
                     faltantes.append({
-                        'insumo_tipo': 'Contenedor',
-                        'insumo_id': receta.insumo_id,
-                        'necesario': receta.cantidad,
-                        'disponible': stock_actual
+                        'insumo_tipo': tipo,
+                        'insumo_id': insumo_id,
+                        'necesario': cantidad,
+                        'disponible': stock_disponible
                     })
-        
+
+            resultado[producto_id] = {
+                'producto_id': producto_id,
+                'cantidad_posible': cantidad_posible,
+                'disponible': cantidad_posible > 0,
+                'limitante': limitante,
+                'faltantes': faltantes
+            }
+
+        return resultado
+
+    @staticmethod
+    def verificar_disponibilidad_carrito(items):
+        """
+        Verifica si hay stock para un carrito de varios productos a la vez
+
+        La demanda de cada insumo se suma entre todos los productos del carrito:
+        dos productos que usan la misma flor compiten por el mismo stock.
+
+        Args:
+            items: lista de dicts con producto_id y cantidad (entero positivo, por defecto 1)
+
+        Returns:
+            tuple: (disponible, faltantes, insumos)
+                - faltantes: insumos cuya demanda total supera lo disponible
+                - insumos: demanda total, disponible y productos que usan cada insumo
+
+        Raises:
+            ValueError: si alguna cantidad no es un entero mayor que cero
+        """
+        cantidades = {}
+        for item in items:
+            producto_id = str(item['producto_id'])
+            cantidad = item.get('cantidad', 1)
+            # int() truncaría 1.5 y aceptaría True
+            if isinstance(cantidad, bool) or (isinstance(cantidad, float) and not cantidad.is_integer()):
+                raise ValueError(f'Cantidad inválida: {cantidad}')
+            cantidad = int(cantidad)
+            if cantidad <= 0:
+                raise ValueError(f'Cantidad inválida: {cantidad}')
+            cantidades[producto_id] = cantidades.get(producto_id, 0) + cantidad
+
+        recetas = InventarioService._cargar_recetas(list(cantidades))
+
+        demanda = {}
+        for producto_id, cantidad_producto in cantidades.items():
+            for tipo, insumo_id, cantidad in recetas.get(producto_id, []):
+                entrada = demanda.setdefault((tipo, insumo_id), {'necesario': 0, 'productos': []})
+                entrada['necesario'] += cantidad * cantidad_producto
+                entrada['productos'].append(producto_id)
+
+        disponibles = InventarioService._cargar_disponibles(set(demanda))
+
+        faltantes = []
+        insumos = []
+        for (tipo, insumo_id), entrada in demanda.items():
+            stock_disponible = disponibles.get((tipo, insumo_id), 0)
+            detalle = {
+                'insumo_tipo': tipo,
+                'insumo_id': insumo_id,
+                'necesario': entrada['necesario'],
+                'disponible': stock_disponible,
+                'productos': entrada['productos']
+            }
+            insumos.append(detalle)
+            if stock_disponible < entrada['necesario']:
+                faltantes.append(detalle)
+
+        return not faltantes, faltantes, insumos
+
+    @staticmethod
+    def verificar_disponibilidad_producto(producto_id):
+        """
+        Verifica si hay stock suficiente para preparar un producto
+        """
+        disponible, faltantes, _ = InventarioService.verificar_disponibilidad_carrito(
+            [{'producto_id': producto_id, 'cantidad': 1}]
+        )
+        for faltante in faltantes:
+            faltante.pop('productos', None)
         return disponible, faltantes
     
     @staticmethod
@@ -129,9 +281,8 @@ class InventarioService:
                 if insumo.insumo_tipo == 'Flor':
                     flor = Flor.query.get(insumo.insumo_id)
                     if flor:
-                        if flor.cantidad_stock >= insumo.cantidad:
-                            flor.cantidad_stock -= insumo.cantidad
-                            flor.fecha_actualizacion = date.today()
+                        # El stock se verifica en el mismo UPDATE que lo descuenta
+                        if mover_stock('Flor', flor.id, stock=-insumo.cantidad, exigir_stock=True):
                             insumo.descontado_stock = True
                             descontados.append(f"Flor: {flor.tipo} {flor.color} (-{insumo.cantidad})")
                         else:
@@ -140,9 +291,7 @@ class InventarioService:
                 else:  # Contenedor
                     contenedor = Contenedor.query.get(insumo.insumo_id)
                     if contenedor:
-                        if contenedor.stock >= insumo.cantidad:
-                            contenedor.stock -= insumo.cantidad
-                            contenedor.fecha_actualizacion = date.today()
+                        if mover_stock('Contenedor', contenedor.id, stock=-insumo.cantidad, exigir_stock=True):
                             insumo.descontado_stock = True
                             descontados.append(f"Contenedor: {contenedor.tipo} {contenedor.forma} (-{insumo.cantidad})")
                         else:
@@ -173,16 +322,14 @@ class InventarioService:
                 if insumo.insumo_tipo == 'Flor':
                     flor = Flor.query.get(insumo.insumo_id)
                     if flor:
-                        flor.cantidad_stock += insumo.cantidad
-                        flor.fecha_actualizacion = date.today()
+                        mover_stock('Flor', flor.id, stock=insumo.cantidad)
                         insumo.descontado_stock = False
                         devueltos.append(f"Flor: {flor.tipo} {flor.color} (+{insumo.cantidad})")
                 
                 else:  # Contenedor
                     contenedor = Contenedor.query.get(insumo.insumo_id)
                     if contenedor:
-                        contenedor.stock += insumo.cantidad
-                        contenedor.fecha_actualizacion = date.today()
+                        mover_stock('Contenedor', contenedor.id, stock=insumo.cantidad)
                         insumo.descontado_stock = False
                         devueltos.append(f"Contenedor: {contenedor.tipo} (+{insumo.cantidad})")
             
@@ -196,35 +343,25 @@ class InventarioService:
     @staticmethod
     def obtener_alertas_stock():
         """
-        Obtiene alertas de productos con stock bajo
+        Obtiene alertas de productos con stock bajo, según el umbral de cada insumo y sus
+        reservas próximas (services/alertas_stock_service.py)
         """
-        # Flores con stock bajo (menos de 20 unidades)
-        flores_bajo_stock = Flor.query.filter(Flor.cantidad_stock < 20).all()
-        
-        # Contenedores con stock bajo (menos de 5 unidades)
-        contenedores_bajo_stock = Contenedor.query.filter(Contenedor.stock < 5).all()
-        
+        success, data, mensaje = AlertasStockService.listar()
+        if not success:
+            raise RuntimeError(mensaje)
+
         alertas = []
-        
-        for flor in flores_bajo_stock:
-            alertas.append({
-                'tipo': 'Flor',
-                'id': flor.id,
-                'nombre': f"{flor.tipo} {flor.color}",
-                'stock_actual': flor.cantidad_stock,
-                'nivel': 'critico' if flor.cantidad_stock < 10 else 'bajo',
-                'mensaje': f"Stock bajo de {flor.tipo} {flor.color}: {flor.cantidad_stock} unidades"
-            })
-        
-        for contenedor in contenedores_bajo_stock:
+        for alerta in data['alertas']:
             alertas.append({
-                'tipo': 'Contenedor',
-                'id': contenedor.id,
-                'nombre': f"{contenedor.tipo} {contenedor.forma}",
-                'stock_actual': contenedor.stock,
-                'nivel': 'critico' if contenedor.stock < 3 else 'bajo',
-                'mensaje': f"Stock bajo de {contenedor.tipo}: {contenedor.stock} unidades"
+                'tipo': alerta['insumo_tipo'],
+                'id': alerta['insumo_id'],
+                'nombre': alerta['nombre'],
+                'stock_actual': alerta['stock'],
+                'disponible': alerta['disponible'],
+                'nivel': alerta['nivel'],
+                'reponer': alerta['reponer'],
+                'mensaje': f"Stock bajo de {alerta['nombre']}: {alerta['disponible']} disponibles "
+                           f"(mínimo {alerta['stock_bajo']}, reservado próximamente {alerta['demanda_proxima']})"
             })
-        
         return alertas
 
@@ -7,22 +7,177 @@ from extensions import db
 from models.pedido import Pedido, PedidoInsumo, PedidoProducto, HistorialEstado
 from models.cliente import Cliente
 from models.inventario import Flor, Contenedor
+from models.producto_detallado import PedidoFlorSeleccionada, PedidoContenedorSeleccionado
+from models.serializadores import PedidoSerializador
 from config.plazos_pago import obtener_plazo_pago
 from utils.fecha_helpers import clasificar_pedido
 from utils.telefono_helpers import normalizar_telefono
+from utils.stock_helpers import mover_stock
+from utils.cache_helpers import cache_referencia, marcar_etiquetas_modificadas
 from datetime import datetime, timedelta, time
-from sqlalchemy import or_, and_, func
-from sqlalchemy.orm import joinedload
+from sqlalchemy import or_, and_, func, event, inspect
+from sqlalchemy.orm import joinedload, Session
 from services.inventario_service import InventarioService
-from services.clientes_service import ClientesService
+from services.clientes_service import ClientesService  # noqa: F401 - mantiene las estadísticas de clientes en la sesión
+from services import cambios_pedidos_service  # noqa: F401 - registra el feed de cambios de pedidos en la sesión
+from itertools import chain
 import re
 
 
+# ============================================
+# CACHÉ DE HOJAS DE RUTA POR FECHA
+# ============================================
+
+# Las hojas de ruta se guardan en la caché de referencia (espacio 'rutas') con una
+# etiqueta por fecha de entrega, más 'rutas' para invalidar todas las fechas
+
+
+def _etiqueta_rutas(fecha=None):
+    """Etiqueta de caché de la hoja de ruta de una fecha; sin fecha, la de todas"""
+    return f'rutas:{fecha.isoformat()}' if fecha is not None else 'rutas'
+
+
+def invalidar_cache_rutas(fecha=None):
+    """
+    Invalida la caché de rutas por comuna de inmediato (escrituras ya confirmadas);
+    dentro de una transacción usar marcar_etiquetas_modificadas(session, ...)
+
+    Args:
+        fecha: date a invalidar; si es None se invalidan todas las fechas
+    """
+    cache_referencia.invalidar(_etiqueta_rutas(fecha))
+
+
+def _fechas_entrega_pedido(pedido):
+    """Fechas de entrega (actual y anterior, si cambió) de un pedido en sesión"""
+    fechas = set()
+    historial = inspect(pedido).attrs.fecha_entrega.history
+    for valor in chain(historial.added or (), historial.unchanged or (), historial.deleted or ()):
+        if isinstance(valor, datetime):
+            fechas.add(valor.date())
+    return fechas
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_fechas_rutas_modificadas(session, flush_context):
+    """Marca las fechas de entrega afectadas por pedidos o productos de pedido modificados"""
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, PedidoProducto):
+            obj = session.identity_map.get(inspect(Pedido).identity_key_from_primary_key([obj.pedido_id]))
+        elif not isinstance(obj, Pedido):
+            continue
+        fechas_pedido = _fechas_entrega_pedido(obj) if obj is not None else None
+        marcar_etiquetas_modificadas(session, *map(_etiqueta_rutas, fechas_pedido or [None]))
+
+
+def _armar_rutas(fecha_objetivo):
+    """Hoja de ruta de una fecha: (rutas por comuna, total de pedidos)"""
+    # Obtener pedidos para la fecha objetivo (no despachados ni cancelados)
+    # Excluir retiro en tienda (se manejan por separado)
+    inicio_dia = datetime.combine(fecha_objetivo, time.min)
+    fin_dia = datetime.combine(fecha_objetivo, time.max)
+
+    condiciones_dia = [
+        Pedido.fecha_entrega >= inicio_dia,
+        Pedido.fecha_entrega <= fin_dia,
+        Pedido.estado.notin_(['Despachados', 'Cancelado']),
+        or_(Pedido.retiro_en_tienda == False, Pedido.retiro_en_tienda.is_(None))  # Excluir retiro en tienda
+    ]
+
+    # Solo las columnas que usa la hoja de ruta (sin cargar el pedido completo)
+    pedidos = db.session.query(
+        Pedido.id,
+        Pedido.comuna,
+        Pedido.cliente_nombre,
+        Pedido.direccion_entrega,
+        Pedido.cliente_telefono,
+        Pedido.fecha_entrega,
+        Pedido.motivo,
+        Pedido.es_urgente,
+        Pedido.arreglo_pedido,
+        Pedido.estado,
+        Pedido.destinatario,
+        Pedido.mensaje,
+        Pedido.detalles_adicionales,
+        Pedido.foto_enviado_url
+    ).filter(and_(*condiciones_dia)).order_by(
+        Pedido.es_urgente.desc(), Pedido.fecha_entrega.asc()
+    ).all()
+
+    # Fotos de respaldo de todos los pedidos del día sin foto de envío, en una sola consulta:
+    # se toma la foto del primer producto (menor id) que tenga una
+    primera_foto = db.session.query(
+        PedidoProducto.pedido_id,
+        func.min(PedidoProducto.id).label('pedido_producto_id')
+    ).join(Pedido, Pedido.id == PedidoProducto.pedido_id).filter(
+        *condiciones_dia,
+        or_(Pedido.foto_enviado_url.is_(None), Pedido.foto_enviado_url == ''),
+        PedidoProducto.foto_respaldo.isnot(None),
+        PedidoProducto.foto_respaldo != ''
+    ).group_by(PedidoProducto.pedido_id).subquery()
+
+    fotos_respaldo = dict(
+        db.session.query(PedidoProducto.pedido_id, PedidoProducto.foto_respaldo)
+        .join(primera_foto, PedidoProducto.id == primera_foto.c.pedido_producto_id)
+        .all()
+    )
+
+    # Agrupar por comuna
+    rutas = {}
+    for pedido in pedidos:
+        comuna = pedido.comuna or 'Sin Comuna'
+
+        if comuna not in rutas:
+            rutas[comuna] = {
+                'comuna': comuna,
+                'pedidos': [],
+                'total_pedidos': 0,
+                'urgentes': 0
+            }
+
+        # Calcular hora de llegada
+        hora_llegada = pedido.fecha_entrega.strftime('%H:%M') if pedido.fecha_entrega and pedido.fecha_entrega.hour != 0 else 'Sin hora'
+
+        # Foto de respaldo: primero la del pedido, si no la de sus productos
+        foto_respaldo = pedido.foto_enviado_url or fotos_respaldo.get(pedido.id)
+
+        pedido_data = {
+            'id': pedido.id,
+            'cliente_nombre': pedido.cliente_nombre,
+            'direccion': pedido.direccion_entrega,
+            'telefono': pedido.cliente_telefono,
+            'hora_llegada': hora_llegada,
+            'motivo': pedido.motivo,
+            'es_urgente': pedido.es_urgente or False,
+            'arreglo': pedido.arreglo_pedido,
+            'estado': pedido.estado,
+            'destinatario': pedido.destinatario,
+            'mensaje': pedido.mensaje,
+            'detalles_adicionales': pedido.detalles_adicionales,
+            'foto_respaldo': foto_respaldo
+        }
+
+        rutas[comuna]['pedidos'].append(pedido_data)
+        rutas[comuna]['total_pedidos'] += 1
+        if pedido.es_urgente:
+            rutas[comuna]['urgentes'] += 1
+
+    # Convertir a lista y ordenar por urgentes (más urgentes primero)
+    rutas_lista = list(rutas.values())
+    rutas_lista.sort(key=lambda x: x['urgentes'], reverse=True)
+
+    return rutas_lista, len(pedidos)
+
+
+# Caracteres que normalizar_telefono quita de los teléfonos guardados con formato
+_SEPARADORES_TELEFONO = (' ', '-', '(', ')', '.', '/')
+
+
 class PedidosService:
     """Servicio para operaciones de negocio de pedidos"""
 
     @staticmethod
-    def listar_pedidos(filtros=None, buscar=None, page=1, limit=100):
+    def listar_pedidos(filtros=None, buscar=None, page=1, limit=100, conjunto='detalle'):
         """
         Lista pedidos con filtros, búsqueda y paginación
 
@@ -31,9 +186,10 @@ class PedidosService:
             buscar: término de búsqueda libre
             page: número de página
             limit: registros por página
+            conjunto: conjunto de campos de PedidoSerializador
 
         Returns:
-            tuple: (pedidos, total, total_pages)
+            tuple: (pedidos serializados (generador de dicts), total, total_pages)
         """
         query = Pedido.query
 
@@ -71,13 +227,13 @@ class PedidosService:
         total_pages = (total + limit - 1) // limit
 
         # Paginar
-        pedidos = query.order_by(Pedido.fecha_pedido.desc()).limit(limit).offset((page - 1) * limit).all()
+        pagina = query.order_by(Pedido.fecha_pedido.desc()).limit(limit).offset((page - 1) * limit)
 
-        return pedidos, total, total_pages
+        return PedidoSerializador.proyectar(pagina, conjunto), total, total_pages
 
     @staticmethod
-    def listar_pagados(buscar=None, page=1, limit=50):
-        """Lista pedidos pagados con búsqueda y paginación"""
+    def listar_pagados(buscar=None, page=1, limit=50, conjunto='detalle'):
+        """Lista pedidos pagados con búsqueda y paginación (serializados con PedidoSerializador)"""
         query = Pedido.query.filter(
             Pedido.estado_pago == 'Pagado',
             Pedido.estado != 'Cancelado'
@@ -97,9 +253,9 @@ class PedidosService:
         total = query.count()
         total_pages = (total + limit - 1) // limit
 
-        pedidos = query.order_by(Pedido.fecha_entrega.desc()).limit(limit).offset((page - 1) * limit).all()
+        pagina = query.order_by(Pedido.fecha_entrega.desc()).limit(limit).offset((page - 1) * limit)
 
-        return pedidos, total, total_pages
+        return PedidoSerializador.proyectar(pagina, conjunto), total, total_pages
 
     @staticmethod
     def obtener_pedido(pedido_id):
@@ -125,22 +281,23 @@ class PedidosService:
             if cliente:
                 return cliente
 
-        # Buscar por teléfono normalizado
-        todos_clientes = Cliente.query.all()
-        for c in todos_clientes:
-            if normalizar_telefono(c.telefono) == telefono_normalizado:
-                return c
+        # Buscar por teléfono normalizado (los separadores se quitan en SQL, sin cargar todos los clientes)
+        if telefono_normalizado:
+            telefono_sql = Cliente.telefono
+            for separador in _SEPARADORES_TELEFONO:
+                telefono_sql = func.replace(telefono_sql, separador, '')
+            cliente = Cliente.query.filter(telefono_sql == telefono_normalizado).order_by(Cliente.id).first()
+            if cliente:
+                return cliente
 
         # Cliente no existe, crear uno nuevo
-        # Generar ID del cliente
-        clientes = Cliente.query.all()
+        # Generar ID del cliente (solo se leen los IDs)
         numeros = []
-        for c in clientes:
-            if c.id.startswith('CLI'):
-                # Extraer solo los dígitos del ID
-                match = re.search(r'\d+', c.id[3:])
-                if match:
-                    numeros.append(int(match.group()))
+        for (cliente_id,) in db.session.query(Cliente.id).filter(Cliente.id.like('CLI%')):
+            # Extraer solo los dígitos del ID
+            match = re.search(r'\d+', cliente_id[3:])
+            if match:
+                numeros.append(int(match.group()))
 
         if numeros:
             numero = max(numeros) + 1
@@ -157,7 +314,6 @@ class PedidosService:
             tipo_cliente='Nuevo'
         )
         db.session.add(cliente)
-        db.session.flush()  # Para obtener el ID
 
         return cliente
 
@@ -260,72 +416,59 @@ class PedidosService:
                 retiro_en_tienda=data.get('retiro_en_tienda', False)
             )
 
-            db.session.add(pedido)
-            db.session.flush()  # Obtener el ID del pedido antes de commit
-
-            # Procesar múltiples productos con sus insumos
-            if 'productos' in data and isinstance(data['productos'], list):
+            # Productos e insumos se enlazan por relaciones: un solo flush, en el commit,
+            # inserta todo el pedido y asigna los IDs
+            reservas = {}  # (insumo_tipo, insumo_id) -> cantidad a reservar
+            productos_data = data['productos'] if isinstance(data.get('productos'), list) else []
+            for producto_data in productos_data:
+                # Crear relación pedido-producto
+                pedido_producto = PedidoProducto(
+                    pedido=pedido,
+                    producto_id=producto_data['producto_id'],
+                    producto_nombre=producto_data.get('producto_nombre', ''),
+                    precio=producto_data.get('precio', 0),
+                    cantidad=1  # Por ahora, siempre 1
+                )
 
-                for producto_data in data['productos']:
-                    # Crear relación pedido-producto
-                    pedido_producto = PedidoProducto(
-                        pedido_id=pedido.id,
-                        producto_id=producto_data['producto_id'],
-                        producto_nombre=producto_data.get('producto_nombre', ''),
-                        precio=producto_data.get('precio', 0),
-                        cantidad=1  # Por ahora, siempre 1
+                # Insumos de este producto
+                insumos_data = producto_data.get('insumos')
+                if not isinstance(insumos_data, list):
+                    continue
+                for insumo in insumos_data:
+                    # Validar que insumo_id esté presente
+                    insumo_id = insumo.get('insumo_id') or insumo.get('flor_id') or insumo.get('contenedor_id')
+                    if not insumo_id:
+                        # Si no hay insumo_id, saltar este insumo
+                        continue
+
+                    cantidad = insumo.get('cantidad', 1)
+                    costo_unitario = insumo.get('costo_unitario', 0)
+                    insumo_tipo = PedidosService._tipo_insumo(insumo, insumo_id)
+
+                    PedidoInsumo(
+                        pedido=pedido,
+                        pedido_producto=pedido_producto,
+                        insumo_tipo=insumo_tipo,
+                        insumo_id=str(insumo_id),  # Asegurar que sea string
+                        insumo_nombre=insumo.get('insumo_nombre', ''),
+                        cantidad=cantidad,
+                        costo_unitario=costo_unitario,
+                        costo_total=cantidad * costo_unitario
                     )
-                    db.session.add(pedido_producto)
-                    db.session.flush()  # Obtener ID de pedido_producto
-
-                    # Guardar insumos de este producto
-                    if 'insumos' in producto_data and isinstance(producto_data['insumos'], list):
-                        for insumo in producto_data['insumos']:
-                            # Validar que insumo_id esté presente
-                            insumo_id = insumo.get('insumo_id') or insumo.get('flor_id') or insumo.get('contenedor_id')
-                            if not insumo_id:
-                                # Si no hay insumo_id, saltar este insumo
-                                continue
-                            
-                            cantidad = insumo.get('cantidad', 1)
-                            costo_unitario = insumo.get('costo_unitario', 0)
-                            costo_total = cantidad * costo_unitario
-                            insumo_tipo = insumo.get('insumo_tipo', 'Flor')
-                            
-                            # Si no se especifica el tipo, intentar inferirlo
-                            if not insumo_tipo or insumo_tipo == 'Flor':
-                                # Verificar si es flor o contenedor basándose en el ID
-                                if insumo.get('flor_id') or (isinstance(insumo_id, str) and insumo_id.startswith('F')):
-                                    insumo_tipo = 'Flor'
-                                elif insumo.get('contenedor_id') or (isinstance(insumo_id, str) and insumo_id.startswith('C')):
-                                    insumo_tipo = 'Contenedor'
-
-                            pedido_insumo = PedidoInsumo(
-                                pedido_id=pedido.id,
-                                pedido_producto_id=pedido_producto.id,
-                                insumo_tipo=insumo_tipo,
-                                insumo_id=str(insumo_id),  # Asegurar que sea string
-                                insumo_nombre=insumo.get('insumo_nombre', ''),
-                                cantidad=cantidad,
-                                costo_unitario=costo_unitario,
-                                costo_total=costo_total
-                            )
-                            db.session.add(pedido_insumo)
-
-            # Actualizar estadísticas del cliente
-            if cliente:
-                cliente.total_pedidos += 1
-                cliente.total_gastado = (cliente.total_gastado or 0) + pedido.precio_total
-                cliente.ultima_compra = datetime.now()
+                    clave = (insumo_tipo, str(insumo_id))
+                    reservas[clave] = reservas.get(clave, 0) + cantidad
 
             # 📦 Reservar insumos automáticamente al crear el pedido
             # Esto incrementa cantidad_en_uso para reflejar que están comprometidos
-            success_reserva, msg_reserva = PedidosService._reservar_insumos_pedido(pedido.id)
+            # (sin autoflush: el cliente nuevo no se inserta antes de tiempo)
+            with db.session.no_autoflush:
+                success_reserva, msg_reserva = PedidosService._reservar_insumos(reservas)
             if not success_reserva:
                 # Si falla la reserva, hacer rollback completo
                 db.session.rollback()
                 return False, None, f'Error al reservar insumos: {msg_reserva}'
 
+            db.session.add(pedido)  # Agrega también productos e insumos (cascade)
             db.session.commit()
 
             mensaje_final = f'Pedido #{pedido.id} creado exitosamente'
@@ -339,35 +482,44 @@ class PedidosService:
             return False, None, str(e)
 
     @staticmethod
-    def _reservar_insumos_pedido(pedido_id):
+    def _tipo_insumo(insumo, insumo_id):
+        """Tipo ('Flor' o 'Contenedor') de un insumo del payload, inferido del ID si no viene"""
+        insumo_tipo = insumo.get('insumo_tipo', 'Flor')
+
+        # Si no se especifica el tipo, intentar inferirlo
+        if not insumo_tipo or insumo_tipo == 'Flor':
+            # Verificar si es flor o contenedor basándose en el ID
+            if insumo.get('flor_id') or (isinstance(insumo_id, str) and insumo_id.startswith('F')):
+                insumo_tipo = 'Flor'
+            elif insumo.get('contenedor_id') or (isinstance(insumo_id, str) and insumo_id.startswith('C')):
+                insumo_tipo = 'Contenedor'
+        return insumo_tipo
+
+    @staticmethod
+    def _reservar_insumos(reservas):
         """
-        Reserva los insumos de un pedido (incrementa cantidad_en_uso)
-        Se llama al CREAR un pedido
+        Reserva insumos (incrementa cantidad_en_uso) a partir de cantidades ya sumadas
+        por insumo, con una consulta por tipo de insumo
 
         NOTA: NO hace commit, debe ser parte de una transacción mayor
 
         Args:
-            pedido_id: ID del pedido
+            reservas: dict {(insumo_tipo, insumo_id): cantidad}
 
         Returns:
             tuple: (success, mensaje)
         """
         try:
-            # Obtener todos los insumos del pedido
-            insumos = PedidoInsumo.query.filter_by(pedido_id=pedido_id).all()
-
             reservados = []
-            for insumo in insumos:
-                if insumo.insumo_tipo == 'Flor':
-                    flor = Flor.query.get(insumo.insumo_id)
-                    if flor:
-                        flor.cantidad_en_uso += insumo.cantidad
-                        reservados.append(f"{insumo.cantidad} {flor.nombre}")
-                elif insumo.insumo_tipo == 'Contenedor':
-                    contenedor = Contenedor.query.get(insumo.insumo_id)
-                    if contenedor:
-                        contenedor.cantidad_en_uso += insumo.cantidad
-                        reservados.append(f"{insumo.cantidad} {contenedor.nombre or contenedor.tipo}")
+            for insumo_tipo, modelo in (('Flor', Flor), ('Contenedor', Contenedor)):
+                ids = [insumo_id for tipo, insumo_id in reservas if tipo == insumo_tipo]
+                if not ids:
+                    continue
+                for insumo in modelo.query.filter(modelo.id.in_(ids)).all():
+                    cantidad = reservas[(insumo_tipo, insumo.id)]
+                    mover_stock(insumo_tipo, insumo.id, en_uso=cantidad)
+                    nombre = insumo.nombre if insumo_tipo == 'Flor' else (insumo.nombre or insumo.tipo)
+                    reservados.append(f"{cantidad} {nombre}")
 
             # NO hacer commit aquí - será parte de la transacción del caller
 
@@ -379,6 +531,26 @@ class PedidosService:
         except Exception as e:
             return False, f"Error al reservar insumos: {str(e)}"
 
+    @staticmethod
+    def _reservar_insumos_pedido(pedido_id):
+        """
+        Reserva los insumos ya guardados de un pedido (incrementa cantidad_en_uso)
+
+        NOTA: NO hace commit, debe ser parte de una transacción mayor
+
+        Args:
+            pedido_id: ID del pedido
+
+        Returns:
+            tuple: (success, mensaje)
+        """
+        reservas = {}
+        for insumo_tipo, insumo_id, cantidad in db.session.query(
+                PedidoInsumo.insumo_tipo, PedidoInsumo.insumo_id, PedidoInsumo.cantidad
+        ).filter_by(pedido_id=pedido_id):
+            reservas[(insumo_tipo, insumo_id)] = reservas.get((insumo_tipo, insumo_id), 0) + cantidad
+        return PedidosService._reservar_insumos(reservas)
+
     @staticmethod
     def _liberar_insumos_pedido(pedido_id):
         """
@@ -403,13 +575,13 @@ class PedidosService:
                     flor = Flor.query.get(insumo.insumo_id)
                     if flor:
                         # Liberar la reserva
-                        flor.cantidad_en_uso = max(0, flor.cantidad_en_uso - insumo.cantidad)
+                        mover_stock('Flor', flor.id, en_uso=-insumo.cantidad)
                         liberados.append(f"{insumo.cantidad} {flor.nombre}")
                 elif insumo.insumo_tipo == 'Contenedor':
                     contenedor = Contenedor.query.get(insumo.insumo_id)
                     if contenedor:
                         # Liberar la reserva
-                        contenedor.cantidad_en_uso = max(0, contenedor.cantidad_en_uso - insumo.cantidad)
+                        mover_stock('Contenedor', contenedor.id, en_uso=-insumo.cantidad)
                         liberados.append(f"{insumo.cantidad} {contenedor.nombre or contenedor.tipo}")
 
             # NO hacer commit aquí - será parte de la transacción del caller
@@ -429,7 +601,8 @@ class PedidosService:
         Se llama cuando un pedido pasa a "Listo para Despacho"
 
         Esto representa el uso FÍSICO de los insumos al armar el pedido.
-        Decrementamos AMBOS: stock (consumo real) y en_uso (liberamos la reserva)
+        Decrementamos AMBOS: stock (consumo real) y en_uso (liberamos la reserva),
+        en un mismo UPDATE atómico por insumo (utils/stock_helpers.py).
         De esta forma cantidad_disponible se mantiene correcta sin doble descuento.
 
         NOTA: NO hace commit, debe ser parte de una transacción mayor
@@ -441,28 +614,24 @@ class PedidosService:
             tuple: (success, mensaje)
         """
         try:
-            # Obtener todos los insumos del pedido
-            insumos = PedidoInsumo.query.filter_by(pedido_id=pedido_id).all()
+            # Obtener los insumos del pedido que aún no se descontaron del stock
+            insumos = PedidoInsumo.query.filter_by(pedido_id=pedido_id, descontado_stock=False).all()
 
             consumidos = []
             for insumo in insumos:
                 if insumo.insumo_tipo == 'Flor':
                     flor = Flor.query.get(insumo.insumo_id)
                     if flor:
-                        # Consumir del stock real
-                        flor.cantidad_stock = max(0, flor.cantidad_stock - insumo.cantidad)
-                        # Liberar la reserva
-                        flor.cantidad_en_uso = max(0, flor.cantidad_en_uso - insumo.cantidad)
+                        # Consumir del stock real y liberar la reserva
+                        mover_stock('Flor', flor.id, stock=-insumo.cantidad, en_uso=-insumo.cantidad)
                         consumidos.append(f"{insumo.cantidad} {flor.nombre}")
                         # Marcar como descontado
                         insumo.descontado_stock = True
                 elif insumo.insumo_tipo == 'Contenedor':
                     contenedor = Contenedor.query.get(insumo.insumo_id)
                     if contenedor:
-                        # Consumir del stock real
-                        contenedor.cantidad_stock = max(0, contenedor.cantidad_stock - insumo.cantidad)
-                        # Liberar la reserva
-                        contenedor.cantidad_en_uso = max(0, contenedor.cantidad_en_uso - insumo.cantidad)
+                        # Consumir del stock real y liberar la reserva
+                        mover_stock('Contenedor', contenedor.id, stock=-insumo.cantidad, en_uso=-insumo.cantidad)
                         consumidos.append(f"{insumo.cantidad} {contenedor.nombre or contenedor.tipo}")
                         # Marcar como descontado
                         insumo.descontado_stock = True
@@ -562,10 +731,7 @@ class PedidosService:
             if motivo_cancelacion:
                 pedido.detalles_adicionales = f"{pedido.detalles_adicionales or ''}\n[CANCELADO: {motivo_cancelacion}]"
 
-            # Actualizar estadísticas del cliente (recalcular desde pedidos activos)
-            if pedido.cliente_id:
-                ClientesService.actualizar_estadisticas_cliente(pedido.cliente_id)
-            
+            # Las estadísticas del cliente se descuentan en el flush (ver services/clientes_service.py)
             db.session.commit()
 
             mensajes = []
@@ -606,26 +772,22 @@ class PedidosService:
             # Liberar insumos reservados (insumos que no fueron descontados aún)
             PedidosService._liberar_insumos_pedido(pedido_id)
 
-            # Guardar información del cliente antes de eliminar
-            cliente_id = pedido.cliente_id
-            precio_total_pedido = (pedido.precio_ramo or 0) + (pedido.precio_envio or 0)
-
             # Eliminar historial de estados (debe hacerse antes de eliminar el pedido)
             HistorialEstado.query.filter_by(pedido_id=pedido_id).delete()
 
+            # Eliminar insumos asociados (antes que los productos: apuntan a pedidos_productos)
+            PedidoInsumo.query.filter_by(pedido_id=pedido_id).delete()
+
+            # Eliminar flores y contenedores seleccionados
+            PedidoFlorSeleccionada.query.filter_by(pedido_id=pedido_id).delete()
+            PedidoContenedorSeleccionado.query.filter_by(pedido_id=pedido_id).delete()
+
             # Eliminar productos del pedido (si existen)
             PedidoProducto.query.filter_by(pedido_id=pedido_id).delete()
 
-            # Eliminar insumos asociados
-            PedidoInsumo.query.filter_by(pedido_id=pedido_id).delete()
-
             # Eliminar pedido
             db.session.delete(pedido)
             
-            # Actualizar estadísticas del cliente (recalcular desde pedidos activos)
-            if cliente_id:
-                ClientesService.actualizar_estadisticas_cliente(cliente_id)
-            
             db.session.commit()
 
             return True, f'Pedido #{pedido_id} eliminado correctamente'
@@ -707,12 +869,13 @@ class PedidosService:
             return False, None, str(e)
 
     @staticmethod
-    def obtener_pedidos_tablero(filtros=None):
+    def obtener_pedidos_tablero(filtros=None, conjunto='detalle'):
         """
         Obtiene pedidos para vista de tablero Kanban
 
         Args:
             filtros: dict con estado, dia_entrega, estado_pago, tipo_pedido, incluir_despachados
+            conjunto: conjunto de campos de PedidoSerializador
 
         Returns:
             list: pedidos organizados por estado
@@ -778,7 +941,8 @@ class PedidosService:
             if filtros.get('tipo_pedido'):
                 query = query.filter_by(tipo_pedido=filtros['tipo_pedido'])
 
-        pedidos = query.order_by(Pedido.fecha_entrega.asc()).all()
+        # Solo las columnas del conjunto; productos e insumos se cargan por lotes
+        pedidos = PedidoSerializador.proyectar(query.order_by(Pedido.fecha_entrega.asc()), conjunto, incluir=('estado',))
 
         # Inicializar tablero con todos los estados posibles
         tablero = {
@@ -801,10 +965,10 @@ class PedidosService:
         # NOTA: Los pedidos con retiro_en_tienda siguen el flujo normal hasta que se confirman insumos
         # Solo se separan en "Retiro en Tienda" cuando su estado es "Retiro en Tienda"
         for pedido in pedidos:
-            estado = pedido.estado or 'Sin Estado'
+            estado = pedido['estado'] or 'Sin Estado'
             if estado not in tablero:
                 tablero[estado] = []
-            tablero[estado].append(pedido.to_dict())
+            tablero[estado].append(pedido)
 
         # Ya no necesitamos filtrar despachados aquí porque la consulta SQL
         # ya los filtró correctamente según la fecha
@@ -1126,92 +1290,23 @@ class PedidosService:
         """
         Obtiene pedidos agrupados por comuna para planificar rutas
 
+        El resultado se guarda en la caché de referencia por fecha y se invalida
+        cuando se confirma un cambio en cualquier pedido (o producto de pedido) de esa
+        fecha; las escrituras fuera del ORM se ven al vencer el TTL (config/cache.py).
+
         Args:
             fecha_objetivo: date - fecha de entrega objetivo
 
         Returns:
-            tuple: (success, rutas_dict, mensaje)
+            tuple: (success, rutas_lista, mensaje); la lista es la entrada compartida de
+                   la caché: no modificar (copiarla antes si hace falta)
         """
         try:
-            from datetime import datetime, time
-            from sqlalchemy import and_, or_
-            from models.pedido import Pedido
-
-            # Obtener pedidos para la fecha objetivo (no despachados ni cancelados)
-            # Excluir retiro en tienda (se manejan por separado)
-            inicio_dia = datetime.combine(fecha_objetivo, time.min)
-            fin_dia = datetime.combine(fecha_objetivo, time.max)
-
-            pedidos = Pedido.query.filter(
-                and_(
-                    Pedido.fecha_entrega >= inicio_dia,
-                    Pedido.fecha_entrega <= fin_dia,
-                    Pedido.estado.notin_(['Despachados', 'Cancelado']),
-                    or_(Pedido.retiro_en_tienda == False, Pedido.retiro_en_tienda.is_(None))  # Excluir retiro en tienda
-                )
-            ).order_by(Pedido.es_urgente.desc(), Pedido.fecha_entrega.asc()).all()
-
-            # Agrupar por comuna
-            rutas = {}
-            for pedido in pedidos:
-                comuna = pedido.comuna or 'Sin Comuna'
-
-                if comuna not in rutas:
-                    rutas[comuna] = {
-                        'comuna': comuna,
-                        'pedidos': [],
-                        'total_pedidos': 0,
-                        'urgentes': 0
-                    }
-
-                # Calcular hora de llegada
-                hora_llegada = pedido.fecha_entrega.strftime('%H:%M') if pedido.fecha_entrega and pedido.fecha_entrega.hour != 0 else 'Sin hora'
-
-                # Obtener foto de respaldo del pedido
-                foto_respaldo = None
-                # Primero intentar desde el pedido directamente
-                if hasattr(pedido, 'foto_enviado_url') and pedido.foto_enviado_url:
-                    foto_respaldo = pedido.foto_enviado_url
-                # Si no, buscar en los productos asociados usando query directa para evitar problemas de lazy loading
-                else:
-                    try:
-                        from models.pedido import PedidoProducto
-                        # Buscar productos del pedido usando query directa
-                        pedido_productos = PedidoProducto.query.filter_by(pedido_id=pedido.id).all()
-                        for pp in pedido_productos:
-                            if pp.foto_respaldo:
-                                foto_respaldo = pp.foto_respaldo
-                                break
-                    except Exception:
-                        # Si hay algún error, simplemente continuar sin foto
-                        pass
-
-                pedido_data = {
-                    'id': pedido.id,
-                    'cliente_nombre': pedido.cliente_nombre,
-                    'direccion': pedido.direccion_entrega,
-                    'telefono': pedido.cliente_telefono,
-                    'hora_llegada': hora_llegada,
-                    'motivo': pedido.motivo,
-                    'es_urgente': pedido.es_urgente or False,
-                    'arreglo': pedido.arreglo_pedido,
-                    'estado': pedido.estado,
-                    'destinatario': pedido.destinatario,
-                    'mensaje': pedido.mensaje,
-                    'detalles_adicionales': pedido.detalles_adicionales,
-                    'foto_respaldo': foto_respaldo
-                }
-
-                rutas[comuna]['pedidos'].append(pedido_data)
-                rutas[comuna]['total_pedidos'] += 1
-                if pedido.es_urgente:
-                    rutas[comuna]['urgentes'] += 1
-
-            # Convertir a lista y ordenar por urgentes (más urgentes primero)
-            rutas_lista = list(rutas.values())
-            rutas_lista.sort(key=lambda x: x['urgentes'], reverse=True)
-
-            return True, rutas_lista, f'{len(pedidos)} pedidos encontrados'
+            rutas_lista, total_pedidos = cache_referencia.obtener_o_calcular(
+                'rutas', fecha_objetivo.isoformat(), lambda: _armar_rutas(fecha_objetivo),
+                etiquetas=(_etiqueta_rutas(), _etiqueta_rutas(fecha_objetivo))
+            )
+            return True, rutas_lista, f'{total_pedidos} pedidos encontrados'
 
         except Exception as e:
             import traceback
@@ -1302,7 +1397,8 @@ class PedidosService:
             fecha_objetivo: date - fecha de entrega objetivo
 
         Returns:
-            tuple: (success, documento_dict, mensaje)
+            tuple: (success, documento_dict, mensaje); documento['rutas'] es compartida
+                   con la caché de rutas: no modificar
         """
         try:
             # Reutilizar función de rutas
@@ -7,6 +7,7 @@ from extensions import db
 from models.producto_detallado import ProductoColor, ProductoColorFlor
 from models.producto import Producto
 from models.inventario import Flor
+from utils.cache_helpers import cache_referencia
 import re
 
 
@@ -308,44 +309,54 @@ class ProductoColoresService:
             tuple: (success, data/error, message)
         """
         try:
-            producto = Producto.query.get(producto_id)
-            if not producto:
+            def construir_configuracion():
+                producto = Producto.query.get(producto_id)
+                if not producto:
+                    return None
+
+                colores = ProductoColor.query.filter_by(
+                    producto_id=producto_id,
+                    activo=True
+                ).order_by(ProductoColor.orden).all()
+
+                configuracion = {
+                    'producto_id': producto_id,
+                    'producto_nombre': producto.nombre,
+                    'precio_venta': float(producto.precio) if producto.precio else 0,
+                    'colores': []
+                }
+
+                for color in colores:
+                    flores_activas = [cf for cf in color.flores if cf.activo]
+
+                    configuracion['colores'].append({
+                        'id': color.id,
+                        'nombre_color': color.nombre_color,
+                        'cantidad_flores_sugerida': color.cantidad_flores_sugerida,
+                        'orden': color.orden,
+                        'notas': color.notas,
+                        'flores': [
+                            {
+                                'id': cf.id,
+                                'flor_id': cf.flor_id,
+                                'flor_nombre': cf.flor.nombre if cf.flor else None,
+                                'flor_color': cf.flor.color if cf.flor else None,
+                                'es_predeterminada': cf.es_predeterminada,
+                                'costo_unitario': float(cf.flor.costo_unitario) if cf.flor and cf.flor.costo_unitario else 0
+                            }
+                            for cf in flores_activas
+                        ]
+                    })
+
+                return configuracion
+
+            configuracion = cache_referencia.obtener_o_calcular(
+                'producto_colores', str(producto_id), construir_configuracion,
+                etiquetas=('producto_colores', 'productos', 'flores')
+            )
+            if configuracion is None:
                 return False, None, 'Producto no encontrado'
 
-            colores = ProductoColor.query.filter_by(
-                producto_id=producto_id,
-                activo=True
-            ).order_by(ProductoColor.orden).all()
-
-            configuracion = {
-                'producto_id': producto_id,
-                'producto_nombre': producto.nombre,
-                'precio_venta': float(producto.precio) if producto.precio else 0,
-                'colores': []
-            }
-
-            for color in colores:
-                flores_activas = [cf for cf in color.flores if cf.activo]
-
-                configuracion['colores'].append({
-                    'id': color.id,
-                    'nombre_color': color.nombre_color,
-                    'cantidad_flores_sugerida': color.cantidad_flores_sugerida,
-                    'orden': color.orden,
-                    'notas': color.notas,
-                    'flores': [
-                        {
-                            'id': cf.id,
-                            'flor_id': cf.flor_id,
-                            'flor_nombre': cf.flor.nombre if cf.flor else None,
-                            'flor_color': cf.flor.color if cf.flor else None,
-                            'es_predeterminada': cf.es_predeterminada,
-                            'costo_unitario': float(cf.flor.costo_unitario) if cf.flor and cf.flor.costo_unitario else 0
-                        }
-                        for cf in flores_activas
-                    ]
-                })
-
             return True, configuracion, 'Configuración obtenida'
 
         except Exception as e:
@@ -0,0 +1,337 @@
+"""
+Pronóstico de demanda de flores y compras sugeridas por proveedor
+
+Las flores se compran casi a diario y se echan a perder en pocos días, así que la
+compra depende de cuánto se va a consumir. El historial de pedidos (PedidoInsumo a la
+fecha de entrega del pedido) se agrega con pandas en una serie diaria por flor y se
+ajusta un modelo multiplicativo simple:
+- nivel: promedio exponencial del consumo diario de cada flor, sin estacionalidad
+- día de la semana: factor común a todas las flores (los datos por flor son escasos)
+- fechas especiales (config/pronostico.py): factor de cada fecha según sus años
+  anteriores, aplicado a los días previos en que se entregan sus pedidos
+
+Para cada día del horizonte la demanda es el pronóstico o, si es mayor, lo ya
+reservado en el libro de reservas (services/reservas_service.py). Lo que hay que
+comprar es esa demanda más el umbral de stock bajo, menos el stock actual.
+
+El cálculo es un proceso nocturno (scripts/calcular_pronostico_compras.py) que
+reemplaza pronosticos_demanda y compras_sugeridas en una transacción; las requests
+solo leen esas tablas.
+"""
+
+import math
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+from extensions import db
+from models.pedido import Pedido, PedidoInsumo
+from models.inventario import Flor, Proveedor, ReservaDiaria, PronosticoDemanda, CompraSugerida, proveedor_flor
+from config.pronostico import (
+    DIAS_HISTORIA, VIDA_MEDIA_NIVEL_DIAS, HORIZONTE_COMPRA_DIAS, MAX_HORIZONTE_COMPRA_DIAS,
+    FECHAS_ESPECIALES, DIAS_PREVIOS_FECHA_ESPECIAL, FACTOR_FECHA_ESPECIAL_DEFECTO
+)
+from config.reservas import ESTADOS_SIN_RESERVA
+
+try:
+    import numpy as np
+    import pandas as pd  # Dependencia opcional: sin ella el pronóstico no está disponible
+except ImportError:
+    np = pd = None
+
+
+def fecha_especial(nombre, anio):
+    """Fecha de una fecha especial de FECHAS_ESPECIALES en un año"""
+    regla, mes, valor = FECHAS_ESPECIALES[nombre]
+    if regla == 'fija':
+        return date(anio, mes, valor)
+    primero = date(anio, mes, 1)
+    primer_domingo = primero + timedelta(days=(6 - primero.weekday()) % 7)
+    return primer_domingo + timedelta(weeks=valor - 1)
+
+
+def dias_especiales(desde, hasta):
+    """
+    Días entre desde y hasta (inclusive) con demanda de una fecha especial
+
+    Returns:
+        dict: {date: nombre de la fecha especial}
+    """
+    dias = {}
+    for anio in range(desde.year, hasta.year + 2):
+        for nombre in FECHAS_ESPECIALES:
+            dia = fecha_especial(nombre, anio)
+            for previo in range(DIAS_PREVIOS_FECHA_ESPECIAL, -1, -1):
+                actual = dia - timedelta(days=previo)
+                if desde <= actual <= hasta:
+                    dias[actual] = nombre
+    return dias
+
+
+def _serie_historica(desde, hasta):
+    """
+    Consumo diario de cada flor en pedidos no cancelados entregados en [desde, hasta)
+
+    Returns:
+        DataFrame: índice diario desde el primer día con consumo (los días anteriores no
+                   son demanda cero, son datos que no existen) y días sin pedidos en 0;
+                   una columna por flor
+    """
+    filas = db.session.execute(
+        select(PedidoInsumo.insumo_id, Pedido.fecha_entrega, PedidoInsumo.cantidad)
+        .join(Pedido, Pedido.id == PedidoInsumo.pedido_id)
+        .where(
+            PedidoInsumo.insumo_tipo == 'Flor',
+            Pedido.estado.notin_(ESTADOS_SIN_RESERVA),
+            Pedido.fecha_entrega >= desde,
+            Pedido.fecha_entrega < hasta,
+        )
+    ).all()
+    indice = pd.date_range(desde, hasta - timedelta(days=1), freq='D')
+    if not filas:
+        return pd.DataFrame(index=indice, dtype=float)
+    datos = pd.DataFrame(filas, columns=['flor_id', 'fecha', 'cantidad'])
+    datos['fecha'] = pd.to_datetime(datos['fecha']).dt.normalize()
+    return (
+        datos.pivot_table(index='fecha', columns='flor_id', values='cantidad', aggfunc='sum')
+        .reindex(indice[indice >= datos['fecha'].min()], fill_value=0)
+        .fillna(0)
+    )
+
+
+def _ajustar(serie, especiales):
+    """
+    Ajusta nivel por flor, factores por día de la semana y por fecha especial
+
+    Args:
+        serie: DataFrame de _serie_historica()
+        especiales: dict {date: nombre} de los días del historial
+
+    Returns:
+        tuple: (niveles Series por flor, factores_dia array de 7 [lunes..domingo],
+                factores_especiales dict {nombre: factor})
+    """
+    marca_especial = np.array([dia.date() in especiales for dia in serie.index], dtype=bool)
+    normal = serie[~marca_especial]
+    total_normal = normal.sum(axis=1)
+
+    # Día de la semana: promedio del consumo total de cada día, relativo al promedio
+    factores_dia = np.ones(7)
+    if total_normal.sum() > 0:
+        por_dia = total_normal.groupby(total_normal.index.dayofweek).mean().reindex(range(7))
+        por_dia = por_dia.fillna(por_dia.mean())
+        factores_dia = (por_dia / por_dia.mean()).to_numpy()
+
+    # Nivel: consumo sin el efecto del día de la semana, con más peso en lo reciente
+    if normal.empty or normal.shape[1] == 0:
+        niveles = pd.Series(dtype=float)
+    else:
+        desestacionalizado = normal.div(factores_dia[normal.index.dayofweek], axis=0)
+        niveles = desestacionalizado.ewm(halflife=VIDA_MEDIA_NIVEL_DIAS).mean().iloc[-1]
+
+    # Fecha especial: consumo observado en sus días vs el esperado para esos días sin
+    # ella. Con pocos datos se acerca al factor por defecto: se suma un año "previo"
+    # que habría tenido exactamente ese factor
+    media_normal = total_normal.mean() if len(total_normal) else 0
+    previo = media_normal * (DIAS_PREVIOS_FECHA_ESPECIAL + 1)
+    total = serie.sum(axis=1)
+    factores_especiales = {}
+    for nombre in FECHAS_ESPECIALES:
+        dias = [dia for dia in serie.index if especiales.get(dia.date()) == nombre]
+        esperado = media_normal * factores_dia[[dia.dayofweek for dia in dias]].sum() if dias else 0
+        if esperado + previo > 0:
+            observado = total.loc[dias].sum() if dias else 0
+            factores_especiales[nombre] = float(
+                (observado + previo * FACTOR_FECHA_ESPECIAL_DEFECTO) / (esperado + previo)
+            )
+        else:
+            factores_especiales[nombre] = FACTOR_FECHA_ESPECIAL_DEFECTO
+    return niveles, factores_dia, factores_especiales
+
+
+def _reservado(desde, hasta):
+    """{(flor_id, fecha): cantidad} reservada en el libro de reservas entre desde y hasta"""
+    filas = db.session.execute(
+        select(ReservaDiaria.insumo_id, ReservaDiaria.fecha, ReservaDiaria.cantidad).where(
+            ReservaDiaria.insumo_tipo == 'Flor',
+            ReservaDiaria.fecha.between(desde, hasta),
+            ReservaDiaria.cantidad > 0,
+        )
+    )
+    return {(flor_id, fecha): cantidad for flor_id, fecha, cantidad in filas}
+
+
+def _proveedor_por_flor():
+    """Primer proveedor activo (por ID) de cada flor"""
+    filas = db.session.execute(
+        select(proveedor_flor.c.flor_id, func.min(Proveedor.id))
+        .join(Proveedor, Proveedor.id == proveedor_flor.c.proveedor_id)
+        .where(Proveedor.activo.isnot(False))
+        .group_by(proveedor_flor.c.flor_id)
+    )
+    return dict(filas.all())
+
+
+class PronosticoService:
+    """Servicio de pronóstico de demanda de flores y compras sugeridas"""
+
+    @staticmethod
+    def calcular(dias=HORIZONTE_COMPRA_DIAS, hoy=None):
+        """
+        Ajusta el pronóstico con el historial y reemplaza pronosticos_demanda y
+        compras_sugeridas para los días siguientes a hoy. No confirma: el caller decide
+
+        Args:
+            dias: días del horizonte (desde mañana)
+            hoy: fecha de referencia (por defecto, hoy)
+
+        Returns:
+            tuple: (success, resumen_dict, mensaje)
+        """
+        if pd is None:
+            return False, {}, 'El pronóstico requiere pandas (ver requirements.txt)'
+        if not 1 <= dias <= MAX_HORIZONTE_COMPRA_DIAS:
+            return False, {}, f'El horizonte debe estar entre 1 y {MAX_HORIZONTE_COMPRA_DIAS} días'
+
+        hoy = hoy or date.today()
+        inicio_historia = hoy - timedelta(days=DIAS_HISTORIA)
+        desde = hoy + timedelta(days=1)
+        hasta = hoy + timedelta(days=dias)
+
+        serie = _serie_historica(inicio_historia, hoy)
+        especiales_historia = dias_especiales(inicio_historia, hoy)
+        niveles, factores_dia, factores_especiales = _ajustar(serie, especiales_historia)
+        especiales_horizonte = dias_especiales(desde, hasta)
+        reservado = _reservado(desde, hasta)
+
+        flores = db.session.execute(
+            select(Flor.id, Flor.cantidad_stock, Flor.stock_bajo, Flor.costo_unitario)
+        ).all()
+        proveedores = _proveedor_por_flor()
+        ahora = datetime.utcnow()
+
+        pronosticos, compras = [], []
+        for flor in flores:
+            nivel = float(niveles.get(flor.id, 0) or 0)
+            demanda_total = 0.0
+            reservado_total = 0
+            for desplazamiento in range(dias):
+                fecha = desde + timedelta(days=desplazamiento)
+                especial = especiales_horizonte.get(fecha)
+                cantidad = nivel * factores_dia[fecha.weekday()] * factores_especiales.get(especial, 1.0)
+                reservado_dia = reservado.get((flor.id, fecha), 0)
+                if cantidad < 0.005 and not reservado_dia:
+                    continue
+                pronosticos.append({
+                    'flor_id': flor.id, 'fecha': fecha, 'cantidad': round(cantidad, 2),
+                    'reservado': reservado_dia, 'fecha_especial': especial, 'fecha_calculo': ahora
+                })
+                demanda_total += max(cantidad, reservado_dia)
+                reservado_total += reservado_dia
+
+            stock = flor.cantidad_stock or 0
+            stock_bajo = flor.stock_bajo or 0
+            comprar = math.ceil(round(demanda_total + stock_bajo - stock, 2)) if demanda_total > 0 else 0
+            if comprar <= 0:
+                continue
+            compras.append({
+                'flor_id': flor.id, 'proveedor_id': proveedores.get(flor.id), 'desde': desde, 'hasta': hasta,
+                'demanda': round(demanda_total, 2), 'reservado': reservado_total, 'stock': stock,
+                'stock_bajo': stock_bajo, 'cantidad': comprar,
+                'costo_estimado': round(comprar * float(flor.costo_unitario or 0), 2), 'fecha_calculo': ahora
+            })
+
+        db.session.execute(delete(PronosticoDemanda))
+        db.session.execute(delete(CompraSugerida))
+        if pronosticos:
+            db.session.execute(insert(PronosticoDemanda), pronosticos)
+        if compras:
+            db.session.execute(insert(CompraSugerida), compras)
+
+        resumen = {
+            'desde': desde.isoformat(),
+            'hasta': hasta.isoformat(),
+            'dias_historia': len(serie.index),
+            'flores_con_historial': int((niveles > 0).sum()) if len(niveles) else 0,
+            'factores_dia_semana': [round(float(f), 3) for f in factores_dia],
+            'factores_fechas_especiales': {nombre: round(f, 3) for nombre, f in factores_especiales.items()},
+            'pronosticos': len(pronosticos),
+            'compras': len(compras),
+            'tallos': sum(c['cantidad'] for c in compras),
+            'costo_estimado': round(sum(c['costo_estimado'] for c in compras), 2),
+        }
+        return True, resumen, f"{len(compras)} flores por comprar entre {desde.isoformat()} y {hasta.isoformat()}"
+
+    @staticmethod
+    def compras_sugeridas(proveedor_id=None):
+        """
+        Lista de compras del último cálculo, agrupada por proveedor
+
+        Args:
+            proveedor_id: solo ese proveedor ('sin-proveedor' para las flores sin proveedor)
+
+        Returns:
+            tuple: (success, data, mensaje)
+        """
+        try:
+            consulta = db.session.query(CompraSugerida, Flor).outerjoin(Flor, Flor.id == CompraSugerida.flor_id)
+            if proveedor_id == 'sin-proveedor':
+                consulta = consulta.filter(CompraSugerida.proveedor_id.is_(None))
+            elif proveedor_id:
+                consulta = consulta.filter(CompraSugerida.proveedor_id == proveedor_id)
+            filas = consulta.order_by(CompraSugerida.proveedor_id, CompraSugerida.flor_id).all()
+            if not filas:
+                return True, {'fecha_calculo': None, 'proveedores': []}, 'No hay compras sugeridas'
+
+            ids_proveedores = {compra.proveedor_id for compra, _ in filas if compra.proveedor_id}
+            proveedores = {
+                p.id: p for p in Proveedor.query.filter(Proveedor.id.in_(ids_proveedores)).all()
+            } if ids_proveedores else {}
+
+            grupos = {}
+            for compra, flor in filas:
+                grupo = grupos.get(compra.proveedor_id)
+                if grupo is None:
+                    proveedor = proveedores.get(compra.proveedor_id)
+                    grupo = grupos[compra.proveedor_id] = {
+                        'proveedor_id': compra.proveedor_id,
+                        'proveedor_nombre': proveedor.nombre if proveedor else None,
+                        'empresa': proveedor.empresa if proveedor else None,
+                        'dias_entrega': proveedor.dias_entrega if proveedor else None,
+                        'flores': [],
+                        'tallos': 0,
+                        'costo_estimado': 0.0
+                    }
+                item = compra.to_dict()
+                item['nombre'] = (flor.nombre or f"{flor.tipo} {flor.color or ''}".strip()) if flor else None
+                item['unidad'] = flor.unidad if flor else None
+                grupo['flores'].append(item)
+                grupo['tallos'] += compra.cantidad
+                grupo['costo_estimado'] += item['costo_estimado']
+
+            primera = filas[0][0]
+            return True, {
+                'fecha_calculo': primera.fecha_calculo.isoformat(),
+                'desde': primera.desde.isoformat(),
+                'hasta': primera.hasta.isoformat(),
+                'proveedores': list(grupos.values())
+            }, f'{len(filas)} flores por comprar'
+        except Exception as e:
+            return False, None, str(e)
+
+    @staticmethod
+    def pronostico_flor(flor_id):
+        """
+        Pronóstico diario de una flor del último cálculo
+
+        Returns:
+            tuple: (success, data, mensaje)
+        """
+        try:
+            dias = PronosticoDemanda.query.filter_by(flor_id=flor_id).order_by(PronosticoDemanda.fecha).all()
+            compra = db.session.get(CompraSugerida, flor_id)
+            return True, {
+                'flor_id': flor_id,
+                'dias': [dia.to_dict() for dia in dias],
+                'compra': compra.to_dict() if compra else None
+            }, f'{len(dias)} días pronosticados'
+        except Exception as e:
+            return False, None, str(e)
@@ -7,6 +7,7 @@ from extensions import db
 from models.pedido import Pedido
 from models.cliente import Cliente
 from models.producto import Producto
+from config.motivos import MOTIVOS_ESTANDAR_MINUSCULAS
 from datetime import datetime, timedelta
 from sqlalchemy import func, extract, case
 import re
@@ -62,13 +63,8 @@ class ReportesService:
             return None
 
         # Excluir si es un motivo estándar
-        try:
-            from config.motivos import obtener_motivos
-            motivos = set(m.lower() for m in obtener_motivos())
-            if candidato.lower() in motivos:
-                return None
-        except Exception:
-            pass
+        if candidato.lower() in MOTIVOS_ESTANDAR_MINUSCULAS:
+            return None
 
         return ReportesService._title_case_keep_acronyms(candidato)
 
@@ -280,7 +276,8 @@ class ReportesService:
     def obtener_top_clientes(limite=10):
         """
         Obtiene los mejores clientes por gasto total
-        Calcula el total basándose en pedidos activos (no cancelados ni eliminados)
+        Lee las estadísticas del cliente, que se mantienen al día con cada cambio de
+        sus pedidos activos (no cancelados ni eliminados)
 
         Args:
             limite: cantidad de clientes a retornar
@@ -288,39 +285,23 @@ class ReportesService:
         Returns:
             list: clientes ordenados por gasto total
         """
-        # Calcular total_gastado real desde pedidos activos para cada cliente
-        from sqlalchemy import func
-        
-        # Obtener total gastado por cliente desde pedidos activos
-        gastos_reales = db.session.query(
-            Pedido.cliente_id,
-            func.sum(Pedido.precio_ramo + Pedido.precio_envio).label('total_real'),
-            func.count(Pedido.id).label('pedidos_real')
+        clientes = db.session.query(
+            Cliente.id, Cliente.nombre, Cliente.total_gastado, Cliente.total_pedidos, Cliente.tipo_cliente
         ).filter(
-            Pedido.cliente_id.isnot(None),
-            Pedido.estado != 'Cancelado'
-        ).group_by(Pedido.cliente_id).subquery()
-        
-        # Unir con clientes y ordenar por total real
-        clientes_con_gasto = db.session.query(
-            Cliente,
-            gastos_reales.c.total_real,
-            gastos_reales.c.pedidos_real
-        ).join(
-            gastos_reales, Cliente.id == gastos_reales.c.cliente_id
+            Cliente.total_pedidos > 0
         ).order_by(
-            gastos_reales.c.total_real.desc()
+            Cliente.total_gastado.desc()
         ).limit(limite).all()
 
         return [
             {
                 'id': c.id,
                 'nombre': c.nombre,
-                'total_gastado': float(total_real or 0),
-                'total_pedidos': int(pedidos_real or 0),
+                'total_gastado': float(c.total_gastado or 0),
+                'total_pedidos': int(c.total_pedidos or 0),
                 'tipo_cliente': c.tipo_cliente
             }
-            for c, total_real, pedidos_real in clientes_con_gasto
+            for c in clientes
         ]
 
     @staticmethod
@@ -0,0 +1,430 @@
+"""
+Libro de reservas de insumos por fecha
+
+Los contadores cantidad_en_uso y cantidad_en_evento de flores y contenedores dicen
+cuánto stock está comprometido, pero no para cuándo: saber si alcanza para un evento
+en una fecha obligaba a recorrer todos los pedidos y eventos abiertos. Este libro
+registra cada reserva con su fecha (la de entrega del pedido o la del evento) en
+movimientos_reservas, donde solo se agregan filas, y mantiene en reservas_diarias el
+total por insumo y día. La disponibilidad de una fecha es entonces una consulta
+agrupada sobre la clave primaria de reservas_diarias.
+
+Las reservas se concilian desde un after_flush de la sesión, en la misma transacción
+que modifica el pedido o evento: se calcula lo que cada origen afectado debería tener
+reservado (sus insumos aún no descontados del stock, a su fecha) y se agregan solo
+las diferencias con lo ya registrado, así que conciliar dos veces no cambia nada. Las
+escrituras con SQL directo o Query.delete() no pasan por la sesión y deben llamar a
+conciliar_reservas(). scripts/reconstruir_reservas.py carga los datos existentes.
+Los insumos cuyas reservas cambian quedan marcados para reevaluar su alerta de stock.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import chain
+from sqlalchemy import and_, case, event, func, inspect, insert, or_, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models.pedido import Pedido, PedidoInsumo
+from models.evento import Evento, EventoInsumo
+from models.inventario import Flor, Contenedor, MovimientoReserva, ReservaDiaria
+from services.alertas_stock_service import marcar_insumos_modificados
+from utils.sql_helpers import insertar_o_sumar
+from config.reservas import (
+    VENTANAS_DISPONIBILIDAD, ESTADOS_SIN_RESERVA, TAMANO_LOTE_CONCILIACION, MAX_DIAS_CALENDARIO
+)
+
+ORIGENES_RESERVA = ('pedido', 'evento')
+
+_MODELOS_INSUMO = {'Flor': Flor, 'Contenedor': Contenedor}
+
+# tipo_insumo de EventoInsumo -> insumo_tipo del libro
+_TIPOS_LINEA_EVENTO = {'flor': 'Flor', 'contenedor': 'Contenedor'}
+
+# Si un origen cambia por varios motivos en un mismo flush se registra el más importante
+_PRIORIDAD_MOTIVOS = {'conciliacion': 0, 'insumos': 1, 'fecha': 2, 'estado': 3, 'creado': 4, 'eliminado': 5}
+
+def _a_fecha(valor):
+    """date de un DateTime, Date o texto ISO (según lo que devuelva el driver)"""
+    if valor is None or (isinstance(valor, date) and not isinstance(valor, datetime)):
+        return valor
+    if isinstance(valor, datetime):
+        return valor.date()
+    return date.fromisoformat(str(valor)[:10])
+
+
+def ventana(insumo_tipo, fecha):
+    """(desde, hasta) de las reservas que compiten con la fecha; None = sin límite"""
+    antes, despues = VENTANAS_DISPONIBILIDAD[insumo_tipo]
+    return (
+        fecha - timedelta(days=antes) if antes is not None else None,
+        fecha + timedelta(days=despues) if despues is not None else None,
+    )
+
+
+def _en_ventana(fecha, desde, hasta):
+    return (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+
+
+def _no_descontado(columna):
+    return or_(columna.is_(None), columna == False)  # noqa: E712
+
+
+def _reservas_deseadas(conexion, origen_tipo, ids):
+    """{(origen_id, insumo_tipo, insumo_id, fecha): cantidad} que cada origen debería tener reservado"""
+    if origen_tipo == 'pedido':
+        consulta = (
+            select(PedidoInsumo.pedido_id, Pedido.fecha_entrega, PedidoInsumo.insumo_tipo,
+                   PedidoInsumo.insumo_id, PedidoInsumo.cantidad)
+            .join(Pedido, Pedido.id == PedidoInsumo.pedido_id)
+            .where(
+                PedidoInsumo.pedido_id.in_([int(origen_id) for origen_id in ids]),
+                Pedido.estado.notin_(ESTADOS_SIN_RESERVA),
+                _no_descontado(PedidoInsumo.descontado_stock),
+            )
+        )
+    else:
+        consulta = (
+            select(EventoInsumo.evento_id, Evento.fecha_evento,
+                   case((EventoInsumo.tipo_insumo == 'flor', 'Flor'), else_='Contenedor'),
+                   case((EventoInsumo.tipo_insumo == 'flor', EventoInsumo.flor_id), else_=EventoInsumo.contenedor_id),
+                   EventoInsumo.cantidad)
+            .join(Evento, Evento.id == EventoInsumo.evento_id)
+            .where(
+                EventoInsumo.evento_id.in_(ids),
+                EventoInsumo.tipo_insumo.in_(tuple(_TIPOS_LINEA_EVENTO)),
+                EventoInsumo.reservado == True,  # noqa: E712
+                _no_descontado(EventoInsumo.descontado_stock),
+                Evento.fecha_evento.isnot(None),
+            )
+        )
+
+    deseadas = defaultdict(int)
+    for origen_id, fecha, insumo_tipo, insumo_id, cantidad in conexion.execute(consulta):
+        if insumo_id and cantidad:
+            deseadas[(str(origen_id), str(insumo_tipo), str(insumo_id), _a_fecha(fecha))] += cantidad
+    return deseadas
+
+
+def _reservas_registradas(conexion, origen_tipo, ids):
+    """{(origen_id, insumo_tipo, insumo_id, fecha): cantidad} reservado hoy en el libro por cada origen"""
+    total = func.sum(MovimientoReserva.cantidad)
+    filas = conexion.execute(
+        select(MovimientoReserva.origen_id, MovimientoReserva.insumo_tipo,
+               MovimientoReserva.insumo_id, MovimientoReserva.fecha, total)
+        .where(MovimientoReserva.origen_tipo == origen_tipo, MovimientoReserva.origen_id.in_(ids))
+        .group_by(MovimientoReserva.origen_id, MovimientoReserva.insumo_tipo,
+                  MovimientoReserva.insumo_id, MovimientoReserva.fecha)
+        .having(total != 0)
+    )
+    return {
+        (origen_id, insumo_tipo, insumo_id, _a_fecha(fecha)): cantidad
+        for origen_id, insumo_tipo, insumo_id, fecha, cantidad in filas
+    }
+
+
+def _acumular_diarias(conexion, movimientos):
+    """Suma los movimientos a reservas_diarias (un INSERT ... ON CONFLICT por día)"""
+    deltas = defaultdict(int)
+    for movimiento in movimientos:
+        deltas[(movimiento['insumo_tipo'], movimiento['insumo_id'], movimiento['fecha'])] += movimiento['cantidad']
+
+    filas = [
+        {'insumo_tipo': insumo_tipo, 'insumo_id': insumo_id, 'fecha': fecha, 'cantidad': cantidad}
+        for (insumo_tipo, insumo_id, fecha), cantidad in deltas.items() if cantidad
+    ]
+    insertar_o_sumar(conexion, ReservaDiaria.__table__, filas, ['insumo_tipo', 'insumo_id', 'fecha'], 'cantidad')
+
+
+def _conciliar(conexion, origenes):
+    """
+    Agrega al libro la diferencia entre lo reservado y lo que cada origen debería reservar
+
+    Args:
+        conexion: conexión de la transacción en curso
+        origenes: dict {(origen_tipo, origen_id): motivo}
+
+    Returns:
+        list: movimientos registrados
+    """
+    ahora = datetime.utcnow()
+    movimientos = []
+    for origen_tipo in ORIGENES_RESERVA:
+        motivos = {str(origen_id): motivo for (tipo, origen_id), motivo in origenes.items() if tipo == origen_tipo}
+        ids = list(motivos)
+        for inicio in range(0, len(ids), TAMANO_LOTE_CONCILIACION):
+            lote = ids[inicio:inicio + TAMANO_LOTE_CONCILIACION]
+            deseadas = _reservas_deseadas(conexion, origen_tipo, lote)
+            registradas = _reservas_registradas(conexion, origen_tipo, lote)
+            for clave in deseadas.keys() | registradas.keys():
+                diferencia = deseadas.get(clave, 0) - registradas.get(clave, 0)
+                if not diferencia:
+                    continue
+                origen_id, insumo_tipo, insumo_id, fecha = clave
+                movimientos.append({
+                    'insumo_tipo': insumo_tipo, 'insumo_id': insumo_id, 'fecha': fecha,
+                    'cantidad': diferencia, 'origen_tipo': origen_tipo, 'origen_id': origen_id,
+                    'motivo': motivos[origen_id], 'fecha_registro': ahora
+                })
+
+    if movimientos:
+        conexion.execute(insert(MovimientoReserva.__table__), movimientos)
+        _acumular_diarias(conexion, movimientos)
+    return movimientos
+
+
+def _marcar_alertas(session, movimientos):
+    """La demanda próxima de estos insumos cambió: reevaluar sus alertas de stock"""
+    if movimientos:
+        marcar_insumos_modificados(session, {(m['insumo_tipo'], m['insumo_id']) for m in movimientos})
+
+
+def _anotar(origenes, origen_tipo, origen_id, motivo):
+    if origen_id is None or motivo is None:
+        return
+    anterior = origenes.get((origen_tipo, origen_id))
+    if anterior is None or _PRIORIDAD_MOTIVOS[motivo] > _PRIORIDAD_MOTIVOS[anterior]:
+        origenes[(origen_tipo, origen_id)] = motivo
+
+
+def _motivo_cambio(obj, campo_fecha, campo_estado=None):
+    """'estado', 'fecha' o None si el cambio no afecta a las reservas"""
+    atributos = inspect(obj).attrs
+    if campo_estado and atributos[campo_estado].history.added:
+        return 'estado'
+    if atributos[campo_fecha].history.added:
+        return 'fecha'
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _conciliar_reservas_flush(session, flush_context):
+    """Concilia las reservas de los pedidos y eventos cuyos insumos, fecha o estado cambiaron en el flush"""
+    origenes = {}
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Pedido):
+            if obj in session.deleted:
+                _anotar(origenes, 'pedido', obj.id, 'eliminado')
+            elif obj in session.new:
+                _anotar(origenes, 'pedido', obj.id, 'creado')
+            else:
+                _anotar(origenes, 'pedido', obj.id, _motivo_cambio(obj, 'fecha_entrega', 'estado'))
+        elif isinstance(obj, Evento):
+            if obj in session.deleted:
+                _anotar(origenes, 'evento', obj.id, 'eliminado')
+            elif obj not in session.new:
+                _anotar(origenes, 'evento', obj.id, _motivo_cambio(obj, 'fecha_evento'))
+        elif isinstance(obj, PedidoInsumo):
+            _anotar(origenes, 'pedido', obj.pedido_id, 'insumos')
+        elif isinstance(obj, EventoInsumo):
+            _anotar(origenes, 'evento', obj.evento_id, 'insumos')
+
+    if origenes:
+        movimientos = _conciliar(session.connection(), origenes)
+        _marcar_alertas(session, movimientos)
+
+
+def conciliar_reservas(pedidos=(), eventos=(), motivo='conciliacion'):
+    """
+    Concilia las reservas de pedidos y eventos modificados con SQL directo (sin pasar
+    por el ORM), en la transacción actual de db.session
+
+    Returns:
+        int: movimientos registrados
+    """
+    origenes = {('pedido', pedido_id): motivo for pedido_id in pedidos}
+    origenes.update({('evento', evento_id): motivo for evento_id in eventos})
+    if not origenes:
+        return 0
+    movimientos = _conciliar(db.session.connection(), origenes)
+    _marcar_alertas(db.session, movimientos)
+    return len(movimientos)
+
+
+def _comprometido(insumo_tipo, fecha, ids=None):
+    """
+    Stock y total reservado en la ventana de la fecha por insumo, en una consulta
+    agrupada sobre reservas_diarias
+
+    Returns:
+        dict: {insumo_id: (nombre, stock, reservado)}
+    """
+    modelo = _MODELOS_INSUMO[insumo_tipo]
+    desde, hasta = ventana(insumo_tipo, fecha)
+    condicion = [ReservaDiaria.insumo_tipo == insumo_tipo, ReservaDiaria.insumo_id == modelo.id]
+    if desde is not None:
+        condicion.append(ReservaDiaria.fecha >= desde)
+    if hasta is not None:
+        condicion.append(ReservaDiaria.fecha <= hasta)
+
+    consulta = (
+        select(modelo.id, modelo.nombre, modelo.cantidad_stock, func.coalesce(func.sum(ReservaDiaria.cantidad), 0))
+        .outerjoin(ReservaDiaria, and_(*condicion))
+        .group_by(modelo.id, modelo.nombre, modelo.cantidad_stock)
+    )
+    if ids is not None:
+        consulta = consulta.where(modelo.id.in_(ids))
+    return {
+        insumo_id: (nombre, stock or 0, reservado)
+        for insumo_id, nombre, stock, reservado in db.session.execute(consulta)
+    }
+
+
+class ReservasService:
+    """Servicio del libro de reservas de insumos por fecha"""
+
+    @staticmethod
+    def disponibilidad(fecha, insumo_tipo=None, ids=None):
+        """
+        Stock disponible de flores y contenedores para una fecha
+
+        Args:
+            fecha: date consultada
+            insumo_tipo: 'Flor', 'Contenedor' o None (ambos)
+            ids: lista de IDs de insumo (None = todos los del tipo)
+
+        Returns:
+            tuple: (success, data, mensaje); data es una lista de insumo_tipo, insumo_id,
+                   nombre, stock, reservado (en la ventana de la fecha) y disponible
+        """
+        if insumo_tipo is not None and insumo_tipo not in _MODELOS_INSUMO:
+            return False, None, f"Tipo de insumo inválido: {insumo_tipo} (Flor o Contenedor)"
+        try:
+            data = []
+            for tipo in ([insumo_tipo] if insumo_tipo else list(_MODELOS_INSUMO)):
+                desde, hasta = ventana(tipo, fecha)
+                for insumo_id, (nombre, stock, reservado) in _comprometido(tipo, fecha, ids).items():
+                    data.append({
+                        'insumo_tipo': tipo,
+                        'insumo_id': insumo_id,
+                        'nombre': nombre,
+                        'stock': stock,
+                        'reservado': reservado,
+                        'disponible': stock - reservado,
+                        'ventana': {
+                            'desde': desde.isoformat() if desde else None,
+                            'hasta': hasta.isoformat() if hasta else None
+                        }
+                    })
+            return True, data, f"{len(data)} insumos"
+        except Exception as e:
+            return False, None, str(e)
+
+    @staticmethod
+    def verificar_evento(evento_id, fecha=None):
+        """
+        Indica si el stock alcanza para las flores y contenedores de un evento en una fecha
+
+        Las reservas que el propio evento ya tiene en el libro no se cuentan como
+        comprometidas: así se puede verificar un evento reservado o moverlo de fecha.
+
+        Args:
+            evento_id: ID del evento
+            fecha: date a verificar (por defecto, la fecha del evento)
+
+        Returns:
+            tuple: (success, data, mensaje); data incluye factible y, por insumo,
+                   requerido, stock, reservado (por otros), disponible y faltante
+        """
+        try:
+            evento = Evento.query.get(evento_id)
+            if not evento:
+                return False, None, 'Evento no encontrado'
+            fecha = fecha or _a_fecha(evento.fecha_evento)
+            if fecha is None:
+                return False, None, 'El evento no tiene fecha: indica la fecha a verificar'
+
+            requeridos = defaultdict(int)
+            for linea in evento.insumos:
+                insumo_tipo = _TIPOS_LINEA_EVENTO.get(linea.tipo_insumo)
+                insumo_id = getattr(linea, f'{linea.tipo_insumo}_id') if insumo_tipo else None
+                if insumo_id and linea.cantidad and not linea.descontado_stock:
+                    requeridos[(insumo_tipo, insumo_id)] += linea.cantidad
+
+            conexion = db.session.connection()
+            propias = _reservas_registradas(conexion, 'evento', [str(evento.id)])
+
+            insumos = []
+            for insumo_tipo in _MODELOS_INSUMO:
+                ids = [insumo_id for tipo, insumo_id in requeridos if tipo == insumo_tipo]
+                if not ids:
+                    continue
+                desde, hasta = ventana(insumo_tipo, fecha)
+                propias_en_ventana = defaultdict(int)
+                for (_, tipo, insumo_id, fecha_reserva), cantidad in propias.items():
+                    if tipo == insumo_tipo and _en_ventana(fecha_reserva, desde, hasta):
+                        propias_en_ventana[insumo_id] += cantidad
+
+                comprometido = _comprometido(insumo_tipo, fecha, ids)
+                for insumo_id in ids:
+                    if insumo_id not in comprometido:
+                        continue  # Referencia a un insumo que ya no existe
+                    requerido = requeridos[(insumo_tipo, insumo_id)]
+                    nombre, stock, reservado = comprometido[insumo_id]
+                    reservado -= propias_en_ventana[insumo_id]
+                    disponible = stock - reservado
+                    insumos.append({
+                        'insumo_tipo': insumo_tipo,
+                        'insumo_id': insumo_id,
+                        'nombre': nombre,
+                        'requerido': requerido,
+                        'stock': stock,
+                        'reservado': reservado,
+                        'disponible': disponible,
+                        'faltante': max(0, requerido - max(0, disponible))
+                    })
+
+            faltantes = [insumo for insumo in insumos if insumo['faltante']]
+            data = {
+                'evento_id': evento.id,
+                'fecha': fecha.isoformat(),
+                'factible': not faltantes,
+                'insumos': insumos,
+                'faltantes': len(faltantes)
+            }
+            mensaje = 'Hay stock para el evento' if not faltantes else f'Faltan {len(faltantes)} insumos'
+            return True, data, mensaje
+        except Exception as e:
+            return False, None, str(e)
+
+    @staticmethod
+    def calendario(insumo_tipo, insumo_id, desde, hasta):
+        """
+        Reservas de un insumo por día, con el pedido o evento que reserva cada cantidad
+
+        Args:
+            insumo_tipo: 'Flor' o 'Contenedor'
+            insumo_id: ID del insumo
+            desde, hasta: rango de fechas (inclusive)
+
+        Returns:
+            tuple: (success, data, mensaje); data es una lista de fecha, cantidad y origenes
+        """
+        if insumo_tipo not in _MODELOS_INSUMO:
+            return False, None, f"Tipo de insumo inválido: {insumo_tipo} (Flor o Contenedor)"
+        if hasta < desde:
+            return False, None, 'La fecha final es anterior a la inicial'
+        if (hasta - desde).days >= MAX_DIAS_CALENDARIO:
+            return False, None, f'El rango no puede superar {MAX_DIAS_CALENDARIO} días'
+        try:
+            total = func.sum(MovimientoReserva.cantidad)
+            filas = db.session.execute(
+                select(MovimientoReserva.fecha, MovimientoReserva.origen_tipo, MovimientoReserva.origen_id, total)
+                .where(
+                    MovimientoReserva.insumo_tipo == insumo_tipo,
+                    MovimientoReserva.insumo_id == insumo_id,
+                    MovimientoReserva.fecha.between(desde, hasta),
+                )
+                .group_by(MovimientoReserva.fecha, MovimientoReserva.origen_tipo, MovimientoReserva.origen_id)
+                .having(total != 0)
+                .order_by(MovimientoReserva.fecha)
+            )
+
+            dias = {}
+            for fecha, origen_tipo, origen_id, cantidad in filas:
+                fecha = _a_fecha(fecha).isoformat()
+                dia = dias.setdefault(fecha, {'fecha': fecha, 'cantidad': 0, 'origenes': []})
+                dia['cantidad'] += cantidad
+                dia['origenes'].append({'origen_tipo': origen_tipo, 'origen_id': origen_id, 'cantidad': cantidad})
+            return True, list(dias.values()), f"{len(dias)} días con reservas"
+        except Exception as e:
+            return False, None, str(e)
@@ -0,0 +1,105 @@
+"""
+Cola del taller: pedidos En Proceso con el estado de sus insumos
+
+Las pantallas del taller consultan la cola cada pocos segundos. La cola se arma con
+dos consultas fijas (tarjetas con PedidoSerializador y el estado de los insumos de
+los pedidos en proceso, agrupado por pedido) y queda en la caché de referencia bajo la
+etiqueta 'taller'.
+
+La etiqueta se invalida al confirmar cambios que alteran la cola: un pedido que entra
+o sale de En Proceso, cambios en los datos de la tarjeta de un pedido en proceso, e
+insumos de pedidos agregados, eliminados o confirmados (descontado_stock). Los cambios
+de productos llegan por la etiqueta 'productos'. Las escrituras con SQL directo deben
+llamar a marcar_etiquetas_modificadas(session, 'taller'); si no, la cola se corrige
+al vencer su TTL (config/cache.py).
+
+Con varios workers la cola solo se cachea si la caché es compartida (CACHE_BACKEND=redis):
+con la caché en memoria de cada proceso, un cambio de estado hecho en otro worker no la
+invalidaría (ver utils/cache_helpers.py).
+"""
+
+from itertools import chain
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.orm import Session
+from extensions import db
+from models.pedido import Pedido, PedidoInsumo
+from models.serializadores import PedidoSerializador
+from utils.cache_helpers import cache_referencia, marcar_etiquetas_modificadas
+
+ESTADO_TALLER = 'En Proceso'
+
+# Etiquetas de caché de la cola
+ETIQUETAS_TALLER = ('taller', 'productos')
+
+# Campos de Pedido que se muestran en la tarjeta del taller
+_CAMPOS_TARJETA = ('fecha_entrega', 'cliente_nombre', 'producto_id', 'arreglo_pedido', 'precio_ramo', 'es_urgente')
+
+
+def _cambia_cola(obj, session):
+    """Si el pedido o insumo creado, modificado o eliminado en el flush altera la cola"""
+    if isinstance(obj, PedidoInsumo):
+        if obj in session.new or obj in session.deleted:
+            return True
+        return bool(inspect(obj).attrs.descontado_stock.history.added)
+
+    if obj in session.new or obj in session.deleted:
+        return obj.estado == ESTADO_TALLER
+    atributos = inspect(obj).attrs
+    historial_estado = atributos.estado.history
+    if ESTADO_TALLER in chain(historial_estado.added or (), historial_estado.deleted or ()):
+        return True
+    return obj.estado == ESTADO_TALLER and any(atributos[campo].history.added for campo in _CAMPOS_TARJETA)
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_cambios_taller(session, flush_context):
+    """Marca la etiqueta 'taller' si el flush cambia pedidos en proceso o la confirmación de insumos"""
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, (Pedido, PedidoInsumo)) and _cambia_cola(obj, session):
+            marcar_etiquetas_modificadas(session, 'taller')
+            return
+
+
+def _estado_insumos():
+    """
+    Insumos de cada pedido en proceso en una consulta agrupada
+
+    Returns:
+        dict: {pedido_id: (total de insumos, todos descontados del stock)}
+    """
+    # bool_and(descontado_stock) portable: ningún insumo pendiente
+    pendientes = func.sum(case((PedidoInsumo.descontado_stock.is_(True), 0), else_=1))
+    filas = db.session.execute(
+        select(PedidoInsumo.pedido_id, func.count(PedidoInsumo.id), pendientes)
+        .join(Pedido, Pedido.id == PedidoInsumo.pedido_id)
+        .where(Pedido.estado == ESTADO_TALLER)
+        .group_by(PedidoInsumo.pedido_id)
+    )
+    return {pedido_id: (total, not sin_descontar) for pedido_id, total, sin_descontar in filas}
+
+
+def _armar_cola():
+    query = Pedido.query.filter(Pedido.estado == ESTADO_TALLER).order_by(Pedido.fecha_entrega, Pedido.id)
+    tarjetas = PedidoSerializador.serializar(query, 'taller')
+    estados = _estado_insumos()
+    for tarjeta in tarjetas:
+        total, confirmados = estados.get(tarjeta['id'], (0, False))
+        tarjeta['tiene_insumos'] = total > 0
+        tarjeta['total_insumos'] = total
+        tarjeta['insumos_confirmados'] = total > 0 and confirmados
+    return tarjetas
+
+
+class TallerService:
+    """Servicio de la cola del taller"""
+
+    @staticmethod
+    def obtener_cola():
+        """
+        Pedidos En Proceso por fecha de entrega, como tarjetas compactas
+
+        Returns:
+            list: dicts con los campos del conjunto 'taller' de PedidoSerializador más
+                  tiene_insumos, total_insumos e insumos_confirmados (compartida: no modificar)
+        """
+        return cache_referencia.obtener_o_calcular('taller', 'cola', _armar_cola, etiquetas=ETIQUETAS_TALLER)
@@ -0,0 +1,364 @@
+"""
+Caché de datos de referencia (catálogos que cambian poco y se leen en casi cada request)
+
+Dos niveles:
+- L1: LRU en memoria del proceso, con TTL por entrada
+- L2: backend compartido entre procesos (Redis) o su sustituto local en memoria
+
+La invalidación es por etiquetas versionadas: cada entrada se guarda bajo una clave
+que incluye la versión actual de sus etiquetas, e invalidar una etiqueta solo
+incrementa su versión. Las claves viejas dejan de leerse y expiran solas, y un cálculo
+que termina después de una invalidación queda guardado bajo la versión anterior.
+
+Las etiquetas se invalidan automáticamente al confirmar (commit) cambios del ORM en
+los modelos de config.cache.ETIQUETAS_POR_MODELO. Las escrituras con SQL directo
+deben llamar a cache_referencia.invalidar() explícitamente.
+
+Con el backend en memoria las versiones son de cada proceso: si el servidor corre
+varios workers (config.servidor) sin Redis, una invalidación no llegaría a los demás
+y la caché queda desactivada (se calcula siempre).
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from config.cache import (
+    CACHE_BACKEND, REDIS_URL, CACHE_PREFIJO, CACHE_MAX_ENTRADAS,
+    TTL_CACHE, TTL_CACHE_DEFECTO, ETIQUETAS_POR_MODELO
+)
+from config.servidor import calcular_workers
+
+# Clave en session.info con las etiquetas modificadas pendientes de commit
+_ETIQUETAS_MODIFICADAS = 'cache_etiquetas_modificadas'
+
+
+class CacheLRU:
+    """Caché LRU en memoria con expiración por entrada"""
+
+    def __init__(self, max_entradas=CACHE_MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Retorna (encontrado, valor)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return False, None
+            expira, valor = entrada
+            if expira <= time.monotonic():
+                del self._datos[clave]
+                return False, None
+            self._datos.move_to_end(clave)
+            return True, valor
+
+    def guardar(self, clave, valor, ttl):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class BackendMemoria:
+    """
+    Sustituto local del backend compartido
+
+    Misma interfaz que BackendRedis; sirve para desarrollo y para instalaciones
+    de un solo proceso, donde no hace falta compartir la caché
+    """
+
+    nombre = 'memoria'
+
+    def __init__(self):
+        self._valores = CacheLRU(max_entradas=CACHE_MAX_ENTRADAS * 4)
+        self._versiones = {}
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        encontrado, valor = self._valores.obtener(clave)
+        return valor if encontrado else None
+
+    def guardar(self, clave, valor, ttl):
+        self._valores.guardar(clave, valor, ttl)
+
+    def obtener_versiones(self, etiquetas):
+        with self._lock:
+            return [self._versiones.get(etiqueta, 0) for etiqueta in etiquetas]
+
+    def incrementar_version(self, etiqueta):
+        with self._lock:
+            self._versiones[etiqueta] = self._versiones.get(etiqueta, 0) + 1
+
+    def limpiar(self):
+        self._valores.limpiar()
+        with self._lock:
+            self._versiones.clear()
+
+
+class BackendRedis:
+    """Backend compartido en Redis (las versiones de etiquetas se comparten entre procesos)"""
+
+    nombre = 'redis'
+
+    def __init__(self, url=REDIS_URL, prefijo=CACHE_PREFIJO):
+        import redis  # Dependencia opcional, solo si CACHE_BACKEND=redis
+        self._cliente = redis.Redis.from_url(url)
+        self._prefijo = prefijo
+        self._cliente.ping()
+
+    def _clave(self, clave):
+        return f'{self._prefijo}:cache:{clave}'
+
+    def _clave_version(self, etiqueta):
+        return f'{self._prefijo}:cache-version:{etiqueta}'
+
+    def obtener(self, clave):
+        datos = self._cliente.get(self._clave(clave))
+        return pickle.loads(datos) if datos is not None else None
+
+    def guardar(self, clave, valor, ttl):
+        self._cliente.set(self._clave(clave), pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), ex=int(ttl))
+
+    def obtener_versiones(self, etiquetas):
+        if not etiquetas:
+            return []
+        valores = self._cliente.mget([self._clave_version(e) for e in etiquetas])
+        return [int(v) if v is not None else 0 for v in valores]
+
+    def incrementar_version(self, etiqueta):
+        self._cliente.incr(self._clave_version(etiqueta))
+
+    def limpiar(self):
+        for clave in self._cliente.scan_iter(f'{self._prefijo}:cache*'):
+            self._cliente.delete(clave)
+
+
+def crear_backend(nombre=CACHE_BACKEND):
+    """Crea el backend compartido configurado; si Redis no está disponible usa el de memoria"""
+    if nombre == 'redis':
+        try:
+            return BackendRedis()
+        except Exception as e:
+            print(f"⚠️ Caché: Redis no disponible ({str(e)}), usando caché en memoria")
+    return BackendMemoria()
+
+
+class _MetricasEspacio:
+    __slots__ = ('hits_l1', 'hits_l2', 'misses', 'errores', 'segundos_calculo')
+
+    def __init__(self):
+        self.hits_l1 = 0
+        self.hits_l2 = 0
+        self.misses = 0
+        self.errores = 0
+        self.segundos_calculo = 0.0
+
+    def to_dict(self):
+        consultas = self.hits_l1 + self.hits_l2 + self.misses
+        ms_por_calculo = (self.segundos_calculo * 1000 / self.misses) if self.misses else 0
+        return {
+            'consultas': consultas,
+            'hits_l1': self.hits_l1,
+            'hits_l2': self.hits_l2,
+            'misses': self.misses,
+            'errores_backend': self.errores,
+            'tasa_acierto': round((self.hits_l1 + self.hits_l2) / consultas * 100, 2) if consultas else 0,
+            'ms_promedio_calculo': round(ms_por_calculo, 3),
+            # Estimación: cada acierto evitó un cálculo de duración promedio
+            'ms_ahorrados_estimados': round(ms_por_calculo * (self.hits_l1 + self.hits_l2), 1)
+        }
+
+
+class CacheReferencia:
+    """Fachada de la caché: L1 en proceso + backend compartido + métricas"""
+
+    def __init__(self, backend=None, max_entradas=CACHE_MAX_ENTRADAS):
+        self.l1 = CacheLRU(max_entradas)
+        self.backend = backend if backend is not None else crear_backend()
+        # Con varios procesos, solo Redis les comparte las invalidaciones
+        self.activa = self.backend.nombre == 'redis' or calcular_workers() == 1
+        self._metricas = {}
+        self._invalidaciones = {}
+        self._lock = threading.Lock()
+
+    def _metricas_de(self, espacio):
+        with self._lock:
+            metricas = self._metricas.get(espacio)
+            if metricas is None:
+                metricas = self._metricas[espacio] = _MetricasEspacio()
+            return metricas
+
+    def _clave_versionada(self, espacio, clave, etiquetas):
+        versiones = self.backend.obtener_versiones(etiquetas)
+        sufijo = '.'.join(f'{e}{v}' for e, v in zip(etiquetas, versiones))
+        return f'{espacio}:{clave}@{sufijo}'
+
+    def obtener_o_calcular(self, espacio, clave, calcular, etiquetas=None, ttl=None):
+        """
+        Retorna el valor cacheado o lo calcula y lo guarda
+
+        Args:
+            espacio: espacio de nombres (define el TTL por defecto y agrupa métricas)
+            clave: clave dentro del espacio (ej: filtros de la consulta)
+            calcular: función sin argumentos que produce el valor
+            etiquetas: etiquetas que invalidan la entrada (por defecto, el espacio)
+            ttl: segundos de vida; por defecto TTL_CACHE[espacio]
+
+        Returns:
+            El valor (compartido entre requests: no modificarlo)
+        """
+        if not self.activa:
+            return calcular()
+
+        etiquetas = tuple(sorted(etiquetas)) if etiquetas else (espacio,)
+        ttl = ttl or TTL_CACHE.get(espacio, TTL_CACHE_DEFECTO)
+        metricas = self._metricas_de(espacio)
+
+        try:
+            clave_completa = self._clave_versionada(espacio, clave, etiquetas)
+        except Exception:
+            # Backend compartido caído: calcular sin caché antes que fallar el request
+            metricas.errores += 1
+            return calcular()
+
+        encontrado, valor = self.l1.obtener(clave_completa)
+        if encontrado:
+            metricas.hits_l1 += 1
+            return valor
+
+        try:
+            valor = self.backend.obtener(clave_completa)
+        except Exception:
+            metricas.errores += 1
+            valor = None
+        if valor is not None:
+            metricas.hits_l2 += 1
+            self.l1.guardar(clave_completa, valor, ttl)
+            return valor
+
+        inicio = time.perf_counter()
+        valor = calcular()
+        metricas.segundos_calculo += time.perf_counter() - inicio
+        metricas.misses += 1
+
+        self.l1.guardar(clave_completa, valor, ttl)
+        try:
+            self.backend.guardar(clave_completa, valor, ttl)
+        except Exception:
+            metricas.errores += 1
+        return valor
+
+    def invalidar(self, *etiquetas):
+        """Invalida todas las entradas asociadas a las etiquetas indicadas"""
+        for etiqueta in set(etiquetas):
+            try:
+                self.backend.incrementar_version(etiqueta)
+            except Exception as e:
+                # Sin poder versionar, lo único seguro en este proceso es vaciar la L1
+                print(f"⚠️ Caché: no se pudo invalidar '{etiqueta}' ({str(e)})")
+                self.l1.limpiar()
+            with self._lock:
+                self._invalidaciones[etiqueta] = self._invalidaciones.get(etiqueta, 0) + 1
+
+    def limpiar(self):
+        """Vacía la caché completa (L1 y backend)"""
+        self.l1.limpiar()
+        self.backend.limpiar()
+
+    def obtener_metricas(self):
+        """Métricas de aciertos/fallos por espacio de nombres"""
+        with self._lock:
+            espacios = {espacio: m.to_dict() for espacio, m in sorted(self._metricas.items())}
+            invalidaciones = dict(sorted(self._invalidaciones.items()))
+
+        total = _MetricasEspacio()
+        for metricas in self._metricas.values():
+            total.hits_l1 += metricas.hits_l1
+            total.hits_l2 += metricas.hits_l2
+            total.misses += metricas.misses
+            total.errores += metricas.errores
+            total.segundos_calculo += metricas.segundos_calculo
+        total_dict = total.to_dict()
+        total_dict['ms_ahorrados_estimados'] = round(sum(e['ms_ahorrados_estimados'] for e in espacios.values()), 1)
+
+        return {
+            'backend': self.backend.nombre,
+            'activa': self.activa,
+            'entradas_l1': len(self.l1),
+            'max_entradas_l1': self.l1.max_entradas,
+            'total': total_dict,
+            'espacios': espacios,
+            'invalidaciones': invalidaciones
+        }
+
+
+# Instancia única usada por rutas y servicios
+cache_referencia = CacheReferencia()
+
+
+# ===== INVALIDACIÓN AUTOMÁTICA DESDE LA SESIÓN DE SQLALCHEMY =====
+
+def _etiquetas_pendientes(session):
+    return session.info.setdefault(_ETIQUETAS_MODIFICADAS, set())
+
+
+def etiquetas_modificadas(session):
+    """Etiquetas modificadas en la transacción en curso de la sesión (no modificar)"""
+    return session.info.get(_ETIQUETAS_MODIFICADAS, ())
+
+
+def marcar_etiquetas_modificadas(session, *etiquetas):
+    """
+    Invalida las etiquetas al confirmar la transacción de la sesión (para escrituras
+    con SQL directo hechas dentro de la misma transacción, p. ej. desde un hook)
+    """
+    _etiquetas_pendientes(session).update(etiquetas)
+
+
+@event.listens_for(Session, 'after_flush')
+def _registrar_etiquetas_modificadas(session, flush_context):
+    """Registra las etiquetas de los modelos de referencia creados, modificados o eliminados"""
+    etiquetas = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        etiquetas_modelo = ETIQUETAS_POR_MODELO.get(type(obj).__name__)
+        if etiquetas_modelo:
+            if etiquetas is None:
+                etiquetas = _etiquetas_pendientes(session)
+            etiquetas.update(etiquetas_modelo)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _registrar_etiquetas_masivas(orm_execute_state):
+    """Registra UPDATE/DELETE masivos (query.update(), query.delete()) sobre modelos de referencia"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    etiquetas_modelo = ETIQUETAS_POR_MODELO.get(mapper.class_.__name__) if mapper is not None else None
+    if etiquetas_modelo:
+        _etiquetas_pendientes(orm_execute_state.session).update(etiquetas_modelo)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_etiquetas_tras_commit(session):
+    """Invalida la caché solo cuando los cambios quedan confirmados"""
+    etiquetas = session.info.pop(_ETIQUETAS_MODIFICADAS, None)
+    if etiquetas:
+        cache_referencia.invalidar(*etiquetas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_etiquetas_modificadas(session):
+    session.info.pop(_ETIQUETAS_MODIFICADAS, None)
@@ -0,0 +1,357 @@
+"""
+Ingesta de archivos CSV por lotes (sin pandas)
+
+El archivo se lee de a lotes de filas con csv.DictReader y cada fila se convierte
+con un mapeo declarativo de columnas ({campo: Columna(...)}), que acepta los
+distintos nombres de columna de cada versión del archivo.
+
+Las tablas destino (TablaIngesta) se precargan una sola vez en diccionarios por
+clave natural (el nombre, sin distinguir mayúsculas) y generan los IDs en memoria,
+así que decidir si una fila inserta, actualiza o no cambia nada no consulta la
+base. Al final de cada lote se escribe un INSERT y un UPDATE por tabla, se marcan
+las etiquetas de caché de las tablas escritas (la caché de referencia y los ETag se
+invalidan con el commit) y se confirma la transacción.
+
+Las filas con error se escriben en un archivo aparte (número de fila, error y la
+fila original). En simulación no se guarda nada y se muestran las diferencias.
+
+Uso (ver importar_insumos_csv.py y scripts/importar_recetario_csv.py):
+
+    flores = TablaIngesta(Flor.__table__, prefijo_id='FL', actualizar=('ubicacion',), etiquetas=('flores',))
+
+    def procesar(valores):
+        flores.upsert({'nombre': valores['nombre'], 'ubicacion': valores['ubicacion']},
+                      al_crear={'ubicacion': 'Taller'})
+
+    ingesta = Ingesta(MAPEO, procesar, [flores], simular=True)
+    success, resumen, mensaje = ingesta.ejecutar('insumos.csv')
+"""
+
+import csv
+import os
+import re
+import time
+from itertools import islice
+from sqlalchemy import select, insert, update, bindparam
+from extensions import db
+from config.importacion import TAMANO_LOTE_IMPORTACION
+from utils.cache_helpers import marcar_etiquetas_modificadas
+
+
+class Columna:
+    """
+    Columna del CSV
+
+    Args:
+        *nombres: nombres aceptados en el encabezado (el primero es el principal)
+        convertir: función que convierte el texto (ValueError si no es válido)
+        requerida: la fila es un error si viene vacía
+        defecto: valor si la columna falta o viene vacía (también al actualizar; para
+            no tocar la columna de un registro existente, dejar None y pasar el valor
+            por defecto en al_crear de TablaIngesta.upsert())
+    """
+
+    def __init__(self, *nombres, convertir=None, requerida=False, defecto=None):
+        self.nombres = nombres
+        self.convertir = convertir
+        self.requerida = requerida
+        self.defecto = defecto
+
+
+def columnas_faltantes(encabezado, mapeo):
+    """Columnas requeridas del mapeo que no están en el encabezado del archivo"""
+    presentes = set(encabezado or ())
+    return [
+        columna.nombres[0] for columna in mapeo.values()
+        if columna.requerida and not presentes.intersection(columna.nombres)
+    ]
+
+
+def mapear_fila(fila, mapeo):
+    """
+    Convierte una fila del CSV según el mapeo
+
+    Returns:
+        dict: {campo: valor}
+
+    Raises:
+        ValueError: si falta una columna requerida o un valor no se puede convertir
+    """
+    valores = {}
+    for campo, columna in mapeo.items():
+        texto = next((fila[nombre] for nombre in columna.nombres if fila.get(nombre)), '')
+        texto = texto.strip()
+        if not texto:
+            if columna.requerida:
+                raise ValueError(f'Falta {columna.nombres[0]}')
+            valores[campo] = columna.defecto
+            continue
+        try:
+            valores[campo] = columna.convertir(texto) if columna.convertir else texto
+        except (ValueError, TypeError, ArithmeticError):
+            raise ValueError(f'{columna.nombres[0]}: valor no válido "{texto}"')
+    return valores
+
+
+def leer_lotes_csv(lector, tamano_lote):
+    """Genera listas de (número de fila, fila); la fila 1 es la primera después del encabezado"""
+    numeradas = enumerate(lector, start=1)
+    while True:
+        lote = list(islice(numeradas, tamano_lote))
+        if not lote:
+            return
+        yield lote
+
+
+class TablaIngesta:
+    """
+    Tabla destino de una ingesta, precargada en memoria por clave natural
+
+    Args:
+        tabla: Table de SQLAlchemy (Modelo.__table__ o table(...) con las columnas a escribir)
+        prefijo_id: los IDs nuevos son prefijo + número (p. ej. FL001); None si los genera la base
+        ancho_id: dígitos del número del ID
+        clave: columna con la clave natural (se compara sin distinguir mayúsculas)
+        actualizar: columnas que se actualizan en los registros existentes
+        etiquetas: etiquetas de caché que se marcan al guardar cambios (config.cache)
+    """
+
+    def __init__(self, tabla, prefijo_id=None, ancho_id=3, clave='nombre', actualizar=(), etiquetas=()):
+        self.tabla = tabla
+        self.nombre = tabla.name
+        self.prefijo_id = prefijo_id
+        self.ancho_id = ancho_id
+        self.clave = clave
+        self.actualizar = tuple(actualizar)
+        self.etiquetas = tuple(etiquetas)
+        self.nuevos = 0
+        self.actualizados = 0
+        self.sin_cambios = 0
+        self._registros = {}
+        self._siguiente_id = 1
+        self._por_insertar = {}
+        self._por_actualizar = {}
+        self.diferencias = []
+
+    def precargar(self):
+        """Carga id, clave y columnas actualizables de todos los registros (una consulta)"""
+        columnas = [self.tabla.c.id, self.tabla.c[self.clave]] + [self.tabla.c[c] for c in self.actualizar]
+        self._registros = {}
+        for fila in db.session.execute(select(*columnas)).mappings():
+            if fila[self.clave]:
+                self._registros.setdefault(str(fila[self.clave]).strip().lower(), dict(fila))
+
+        if self.prefijo_id:
+            patron = re.compile(rf'^{re.escape(self.prefijo_id)}(\d+)$')
+            numeros = (patron.match(str(registro['id'])) for registro in self._registros.values())
+            self._siguiente_id = max((int(m.group(1)) for m in numeros if m), default=0) + 1
+
+    def buscar(self, nombre):
+        """Registro existente (o nuevo en esta ingesta) con ese nombre, o None"""
+        return self._registros.get((nombre or '').strip().lower())
+
+    def upsert(self, valores, al_crear=None):
+        """
+        Inserta o actualiza un registro por su clave natural (se escribe en guardar())
+
+        Args:
+            valores: {columna: valor}; debe incluir la clave. Un valor None (celda
+                vacía) no actualiza la columna ni reemplaza al de al_crear
+            al_crear: valores que solo se usan si el registro es nuevo
+
+        Returns:
+            dict: el registro; su 'id' es None hasta guardar() si lo genera la base
+        """
+        clave = valores[self.clave].strip().lower()
+        registro = self._registros.get(clave)
+        valores = {columna: valor for columna, valor in valores.items() if valor is not None}
+
+        if registro is None:
+            registro = {**(al_crear or {}), **valores, 'id': None}
+            if self.prefijo_id:
+                registro['id'] = f'{self.prefijo_id}{self._siguiente_id:0{self.ancho_id}d}'
+                self._siguiente_id += 1
+            self._registros[clave] = registro
+            self._por_insertar[clave] = registro
+            self.nuevos += 1
+            self.diferencias.append(('nuevo', valores[self.clave], {}))
+            return registro
+
+        cambios = {
+            columna: (registro.get(columna), valores[columna])
+            for columna in self.actualizar
+            if columna in valores and valores[columna] != registro.get(columna)
+        }
+        if not cambios:
+            self.sin_cambios += 1
+            return registro
+
+        for columna, (_, nuevo) in cambios.items():
+            registro[columna] = nuevo
+        # Si se creó en este mismo lote basta con el INSERT
+        if clave not in self._por_insertar:
+            self._por_actualizar[clave] = registro
+            self.actualizados += 1
+            self.diferencias.append(('cambio', valores[self.clave], cambios))
+        return registro
+
+    def guardar(self):
+        """Escribe los registros pendientes del lote: un INSERT y un UPDATE (executemany)"""
+        columnas = self.tabla.c.keys()
+        if self.etiquetas and (self._por_insertar or self._por_actualizar):
+            marcar_etiquetas_modificadas(db.session, *self.etiquetas)
+
+        nuevos = list(self._por_insertar.values())
+        if nuevos:
+            filas = [{c: v for c, v in registro.items() if c in columnas and (c != 'id' or v is not None)}
+                     for registro in nuevos]
+            if self.prefijo_id:
+                db.session.execute(insert(self.tabla), filas)
+            else:
+                ids = db.session.execute(
+                    insert(self.tabla).returning(self.tabla.c.id, sort_by_parameter_order=True), filas
+                ).scalars().all()
+                for registro, nuevo_id in zip(nuevos, ids):
+                    registro['id'] = nuevo_id
+
+        if self._por_actualizar:
+            db.session.execute(
+                update(self.tabla).where(self.tabla.c.id == bindparam('_id')),
+                [
+                    {'_id': registro['id'], **{c: registro[c] for c in self.actualizar}}
+                    for registro in self._por_actualizar.values()
+                ]
+            )
+        self.descartar()
+
+    def descartar(self):
+        """Olvida lo pendiente del lote (en simulación); los registros siguen en memoria"""
+        self._por_insertar = {}
+        self._por_actualizar = {}
+        self.diferencias = []
+
+
+class _ArchivoErrores:
+    """CSV con las filas que no se pudieron importar; se crea con el primer error"""
+
+    def __init__(self, ruta, encabezado):
+        self.ruta = ruta
+        self.encabezado = ['fila', 'error'] + list(encabezado or ())
+        self.cantidad = 0
+        self._archivo = None
+        self._escritor = None
+
+    def escribir(self, numero, error, fila):
+        if self._archivo is None:
+            self._archivo = open(self.ruta, 'w', newline='', encoding='utf-8')
+            self._escritor = csv.DictWriter(self._archivo, fieldnames=self.encabezado, extrasaction='ignore')
+            self._escritor.writeheader()
+        self._escritor.writerow({**fila, 'fila': numero, 'error': str(error)})
+        self.cantidad += 1
+
+    def cerrar(self):
+        if self._archivo is not None:
+            self._archivo.close()
+
+
+def _mostrar_diferencias(tabla, mostrar):
+    for estado, nombre, cambios in tabla.diferencias:
+        if estado == 'nuevo':
+            mostrar(f"   ➕ {tabla.nombre}: {nombre}")
+        else:
+            detalle = ', '.join(f"{c}: {antes!r} → {despues!r}" for c, (antes, despues) in cambios.items())
+            mostrar(f"   ✏️  {tabla.nombre}: {nombre} ({detalle})")
+
+
+class Ingesta:
+    """
+    Ingesta de un CSV por lotes
+
+    Args:
+        mapeo: {campo: Columna}
+        procesar_fila: función(valores) que llama a upsert() de las tablas; puede lanzar
+            ValueError para rechazar la fila (antes de hacer upserts, para no dejarla a medias)
+        tablas: TablaIngesta que se precargan y se guardan en cada lote
+        simular: no guardar y mostrar las diferencias
+        tamano_lote: filas por lote (y por transacción)
+        al_guardar: función() que se llama en cada lote después de guardar las tablas
+            y antes del commit (p. ej. para escribir filas hijas con los IDs ya asignados)
+        ruta_errores: CSV de filas con error (por defecto <archivo>.errores.csv)
+        mostrar: función para los mensajes de progreso y diferencias
+    """
+
+    def __init__(self, mapeo, procesar_fila, tablas, simular=False, tamano_lote=TAMANO_LOTE_IMPORTACION,
+                 al_guardar=None, ruta_errores=None, mostrar=print):
+        self.mapeo = mapeo
+        self.procesar_fila = procesar_fila
+        self.tablas = tablas
+        self.simular = simular
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.al_guardar = al_guardar
+        self.ruta_errores = ruta_errores
+        self.mostrar = mostrar
+
+    def ejecutar(self, ruta):
+        """
+        Returns:
+            tuple: (success, resumen, mensaje); resumen con lotes, filas, con_errores,
+                   archivo_errores y {tabla: {nuevos, actualizados, sin_cambios}}
+        """
+        inicio = time.perf_counter()
+        resumen = {'archivo': ruta, 'simulacion': self.simular, 'lotes': 0, 'filas': 0,
+                   'con_errores': 0, 'archivo_errores': None, 'tablas': {}}
+        errores = None
+
+        try:
+            with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+                lector = csv.DictReader(archivo)
+                faltantes = columnas_faltantes(lector.fieldnames, self.mapeo)
+                if faltantes:
+                    return False, resumen, f'Faltan columnas en el archivo: {", ".join(faltantes)}'
+
+                for tabla in self.tablas:
+                    tabla.precargar()
+                errores = _ArchivoErrores(
+                    self.ruta_errores or f'{os.path.splitext(ruta)[0]}.errores.csv', lector.fieldnames
+                )
+
+                for lote in leer_lotes_csv(lector, self.tamano_lote):
+                    for numero, fila in lote:
+                        try:
+                            self.procesar_fila(mapear_fila(fila, self.mapeo))
+                        except ValueError as e:
+                            errores.escribir(numero, e, fila)
+
+                    if self.simular:
+                        for tabla in self.tablas:
+                            _mostrar_diferencias(tabla, self.mostrar)
+                            tabla.descartar()
+                    else:
+                        for tabla in self.tablas:
+                            tabla.guardar()
+                        if self.al_guardar:
+                            self.al_guardar()
+                        db.session.commit()
+
+                    resumen['lotes'] += 1
+                    resumen['filas'] += len(lote)
+                    self.mostrar(f"   Lote {resumen['lotes']}: {resumen['filas']} filas "
+                                 f"({errores.cantidad} con errores)")
+
+        except Exception as e:
+            db.session.rollback()
+            return False, resumen, f"Error en el lote {resumen['lotes'] + 1}: {e}"
+        finally:
+            if errores is not None:
+                errores.cerrar()
+                resumen['con_errores'] = errores.cantidad
+                resumen['archivo_errores'] = errores.ruta if errores.cantidad else None
+            resumen['tablas'] = {
+                tabla.nombre: {'nuevos': tabla.nuevos, 'actualizados': tabla.actualizados,
+                               'sin_cambios': tabla.sin_cambios}
+                for tabla in self.tablas
+            }
+            resumen['segundos'] = round(time.perf_counter() - inicio, 2)
+
+        verbo = 'validadas' if self.simular else 'importadas'
+        return True, resumen, f"{resumen['filas']} filas {verbo}, {resumen['con_errores']} con errores"
@@ -0,0 +1,209 @@
+"""
+Instrumentación de consultas SQL por request (opt-in con SQL_PROFILE=1)
+
+Escucha before/after_cursor_execute de SQLAlchemy y acumula, para el request en curso:
+cantidad de consultas, tiempo total en base de datos y cuántas veces se repite cada
+forma de consulta (la sentencia con los valores literales normalizados). Una forma
+repetida más de UMBRAL_CONSULTAS_REPETIDAS veces es casi siempre un N+1: una consulta
+por fila dentro de un loop (Flor.query.get, relaciones lazy en to_dict...).
+
+Cada respuesta lleva un header Server-Timing (visible en la pestaña Network del
+navegador) y el reporte agregado por endpoint está en /api/debug/profile.
+"""
+
+import re
+import threading
+import time
+from collections import Counter, deque
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config.instrumentacion import (
+    UMBRAL_CONSULTAS_REPETIDAS, MAX_PERFILES_RECIENTES, MAX_HUELLAS_POR_PERFIL, MAX_LARGO_HUELLA
+)
+
+# Normalización de sentencias a su "forma"
+_RE_LISTA_PARAMETROS = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))+\s*\)')
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+_instalada = False
+
+
+def huella_consulta(sentencia):
+    """
+    Forma de una sentencia SQL: literales reemplazados por ? y listas IN colapsadas,
+    para que la misma consulta con distintos valores cuente como repetida
+    """
+    huella = _RE_TEXTO.sub('?', sentencia)
+    huella = _RE_NUMERO.sub('?', huella)
+    huella = _RE_LISTA_PARAMETROS.sub('(?...)', huella)
+    return _RE_ESPACIOS.sub(' ', huella).strip()
+
+
+class PerfilRequest:
+    """Consultas SQL de un request"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_db = 0.0
+        self.huellas = Counter()
+
+    def registrar(self, sentencia, duracion):
+        self.consultas += 1
+        self.tiempo_db += duracion
+        self.huellas[huella_consulta(sentencia)] += 1
+
+    def repetidas(self, umbral=UMBRAL_CONSULTAS_REPETIDAS):
+        """[(huella, veces)] de las formas que superan el umbral, de más a menos repetida"""
+        return [(huella, veces) for huella, veces in self.huellas.most_common() if veces > umbral]
+
+
+class _EstadisticasEndpoint:
+    """Acumulado de un endpoint para el reporte"""
+
+    def __init__(self):
+        self.requests = 0
+        self.consultas = 0
+        self.max_consultas = 0
+        self.tiempo_db = 0.0
+        self.tiempo_total = 0.0
+        self.con_n_mas_1 = 0
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'consultas_promedio': round(self.consultas / self.requests, 1) if self.requests else 0,
+            'consultas_max': self.max_consultas,
+            'ms_db_promedio': round(self.tiempo_db * 1000 / self.requests, 2) if self.requests else 0,
+            'ms_total_promedio': round(self.tiempo_total * 1000 / self.requests, 2) if self.requests else 0,
+            'requests_con_n_mas_1': self.con_n_mas_1,
+        }
+
+
+class RegistroPerfiles:
+    """Perfiles recientes y estadísticas por endpoint (compartido entre hilos del proceso)"""
+
+    def __init__(self, max_recientes=MAX_PERFILES_RECIENTES):
+        self._recientes = deque(maxlen=max_recientes)
+        self._por_endpoint = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, endpoint, resumen, tiempo_total, n_mas_1):
+        with self._lock:
+            self._recientes.append(resumen)
+            estadisticas = self._por_endpoint.setdefault(endpoint, _EstadisticasEndpoint())
+            estadisticas.requests += 1
+            estadisticas.consultas += resumen['consultas']
+            estadisticas.max_consultas = max(estadisticas.max_consultas, resumen['consultas'])
+            estadisticas.tiempo_db += resumen['ms_db'] / 1000
+            estadisticas.tiempo_total += tiempo_total
+            if n_mas_1:
+                estadisticas.con_n_mas_1 += 1
+
+    def reporte(self, limite=50):
+        with self._lock:
+            recientes = list(self._recientes)[-limite:]
+            por_endpoint = {nombre: e.to_dict() for nombre, e in self._por_endpoint.items()}
+        return {
+            'umbral_repetidas': UMBRAL_CONSULTAS_REPETIDAS,
+            # Los endpoints con más consultas por request primero
+            'por_endpoint': dict(sorted(
+                por_endpoint.items(), key=lambda x: -x[1]['consultas_promedio']
+            )),
+            'recientes': list(reversed(recientes)),
+        }
+
+    def limpiar(self):
+        with self._lock:
+            self._recientes.clear()
+            self._por_endpoint.clear()
+
+
+registro_perfiles = RegistroPerfiles()
+
+
+def _perfil_actual():
+    if not has_request_context():
+        return None
+    return g.get('perfil_sql')
+
+
+def _antes_de_consulta(conn, cursor, sentencia, parametros, context, executemany):
+    if _perfil_actual() is not None:
+        conn.info.setdefault('inicio_consulta_perfil', []).append(time.perf_counter())
+
+
+def _despues_de_consulta(conn, cursor, sentencia, parametros, context, executemany):
+    perfil = _perfil_actual()
+    inicios = conn.info.get('inicio_consulta_perfil')
+    if perfil is None or not inicios:
+        return
+    perfil.registrar(sentencia, time.perf_counter() - inicios.pop())
+
+
+def _error_en_consulta(contexto):
+    # La consulta falló: descartar su hora de inicio para no desfasar las siguientes
+    inicios = contexto.connection.info.get('inicio_consulta_perfil') if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+
+def _iniciar_perfil():
+    g.perfil_sql = PerfilRequest()
+
+
+def _cerrar_perfil(response):
+    perfil = g.pop('perfil_sql', None)
+    if perfil is None:
+        return response
+
+    tiempo_total = time.perf_counter() - perfil.inicio
+    ms_db = perfil.tiempo_db * 1000
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={ms_db:.1f};desc="{perfil.consultas} consultas", app;dur={tiempo_total * 1000:.1f}'
+    )
+
+    repetidas = perfil.repetidas()
+    endpoint = f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+    if repetidas:
+        huella, veces = repetidas[0]
+        current_app.logger.warning(
+            f"⚠️ Posible N+1 en {endpoint}: {veces} consultas con la misma forma "
+            f"({perfil.consultas} en total): {huella[:MAX_LARGO_HUELLA]}"
+        )
+
+    registro_perfiles.agregar(endpoint, {
+        'endpoint': endpoint,
+        'path': request.full_path.rstrip('?'),
+        'status': response.status_code,
+        'consultas': perfil.consultas,
+        'ms_db': round(ms_db, 2),
+        'ms_total': round(tiempo_total * 1000, 2),
+        'mas_repetidas': [
+            {'sql': huella[:MAX_LARGO_HUELLA], 'veces': veces}
+            for huella, veces in perfil.huellas.most_common(MAX_HUELLAS_POR_PERFIL)
+        ],
+        'n_mas_1': bool(repetidas),
+    }, tiempo_total, bool(repetidas))
+
+    return response
+
+
+def instalar_instrumentacion(app):
+    """
+    Activa la instrumentación para la app: los eventos del engine se registran una
+    sola vez por proceso y solo cuentan consultas hechas dentro de un request perfilado
+    """
+    global _instalada
+    if not _instalada:
+        event.listen(Engine, 'before_cursor_execute', _antes_de_consulta)
+        event.listen(Engine, 'after_cursor_execute', _despues_de_consulta)
+        event.listen(Engine, 'handle_error', _error_en_consulta)
+        _instalada = True
+
+    app.before_request(_iniciar_perfil)
+    app.after_request(_cerrar_perfil)
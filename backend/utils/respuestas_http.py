@@ -0,0 +1,220 @@
+"""
+Compresión de respuestas y GET condicional (ETag) para la API JSON
+
+Compresión: un after_request comprime con brotli (si el paquete está instalado) o
+gzip las respuestas de TIPOS_COMPRIMIBLES desde COMPRESION_MIN_BYTES; las
+respuestas en streaming se comprimen trozo a trozo.
+
+ETag: con_etag() calcula un sello barato del estado de los datos ANTES de ejecutar
+la vista (filas y máximo de una columna de fecha por tabla más la versión de las
+etiquetas de caché de esos modelos, en una sola consulta). Si el cliente manda
+If-None-Match con ese mismo ETag se responde 304 sin consultar ni serializar nada.
+
+Las versiones de las etiquetas de config.cache.ETIQUETAS_VERSIONADAS se guardan en la
+base de datos (versiones_etiquetas) y se incrementan antes del commit, en la misma
+transacción que modifica los datos: así una edición que no toca la columna de fecha
+también cambia el ETag, aunque la haga otro proceso (otro worker o un script) y aunque
+el servidor se reinicie. Las etiquetas salen de los cambios del ORM
+(config.cache.ETIQUETAS_POR_MODELO); las escrituras con SQL directo deben llamar a
+marcar_etiquetas_modificadas() antes del commit.
+
+Los pedidos cambian en casi cada commit y no se versionan así (sería una fila que
+todas las escrituras de pedidos tendrían que bloquear): los sellos de Pedido y Cliente
+(sus estadísticas salen de los pedidos) incluyen el último id de cambios_pedidos, que
+cada cambio de pedido ya escribe (services/cambios_pedidos_service.py).
+"""
+
+import gzip
+import hashlib
+import zlib
+from datetime import date
+from functools import wraps
+from flask import make_response, request
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from extensions import db
+from config.cache import ETIQUETAS_POR_MODELO, ETIQUETAS_VERSIONADAS
+from config.respuestas import (
+    COMPRESION_MIN_BYTES, NIVEL_GZIP, NIVEL_BROTLI, TIPOS_COMPRIMIBLES
+)
+from models.pedido import CambioPedido
+from models.version_etiqueta import VersionEtiqueta
+from utils.cache_helpers import etiquetas_modificadas
+from utils.sql_helpers import insertar_o_sumar
+
+try:
+    import brotli  # Dependencia opcional: sin ella se usa solo gzip
+except ImportError:
+    brotli = None
+
+
+# ===== COMPRESIÓN =====
+
+def _elegir_codificacion():
+    """'br', 'gzip' o None según Accept-Encoding"""
+    aceptadas = request.accept_encodings
+    if brotli is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+def _comprimir(datos, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(datos, quality=NIVEL_BROTLI)
+    return gzip.compress(datos, compresslevel=NIVEL_GZIP, mtime=0)
+
+
+def _comprimir_trozos(trozos, codificacion):
+    """Comprime un iterable de trozos, enviando cada uno apenas se comprime"""
+    try:
+        if codificacion == 'br':
+            compresor = brotli.Compressor(quality=NIVEL_BROTLI)
+            comprimir = lambda trozo: compresor.process(trozo) + compresor.flush()
+            terminar = compresor.finish
+        else:
+            compresor = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            comprimir = lambda trozo: compresor.compress(trozo) + compresor.flush(zlib.Z_SYNC_FLUSH)
+            terminar = compresor.flush
+
+        for trozo in trozos:
+            if isinstance(trozo, str):
+                trozo = trozo.encode('utf-8')
+            salida = comprimir(trozo)
+            if salida:
+                yield salida
+        yield terminar()
+    finally:
+        # Cierra el generador original (libera el contexto de stream_with_context)
+        cerrar = getattr(trozos, 'close', None)
+        if cerrar is not None:
+            cerrar()
+
+
+def _comprimir_respuesta(respuesta):
+    if (respuesta.status_code < 200 or respuesta.status_code in (204, 206, 304)
+            or respuesta.direct_passthrough
+            or 'Content-Encoding' in respuesta.headers
+            or respuesta.mimetype not in TIPOS_COMPRIMIBLES):
+        return respuesta
+
+    # La representación depende de Accept-Encoding aunque esta vez no se comprima
+    respuesta.vary.add('Accept-Encoding')
+    codificacion = _elegir_codificacion()
+    if codificacion is None:
+        return respuesta
+
+    if respuesta.is_streamed:
+        respuesta.response = _comprimir_trozos(respuesta.response, codificacion)
+        respuesta.headers.pop('Content-Length', None)
+    else:
+        datos = respuesta.get_data()
+        if len(datos) < COMPRESION_MIN_BYTES:
+            return respuesta
+        respuesta.set_data(_comprimir(datos, codificacion))
+
+    respuesta.headers['Content-Encoding'] = codificacion
+    return respuesta
+
+
+def instalar_compresion(app):
+    """Comprime las respuestas de la app (ver config/respuestas.py)"""
+    app.after_request(_comprimir_respuesta)
+
+
+# ===== ETAG =====
+
+# Modelos cuyos datos cambian con cada cambio de pedido: el sello lleva el cursor del feed
+_MODELOS_CON_CAMBIOS_PEDIDOS = ('Pedido', 'Cliente')
+
+@event.listens_for(Session, 'before_commit')
+def _versionar_etiquetas(session):
+    """Incrementa la versión guardada de las etiquetas modificadas, dentro de la transacción"""
+    session.flush()  # Los cambios pendientes también marcan etiquetas
+    etiquetas = ETIQUETAS_VERSIONADAS.intersection(etiquetas_modificadas(session))
+    if etiquetas:
+        # En orden: dos transacciones con etiquetas en común las bloquean en el mismo orden
+        insertar_o_sumar(
+            session.connection(), VersionEtiqueta.__table__,
+            [{'etiqueta': etiqueta, 'version': 1} for etiqueta in sorted(etiquetas)],
+            ['etiqueta'], 'version'
+        )
+
+
+def version_datos(columnas, etiquetas=(), por_dia=False):
+    """
+    Sello del estado de los datos: (filas, máximo de la columna) de la tabla de cada
+    columna y las versiones guardadas de las etiquetas de caché, en una sola consulta
+
+    Args:
+        columnas: columnas de fecha de los modelos (p. ej. Pedido.fecha_actualizacion)
+        etiquetas: etiquetas de caché adicionales a las de los modelos de las columnas
+        por_dia: incluir la fecha de hoy (respuestas que dependen de "hoy" o "esta semana")
+
+    Returns:
+        str: sello (cambia si cambian los datos)
+    """
+    subconsultas = []
+    todas_etiquetas = set(etiquetas)
+    for columna in columnas:
+        subconsultas.append(select(func.count()).select_from(columna.class_.__table__).scalar_subquery())
+        subconsultas.append(select(func.max(columna)).scalar_subquery())
+        todas_etiquetas.update(ETIQUETAS_POR_MODELO.get(columna.class_.__name__, ()))
+    if any(columna.class_.__name__ in _MODELOS_CON_CAMBIOS_PEDIDOS for columna in columnas):
+        subconsultas.append(select(func.max(CambioPedido.id)).scalar_subquery())
+    for etiqueta in sorted(todas_etiquetas & ETIQUETAS_VERSIONADAS):
+        subconsultas.append(
+            select(VersionEtiqueta.version).where(VersionEtiqueta.etiqueta == etiqueta).scalar_subquery()
+        )
+
+    partes = [str(valor) for valor in db.session.execute(select(*subconsultas)).one()] if subconsultas else []
+
+    if por_dia:
+        partes.append(date.today().isoformat())
+    return '|'.join(partes)
+
+
+def _calcular_etag(columnas, etiquetas, por_dia):
+    sello = version_datos(columnas, etiquetas, por_dia)
+    # Los parámetros de la consulta (filtros, página, campos) cambian el contenido
+    return hashlib.sha1(f'{request.full_path}|{sello}'.encode('utf-8')).hexdigest()
+
+
+def con_etag(*columnas, etiquetas=(), por_dia=False):
+    """
+    Decorador de vistas GET: ETag débil desde version_datos() y 304 si el cliente
+    ya tiene esa versión (la vista no se ejecuta)
+
+    Ejemplo:
+        @bp.route('/', methods=['GET'])
+        @con_etag(Pedido.fecha_actualizacion)
+        def listar_pedidos(): ...
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(*args, **kwargs)
+
+            try:
+                etag = _calcular_etag(columnas, etiquetas, por_dia)
+            except Exception:
+                db.session.rollback()
+                etag = None
+            if etag is None:
+                return vista(*args, **kwargs)
+
+            if request.if_none_match.contains_weak(etag):
+                respuesta = make_response('', 304)
+            else:
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+
+            respuesta.set_etag(etag, weak=True)
+            # El navegador puede guardar la respuesta pero debe revalidarla siempre
+            respuesta.headers['Cache-Control'] = 'no-cache'
+            return respuesta
+        return envoltura
+    return decorador
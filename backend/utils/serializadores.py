@@ -0,0 +1,270 @@
+"""
+Serializadores livianos: de consulta SQL a JSON sin pasar por instancias del ORM
+
+Un Serializador declara sus campos como expresiones SQL (columnas del modelo o
+subconsultas escalares correlacionadas para datos de otra tabla) y los agrupa en
+conjuntos con nombre ('tarjeta', 'lista', 'detalle'). Serializar un conjunto
+proyecta solo esas columnas (query.with_entities): no se construyen objetos del ORM
+ni se disparan relaciones lazy por fila.
+
+Los datos anidados (productos de un pedido, etiquetas de un cliente...) son campos
+Relacion: se cargan por lotes de filas, con una consulta por lote, y solo si el
+conjunto o el parámetro incluir los pide.
+
+La salida se codifica con orjson (varias veces más rápido que json; si no está
+instalado se usa json) y los listados grandes se pueden enviar como un arreglo
+JSON en streaming con respuesta_json_streaming().
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import Response, request, stream_with_context
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Filas que se procesan juntas (y por lo tanto por consulta de cada Relacion)
+TAMANO_LOTE = 500
+
+# Bytes que se acumulan antes de enviar un trozo de una respuesta en streaming
+TAMANO_TROZO_STREAMING = 64 * 1024
+
+
+# ===== FORMATOS DE VALORES =====
+
+def iso(valor):
+    """Fecha u hora en ISO 8601, o None"""
+    return valor.isoformat() if valor else None
+
+
+def decimal_o_cero(valor):
+    """Numeric a float; None y cero quedan como 0 (igual que los to_dict)"""
+    return float(valor) if valor else 0
+
+
+# ===== DECLARACIÓN DE CAMPOS =====
+
+class Campo:
+    """Campo proyectado desde una expresión SQL, con formato opcional"""
+
+    def __init__(self, expresion, formato=None):
+        self.expresion = expresion
+        self.formato = formato
+
+
+class Calculado:
+    """
+    Campo armado en Python a partir de columnas auxiliares que se proyectan con él
+
+    Args:
+        funcion: recibe un dict {nombre: valor} con las columnas auxiliares
+        **columnas: expresiones SQL de las columnas auxiliares
+    """
+
+    def __init__(self, funcion, **columnas):
+        self.funcion = funcion
+        self.columnas = columnas
+
+
+class Relacion:
+    """
+    Campo que se carga por lotes después de proyectar las filas
+
+    Args:
+        cargador: recibe la lista de filas (dicts) del lote y devuelve la lista de
+                  valores del campo en el mismo orden, idealmente con una sola consulta
+        requiere: campos que el cargador necesita en cada fila (se proyectan aunque
+                  el conjunto no los incluya y se quitan de la salida)
+    """
+
+    def __init__(self, cargador, requiere=()):
+        self.cargador = cargador
+        self.requiere = tuple(requiere)
+
+
+class Serializador:
+    """
+    Base de los serializadores: las subclases definen campos y conjuntos
+
+    campos: dict ordenado {nombre: Campo | Calculado | Relacion}
+    conjuntos: dict {nombre_conjunto: tupla de nombres de campos}
+    """
+
+    campos = {}
+    conjuntos = {}
+
+    @classmethod
+    def nombres_campos(cls, conjunto, incluir=()):
+        """Nombres de los campos del conjunto más los de incluir, en el orden declarado"""
+        if conjunto not in cls.conjuntos:
+            raise ValueError(
+                f"Conjunto de campos desconocido: '{conjunto}'. Opciones: {', '.join(cls.conjuntos)}"
+            )
+        desconocidos = [nombre for nombre in incluir if nombre not in cls.campos]
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+
+        pedidos = set(cls.conjuntos[conjunto]) | set(incluir)
+        return [nombre for nombre in cls.campos if nombre in pedidos]
+
+    @classmethod
+    def proyectar(cls, query, conjunto='lista', incluir=()):
+        """
+        Serializa las filas de una consulta del modelo
+
+        Args:
+            query: Query del ORM (filtros, orden y paginación ya aplicados)
+            conjunto: nombre del conjunto de campos
+            incluir: campos adicionales al conjunto (p. ej. una Relacion)
+
+        Yields:
+            dict: una fila serializada por cada resultado, en el orden de la consulta
+        """
+        nombres = cls.nombres_campos(conjunto, incluir)
+
+        # Campos que alguna Relacion necesita y que el conjunto no pidió
+        ocultos = []
+        for nombre in nombres:
+            campo = cls.campos[nombre]
+            if isinstance(campo, Relacion):
+                ocultos.extend(r for r in campo.requiere if r not in nombres and r not in ocultos)
+
+        proyectados = [n for n in cls.campos if n in ocultos or (n in nombres and not isinstance(cls.campos[n], Relacion))]
+        relaciones = [n for n in nombres if isinstance(cls.campos[n], Relacion)]
+
+        # Columnas de la consulta: (nombre del campo, columna auxiliar o None)
+        columnas = []
+        expresiones = []
+        for nombre in proyectados:
+            campo = cls.campos[nombre]
+            if isinstance(campo, Calculado):
+                for auxiliar, expresion in campo.columnas.items():
+                    columnas.append((nombre, auxiliar))
+                    expresiones.append(expresion.label(f'{nombre}__{auxiliar}'))
+            else:
+                columnas.append((nombre, None))
+                expresiones.append(campo.expresion.label(nombre))
+
+        lote = []
+        for fila in query.with_entities(*expresiones):
+            lote.append(cls._armar_fila(fila, columnas, proyectados))
+            if len(lote) >= TAMANO_LOTE:
+                yield from cls._completar_lote(lote, relaciones, ocultos, nombres)
+                lote = []
+        if lote:
+            yield from cls._completar_lote(lote, relaciones, ocultos, nombres)
+
+    @classmethod
+    def serializar(cls, query, conjunto='lista', incluir=()):
+        """Como proyectar(), pero devuelve la lista completa"""
+        return list(cls.proyectar(query, conjunto, incluir))
+
+    @classmethod
+    def _armar_fila(cls, fila, columnas, proyectados):
+        valores = {}
+        auxiliares = {}
+        for (nombre, auxiliar), valor in zip(columnas, fila):
+            if auxiliar is None:
+                valores[nombre] = valor
+            else:
+                auxiliares.setdefault(nombre, {})[auxiliar] = valor
+
+        resultado = {}
+        for nombre in proyectados:
+            campo = cls.campos[nombre]
+            if isinstance(campo, Calculado):
+                resultado[nombre] = campo.funcion(auxiliares.get(nombre, {}))
+            elif campo.formato is not None:
+                resultado[nombre] = campo.formato(valores[nombre])
+            else:
+                resultado[nombre] = valores[nombre]
+        return resultado
+
+    @classmethod
+    def _completar_lote(cls, lote, relaciones, ocultos, nombres):
+        cargados = {nombre: cls.campos[nombre].cargador(lote) for nombre in relaciones}
+
+        for i, fila in enumerate(lote):
+            for nombre in ocultos:
+                fila.pop(nombre, None)
+            for nombre in relaciones:
+                fila[nombre] = cargados[nombre][i]
+            # Mismo orden de claves que la declaración de campos
+            yield {nombre: fila[nombre] for nombre in nombres}
+
+
+def conjunto_solicitado(defecto, serializador=None):
+    """
+    Conjunto de campos pedido en el query param ?campos= (o el por defecto)
+
+    Raises:
+        ValueError: si el serializador no tiene ese conjunto
+    """
+    conjunto = request.args.get('campos', '').strip() or defecto
+    if serializador is not None and conjunto not in serializador.conjuntos:
+        raise ValueError(
+            f"Conjunto de campos desconocido: '{conjunto}'. Opciones: {', '.join(serializador.conjuntos)}"
+        )
+    return conjunto
+
+
+# ===== CODIFICACIÓN JSON =====
+
+def _valor_json(valor):
+    """Tipos que ni json ni orjson codifican por sí solos"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo no serializable a JSON: {type(valor).__name__}')
+
+
+def a_json(datos):
+    """Codifica a JSON (bytes UTF-8) con orjson si está disponible"""
+    if orjson is not None:
+        return orjson.dumps(datos, default=_valor_json, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(datos, default=_valor_json, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def respuesta_json(datos, status=200):
+    """Response JSON codificada con a_json() (reemplazo directo de jsonify)"""
+    return Response(a_json(datos), status=status, mimetype='application/json')
+
+
+def respuesta_json_streaming(filas, clave='data', **extras):
+    """
+    Response con un objeto JSON cuyo campo `clave` es un arreglo que se envía a medida
+    que se generan las filas, en trozos de TAMANO_TROZO_STREAMING bytes
+
+    La consulta se ejecuta mientras se envía la respuesta: los errores deben detectarse
+    antes (conteos, validaciones), porque el status 200 ya está enviado. Las consultas
+    del streaming no alcanzan a contarse en el header Server-Timing.
+
+    Args:
+        filas: iterable de dicts (p. ej. Serializador.proyectar)
+        clave: nombre del campo con el arreglo
+        **extras: otros campos del objeto (success, total, page...)
+    """
+    encabezado = a_json(extras)[:-1]
+    if extras:
+        encabezado += b','
+    encabezado += a_json(clave) + b':['
+
+    def generar():
+        trozo = bytearray(encabezado)
+        primera = True
+        for fila in filas:
+            if not primera:
+                trozo += b','
+            trozo += a_json(fila)
+            primera = False
+            if len(trozo) >= TAMANO_TROZO_STREAMING:
+                yield bytes(trozo)
+                trozo.clear()
+        trozo += b']}'
+        yield bytes(trozo)
+
+    return Response(stream_with_context(generar()), mimetype='application/json')
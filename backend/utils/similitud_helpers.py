@@ -0,0 +1,181 @@
+"""
+Comparación aproximada de nombres de productos
+
+En vez de comparar cada nombre con todos los candidatos (SequenceMatcher en dos
+bucles anidados: N×M comparaciones en Python), los candidatos se indexan por los
+n-gramas de caracteres de su nombre normalizado. Para cada consulta se cuentan los
+n-gramas compartidos con el índice invertido y solo se puntúan los candidatos que
+comparten suficientes (bloqueo); la similitud final es SequenceMatcher sobre los
+nombres normalizados.
+
+Un nombre normalizado es el conjunto de sus palabras, sin tildes ni signos ni
+palabras vacías, en orden alfabético: "Ramo de Rosas Rojas" y "rosas rojas, ramo"
+son el mismo nombre.
+"""
+
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from config.coincidencias import (
+    UMBRAL_COINCIDENCIA, TAMANO_NGRAMA, DICE_MINIMO_CANDIDATO, MAX_CANDIDATOS_POR_CONSULTA,
+    PROCESOS_COINCIDENCIAS, MIN_CONSULTAS_PARALELO
+)
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+# Sin palabras de una letra: en los nombres suelen ser variantes ("Florero Mago A" / "E")
+_PALABRAS_VACIAS = frozenset({
+    'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'los', 'para', 'por', 'un', 'una'
+})
+
+
+def normalizar_nombre(texto):
+    """
+    Conjunto de palabras del nombre, normalizadas y ordenadas
+
+    Examples:
+        >>> normalizar_nombre("Ramo de Rosas Rojas (Grande)")
+        'grande ramo rojas rosas'
+        >>> normalizar_nombre("Canasto Ñandú")
+        'canasto nandu'
+    """
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    palabras = set(_NO_ALFANUMERICO.sub(' ', texto).split()) - _PALABRAS_VACIAS
+    return ' '.join(sorted(palabras))
+
+
+def _ngramas(normalizado):
+    texto = f' {normalizado} '
+    return {texto[i:i + TAMANO_NGRAMA] for i in range(max(1, len(texto) - TAMANO_NGRAMA + 1))}
+
+
+def similitud(a, b):
+    """Similitud (0-1) entre dos nombres ya normalizados"""
+    if a == b:
+        return 1.0 if a else 0.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class IndiceSimilitud:
+    """
+    Índice invertido de n-gramas sobre nombres de candidatos
+
+    Ejemplo:
+        indice = IndiceSimilitud([(1, 'Ramo de rosas'), (2, 'Florero Aura')])
+        indice.buscar('rosas ramo')  # [{'id': 1, 'nombre': 'Ramo de rosas', 'similitud': 1.0}]
+    """
+
+    def __init__(self, candidatos=()):
+        self._ids = []
+        self._nombres = []
+        self._normalizados = []
+        self._cantidad_ngramas = []
+        self._por_ngrama = {}  # n-grama -> posiciones de los candidatos que lo tienen
+        for candidato_id, nombre in candidatos:
+            self.agregar(candidato_id, nombre)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def agregar(self, candidato_id, nombre):
+        """Agrega un candidato (los nombres vacíos se ignoran)"""
+        normalizado = normalizar_nombre(nombre)
+        if not normalizado:
+            return
+        posicion = len(self._ids)
+        self._ids.append(candidato_id)
+        self._nombres.append(nombre)
+        self._normalizados.append(normalizado)
+        ngramas = _ngramas(normalizado)
+        self._cantidad_ngramas.append(len(ngramas))
+        for ngrama in ngramas:
+            self._por_ngrama.setdefault(ngrama, []).append(posicion)
+
+    def buscar(self, nombre, umbral=UMBRAL_COINCIDENCIA, limite=1, excluir=None):
+        """
+        Candidatos más parecidos al nombre
+
+        Args:
+            nombre: nombre a buscar
+            umbral: similitud mínima (0-1)
+            limite: cantidad máxima de resultados
+            excluir: id de candidato que no se devuelve (p. ej. el mismo producto)
+
+        Returns:
+            list: [{'id', 'nombre', 'similitud'}] de mayor a menor similitud
+        """
+        normalizado = normalizar_nombre(nombre)
+        if not normalizado:
+            return []
+        ngramas = _ngramas(normalizado)
+        compartidos = Counter()
+        for ngrama in ngramas:
+            compartidos.update(self._por_ngrama.get(ngrama, ()))
+
+        # Bloqueo: solo los candidatos con suficientes n-gramas en común
+        candidatos = []
+        for posicion, cantidad in compartidos.items():
+            dice = 2 * cantidad / (len(ngramas) + self._cantidad_ngramas[posicion])
+            if dice >= DICE_MINIMO_CANDIDATO and self._ids[posicion] != excluir:
+                candidatos.append((posicion, dice))
+        candidatos = heapq.nlargest(MAX_CANDIDATOS_POR_CONSULTA, candidatos, key=lambda c: c[1])
+
+        resultados = []
+        for posicion, _ in candidatos:
+            valor = similitud(normalizado, self._normalizados[posicion])
+            if valor >= umbral:
+                resultados.append((posicion, valor))
+        resultados = heapq.nlargest(limite, resultados, key=lambda r: r[1])
+        return [
+            {'id': self._ids[posicion], 'nombre': self._nombres[posicion], 'similitud': round(valor, 3)}
+            for posicion, valor in resultados
+        ]
+
+
+# ===== LOTES EN PARALELO =====
+
+_indice_trabajador = None
+
+
+def _iniciar_trabajador(candidatos):
+    global _indice_trabajador
+    _indice_trabajador = IndiceSimilitud(candidatos)
+
+
+def _buscar_en_trabajador(parte):
+    nombres, umbral, limite = parte
+    return [_indice_trabajador.buscar(nombre, umbral, limite) for nombre in nombres]
+
+
+def buscar_coincidencias(nombres, candidatos, umbral=UMBRAL_COINCIDENCIA, limite=1, procesos=None):
+    """
+    Busca cada nombre entre los candidatos; con muchos nombres reparte las búsquedas
+    entre procesos (cada uno arma su propio índice una vez)
+
+    Args:
+        nombres: nombres a buscar
+        candidatos: iterable de (id, nombre)
+        umbral, limite: como en IndiceSimilitud.buscar
+        procesos: procesos a usar (por defecto PROCESOS_COINCIDENCIAS)
+
+    Returns:
+        list: resultados de IndiceSimilitud.buscar, en el orden de los nombres
+    """
+    nombres = list(nombres)
+    candidatos = list(candidatos)
+    procesos = PROCESOS_COINCIDENCIAS if procesos is None else procesos
+
+    if procesos <= 1 or len(nombres) < MIN_CONSULTAS_PARALELO:
+        indice = IndiceSimilitud(candidatos)
+        return [indice.buscar(nombre, umbral, limite) for nombre in nombres]
+
+    # Varias partes por proceso para repartir bien aunque unas búsquedas tarden más
+    tamano = math.ceil(len(nombres) / (procesos * 4))
+    partes = [(nombres[i:i + tamano], umbral, limite) for i in range(0, len(nombres), tamano)]
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                             initargs=(candidatos,)) as ejecutor:
+        return [resultado for parte in ejecutor.map(_buscar_en_trabajador, partes) for resultado in parte]
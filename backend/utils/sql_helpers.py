@@ -0,0 +1,70 @@
+"""
+Sentencias SQL que cambian de sintaxis según el motor (SQLite o Postgres)
+"""
+
+import zlib
+from sqlalchemy import delete, false, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+_INSERT_POR_DIALECTO = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def sentencia_insert(conexion, tabla):
+    """INSERT del motor de la conexión, con on_conflict_do_update() y returning()"""
+    return _INSERT_POR_DIALECTO[conexion.dialect.name](tabla)
+
+
+def insertar_o_sumar(conexion, tabla, filas, claves, columna):
+    """
+    INSERT ... ON CONFLICT (claves) DO UPDATE SET columna = columna + excluded.columna
+
+    Una sola sentencia por fila: sin la consulta previa de las filas existentes, dos
+    transacciones que agregan la misma clave a la vez no chocan con la clave primaria
+    (SQLite 3.24+ y Postgres)
+
+    Args:
+        conexion: conexión de la transacción en curso (session.connection())
+        tabla: Table destino
+        filas: lista de dicts con las claves y la columna a sumar
+        claves: columnas de la clave primaria o de un índice único
+        columna: columna numérica que se suma
+    """
+    if not filas:
+        return
+    consulta = sentencia_insert(conexion, tabla)
+    consulta = consulta.on_conflict_do_update(
+        index_elements=claves,
+        set_={columna: tabla.c[columna] + consulta.excluded[columna]}
+    )
+    conexion.execute(consulta, filas)
+
+
+def _bloquear_sqlite(conexion, tabla):
+    # Un DELETE que no borra nada toma igual el bloqueo de escritura de la base
+    conexion.execute(delete(tabla).where(false()))
+
+
+def _bloquear_postgresql(conexion, tabla):
+    conexion.execute(select(func.pg_advisory_xact_lock(zlib.crc32(tabla.name.encode()))))
+
+
+_BLOQUEO_POR_DIALECTO = {'sqlite': _bloquear_sqlite, 'postgresql': _bloquear_postgresql}
+
+
+def bloquear_hasta_commit(conexion, tabla):
+    """
+    Serializa, hasta su commit o rollback, las transacciones que llaman a esta función
+    con la misma tabla
+
+    Sirve para numerar filas en orden de commit (cursores de feeds): lo que se numera
+    después del bloqueo se confirma antes de que otra transacción pueda numerar. Con
+    una secuencia o autoincrement sin bloqueo, en Postgres una transacción que tomó
+    el número N+1 puede confirmar antes que la que tiene el N, y un cliente que ya
+    leyó N+1 nunca vería el N. SQLite usa el bloqueo de escritura de la base; Postgres
+    un advisory lock de la transacción (no bloquea a los lectores).
+
+    Args:
+        conexion: conexión de la transacción en curso (session.connection())
+        tabla: Table que se numera (identifica el bloqueo)
+    """
+    _BLOQUEO_POR_DIALECTO[conexion.dialect.name](conexion, tabla)
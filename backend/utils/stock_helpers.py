@@ -0,0 +1,136 @@
+"""
+Cambios atómicos de stock de flores y contenedores
+
+Cada cambio es un solo UPDATE que suma o resta sobre el valor de la fila
+(cantidad_stock = cantidad_stock - :n) en vez de leer el objeto, calcular en Python y
+escribir el resultado: con varios workers, dos lecturas del mismo valor hacían que una
+de las escrituras se perdiera. Cuando el stock debe alcanzar, la condición va en el
+mismo WHERE (cantidad_stock >= :n), así que otro worker no puede consumirlo entre la
+verificación y la escritura.
+
+Los valores nuevos vuelven con RETURNING y se copian al objeto de la sesión (si está
+cargado), así que el resto de la request ve el stock actualizado sin otra consulta.
+El UPDATE pasa por la sesión: invalida la caché de flores/contenedores al confirmar
+y marca el insumo para reevaluar su alerta de stock (services/alertas_stock_service.py).
+"""
+
+from datetime import date
+from sqlalchemy import case, inspect, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from extensions import db
+from models.inventario import Flor, Contenedor
+from services.alertas_stock_service import marcar_insumos_modificados
+
+MODELOS_INSUMO = {'Flor': Flor, 'Contenedor': Contenedor}
+
+# Parámetro de mover_stock() -> columna de Flor/Contenedor
+_CONTADORES = {'stock': 'cantidad_stock', 'en_uso': 'cantidad_en_uso', 'en_evento': 'cantidad_en_evento'}
+
+
+class StockInsuficiente(ValueError):
+    """El stock de uno o más insumos no alcanza; faltantes es una lista de dicts"""
+
+    def __init__(self, faltantes):
+        self.faltantes = faltantes
+        super().__init__('Stock insuficiente: ' + ', '.join(
+            f"{f['nombre'] or f['insumo_id']} (disponible {f['stock']}, requerido {f['requerido']})"
+            for f in faltantes
+        ))
+
+
+def modelo_insumo(insumo_tipo):
+    """Flor o Contenedor según 'Flor'/'flor' o 'Contenedor'/'contenedor'"""
+    return MODELOS_INSUMO[insumo_tipo.capitalize()]
+
+
+def _sumar(columna, delta):
+    """columna + delta, recortado en 0 si delta es negativo"""
+    if delta >= 0:
+        return columna + delta
+    return case((columna + delta < 0, 0), else_=columna + delta)
+
+
+def mover_stock(insumo_tipo, insumo_id, stock=0, en_uso=0, en_evento=0, exigir_stock=False):
+    """
+    Suma (o resta, con valores negativos) a stock, en uso y en evento de un insumo
+    en un UPDATE atómico. Los contadores no quedan negativos: se recortan en 0
+
+    Args:
+        insumo_tipo: 'Flor' o 'Contenedor' (en minúsculas también)
+        insumo_id: ID del insumo
+        stock, en_uso, en_evento: variación de cada contador
+        exigir_stock: si stock es negativo, descontar solo si el stock alcanza
+
+    Returns:
+        dict: valores nuevos de los contadores, o None si el insumo no existe o (con
+              exigir_stock) el stock no alcanza
+    """
+    modelo = modelo_insumo(insumo_tipo)
+    deltas = {'stock': stock, 'en_uso': en_uso, 'en_evento': en_evento}
+    valores = {
+        _CONTADORES[nombre]: _sumar(getattr(modelo, _CONTADORES[nombre]), delta)
+        for nombre, delta in deltas.items() if delta
+    }
+    if stock:
+        valores['fecha_actualizacion'] = date.today()
+
+    columnas = [getattr(modelo, columna) for columna in _CONTADORES.values()] + [modelo.fecha_actualizacion]
+    condiciones = [modelo.id == insumo_id]
+    if exigir_stock and stock < 0:
+        condiciones.append(modelo.cantidad_stock >= -stock)
+
+    if valores:
+        consulta = update(modelo).where(*condiciones).values(valores).returning(*columnas)
+        fila = db.session.execute(consulta, execution_options={'synchronize_session': False}).first()
+        if fila is not None:
+            marcar_insumos_modificados(db.session, [(modelo.__name__, insumo_id)])
+    else:
+        fila = db.session.execute(select(*columnas).where(*condiciones)).first()
+    if fila is None:
+        return None
+
+    nuevos = dict(zip([columna.key for columna in columnas], fila))
+    objeto = db.session.identity_map.get(inspect(modelo).identity_key_from_primary_key([insumo_id]))
+    if objeto is not None:
+        for atributo, valor in nuevos.items():
+            set_committed_value(objeto, atributo, valor)
+    return nuevos
+
+
+def mover_stock_lote(movimientos, exigir_stock=False):
+    """
+    mover_stock() para varios insumos, en orden de clave (los workers bloquean las
+    filas siempre en el mismo orden)
+
+    Args:
+        movimientos: dict {(insumo_tipo, insumo_id): {'stock': n, 'en_uso': n, 'en_evento': n}}
+        exigir_stock: ver mover_stock()
+
+    Returns:
+        dict: {(insumo_tipo, insumo_id): valores nuevos}; los insumos que no existen se omiten
+
+    Raises:
+        StockInsuficiente: con exigir_stock, si algún stock no alcanza. Los insumos ya
+            actualizados quedan en la transacción: el caller debe hacer rollback
+    """
+    resultados = {}
+    faltantes = []
+    for (insumo_tipo, insumo_id) in sorted(movimientos):
+        deltas = movimientos[(insumo_tipo, insumo_id)]
+        nuevos = mover_stock(insumo_tipo, insumo_id, exigir_stock=exigir_stock, **deltas)
+        if nuevos is not None:
+            resultados[(insumo_tipo, insumo_id)] = nuevos
+            continue
+        if exigir_stock and deltas.get('stock', 0) < 0:
+            modelo = modelo_insumo(insumo_tipo)
+            actual = db.session.execute(
+                select(modelo.nombre, modelo.cantidad_stock).where(modelo.id == insumo_id)
+            ).first()
+            if actual is not None:
+                faltantes.append({
+                    'insumo_tipo': insumo_tipo.capitalize(), 'insumo_id': insumo_id,
+                    'nombre': actual.nombre, 'stock': actual.cantidad_stock, 'requerido': -deltas['stock']
+                })
+    if faltantes:
+        raise StockInsuficiente(faltantes)
+    return resultados
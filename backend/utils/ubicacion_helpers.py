@@ -2,7 +2,82 @@
 Utilidades para manejo de ubicaciones y direcciones
 """
 
-from config.comunas import COMUNAS_PRECIOS
+import re
+import unicodedata
+from functools import lru_cache
+from config.comunas import COMUNAS_PRECIOS, ALIAS_COMUNAS, DESTINOS_ESPECIALES
+
+# Tabla de traducción para las letras con tilde del español (más rápida que unicodedata)
+_SIN_TILDES = str.maketrans('áéíóúüñàèìòùâêîôûäëïö', 'aeiouunaeiouaeiouaeio')
+_NO_ALFANUMERICO = re.compile(r'[\W_]+')
+
+
+def normalizar_texto_ubicacion(texto):
+    """
+    Normaliza un texto para comparar comunas: minúsculas, sin tildes ni ñ,
+    signos de puntuación como espacios y espacios colapsados
+
+    Examples:
+        >>> normalizar_texto_ubicacion("Ñuñoa, Stgo.")
+        'nunoa stgo'
+    """
+    texto = (texto or '').lower().translate(_SIN_TILDES)
+    if not texto.isascii():
+        # Caracteres poco comunes: descomposición Unicode completa
+        texto = ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+    return ' '.join(_NO_ALFANUMERICO.sub(' ', texto).split())
+
+
+def _construir_patrones():
+    """Forma normalizada -> comuna canónica (comunas conocidas y sus alias)"""
+    patrones = {}
+    for comuna in COMUNAS_PRECIOS:
+        # Variantes con y sin tilde ("Peñalolén"/"Peñalolen") se quedan con la primera
+        patrones.setdefault(normalizar_texto_ubicacion(comuna), comuna)
+    for alias, comuna in ALIAS_COMUNAS.items():
+        patrones.setdefault(normalizar_texto_ubicacion(alias), comuna)
+    return patrones
+
+
+# Se compila una sola vez al importar: una expresión con todas las comunas y alias.
+# Las alternativas van de más larga a más corta para que, entre nombres que se
+# traslapan, gane el más largo ("clinica las condes" antes que "las condes")
+_COMUNA_POR_PATRON = _construir_patrones()
+_COMUNAS_NORMALIZADAS = tuple((normalizar_texto_ubicacion(comuna), comuna) for comuna in COMUNAS_PRECIOS)
+_PATRON_COMUNAS = re.compile(
+    r'(?<!\w)(' + '|'.join(
+        re.escape(patron) for patron in sorted(_COMUNA_POR_PATRON, key=len, reverse=True)
+    ) + r')(?!\w)'
+)
+
+
+@lru_cache(maxsize=4096)
+def _buscar_comuna(direccion_normalizada):
+    """
+    Comuna mencionada en la dirección normalizada (memoizada), o None
+
+    Gana la mención más a la derecha: la comuna va al final de la dirección y las
+    anteriores suelen ser calles con nombre de comuna ("Av. Padre Hurtado 1200, Las
+    Condes"). Un destino especial (config/comunas.py) gana donde sea que aparezca
+    """
+    comuna = destino = None
+    for coincidencia in _PATRON_COMUNAS.finditer(direccion_normalizada):
+        comuna = _COMUNA_POR_PATRON[coincidencia.group(1)]
+        if comuna in DESTINOS_ESPECIALES:
+            destino = comuna
+    return destino or comuna
+
+
+@lru_cache(maxsize=1024)
+def _buscar_comuna_parcial(texto_normalizado):
+    """Comuna que contiene al texto o está contenida en él (último tramo de la dirección)"""
+    if len(texto_normalizado) < 4:
+        return None  # Tramos muy cortos ("b", "n") coinciden con casi cualquier comuna
+    # Sin alias: un alias corto ("pac") contenido en cualquier palabra daría falsos positivos
+    for patron, comuna in _COMUNAS_NORMALIZADAS:
+        if texto_normalizado in patron or patron in texto_normalizado:
+            return comuna
+    return None
 
 
 def extraer_comuna(direccion):
@@ -18,19 +93,36 @@ def extraer_comuna(direccion):
 
     Examples:
         >>> extraer_comuna("Av. Principal 123, Santiago")
-        'Santiago'
+        'Santiago Centro'
         >>> extraer_comuna("Calle Falsa 456, Las Condes")
         'Las Condes'
+        >>> extraer_comuna("Irarrázaval 3000, Nunoa")
+        'Ñuñoa'
+        >>> extraer_comuna("Av. Padre Hurtado 1200, Las Condes")
+        'Las Condes'
+        >>> extraer_comuna("Av. Independencia 500, Recoleta")
+        'Recoleta'
+        >>> extraer_comuna("Camino San Bernardo 12, Puente Alto")
+        'Puente Alto'
+        >>> extraer_comuna("Av. Pedro Aguirre Cerda 5000, Cerrillos")
+        'Cerrillos'
+        >>> extraer_comuna("Clinica Alemana, Habitación 1405, Vitacura")
+        'Clinica Alemana'
     """
     if not direccion:
         return 'Sin especificar'
+    return _extraer_comuna(direccion)
 
-    direccion_lower = direccion.lower()
 
-    # Buscar coincidencias con comunas conocidas
-    for comuna in COMUNAS_PRECIOS.keys():
-        if comuna.lower() in direccion_lower:
-            return comuna
+@lru_cache(maxsize=4096)
+def _extraer_comuna(direccion):
+    # Memoizada también por dirección original: las mismas direcciones se repiten en
+    # cada listado de rutas y así ni siquiera se vuelve a normalizar el texto
+
+    # Buscar coincidencias con comunas conocidas (y sus alias)
+    comuna = _buscar_comuna(normalizar_texto_ubicacion(direccion))
+    if comuna:
+        return comuna
 
     # Si no se encuentra, intentar extraer la última parte de la dirección
     # que típicamente es la comuna
@@ -39,10 +131,11 @@ def extraer_comuna(direccion):
         posible_comuna = partes[-1].strip()
 
         # Buscar coincidencia parcial
-        for comuna in COMUNAS_PRECIOS.keys():
-            if posible_comuna.lower() in comuna.lower() or comuna.lower() in posible_comuna.lower():
-                return comuna
+        comuna = _buscar_comuna_parcial(normalizar_texto_ubicacion(posible_comuna))
+        if comuna:
+            return comuna
 
         return posible_comuna
 
     return 'Sin especificar'
+
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { useNavigate } from 'react-router-dom'
 import { pedidosAPI } from '../services/api'
 import ColumnaKanban from '../components/Tablero/ColumnaKanban'
@@ -27,6 +27,8 @@ function TableroPage() {
   const [actualizando, setActualizando] = useState(false)
   const [incluirDespachados, setIncluirDespachados] = useState(false)
   const [semanasDespachados, setSemanasDespachados] = useState(1) // Por defecto 1 semana
+  // Último cambio aplicado del feed /pedidos/cambios (null hasta cargar el tablero)
+  const cursorCambios = useRef(null)
 
   // Estados según flujo actualizado (orden de prioridad)
   const estados = [
@@ -61,6 +63,7 @@ function TableroPage() {
       const response = await pedidosAPI.obtenerTablero(incluirDespachados, semanasDespachados)
       if (response.data.success) {
         setTablero(response.data.data)
+        cursorCambios.current = response.data.cursor_cambios ?? null
       }
     } catch (err) {
       setError('Error al cargar el tablero')
@@ -70,6 +73,31 @@ function TableroPage() {
     }
   }
   
+  // Aplica al tablero los pedidos cambiados: se sacan de su columna y se vuelven a
+  // poner en la de su estado actual (los cancelados o eliminados solo se sacan)
+  const aplicarCambios = ({ cambios, pedidos }) => {
+    setTablero(prev => {
+      const ids = new Set(cambios.map(cambio => cambio.pedido_id))
+      const nuevo = {}
+      for (const [columna, lista] of Object.entries(prev)) {
+        nuevo[columna] = lista.filter(pedido => !ids.has(pedido.id))
+      }
+      const columnasTocadas = new Set()
+      for (const id of ids) {
+        const pedido = pedidos[id]
+        if (pedido && nuevo[pedido.estado]) {
+          nuevo[pedido.estado].push(pedido)
+          columnasTocadas.add(pedido.estado)
+        }
+      }
+      // Mismo orden que el backend: por fecha de entrega
+      for (const columna of columnasTocadas) {
+        nuevo[columna].sort((a, b) => (a.fecha_entrega || '').localeCompare(b.fecha_entrega || ''))
+      }
+      return nuevo
+    })
+  }
+
   const forzarActualizacion = async () => {
     try {
       setActualizando(true)
@@ -92,15 +120,44 @@ function TableroPage() {
       cargarTablero(false)
     })
     
-    // Polling periódico para sincronización entre usuarios (cada 10 segundos)
-    const intervaloPolling = setInterval(() => {
-      cargarTablero(false) // No auto-clasificar en polling
-    }, 10000) // 10 segundos
+    // Sincronización entre usuarios: long-poll del feed de cambios. El servidor
+    // responde apenas otro usuario modifica un pedido y solo se aplican esos pedidos
+    let activo = true
+    const esperar = (ms) => new Promise(resolve => setTimeout(resolve, ms))
+    const seguirCambios = async () => {
+      while (activo) {
+        if (cursorCambios.current === null) {
+          await esperar(1000) // Esperar a que cargue el tablero
+          continue
+        }
+        try {
+          const response = await pedidosAPI.obtenerCambios(cursorCambios.current)
+          const datos = response.data.data
+          if (!activo) break
+          if (datos.reiniciar) {
+            // Cursor vencido: recargar el tablero completo
+            cursorCambios.current = null
+            await cargarTablero(false)
+            continue
+          }
+          if (datos.cambios.length > 0) {
+            aplicarCambios(datos)
+            cursorCambios.current = datos.cursor
+          } else if (!datos.esperado) {
+            await esperar(10000) // Servidor sin esperas libres: volver a preguntar en 10 s
+          }
+        } catch (err) {
+          console.error('Error al obtener cambios del tablero:', err)
+          await esperar(10000)
+        }
+      }
+    }
+    seguirCambios()
     
     return () => {
+      activo = false
       unsubscribeTablero()
       unsubscribePedidos()
-      clearInterval(intervaloPolling)
     }
   }, [])
 
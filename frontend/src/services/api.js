@@ -24,6 +24,8 @@ export const pedidosAPI = {
   cancelar: (id, motivo) => api.patch(`/pedidos/${id}/cancelar`, { motivo }),
   obtenerTablero: (incluirDespachados = false, semanasDespachados = 1) => api.get('/pedidos/tablero', { params: { incluir_despachados: incluirDespachados, semanas_despachados: semanasDespachados } }),
   actualizarEstadosPorFecha: () => api.post('/pedidos/actualizar-estados-por-fecha'),
+  // Long-poll: responde apenas hay cambios posteriores al cursor (o vacío tras `espera` segundos)
+  obtenerCambios: (desde, espera = 25) => api.get('/pedidos/cambios', { params: { desde, espera, campos: 'detalle' } }),
 };
 
 // === INSUMOS DE PEDIDOS (TALLER) ===
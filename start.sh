@@ -1,5 +1,15 @@
 #!/bin/bash
 
+# Modo producción: backend con Gunicorn (varios workers, reinicio ordenado con kill -HUP)
+# Uso: ./start.sh produccion
+if [ "$1" = "produccion" ]; then
+    cd "$(dirname "$0")/backend" || exit 1
+    echo "🌸 Las Lira - Backend en modo producción"
+    echo "   • Listo para recibir tráfico: http://127.0.0.1:${PORT:-5001}/api/ready"
+    echo "   • Reinicio ordenado: kill -HUP \$(cat backend/gunicorn.pid)"
+    exec gunicorn -c gunicorn.conf.py 'app:create_app()'
+fi
+
 echo "🌸 =================================="
 echo "   LAS LIRA - Sistema de Gestión"
 echo "   =================================="